@@ -0,0 +1,109 @@
+"""
+并发查询基准：asyncpg 连接池 vs 线程池卸载的同步查询
+
+使用方法：
+    python scripts/benchmark_async_queries.py [--concurrency 64] [--rounds 3]
+    python scripts/benchmark_async_queries.py --host /tmp/pgdata --database cost_allocation --password ""
+
+说明：
+    - 默认查询带 pg_sleep 模拟较慢的语句，衡量的是并发在途查询的吞吐与线程占用
+    - native：AsyncPostgreSQLDataSource.execute_query_async（asyncpg 连接池）
+    - thread：PostgreSQLDataSource.execute_query_async（基类默认实现，asyncio.to_thread 卸载）
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.core.data_sources.async_postgres_source import AsyncPostgreSQLDataSource
+from src.core.data_sources.postgres_source import PostgreSQLDataSource
+
+DEFAULT_QUERY = "SELECT pg_sleep(0.05) AS slept, COUNT(*) AS n FROM pg_class"
+
+
+async def run_round(source, query, concurrency):
+    """并发执行一轮查询，返回 (耗时秒, 各查询延迟列表, 峰值线程数)"""
+    latencies = []
+    peak_threads = threading.active_count()
+
+    async def one():
+        nonlocal peak_threads
+        started = time.perf_counter()
+        await source.execute_query_async(query)
+        latencies.append(time.perf_counter() - started)
+        peak_threads = max(peak_threads, threading.active_count())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, peak_threads
+
+
+async def benchmark(name, source, query, concurrency, rounds):
+    # 预热：建立连接池
+    await source.execute_query_async(query)
+    elapsed_total = 0.0
+    latencies = []
+    peak_threads = 0
+    for _ in range(rounds):
+        elapsed, round_latencies, threads = await run_round(source, query, concurrency)
+        elapsed_total += elapsed
+        latencies.extend(round_latencies)
+        peak_threads = max(peak_threads, threads)
+
+    latencies.sort()
+    queries = concurrency * rounds
+    print(
+        f"{name:<8} {queries:>6} queries  {queries / elapsed_total:>8.1f} q/s  "
+        f"p50={statistics.median(latencies) * 1000:>7.1f}ms  "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:>7.1f}ms  "
+        f"peak threads={peak_threads}"
+    )
+
+
+async def main_async(args):
+    kwargs = {}
+    for key in ("host", "port", "database", "user", "password"):
+        value = getattr(args, key)
+        if value is not None:
+            kwargs[key] = value
+    connection_params = {"host": kwargs.pop("host")} if "host" in kwargs else None
+
+    print(f"Concurrency {args.concurrency} x {args.rounds} rounds: {args.query}")
+    native = AsyncPostgreSQLDataSource(
+        connection_params=connection_params, pool_max_size=args.pool_size, **kwargs
+    )
+    try:
+        await benchmark("native", native, args.query, args.concurrency, args.rounds)
+    finally:
+        await native.close_async()
+
+    threaded = PostgreSQLDataSource(connection_params=connection_params, **kwargs)
+    try:
+        await benchmark("thread", threaded, args.query, args.concurrency, args.rounds)
+    finally:
+        threaded.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent async PostgreSQL queries")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发查询数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="基准查询")
+    parser.add_argument("--pool-size", type=int, default=None, help="asyncpg 连接池大小")
+    parser.add_argument("--host", default=None, help="主机或 Unix socket 目录，默认读取配置")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--user", default=None)
+    parser.add_argument("--password", default=None)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
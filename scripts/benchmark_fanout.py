@@ -0,0 +1,147 @@
+"""
+预处理关键路径基准：顺序执行 vs 并行分叉（workflow.fan_out）
+
+使用方法：
+    python scripts/benchmark_fanout.py [--rounds 5] [--latency 300]
+
+说明：
+    - 数据：tests/fixtures 下的 Excel 文件，每个请求绑定新的 Excel 数据源（模拟用户上传，表结构需重新读取）
+    - LLM：本地 OpenAI 兼容桩服务，每次调用固定延迟 --latency 毫秒，按提示词返回意图或选表 JSON
+    - 只运行到 load_context（GraphWorkflow.build_preprocess_graph），技能按 NLToSQLAgent 预选的方式强制指定
+    - 输出两种图的单请求中位耗时（即加载上下文完成前的关键路径）
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config.settings import (
+    AppConfig,
+    LLMResponseCacheConfig,
+    ModelConfig,
+    ProviderConfig,
+    QuestionCacheConfig,
+    set_config,
+)
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.session import open_session, release_session
+from src.core.llm import reset_llm_cache
+from src.graph.graph import GraphWorkflow
+
+FIXTURES = PROJECT_ROOT / "tests" / "fixtures"
+QUESTIONS = {
+    "nl_cost_data.xlsx": "2025年 IT 部门的 IT Cost 总额是多少",
+    "nl_rate_data.xlsx": "各月份的费率对比",
+    "nl_allocation_data.xlsx": "HR 的分摊金额合计",
+    "nl_procurement_data.xlsx": "Actual 场景下各类别的采购金额",
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI 兼容桩：固定延迟后按提示词返回选表或意图 JSON"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.3
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = json.dumps(request.get("messages"), ensure_ascii=False)
+        if "数据上下文加载助手" in prompt:
+            content = json.dumps([{"table_name": "Sheet1", "fields": []}])
+        else:
+            content = json.dumps({"is_data_query": True, "reason": "数据统计"}, ensure_ascii=False)
+        time.sleep(self.latency)
+        body = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "bench",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, graph, rounds):
+    timings = []
+    for _ in range(rounds):
+        for filename, question in QUESTIONS.items():
+            trace_id = str(uuid.uuid4())
+            session = open_session(trace_id, "excel")
+            session.bind_strategy(ExcelDataSource(str(FIXTURES / filename)))
+            state = {
+                "trace_id": trace_id,
+                "user_query": question,
+                "data_source_type": "excel",
+                "skill_name": "nl-to-sql-agent",
+                "skill_selected_by": "forced",
+                "skill_context": {"tables": ["Sheet1"]},
+            }
+            started = time.perf_counter()
+            try:
+                graph.invoke(state)
+            finally:
+                timings.append(time.perf_counter() - started)
+                release_session(trace_id)
+    print(
+        f"{label:<10} critical path per request: median {statistics.median(timings) * 1000:>7.1f} ms  "
+        f"p90 {sorted(timings)[int(len(timings) * 0.9) - 1] * 1000:>7.1f} ms  ({len(timings)} requests)"
+    )
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs fan-out preprocessing")
+    parser.add_argument("--rounds", type=int, default=5, help="每个 fixture 问题的重复次数")
+    parser.add_argument("--latency", type=float, default=300, help="桩 LLM 每次调用的延迟（毫秒）")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    set_config(
+        AppConfig(
+            model=ModelConfig(
+                active="bench",
+                providers={
+                    "bench": ProviderConfig(
+                        provider="openai", model_name="bench", api_key="sk-bench", base_url=base_url, max_tokens=64
+                    )
+                },
+                response_cache=LLMResponseCacheConfig(enabled=False),
+            ),
+            question_cache=QuestionCacheConfig(enabled=False),
+        )
+    )
+    reset_llm_cache()
+
+    try:
+        sequential = run("sequential", GraphWorkflow("chain", fan_out=False).build_preprocess_graph(), args.rounds)
+        fan_out = run("fan-out", GraphWorkflow("chain", fan_out=True).build_preprocess_graph(), args.rounds)
+        print(f"saved per request: {(sequential - fan_out) * 1000:.1f} ms ({1 - fan_out / sequential:.0%})")
+    finally:
+        reset_llm_cache()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
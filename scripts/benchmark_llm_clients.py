@@ -0,0 +1,131 @@
+"""
+LLM 客户端复用基准：每次调用新建客户端 vs 进程内缓存 + 共享 keep-alive 连接池
+
+使用方法：
+    python scripts/benchmark_llm_clients.py [--requests 20] [--calls 8]
+    python scripts/benchmark_llm_clients.py --base-url https://api.example.com/v1 --api-key sk-...
+
+说明：
+    - 默认启动本地的 OpenAI 兼容桩服务（/chat/completions 立即返回），只衡量客户端构建与建连开销；
+      指定 --base-url 时对真实端点测量（会产生实际调用费用）
+    - 一次“请求”模拟一个问题流经工作流：依次调用 --calls 次 get_llm() + invoke
+    - 输出每次请求的耗时与服务端看到的新 TCP 连接数
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config.settings import AppConfig, LLMClientConfig, ModelConfig, ProviderConfig, set_config
+from src.core.llm import get_llm, reset_llm_cache
+
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "bench",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI 兼容桩：支持 HTTP/1.1 keep-alive，统计新连接数"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 头与正文分两次写出，避免 Nagle + 延迟 ACK 的 40ms 停顿
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, requests, calls, base_url, api_key, model, cache_clients):
+    set_config(
+        AppConfig(
+            model=ModelConfig(
+                active="bench",
+                providers={
+                    "bench": ProviderConfig(
+                        provider="openai", model_name=model, api_key=api_key, base_url=base_url, max_tokens=8
+                    )
+                },
+                client=LLMClientConfig(cache_clients=cache_clients),
+            )
+        )
+    )
+    reset_llm_cache()
+    get_llm().invoke("warm up")
+    StubHandler.connections = 0
+
+    construct, total = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        build = 0.0
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            llm = get_llm()
+            build += time.perf_counter() - t0
+            llm.invoke("ping")
+        total.append(time.perf_counter() - started)
+        construct.append(build)
+
+    print(
+        f"{label:<8} per request ({calls} calls): median {statistics.median(total) * 1000:>7.1f} ms  "
+        f"client setup {statistics.median(construct) * 1000:>6.1f} ms  "
+        f"new connections/request {StubHandler.connections / requests:>4.1f}"
+    )
+    return statistics.median(total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM client reuse")
+    parser.add_argument("--requests", type=int, default=20, help="模拟的请求数")
+    parser.add_argument("--calls", type=int, default=8, help="每个请求的 LLM 调用次数（工作流节点数）")
+    parser.add_argument("--base-url", default=None, help="OpenAI 兼容端点，默认使用本地桩服务")
+    parser.add_argument("--api-key", default="sk-bench")
+    parser.add_argument("--model", default="bench")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    server = None
+    if base_url is None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    try:
+        fresh = run("fresh", args.requests, args.calls, base_url, args.api_key, args.model, False)
+        cached = run("cached", args.requests, args.calls, base_url, args.api_key, args.model, True)
+        print(f"saved per request: {(fresh - cached) * 1000:.1f} ms")
+    finally:
+        reset_llm_cache()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+预处理基准：select_skill → analyze_intent → 选表 三次调用 vs 融合的 understand 单次调用
+
+使用方法：
+    python scripts/benchmark_preprocess.py "各部门2024年的总成本" "IT部门人数" [--rounds 3]
+    python scripts/benchmark_preprocess.py --file questions.txt
+
+说明：
+    - 使用 config.yaml 中配置的模型（会产生实际调用费用），运行期间关闭 LLM 响应缓存
+    - 只运行预处理阶段，不生成与执行 SQL
+    - 输出两种方式每个问题的中位耗时，以及融合方式与原链路在技能、意图、表名上的一致率
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.agents.intent_analysis_agent import analyze_intent_node
+from src.agents.load_context_agent import select_tables
+from src.agents.understand_agent import understand_node
+from src.config.settings import get_config
+from src.core.llm import get_llm, reset_llm_cache
+from src.skills.middleware.skill_middleware import select_skill_node
+
+
+def _table_names(tables):
+    return sorted(t.get("table_name") for t in tables or [] if isinstance(t, dict) and t.get("table_name"))
+
+
+def run_chain(question):
+    state = select_skill_node({"user_query": question})
+    state = analyze_intent_node(state)
+    tables, _ = select_tables(get_llm(node="load_context"), question, state.get("skill_context") or {})
+    return state, _table_names(tables)
+
+
+def run_fused(question):
+    state = understand_node({"user_query": question})
+    tables = state.get("selected_tables")
+    if tables is None:
+        # 换了技能或结构化调用失败时，工作流由 load_context 再选一次表
+        tables, _ = select_tables(get_llm(node="load_context"), question, state.get("skill_context") or {})
+    return state, _table_names(tables)
+
+
+def measure(runner, question, rounds):
+    timings, outcome = [], None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        outcome = runner(question)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), outcome
+
+
+def _is_data_query(state):
+    return bool((state.get("intent_analysis") or {}).get("is_data_query"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chain vs fused preprocessing")
+    parser.add_argument("questions", nargs="*", help="测试问题")
+    parser.add_argument("--file", default=None, help="每行一个问题的文本文件")
+    parser.add_argument("--rounds", type=int, default=3, help="每个问题的重复次数（取中位数）")
+    args = parser.parse_args()
+
+    questions = list(args.questions)
+    if args.file:
+        questions += [line.strip() for line in Path(args.file).read_text(encoding="utf-8").splitlines() if line.strip()]
+    if not questions:
+        parser.error("至少提供一个问题")
+
+    get_config().model.response_cache.enabled = False
+    reset_llm_cache()
+
+    chain_times, fused_times = [], []
+    agree = {"skill": 0, "intent": 0, "tables": 0}
+    for question in questions:
+        chain_time, (chain_state, chain_tables) = measure(run_chain, question, args.rounds)
+        fused_time, (fused_state, fused_tables) = measure(run_fused, question, args.rounds)
+        chain_times.append(chain_time)
+        fused_times.append(fused_time)
+
+        agree["skill"] += chain_state.get("skill_name") == fused_state.get("skill_name")
+        agree["intent"] += _is_data_query(chain_state) == _is_data_query(fused_state)
+        agree["tables"] += chain_tables == fused_tables
+        print(
+            f"{question[:30]:<30}  chain {chain_time * 1000:>7.0f} ms  fused {fused_time * 1000:>7.0f} ms  "
+            f"tables {chain_tables} vs {fused_tables}"
+        )
+
+    total = len(questions)
+    print(
+        f"median latency: chain {statistics.median(chain_times) * 1000:.0f} ms, "
+        f"fused {statistics.median(fused_times) * 1000:.0f} ms"
+    )
+    print("agreement: " + ", ".join(f"{key} {count}/{total}" for key, count in agree.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+SQL Server 连接池与分批读取基准（模拟 pyodbc 驱动，无需 SQL Server 实例）
+
+使用方法：
+    python scripts/benchmark_sqlserver_fetch.py [--rows 200000] [--queries 50] [--login-ms 30]
+
+说明：
+    - 模拟驱动替换 sys.modules["pyodbc"]，SQLAlchemy 的 mssql+pyodbc 方言照常初始化；
+      每次 connect 休眠 --login-ms 模拟登录握手，查询返回预先生成的行
+    - connect：每次查询新建数据源实例，对比“每个实例一个 engine”（旧行为）与按 DSN 共享的连接池
+    - fetch：同一结果集对比 fetchall() + DataFrame(rows) 与按 arraysize 分批 fetchmany、
+      每批转换为按列类型的数组，输出耗时与峰值内存（tracemalloc）
+"""
+
+import argparse
+import datetime
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+from decimal import Decimal
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+
+
+def make_mock_pyodbc(row_count, make_row, description, login_seconds, stats):
+    """构建模拟的 pyodbc 模块；结果集的行在读取时由 make_row(i) 生成"""
+    module = types.ModuleType("pyodbc")
+    module.version, module.paramstyle, module.apilevel, module.threadsafety = "5.1.0", "qmark", "2.0", 1
+    module.SQL_DBMS_VER, module.SQL_DRIVER_NAME = 18, 6
+    module.Error = type("Error", (Exception,), {})
+    for name in ("Warning", "InterfaceError", "DatabaseError", "DataError", "OperationalError",
+                 "IntegrityError", "InternalError", "ProgrammingError", "NotSupportedError"):
+        setattr(module, name, type(name, (module.Error,), {}))
+
+    class Cursor:
+        arraysize = 1
+
+        def __init__(self):
+            self.description, self._count, self._make, self._pos = None, 0, None, 0
+
+        def execute(self, sql, *params):
+            if "FROM bench" in sql:
+                self.description, self._count, self._make = description, row_count, make_row
+            else:
+                self.description = [("v", str, None, None, None, None, True)]
+                self._count, self._make = 1, lambda i: ("16.0.1000.6",)
+            self._pos = 0
+            return self
+
+        def fetchmany(self, size=None):
+            # 与真实驱动一样，行对象与其中的值在读取时才创建
+            end = min(self._count, self._pos + (size or self.arraysize))
+            batch = [self._make(i) for i in range(self._pos, end)]
+            self._pos = end
+            return batch
+
+        def fetchone(self):
+            batch = self.fetchmany(1)
+            return batch[0] if batch else None
+
+        def fetchall(self):
+            return self.fetchmany(self._count - self._pos)
+
+        def nextset(self):
+            return False
+
+        def setinputsizes(self, *args):
+            pass
+
+        def cancel(self):
+            pass
+
+        def close(self):
+            pass
+
+    class Connection:
+        timeout = 0
+
+        def cursor(self):
+            return Cursor()
+
+        def getinfo(self, key):
+            return "16.00.1000"
+
+        def add_output_converter(self, *args):
+            pass
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    def connect(*args, **kwargs):
+        stats["connects"] += 1
+        time.sleep(login_seconds)
+        return Connection()
+
+    module.Cursor, module.Connection, module.connect = Cursor, Connection, connect
+    return module
+
+
+def make_result():
+    """基准结果集的列描述与行生成函数"""
+    description = [
+        (name, type_code, None, None, None, None, True)
+        for name, type_code in [
+            ("id", int), ("amount", float), ("function", str),
+            ("period", datetime.datetime), ("cost", Decimal), ("flag", bool),
+        ]
+    ]
+    start = datetime.datetime(2025, 1, 1)
+
+    def make_row(i):
+        return (i, i * 0.5, f"F{i % 17}", start + datetime.timedelta(hours=i % 8760), Decimal(i) / 100, i % 2 == 0)
+
+    return description, make_row
+
+
+def bench_connect(queries, stats):
+    from sqlalchemy import create_engine, text
+
+    from src.core.data_sources.engines import dispose_shared_engines
+    from src.core.data_sources.sqlserver_source import SQLServerDataSource
+
+    query = "SELECT 1 AS one"
+
+    def per_instance_engine():
+        # 旧行为：每个数据源实例 create_engine，连接池随实例丢弃
+        source = SQLServerDataSource(host="mock-host", password="pw")
+        engine = create_engine(f"{source._get_connection_string()}?driver={source.driver}")
+        with engine.connect() as conn:
+            conn.execute(text(query)).fetchall()
+        engine.dispose()
+
+    def shared_engine():
+        SQLServerDataSource(host="mock-host", password="pw").execute_query(query)
+
+    for name, fn in (("per-instance", per_instance_engine), ("shared pool", shared_engine)):
+        dispose_shared_engines()
+        stats["connects"] = 0
+        started = time.perf_counter()
+        for _ in range(queries):
+            fn()
+        elapsed = time.perf_counter() - started
+        print(
+            f"connect  {name:<13} {queries} queries  {elapsed * 1000 / queries:>7.2f} ms/query  "
+            f"logins={stats['connects']}"
+        )
+
+
+def bench_fetch(row_count, description, repeats):
+    from src.core.data_sources.sqlserver_source import _fetch_frame
+
+    module = sys.modules["pyodbc"]
+
+    def fetchall_rows():
+        cursor = module.Connection().cursor().execute("SELECT * FROM bench")
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in description])
+
+    def batched_typed(arraysize):
+        cursor = module.Connection().cursor().execute("SELECT * FROM bench")
+        return _fetch_frame(cursor, arraysize)
+
+    variants = [("fetchall", fetchall_rows)] + [
+        (f"fetchmany {size}", lambda size=size: batched_typed(size)) for size in (1000, 5000, 20000)
+    ]
+    for name, fn in variants:
+        timings = []
+        for _ in range(repeats):
+            gc.collect()
+            started = time.perf_counter()
+            df = fn()
+            timings.append(time.perf_counter() - started)
+
+        # 峰值内存单独测量（tracemalloc 会拖慢执行）
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        dtypes = ",".join(str(t) for t in df.dtypes)
+        print(
+            f"fetch    {name:<15} {row_count} rows  median {statistics.median(timings) * 1000:>8.1f} ms  "
+            f"peak {peak / 2**20:>6.1f} MiB  [{dtypes}]"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQL Server pooling and batched fetch with a mock driver")
+    parser.add_argument("--rows", type=int, default=200_000, help="结果集行数")
+    parser.add_argument("--queries", type=int, default=50, help="connect 基准的查询次数")
+    parser.add_argument("--login-ms", type=float, default=30.0, help="模拟登录耗时（毫秒）")
+    parser.add_argument("--repeats", type=int, default=5, help="fetch 基准重复次数")
+    args = parser.parse_args()
+
+    description, make_row = make_result()
+    stats = {"connects": 0}
+    sys.modules["pyodbc"] = make_mock_pyodbc(args.rows, make_row, description, args.login_ms / 1000, stats)
+
+    bench_connect(args.queries, stats)
+    bench_fetch(args.rows, description, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+索引顾问：根据慢查询日志中的已执行 SQL 推荐索引并估算收益
+
+使用方法：
+    python scripts/index_advisor.py --source postgresql [--log logs/slow_queries.jsonl] [--apply]
+    python scripts/index_advisor.py --source excel [--excel data/cost_database.xlsx] [--apply]
+
+说明：
+    - PostgreSQL 收益估算优先使用 HypoPG 假设索引；未安装时在事务内建索引、EXPLAIN 后回滚，
+      会短暂锁表，建议对本地副本运行（--db 指向副本）
+    - Excel 在内存 SQLite 目录副本上做建索引前后的基准测试
+    - --apply：PostgreSQL 执行 CREATE INDEX CONCURRENTLY；Excel 写入 config.yaml 的
+      data_source.excel.indexes，由 ExcelDataSource 构建内存目录时建立
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config.settings import get_config
+from src.core.data_sources.index_advisor import (
+    apply_postgres_indexes,
+    estimate_postgres_benefit,
+    estimate_sqlite_benefit,
+    load_workload,
+    postgres_catalog,
+    postgres_existing_indexes,
+    propose_indexes,
+    sqlite_catalog,
+    sqlite_existing_indexes,
+)
+from src.core.data_sources.query_log import iter_log_files
+
+
+def write_excel_indexes(config_path: Path, indexes: dict) -> None:
+    """把索引配置写入 config.yaml 的 data_source.excel.indexes（保留文件其余内容与注释）"""
+    lines = config_path.read_text(encoding="utf-8").splitlines()
+    block = yaml.safe_dump({"indexes": indexes}, allow_unicode=True, default_flow_style=None)
+    new_lines = ["    " + line for line in block.rstrip().splitlines()]
+
+    in_data_source = in_excel = written = False
+    for i, line in enumerate(lines):
+        if re.match(r"^data_source:", line):
+            in_data_source = True
+        elif in_data_source and re.match(r"^\S", line):
+            break
+        elif in_data_source and re.match(r"^  excel:", line):
+            in_excel = True
+        elif in_excel and re.match(r"^    indexes:", line):
+            end = i + 1
+            while end < len(lines) and lines[end].startswith("      "):
+                end += 1
+            lines[i:end] = new_lines
+            written = True
+            break
+        elif in_excel and re.match(r"^  \S", line):
+            # excel 段结束仍未找到 indexes，插入到段尾
+            lines[i:i] = new_lines + [""]
+            written = True
+            break
+
+    if not written:
+        raise ValueError(f"data_source.excel section not found in {config_path}")
+
+    config_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend indexes from the executed-query log")
+    parser.add_argument("--source", choices=["postgresql", "excel"], required=True)
+    parser.add_argument("--log", default=None, help="慢查询日志路径，默认读取配置")
+    parser.add_argument("--excel", default=None, help="Excel 文件路径，默认使用配置中的第一个文件")
+    parser.add_argument("--db", default=None, help="PostgreSQL 连接串（建议指向本地副本）")
+    parser.add_argument("--top", type=int, default=10, help="最多推荐的索引数")
+    parser.add_argument("--min-queries", type=int, default=2, help="至少命中多少次执行")
+    parser.add_argument("--min-benefit", type=float, default=0.2, help="应用时要求的最小收益比例")
+    parser.add_argument("--apply", action="store_true", help="应用收益达标的推荐")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    config = get_config()
+    log_path = args.log or config.data_source.slow_query_log.path
+    workload = load_workload(iter_log_files(log_path))
+    workload = [e for e in workload if e.get("source") == args.source]
+    if not workload:
+        print(f"No {args.source} executions found in {log_path}")
+        return
+
+    if args.source == "postgresql":
+        from sqlalchemy import create_engine
+        from src.core.data_sources.postgres_source import PostgreSQLDataSource
+
+        source = PostgreSQLDataSource()
+        engine = create_engine(args.db) if args.db else source._get_engine()
+        schema = source.schema
+        candidates = propose_indexes(
+            workload,
+            catalog=postgres_catalog(engine, schema),
+            existing=postgres_existing_indexes(engine, schema),
+            min_queries=args.min_queries,
+        )[: args.top]
+        estimate_postgres_benefit(engine, candidates, schema)
+    else:
+        from src.core.data_sources.excel_source import ExcelDataSource
+
+        file_path = args.excel or next(
+            (p for p in config.data_source.excel.file_paths.values() if p), None
+        )
+        if not file_path:
+            print("No Excel file configured; pass --excel")
+            return
+        conn = ExcelDataSource(file_path).build_catalog()
+        candidates = propose_indexes(
+            workload,
+            catalog=sqlite_catalog(conn),
+            existing=sqlite_existing_indexes(conn),
+            min_queries=args.min_queries,
+        )[: args.top]
+        estimate_sqlite_benefit(conn, candidates)
+        conn.close()
+
+    if args.json:
+        print(json.dumps([c.to_dict() for c in candidates], ensure_ascii=False, indent=2))
+    else:
+        print("=" * 80)
+        print(f"Index recommendations for {args.source} ({len(workload)} logged executions)")
+        print("=" * 80)
+        for candidate in candidates:
+            benefit = "n/a" if candidate.benefit is None else f"{candidate.benefit:.0%}"
+            print(
+                f"{candidate.table}({', '.join(candidate.columns)})  queries={candidate.queries}  "
+                f"weight={candidate.weight_ms:,.0f}ms  benefit={benefit}  [{candidate.method or 'no samples'}]"
+            )
+            print(f"    {candidate.ddl()}")
+
+    if not args.apply:
+        return
+
+    selected = [c for c in candidates if c.benefit is not None and c.benefit >= args.min_benefit]
+    if not selected:
+        print("\nNo recommendation reaches --min-benefit; nothing applied")
+        return
+
+    if args.source == "postgresql":
+        for ddl in apply_postgres_indexes(engine, selected, schema):
+            print(f"Applied: {ddl}")
+    else:
+        indexes = {k: [list(cols) for cols in v] for k, v in config.data_source.excel.indexes.items()}
+        for candidate in selected:
+            columns = list(candidate.columns)
+            if columns not in indexes.setdefault(candidate.table, []):
+                indexes[candidate.table].append(columns)
+        config_path = PROJECT_ROOT / "config.yaml"
+        write_excel_indexes(config_path, indexes)
+        print(f"Updated data_source.excel.indexes in {config_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+刷新分摊预聚合表 alloc_cost_rollup
+
+使用方法：
+    python scripts/refresh_rollups.py --db <database_url> --missing
+    python scripts/refresh_rollups.py --db <database_url> --partition FY25 Actual Oct --partition FY25 Actual Nov
+    python scripts/refresh_rollups.py --db <database_url> --full
+
+说明：
+    --missing    只刷新成本表中存在但预聚合表尚未覆盖的 (year, scenario, month) 分区（默认）
+    --partition  刷新指定分区（如重新导入了某个月份）
+    --full       全量重建
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config.settings import get_config
+from src.core.data_sources.rollups import AllocationRollup
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    rollup_config = get_config().data_source.rollups
+
+    parser = argparse.ArgumentParser(description="Refresh the allocation rollup table")
+    parser.add_argument("--db", required=True, help="Database URL")
+    parser.add_argument("--dialect", choices=["postgresql", "sqlserver"], default="postgresql")
+    parser.add_argument("--full", action="store_true", help="Rebuild the whole rollup")
+    parser.add_argument("--missing", action="store_true", help="Refresh partitions not yet in the rollup")
+    parser.add_argument(
+        "--partition", nargs=3, action="append", metavar=("YEAR", "SCENARIO", "MONTH"),
+        help="Refresh one (year, scenario, month) partition; repeatable",
+    )
+    parser.add_argument("--cost-table", default=rollup_config.cost_table)
+    parser.add_argument("--rate-table", default=rollup_config.rate_table)
+    parser.add_argument("--rollup-table", default=rollup_config.table)
+    args = parser.parse_args()
+
+    rollup = AllocationRollup(
+        create_engine(args.db),
+        dialect=args.dialect,
+        cost_table=args.cost_table,
+        rate_table=args.rate_table,
+        rollup_table=args.rollup_table,
+    )
+
+    if args.full:
+        written = rollup.refresh()
+    elif args.partition:
+        written = rollup.refresh([tuple(p) for p in args.partition])
+    else:
+        partitions = rollup.missing_partitions()
+        logger.info(f"Missing partitions: {partitions}")
+        written = rollup.refresh(partitions) if partitions else 0
+
+    logger.info(f"✅ {args.rollup_table} refreshed, {written} rows written")
+
+
+if __name__ == "__main__":
+    main()
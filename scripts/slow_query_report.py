@@ -0,0 +1,74 @@
+"""
+慢查询报告：按查询形状（归一化 SQL 指纹）对慢查询日志排名
+
+使用方法：
+    python scripts/slow_query_report.py [--log logs/slow_queries.jsonl] [--top 20] [--sort total_ms]
+
+示例：
+    python scripts/slow_query_report.py --sort p95_ms --top 10
+    python scripts/slow_query_report.py --fingerprint 3f2a9c0d1b2e4f56 --show-plan
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.data_sources.query_log import iter_log_files, summarize_slow_queries
+
+SORT_KEYS = ["total_ms", "p95_ms", "max_ms", "count", "avg_rows", "avg_bytes"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the worst query shapes in the slow query log")
+    parser.add_argument("--log", default=None, help="慢查询日志路径，默认读取 config.yaml 中的 slow_query_log.path")
+    parser.add_argument("--top", type=int, default=20, help="显示前 N 个查询形状")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="total_ms", help="排序字段")
+    parser.add_argument("--fingerprint", default=None, help="只显示指定指纹")
+    parser.add_argument("--show-plan", action="store_true", help="显示最近一次抓取的执行计划")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args()
+
+    log_path = args.log
+    if log_path is None:
+        from src.config.settings import get_config
+
+        log_path = get_config().data_source.slow_query_log.path
+
+    files = iter_log_files(log_path)
+    if not files:
+        print(f"No slow query log found at {log_path}")
+        return
+
+    summary = summarize_slow_queries(files)
+    if args.fingerprint:
+        summary = [s for s in summary if s["fingerprint"].startswith(args.fingerprint)]
+    summary.sort(key=lambda s: s[args.sort], reverse=True)
+    summary = summary[: args.top]
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2, default=str))
+        return
+
+    print("=" * 100)
+    print(f"Slow query shapes ranked by {args.sort} ({len(files)} log file(s))")
+    print("=" * 100)
+    for rank, item in enumerate(summary, 1):
+        print(
+            f"#{rank:<3} {item['fingerprint']}  count={item['count']:<5} "
+            f"total={item['total_ms']:>10,.0f}ms  p50={item['p50_ms']:>8,.0f}ms  "
+            f"p95={item['p95_ms']:>8,.0f}ms  max={item['max_ms']:>8,.0f}ms  "
+            f"rows~{item['avg_rows']:,.0f}  bytes~{item['avg_bytes']:,}  "
+            f"sources={','.join(item['sources'])}  plans={item['plans']}  "
+            f"errors={item['errors']}  timeouts={item['timeouts']}"
+        )
+        print(f"     {item['sql'][:300]}")
+        if args.show_plan and item["last_plan"] is not None:
+            print(json.dumps(item["last_plan"], ensure_ascii=False, indent=2)[:4000])
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,17 @@ functions and business lines.
 
 Usage:
     python generate_allocation_sql.py --years FY25 --scenarios Actual --function "IT Allocation" --party_field "t7.[BL]" --party_value "'CT'"
+    python generate_allocation_sql.py --years FY25 --scenarios Actual --function "IT Allocation" --party_field "r.bl" --party_value "'CT'" --use_rollup
 """
 
+import re
 import sys
 import argparse
 from typing import List, Optional
 
 # SQL Template for Allocation Calculation
 # Uses CTEs for readability and performance
-ALLOC_TEMPLATE = """
+MONTHLY_ALLOC_CTE = """
 WITH monthly_alloc AS (
     SELECT
         cdb.year AS "Year",
@@ -38,7 +40,26 @@ WITH monthly_alloc AS (
       AND cdb.function = {function_literal}
       AND {party_filter}
     GROUP BY cdb.year, {party_field}
-),
+),"""
+
+# Same CTE served from the precomputed alloc_cost_rollup table
+# (already joined and aggregated by year/scenario/function/key/month/bl/cc)
+MONTHLY_ALLOC_ROLLUP_CTE = """
+WITH monthly_alloc AS (
+    SELECT
+        ro.year AS "Year",
+        COALESCE(SUM(ro.cost_amount), 0) AS "Base_Month_Cost",
+        COALESCE(SUM(ro.allocated_amount), 0) AS "Allocated_Month_Cost",
+        {party_field} AS "Allocated_Party"
+    FROM {rollup_table} ro
+    WHERE {year_filter}
+      AND {scenario_filter}
+      AND ro.function = {function_literal}
+      AND {party_filter}
+    GROUP BY ro.year, {party_field}
+),"""
+
+ALLOC_TAIL = """
 yearly_agg AS (
     SELECT
         "Year",
@@ -76,6 +97,9 @@ FROM compare
 ORDER BY "Allocated_Party", "Year" DESC;
 """
 
+ALLOC_TEMPLATE = MONTHLY_ALLOC_CTE + ALLOC_TAIL
+ALLOC_ROLLUP_TEMPLATE = MONTHLY_ALLOC_ROLLUP_CTE + ALLOC_TAIL
+
 
 def _quote_literal(s: str) -> str:
     """Safely quote a string literal for SQL."""
@@ -103,6 +127,8 @@ def generate_alloc_sql(
     function_name: str,
     party_field: str,
     party_value: str,
+    use_rollup: bool = False,
+    rollup_table: str = "alloc_cost_rollup",
 ) -> str:
     """
     Generate the SQL query for cost allocation.
@@ -113,6 +139,9 @@ def generate_alloc_sql(
         function_name: Function name (e.g., 'IT Allocation')
         party_field: The field representing the allocated party (e.g., 't7.[BL]')
         party_value: The value for the party field (e.g., "'CT'")
+        use_rollup: Read from the precomputed rollup table instead of joining
+            CostDataBase to Rate (the party field alias is rewritten to the rollup)
+        rollup_table: Name of the rollup table
 
     Returns:
         Formatted SQL query string.
@@ -125,17 +154,24 @@ def generate_alloc_sql(
     if not function_name:
         raise ValueError("Function name is required")
 
-    year_filter = _build_or_list(years, "cdb.year")
-    scenario_filter = _build_or_list(scenarios, "cdb.scenario")
+    alias = "ro" if use_rollup else "cdb"
+    if use_rollup:
+        # t7.[BL] / r.bl -> ro.[BL] / ro.bl
+        party_field = re.sub(r"^\s*\w+\.", "ro.", party_field)
+
+    year_filter = _build_or_list(years, f"{alias}.year")
+    scenario_filter = _build_or_list(scenarios, f"{alias}.scenario")
     function_literal = _quote_literal(function_name)
     party_filter = f"{party_field} = {party_value}"
 
-    return ALLOC_TEMPLATE.format(
+    template = ALLOC_ROLLUP_TEMPLATE if use_rollup else ALLOC_TEMPLATE
+    return template.format(
         party_field=party_field,
         year_filter=year_filter,
         scenario_filter=scenario_filter,
         function_literal=function_literal,
         party_filter=party_filter,
+        rollup_table=rollup_table,
     ).strip()
 
 
@@ -155,6 +191,11 @@ def main():
         "--party_field", required=True, help="Party field name (e.g. t7.[BL])"
     )
     parser.add_argument("--party_value", required=True, help="Party value")
+    parser.add_argument(
+        "--use_rollup",
+        action="store_true",
+        help="Query the precomputed alloc_cost_rollup table instead of joining raw tables",
+    )
 
     args = parser.parse_args()
 
@@ -165,6 +206,7 @@ def main():
             function_name=args.function,
             party_field=args.party_field,
             party_value=args.party_value,
+            use_rollup=args.use_rollup,
         )
         print(sql)
     except Exception as e:
@@ -2,7 +2,7 @@ from .load_context_agent import load_context_node
 from .intent_analysis_agent import analyze_intent_node
 from .sql_generation_agent import generate_sql_node
 from .sql_validation_agent import validate_sql_node
-from .execute_sql_agent import execute_sql_node
+from .execute_sql_agent import execute_sql_tool_node
 from .result_review_agent import review_result_node
 from .refine_answer_agent import refine_answer_node
 
@@ -11,7 +11,7 @@ __all__ = [
     "analyze_intent_node",
     "generate_sql_node",
     "validate_sql_node",
-    "execute_sql_node",
+    "execute_sql_tool_node",
     "review_result_node",
     "refine_answer_node",
 ]
@@ -56,12 +56,15 @@ def _convert_limit_to_top(sql_query: str, data_source_type: str) -> str:
     return sql_query
 
 
-def execute_sql_impl(sql_query: str, data_source_type: str = "excel") -> Dict[str, Any]:
+def execute_sql_impl(
+    sql_query: str, data_source_type: str = "excel", trace_id: Optional[str] = None
+) -> Dict[str, Any]:
     """Execute SQL query implementation.
 
     Args:
         sql_query: The SQL query to execute
         data_source_type: Type of data source (excel, sqlserver, postgresql)
+        trace_id: Request ID used to look up the cancellation token
 
     Returns:
         Dictionary with 'result' or 'error' key
@@ -71,7 +74,9 @@ def execute_sql_impl(sql_query: str, data_source_type: str = "excel") -> Dict[st
         cleaned_sql = _convert_limit_to_top(cleaned_sql, data_source_type)
 
         context_provider = get_data_source_context_provider()
-        df = context_provider.execute_sql(cleaned_sql, data_source_type=data_source_type)
+        df = context_provider.execute_sql(
+            cleaned_sql, data_source_type=data_source_type, trace_id=trace_id
+        )
 
         return {
             "result": df.to_string(index=False),
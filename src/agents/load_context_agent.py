@@ -3,93 +3,275 @@
 
 本模块负责根据用户查询和技能上下文加载数据源相关信息，
 识别需要查询的表名并获取表结构信息。
+各节点另有 *_async 版本（graph.ainvoke 时使用），LLM 与数据源调用在事件循环中等待。
 """
 
 from __future__ import annotations
 
 import json  # JSON 解析库
 import uuid  # UUID 生成库
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from langchain_core.messages import HumanMessage  # 人类消息类型
 
+from src.config.logger_interface import get_logger  # 日志
 from src.core.data_sources.context_provider import get_data_source_context_provider  # 数据源上下文提供者
-from src.core.llm import get_llm  # LLM 工厂函数
+from src.core.data_sources.session import get_session, session_for  # 请求级数据源会话
+from src.core.intent_classifier import LocalDecision, get_local_intent_classifier  # 本地意图/选表分类器
+from src.core.llm import ainvoke_llm, get_llm  # LLM 工厂函数与异步调用
+from src.core.metadata import parse_skill_metadata  # 技能元数据解析
+from src.core.prompt_budget import PromptAssembler  # 提示词令牌预算
+from src.core.value_index import lookup_question_values  # 字段取值索引
 
 if TYPE_CHECKING:
     from src.graph.graph import AgentState  # 工作流状态类型
 
+logger = get_logger("load_context_agent")
 
-def load_context_node(state: AgentState) -> AgentState:
-    """
-    上下文加载节点 - 根据用户查询加载数据源上下文
 
-    本节点完成以下功能：
-    1. 根据用户查询识别需要访问的数据表
-    2. 加载数据源上下文和表结构信息
-    3. 为后续 SQL 生成提供数据源信息
+def _is_auto_routing() -> bool:
+    """data_source.type 为 auto 时按表与观测统计逐请求路由"""
+    try:
+        from src.config.settings import get_config
+
+        return get_config().data_source.type == "auto"
+    except Exception:
+        return False
+
+
+def _cached_local_decision(state: AgentState) -> Tuple[bool, Optional[LocalDecision]]:
+    """(是否无需再计算, 结果)：未启用、不适用或本请求已计算过时无需计算"""
+    try:
+        from src.config.settings import get_config
+
+        config = get_config().intent_classifier
+    except Exception:
+        return True, None
+    if not config.enabled or not state.get("user_query") or state.get("retry_count"):
+        return True, None
+    session = get_session(state.get("trace_id"))
+    if session is not None and "local_decision" in session.cache:
+        return True, session.cache["local_decision"]
+    return False, None
+
+
+def _classify_locally(state: AgentState, catalog: Optional[List[str]]) -> Optional[LocalDecision]:
+    """调用本地分类器并在请求会话中记下结果"""
+    user_query = state.get("user_query") or ""
+    trace_id = state.get("trace_id")
+    value_hints: List[Dict[str, str]] = []
+    if not _is_auto_routing():  # auto 路由模式下数据源在选表后才确定
+        value_hints = [
+            hint.to_dict()
+            for hint in lookup_question_values(user_query, trace_id, state.get("data_source_type"))
+        ]
+
+    try:
+        decision = get_local_intent_classifier().classify(
+            user_query, parse_skill_metadata(state.get("skill_context")), value_hints, catalog or None
+        )
+    except Exception as e:
+        logger.warning(f"[{trace_id}] Local intent classifier failed: {e}")
+        return None
+    logger.info(
+        f"[{trace_id}] Local decision: intent {decision.is_data_query} ({decision.intent_confidence:.2f}, "
+        f"accepted={decision.intent_accepted}), tables {decision.tables} "
+        f"({decision.table_confidence:.2f}, accepted={decision.tables_accepted})"
+    )
+    session = get_session(trace_id)
+    if session is not None:
+        session.cache["local_decision"] = decision
+    return decision
+
+
+def local_decision_for(state: AgentState) -> Optional[LocalDecision]:
+    """本地分类器对当前问题的判断（同一请求内只计算一次，意图分析与选表共用）
+
+    重新分析（retry_count > 0）时返回 None，交给 LLM 判断。
 
     参数:
         state: 当前工作流状态
 
     返回:
-        更新后的工作流状态，包含表名列表和数据源模式
+        分类结果；未启用或不适用时为 None
     """
-    # 从状态中获取必要信息
-    # 技能上下文，用于理解业务逻辑
-    skill_context = state.get("skill_context") or {}
-    # LLM 实例，优先使用状态中保存的，否则使用全局默认
-    llm = state.get("llm") or get_llm()
-    # 用户原始查询
-    user_query = state.get("user_query", "")
-    # 重试次数，用于跟踪当前是第几次尝试
-    retry_count = state.get("retry_count", 0) or 0
+    done, decision = _cached_local_decision(state)
+    if done:
+        return decision
+    catalog = None
+    if not _is_auto_routing():
+        try:
+            catalog = list(session_for(state.get("trace_id"), state.get("data_source_type")).get_context().get("tables") or {})
+        except Exception as e:
+            logger.debug(f"[{state.get('trace_id')}] Table catalog unavailable for local classifier: {e}")
+    return _classify_locally(state, catalog)
 
-    # 生成追踪 ID，用于日志和问题排查
-    if not state.get("trace_id"):
-        state["trace_id"] = str(uuid.uuid4())
 
-    # 构建提示词，要求 LLM 识别需要加载的表
+async def local_decision_for_async(state: AgentState) -> Optional[LocalDecision]:
+    """local_decision_for 的异步版本（表目录经会话的异步接口读取）"""
+    done, decision = _cached_local_decision(state)
+    if done:
+        return decision
+    catalog = None
+    if not _is_auto_routing():
+        try:
+            session = session_for(state.get("trace_id"), state.get("data_source_type"))
+            catalog = list((await session.get_context_async()).get("tables") or {})
+        except Exception as e:
+            logger.debug(f"[{state.get('trace_id')}] Table catalog unavailable for local classifier: {e}")
+    return _classify_locally(state, catalog)
+
+
+def _local_tables(state: AgentState, decision: Optional[LocalDecision]) -> Optional[List[Dict[str, Any]]]:
+    """本地分类器置信时的选表结果（同时把判断依据写入状态）"""
+    if decision is None:
+        return None
+    state["local_decision"] = decision.to_dict()
+    if not decision.tables_accepted:
+        return None
+    return [{"table_name": table, "fields": []} for table in decision.tables]
+
+
+def _select_tables_prompt(user_query: str, skill_context: Dict[str, Any]) -> List[HumanMessage]:
+    """构建提示词，要求 LLM 识别需要加载的表
+
+    技能上下文不带脚本源码，并按 prompt_budget.nodes.load_context 的令牌预算裁剪文档章节（见 PromptAssembler），
+    提到技能表名的章节优先保留。
+    """
     prompt = (
         "你是一个数据上下文加载助手。请根据用户问题与技能上下文识别需要加载的表名。\n\n"
         "要求：仅返回 JSON 数组，每个元素包含 table_name 与 fields(字段名列表)。\n\n"
         f"用户问题:\n{user_query}\n\n"
-        f"技能上下文(JSON):\n{json.dumps(skill_context, ensure_ascii=False, indent=2)}\n"
+        "技能上下文(JSON):\n"
     )
+    metadata = parse_skill_metadata(skill_context)
+    table_names = list(metadata.get("tables") or []) + list(metadata.get("default_tables") or [])
+    assembler = PromptAssembler("load_context", user_query, keep_terms=table_names)
+    assembler.add_skill_context("skill_context", skill_context, include_scripts=False)
+    parts = assembler.fit(prompt)
+    return [HumanMessage(content=prompt + parts["skill_context"] + "\n")]
+
 
-    # 调用 LLM 获取表名列表
-    response = llm.invoke([HumanMessage(content=prompt)])
+def _parse_selected_tables(response: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """解析 LLM 返回的表列表"""
     content = response.content.replace("```json", "").replace("```", "").strip()
 
     # 解析 LLM 返回的 JSON 结果
     try:
         schema_json = json.loads(content)
-        # 确保解析结果是数组类型
-        if not isinstance(schema_json, list):
-            schema_json = []
     except Exception as e:
-        # JSON 解析失败，设置错误信息
-        schema_json = []
-        state["error_message"] = f"Failed to parse schema JSON: {e}"
+        # JSON 解析失败，返回错误信息
+        return [], f"Failed to parse schema JSON: {e}"
+    # 确保解析结果是数组类型
+    return (schema_json if isinstance(schema_json, list) else []), None
+
+
+def select_tables(llm, user_query: str, skill_context: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """由 LLM 根据用户问题与技能上下文选择需要加载的表
+
+    Args:
+        llm: 聊天模型
+        user_query: 用户问题
+        skill_context: 技能上下文
+
+    Returns:
+        (表列表 [{"table_name": ..., "fields": [...]}], 解析错误信息)
+    """
+    response = llm.invoke(_select_tables_prompt(user_query, skill_context))
+    return _parse_selected_tables(response)
+
+
+async def select_tables_async(
+    llm, user_query: str, skill_context: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """select_tables 的异步版本"""
+    response = await ainvoke_llm(llm, _select_tables_prompt(user_query, skill_context))
+    return _parse_selected_tables(response)
+
+
+def _selection_update(
+    state: AgentState, tables: List[Dict[str, Any]], error: Optional[str] = None
+) -> Dict[str, Any]:
+    update: Dict[str, Any] = {"local_decision": state.get("local_decision")} if state.get("local_decision") else {}
+    update["selected_tables"] = tables
+    if error:
+        update["error_message"] = error
+    return update
+
+
+def select_tables_node(state: AgentState) -> Dict[str, Any]:
+    """
+    选表节点 - 并行预处理（workflow.fan_out）中与意图分析同时运行的选表（本地分类器不置信时调用 LLM）
+
+    参数:
+        state: 当前工作流状态
+
+    返回:
+        只包含 selected_tables（另含 local_decision、解析失败时的 error_message）的状态更新
+    """
+    state = dict(state)
+    tables = _local_tables(state, local_decision_for(state))
+    if tables is not None:
+        return _selection_update(state, tables)
+    llm = state.get("llm") or get_llm(node="load_context")
+    return _selection_update(state, *select_tables(llm, state.get("user_query", ""), state.get("skill_context") or {}))
+
 
+async def select_tables_node_async(state: AgentState) -> Dict[str, Any]:
+    """select_tables_node 的异步版本"""
+    state = dict(state)
+    tables = _local_tables(state, await local_decision_for_async(state))
+    if tables is not None:
+        return _selection_update(state, tables)
+    llm = state.get("llm") or get_llm(node="load_context")
+    return _selection_update(
+        state, *(await select_tables_async(llm, state.get("user_query", ""), state.get("skill_context") or {}))
+    )
+
+
+def _route_tables(state: AgentState, selected_tables: List[Dict[str, Any]]) -> Optional[str]:
+    """写入表名列表、检测可用数据源；auto 模式下选择数据源
+
+    返回:
+        auto 模式路由到的数据源类型，其余情况为 None
+    """
     # 提取表名列表
     state["table_names"] = [
         table.get("table_name")
-        for table in schema_json
+        for table in selected_tables
         if isinstance(table, dict) and table.get("table_name")
     ]
 
-    # 获取数据源上下文提供者
-    context_provider = get_data_source_context_provider()
     # 检测可用数据源
-    context_provider.detect_sources(state.get("table_names", []))
-    # 获取数据源上下文（表结构信息）
-    schema_text = context_provider.get_data_source_context(state.get("table_names", []))
-    # 保存数据源模式到状态
+    get_data_source_context_provider().detect_sources(state.get("table_names", []))
+
+    # auto 模式：选择拥有全部表且观测耗时最低的数据源，决策写入状态（随 trace 返回）
+    routed_source = None
+    if _is_auto_routing():
+        try:
+            from src.core.data_sources.manager import get_data_source_manager
+
+            decision = get_data_source_manager().route(state.get("table_names", []))
+            routed_source = decision.source
+            state["routing_decision"] = decision.to_dict()
+            logger.info(
+                f"[{state.get('trace_id')}] Routed to {decision.source}: {decision.reason}"
+            )
+        except Exception as e:
+            logger.warning(f"[{state.get('trace_id')}] Data source routing failed: {e}")
+    return routed_source
+
+
+def _finish_load_context(
+    state: AgentState, routed_source: Optional[str], schema_text: str, user_query: str, retry_count: int
+) -> AgentState:
+    """保存数据源模式并根据实际数据源设置 data_source_type"""
+    context_provider = get_data_source_context_provider()
     state["data_source_schema"] = schema_text
 
-    # 根据实际数据源设置 data_source_type
-    if context_provider.is_sql_server_mode():
+    if routed_source:
+        state["data_source_type"] = routed_source
+    elif context_provider.is_sql_server_mode():
         state["data_source_type"] = "sqlserver"
     elif context_provider.is_excel_mode():
         state["data_source_type"] = "excel"
@@ -102,3 +284,81 @@ def load_context_node(state: AgentState) -> AgentState:
     state["error_message"] = state.get("error_message", "")
 
     return state
+
+
+def load_context_node(state: AgentState) -> AgentState:
+    """
+    上下文加载节点 - 根据用户查询加载数据源上下文
+
+    本节点完成以下功能：
+    1. 根据用户查询识别需要访问的数据表（理解节点或本地分类器已选出时直接使用）
+    2. 加载数据源上下文和表结构信息
+    3. 为后续 SQL 生成提供数据源信息
+
+    参数:
+        state: 当前工作流状态
+
+    返回:
+        更新后的工作流状态，包含表名列表和数据源模式
+    """
+    # 从状态中获取必要信息
+    # 技能上下文，用于理解业务逻辑
+    skill_context = state.get("skill_context") or {}
+    # 用户原始查询
+    user_query = state.get("user_query", "")
+    # 重试次数，用于跟踪当前是第几次尝试
+    retry_count = state.get("retry_count", 0) or 0
+
+    # 生成追踪 ID，用于日志和问题排查
+    if not state.get("trace_id"):
+        state["trace_id"] = str(uuid.uuid4())
+
+    # 融合的理解节点（workflow.preprocess = fused）已选出表与字段时不再调用 LLM
+    selected_tables = state.get("selected_tables")
+    if selected_tables is None:
+        # 本地分类器置信时不调用 LLM
+        selected_tables = _local_tables(state, local_decision_for(state))
+    if selected_tables is None:
+        # LLM 实例，优先使用状态中保存的，否则使用全局默认
+        llm = state.get("llm") or get_llm(node="load_context")
+        selected_tables, error = select_tables(llm, user_query, skill_context)
+        if error:
+            state["error_message"] = error
+
+    routed_source = _route_tables(state, selected_tables)
+
+    # 获取数据源上下文（表结构信息）
+    schema_text = get_data_source_context_provider().get_data_source_context(
+        state.get("table_names", []),
+        trace_id=state.get("trace_id"),
+        data_source_type=routed_source,
+    )
+    return _finish_load_context(state, routed_source, schema_text, user_query, retry_count)
+
+
+async def load_context_node_async(state: AgentState) -> AgentState:
+    """load_context_node 的异步版本"""
+    skill_context = state.get("skill_context") or {}
+    user_query = state.get("user_query", "")
+    retry_count = state.get("retry_count", 0) or 0
+
+    if not state.get("trace_id"):
+        state["trace_id"] = str(uuid.uuid4())
+
+    selected_tables = state.get("selected_tables")
+    if selected_tables is None:
+        selected_tables = _local_tables(state, await local_decision_for_async(state))
+    if selected_tables is None:
+        llm = state.get("llm") or get_llm(node="load_context")
+        selected_tables, error = await select_tables_async(llm, user_query, skill_context)
+        if error:
+            state["error_message"] = error
+
+    routed_source = _route_tables(state, selected_tables)
+
+    schema_text = await get_data_source_context_provider().get_data_source_context_async(
+        state.get("table_names", []),
+        trace_id=state.get("trace_id"),
+        data_source_type=routed_source,
+    )
+    return _finish_load_context(state, routed_source, schema_text, user_query, retry_count)
@@ -0,0 +1,98 @@
+"""
+预取 Agent - 与意图分析、选表并行运行的数据源节点
+
+本模块提供两个不调用 LLM 的节点（workflow.fan_out 时使用）：
+- prefetch_schema_node: 在选表完成前预取候选表的结构快照，load_context 汇合时直接复用
+- lookup_values_node: 在字段取值索引中查找问题里出现的维度取值，提示 SQL 生成
+
+prefetch_schema_node_async 为 graph.ainvoke 使用的异步版本；取值查找只读内存索引，没有异步版本。
+"""
+
+from __future__ import annotations
+
+import json  # JSON 序列化
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from src.agents.load_context_agent import _is_auto_routing  # auto 路由模式下数据源在选表后才确定
+from src.config.logger_interface import get_logger  # 日志
+from src.core.data_sources.session import session_for  # 请求级数据源会话
+from src.core.value_index import lookup_question_values  # 字段取值索引
+
+if TYPE_CHECKING:
+    from src.graph.graph import AgentState  # 工作流状态类型
+
+logger = get_logger("prefetch_agent")
+
+
+def _candidate_tables(catalog: List[str], skill_context: Any, max_tables: int) -> List[str]:
+    """技能上下文中提到的表；都没有提到且目录不大时取目录中全部表"""
+    text = json.dumps(skill_context or {}, ensure_ascii=False, default=str).lower()
+    mentioned = [name for name in catalog if name.lower() in text]
+    if mentioned:
+        return mentioned[:max_tables]
+    return catalog if len(catalog) <= max_tables else []
+
+
+def _prefetch_max_tables() -> int:
+    try:
+        from src.config.settings import get_config
+
+        return get_config().workflow.prefetch_max_tables
+    except Exception:
+        return 8
+
+
+def prefetch_schema_node(state: AgentState) -> Dict[str, Any]:
+    """
+    表结构预取节点 - 与 LLM 选表同时读取候选表结构
+
+    参数:
+        state: 当前工作流状态
+
+    返回:
+        只包含 prefetched_tables 的状态更新
+    """
+    if _is_auto_routing():
+        return {"prefetched_tables": []}
+
+    try:
+        session = session_for(state.get("trace_id"), state.get("data_source_type"))
+        catalog = list(session.get_context().get("tables") or {})
+        candidates = _candidate_tables(catalog, state.get("skill_context"), _prefetch_max_tables())
+        ready = session.prefetch_schema(candidates)
+    except Exception as e:
+        logger.debug(f"[{state.get('trace_id')}] Schema prefetch skipped: {e}")
+        ready = []
+    return {"prefetched_tables": ready}
+
+
+async def prefetch_schema_node_async(state: AgentState) -> Dict[str, Any]:
+    """prefetch_schema_node 的异步版本（候选表的结构并发读取）"""
+    if _is_auto_routing():
+        return {"prefetched_tables": []}
+
+    try:
+        session = session_for(state.get("trace_id"), state.get("data_source_type"))
+        catalog = list((await session.get_context_async()).get("tables") or {})
+        candidates = _candidate_tables(catalog, state.get("skill_context"), _prefetch_max_tables())
+        ready = await session.prefetch_schema_async(candidates)
+    except Exception as e:
+        logger.debug(f"[{state.get('trace_id')}] Schema prefetch skipped: {e}")
+        ready = []
+    return {"prefetched_tables": ready}
+
+
+def lookup_values_node(state: AgentState) -> Dict[str, Any]:
+    """
+    字段取值查找节点 - 问题中的维度取值 → 表.列
+
+    参数:
+        state: 当前工作流状态
+
+    返回:
+        只包含 value_hints 的状态更新
+    """
+    if _is_auto_routing():
+        return {"value_hints": []}
+    hints = lookup_question_values(state.get("user_query", ""), state.get("trace_id"), state.get("data_source_type"))
+    return {"value_hints": [hint.to_dict() for hint in hints]}
@@ -2,7 +2,7 @@
 答案精炼 Agent - 使用依赖注入
 
 本模块负责根据执行结果生成最终的回答，
-将技术性的查询结果转换为用户友好的答案。
+将技术性的查询结果转换为用户友好的答案。refine_answer_node_async 为 graph.ainvoke 使用的异步版本。
 """
 
 from __future__ import annotations
@@ -11,28 +11,15 @@ from typing import TYPE_CHECKING
 
 from langchain_core.messages import HumanMessage  # 人类消息类型
 
-from src.core.llm import get_llm  # LLM 工厂函数
+from src.core.llm import ainvoke_llm, get_llm  # LLM 工厂函数与异步调用
 from src.prompts.manager import ANSWER_REFINEMENT_PROMPT, render_prompt_template  # 答案精炼提示模板
 
 if TYPE_CHECKING:
     from workflow.graph import AgentState  # 工作流状态类型
 
 
-def refine_answer_node(state: AgentState) -> AgentState:
-    """
-    答案精炼节点 - 根据执行结果生成最终回答
-
-    本节点完成以下功能：
-    1. 将 SQL 执行结果转换为用户友好的回答
-    2. 总结关键信息和洞察
-    3. 如果结果包含错误，仅解释错误原因
-
-    参数:
-        state: 当前工作流状态
-
-    返回:
-        更新后的工作流状态，包含最终回答
-    """
+def _refine_messages(state: AgentState):
+    """根据执行结果构建答案精炼提示词"""
     # 从状态中获取必要信息
     user_query = state.get("user_query", "")
     # 如果没有 SQL，使用默认值
@@ -59,11 +46,36 @@ def refine_answer_node(state: AgentState) -> AgentState:
             "你必须停止尝试回答用户的问题数据。**绝对禁止**输出任何数据表格或数值。请仅解释错误原因。"
         )
 
+    return [HumanMessage(content=prompt)]
+
+
+def refine_answer_node(state: AgentState) -> AgentState:
+    """
+    答案精炼节点 - 根据执行结果生成最终回答
+
+    本节点完成以下功能：
+    1. 将 SQL 执行结果转换为用户友好的回答
+    2. 总结关键信息和洞察
+    3. 如果结果包含错误，仅解释错误原因
+
+    参数:
+        state: 当前工作流状态
+
+    返回:
+        更新后的工作流状态，包含最终回答
+    """
     # 调用 LLM 生成最终回答
-    llm = state.get("llm") or get_llm()
-    response = llm.invoke([HumanMessage(content=prompt)])
+    llm = state.get("llm") or get_llm(node="refine_answer")
+    response = llm.invoke(_refine_messages(state))
 
     # 将回答保存到消息列表
     state["messages"] = [response]
 
     return state
+
+
+async def refine_answer_node_async(state: AgentState) -> AgentState:
+    """refine_answer_node 的异步版本"""
+    llm = state.get("llm") or get_llm(node="refine_answer")
+    state["messages"] = [await ainvoke_llm(llm, _refine_messages(state))]
+    return state
@@ -3,6 +3,8 @@
 将 SQL 校验和执行分离：
 - sql_validation_node: 独立校验节点
 - sql_execution_node: ReAct Agent 模式，仅包含 execute_sql 工具
+
+各节点另有 *_async 版本（graph.ainvoke 时使用）。
 """
 
 from __future__ import annotations
@@ -10,15 +12,14 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from pydantic import BaseModel
 
-from langchain_core.tools import BaseTool, tool as create_tool
+from langchain_core.tools import BaseTool, StructuredTool, tool as create_tool
 from langchain_core.messages import HumanMessage
 from langchain.agents.middleware import HumanInTheLoopMiddleware
 from langgraph.checkpoint.memory import InMemorySaver
 
 from src.core.data_sources.context_provider import get_data_source_context_provider
-from src.core.llm import get_llm
+from src.core.llm import ainvoke_llm, get_llm
 from src.prompts.manager import SQL_VALIDATION_PROMPT, render_prompt_template
-from src.core.metadata import get_sql_generation_rules
 
 
 if TYPE_CHECKING:
@@ -79,7 +80,63 @@ def _convert_limit_to_top(sql_query: str, data_source_type: str) -> str:
     return sql_query
 
 
-def validate_sql_impl(sql_query: str, data_source_type: str = "excel", skill: Any = None) -> ValidateSqlResult:
+def _precheck_sql(sql_query: str) -> Optional[ValidateSqlResult]:
+    """空语句与危险关键词检查；未通过时返回校验结果"""
+    if not sql_query or sql_query.strip() == "":
+        return ValidateSqlResult(
+            valid=False,
+            error_message="SQL query cannot be empty."
+        )
+
+    forbidden_keywords = [
+        "delete", "drop", "insert", "update", "replace", "alter",
+        "create", "truncate", "exec(", "eval(", "__import__",
+        "open(", "write(", "system(", "os.", "sys.",
+    ]
+
+    sql_upper = sql_query.upper()
+    for keyword in forbidden_keywords:
+        if keyword in sql_upper:
+            return ValidateSqlResult(
+                valid=False,
+                error_message=f"Contains forbidden keyword '{keyword}'. Please use read-only SELECT syntax only."
+            )
+    return None
+
+
+def _validation_messages(sql_query: str, columns_info: str) -> List[HumanMessage]:
+    prompt = render_prompt_template(
+        SQL_VALIDATION_PROMPT,
+        database_context=columns_info,
+        sql_query=sql_query,
+        extra_rule="""
+        Important validation rules:
+        1. Only allow SELECT queries (read-only)
+        2. Syntax errors, field errors, or non-SELECT syntax => INVALID
+        3. Return only 【VALID】 or 【INVALID + reason】
+        """,
+    )
+    return [HumanMessage(content=prompt)]
+
+
+def _validation_result(response: Any) -> ValidateSqlResult:
+    result = response.content.strip().upper()
+
+    if "INVALID" in result:
+        return ValidateSqlResult(
+            valid=False,
+            error_message=f"Validation failed: {response.content.strip()}"
+        )
+
+    return ValidateSqlResult(valid=True)
+
+
+def validate_sql_impl(
+    sql_query: str,
+    data_source_type: str = "excel",
+    skill: Any = None,
+    trace_id: Optional[str] = None,
+) -> ValidateSqlResult:
     """
     校验 SQL 查询的安全性
 
@@ -87,32 +144,16 @@ def validate_sql_impl(sql_query: str, data_source_type: str = "excel", skill: An
         sql_query: 待校验的 SQL 查询
         data_source_type: 数据源类型
         skill: 技能上下文
+        trace_id: 请求 ID，用于复用请求会话中的 schema 快照
 
     Returns:
         ValidateSqlResult 校验结果
     """
     try:
         cleaned_sql = _clean_sql_query(sql_query)
-
-        if not cleaned_sql or cleaned_sql.strip() == "":
-            return ValidateSqlResult(
-                valid=False,
-                error_message="SQL query cannot be empty."
-            )
-
-        forbidden_keywords = [
-            "delete", "drop", "insert", "update", "replace", "alter",
-            "create", "truncate", "exec(", "eval(", "__import__",
-            "open(", "write(", "system(", "os.", "sys.",
-        ]
-
-        sql_upper = cleaned_sql.upper()
-        for keyword in forbidden_keywords:
-            if keyword in sql_upper:
-                return ValidateSqlResult(
-                    valid=False,
-                    error_message=f"Contains forbidden keyword '{keyword}'. Please use read-only SELECT syntax only."
-                )
+        rejected = _precheck_sql(cleaned_sql)
+        if rejected is not None:
+            return rejected
 
         context_provider = get_data_source_context_provider()
 
@@ -121,34 +162,48 @@ def validate_sql_impl(sql_query: str, data_source_type: str = "excel", skill: An
 
         columns_info = context_provider.get_data_source_context(
             table_names=[],
-            skill=skill
+            skill=skill,
+            trace_id=trace_id,
         )
 
-        sql_rules = get_sql_generation_rules(data_source_type, skill=skill)
-
-        prompt = render_prompt_template(
-            SQL_VALIDATION_PROMPT,
-            database_context=columns_info,
-            sql_query=cleaned_sql,
-            extra_rule="""
-            Important validation rules:
-            1. Only allow SELECT queries (read-only)
-            2. Syntax errors, field errors, or non-SELECT syntax => INVALID
-            3. Return only 【VALID】 or 【INVALID + reason】
-            """,
+        llm = get_llm(node="sql_validation")
+        response = llm.invoke(_validation_messages(cleaned_sql, columns_info))
+        return _validation_result(response)
+
+    except Exception as e:
+        return ValidateSqlResult(
+            valid=False,
+            error_message=f"Validation error: {str(e)}"
         )
 
-        llm = get_llm()
-        response = llm.invoke([HumanMessage(content=prompt)])
-        result = response.content.strip().upper()
 
-        if "INVALID" in result:
-            return ValidateSqlResult(
-                valid=False,
-                error_message=f"Validation failed: {response.content.strip()}"
-            )
+async def validate_sql_impl_async(
+    sql_query: str,
+    data_source_type: str = "excel",
+    skill: Any = None,
+    trace_id: Optional[str] = None,
+) -> ValidateSqlResult:
+    """validate_sql_impl 的异步版本"""
+    try:
+        cleaned_sql = _clean_sql_query(sql_query)
+        rejected = _precheck_sql(cleaned_sql)
+        if rejected is not None:
+            return rejected
+
+        context_provider = get_data_source_context_provider()
+
+        if context_provider.is_excel_mode():
+            return ValidateSqlResult(valid=True)
+
+        columns_info = await context_provider.get_data_source_context_async(
+            table_names=[],
+            skill=skill,
+            trace_id=trace_id,
+        )
 
-        return ValidateSqlResult(valid=True)
+        llm = get_llm(node="sql_validation")
+        response = await ainvoke_llm(llm, _validation_messages(cleaned_sql, columns_info))
+        return _validation_result(response)
 
     except Exception as e:
         return ValidateSqlResult(
@@ -157,13 +212,24 @@ def validate_sql_impl(sql_query: str, data_source_type: str = "excel", skill: An
         )
 
 
-def execute_sql_impl(sql_query: str, data_source_type: str = "excel") -> ExecuteSqlResult:
+def _execution_result(df) -> ExecuteSqlResult:
+    return ExecuteSqlResult(
+        success=True,
+        result=df.to_string(index=False),
+        data=df.to_dict(orient="records")
+    )
+
+
+def execute_sql_impl(
+    sql_query: str, data_source_type: str = "excel", trace_id: Optional[str] = None
+) -> ExecuteSqlResult:
     """
     执行 SQL 查询
 
     Args:
         sql_query: 待执行的 SQL 查询
         data_source_type: 数据源类型
+        trace_id: 请求 ID，用于关联取消令牌与超时
 
     Returns:
         ExecuteSqlResult 执行结果
@@ -173,13 +239,31 @@ def execute_sql_impl(sql_query: str, data_source_type: str = "excel") -> Execute
         cleaned_sql = _convert_limit_to_top(cleaned_sql, data_source_type)
 
         context_provider = get_data_source_context_provider()
-        df = context_provider.execute_sql(cleaned_sql, data_source_type=data_source_type)
+        df = context_provider.execute_sql(
+            cleaned_sql, data_source_type=data_source_type, trace_id=trace_id
+        )
 
+        return _execution_result(df)
+    except Exception as e:
         return ExecuteSqlResult(
-            success=True,
-            result=df.to_string(index=False),
-            data=df.to_dict(orient="records")
+            success=False,
+            error=str(e)
         )
+
+
+async def execute_sql_impl_async(
+    sql_query: str, data_source_type: str = "excel", trace_id: Optional[str] = None
+) -> ExecuteSqlResult:
+    """execute_sql_impl 的异步版本（经数据源策略的 execute_query_async 执行）"""
+    try:
+        cleaned_sql = _clean_sql_query(sql_query)
+        cleaned_sql = _convert_limit_to_top(cleaned_sql, data_source_type)
+
+        df = await get_data_source_context_provider().execute_sql_async(
+            cleaned_sql, data_source_type=data_source_type, trace_id=trace_id
+        )
+
+        return _execution_result(df)
     except Exception as e:
         return ExecuteSqlResult(
             success=False,
@@ -207,18 +291,27 @@ def create_validate_sql_tool() -> BaseTool:
     return base_tool
 
 
-def create_execute_sql_tool(data_source_type: str = "excel") -> BaseTool:
-    """创建 SQL 执行工具"""
-    def execute_sql_fn(sql_query: str) -> str:
-        """执行 SQL 查询并返回结果"""
-        result = execute_sql_impl(sql_query, data_source_type)
+def create_execute_sql_tool(
+    data_source_type: str = "excel", trace_id: Optional[str] = None
+) -> BaseTool:
+    """创建 SQL 执行工具（同时提供异步实现，agent.ainvoke 时使用）"""
+    def _output(result: ExecuteSqlResult) -> str:
         if result.success:
             return result.result or ""
         else:
             return f"Error: {result.error}"
 
-    base_tool = create_tool(
-        execute_sql_fn,
+    def execute_sql_fn(sql_query: str) -> str:
+        """执行 SQL 查询并返回结果"""
+        return _output(execute_sql_impl(sql_query, data_source_type, trace_id=trace_id))
+
+    async def execute_sql_coroutine(sql_query: str) -> str:
+        """执行 SQL 查询并返回结果"""
+        return _output(await execute_sql_impl_async(sql_query, data_source_type, trace_id=trace_id))
+
+    base_tool = StructuredTool.from_function(
+        func=execute_sql_fn,
+        coroutine=execute_sql_coroutine,
         name="execute_sql",
         description="Execute a SQL query against the configured data source."
     )
@@ -228,20 +321,26 @@ def create_execute_sql_tool(data_source_type: str = "excel") -> BaseTool:
 
 # ==================== ReAct Agent ====================
 
-def create_sql_execution_react_agent():
+def create_sql_execution_react_agent(
+    data_source_type: str = "excel", trace_id: Optional[str] = None
+):
     """
     创建 SQL 执行的 ReAct Agent
 
     该 Agent 仅包含 execute_sql 工具，负责执行已校验的 SQL 查询
+
+    Args:
+        data_source_type: 数据源类型
+        trace_id: 请求 ID，工具执行时据此关联取消令牌
     """
     from langchain.agents import create_agent
     
 
-    llm = get_llm()
+    llm = get_llm(node="sql_execution")
 
     # 仅包含执行工具
     tools = [
-        create_execute_sql_tool(),
+        create_execute_sql_tool(data_source_type, trace_id=trace_id),
     ]
 
     agent = create_agent(
@@ -295,7 +394,7 @@ def sql_validation_node(state: AgentState) -> AgentState:
     ds_type = state.get("data_source_type", "excel")
     skill = state.get("skill")
 
-    result = validate_sql_impl(sql, ds_type, skill)
+    result = validate_sql_impl(sql, ds_type, skill, trace_id=state.get("trace_id"))
 
     state["sql_valid"] = result.valid
     state["error_message"] = result.error_message or ""
@@ -303,6 +402,47 @@ def sql_validation_node(state: AgentState) -> AgentState:
     return state
 
 
+async def sql_validation_node_async(state: AgentState) -> AgentState:
+    """sql_validation_node 的异步版本"""
+    result = await validate_sql_impl_async(
+        state.get("sql_query", ""),
+        state.get("data_source_type", "excel"),
+        state.get("skill"),
+        trace_id=state.get("trace_id"),
+    )
+
+    state["sql_valid"] = result.valid
+    state["error_message"] = result.error_message or ""
+
+    return state
+
+
+def _agent_input(state: AgentState):
+    """(ReAct Agent 输入, 调用配置)"""
+    return (
+        {
+            "sql_query": state.get("sql_query", ""),
+            "data_source_type": state.get("data_source_type", "excel"),
+            "table_names": state.get("table_names", []),
+        },
+        {"configurable": {"thread_id": state.get("trace_id") or "default"}},
+    )
+
+
+def _apply_agent_result(state: AgentState, result: Dict[str, Any]) -> AgentState:
+    agent_response = result.get("output", "")
+
+    if "Error:" in agent_response:
+        state["execution_result"] = ""
+        state["error_message"] = agent_response
+    else:
+        state["execution_result"] = agent_response
+        state["error_message"] = ""
+
+    state["retry_count"] = state.get("retry_count", 0) + 1
+    return state
+
+
 def sql_execution_node(state: AgentState) -> AgentState:
     """
     SQL 执行节点 - ReAct Agent 模式
@@ -312,32 +452,28 @@ def sql_execution_node(state: AgentState) -> AgentState:
 
     注意：SQL 校验应在独立的 sql_validation_node 中完成
     """
-    sql = state.get("sql_query", "")
     ds_type = state.get("data_source_type", "excel")
-    table_names = state.get("table_names", [])
-    skill = state.get("skill")
-    agent = create_sql_execution_react_agent()
+    agent = create_sql_execution_react_agent(ds_type, trace_id=state.get("trace_id"))
 
     try:
-        result = agent.invoke(
-            {
-                "sql_query": sql,
-                "data_source_type": ds_type,
-                "table_names": table_names,
-            },
-            config={"configurable": {"thread_id": state.get("trace_id") or "default"}},
-        )
+        agent_input, config = _agent_input(state)
+        state = _apply_agent_result(state, agent.invoke(agent_input, config=config))
+
+    except Exception as e:
+        state["error_message"] = f"Agent execution error: {str(e)}"
+        state["sql_valid"] = False
 
-        agent_response = result.get("output", "")
+    return state
 
-        if "Error:" in agent_response:
-            state["execution_result"] = ""
-            state["error_message"] = agent_response
-        else:
-            state["execution_result"] = agent_response
-            state["error_message"] = ""
 
-        state["retry_count"] = state.get("retry_count", 0) + 1
+async def sql_execution_node_async(state: AgentState) -> AgentState:
+    """sql_execution_node 的异步版本（agent.ainvoke，execute_sql 工具走异步执行）"""
+    ds_type = state.get("data_source_type", "excel")
+    agent = create_sql_execution_react_agent(ds_type, trace_id=state.get("trace_id"))
+
+    try:
+        agent_input, config = _agent_input(state)
+        state = _apply_agent_result(state, await agent.ainvoke(agent_input, config=config))
 
     except Exception as e:
         state["error_message"] = f"Agent execution error: {str(e)}"
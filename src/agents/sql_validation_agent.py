@@ -85,18 +85,23 @@ def validate_sql_node(state: AgentState) -> AgentState:
                 state["sql_valid"] = False
                 return state
 
-        # Excel 模式下不需要校验
-        if context_provider.is_excel_mode():
+        # Excel 模式下不需要校验（自动路由时以路由结果为准）
+        routed_source = (state.get("routing_decision") or {}).get("source")
+        if routed_source == "excel" or (not routed_source and context_provider.is_excel_mode()):
             state["sql_valid"] = True
             state["error_message"] = ""
             return state
 
         # 获取数据源上下文（表结构信息）
-        columns_info = context_provider.get_data_source_context(state.get("table_names"))
+        columns_info = context_provider.get_data_source_context(
+            state.get("table_names"), trace_id=state.get("trace_id")
+        )
 
         # 确定数据源类型
         data_source_type = state.get("data_source_type") or "postgresql"
-        if context_provider.is_excel_mode():
+        if routed_source:
+            data_source_type = routed_source
+        elif context_provider.is_excel_mode():
             data_source_type = "excel"
         elif context_provider.is_sql_server_mode():
             data_source_type = "sqlserver"
@@ -119,7 +124,7 @@ def validate_sql_node(state: AgentState) -> AgentState:
         )
 
         # 调用 LLM 进行 SQL 语法校验
-        llm = state.get("llm") or get_llm()
+        llm = state.get("llm") or get_llm(node="sql_validation")
         response = llm.invoke([HumanMessage(content=prompt)])
         result = response.content.strip().upper()
 
@@ -0,0 +1,132 @@
+"""
+理解 Agent - 融合的预处理节点
+
+本模块用一次结构化输出调用同时完成技能选择、意图分析与选表，
+替代 select_skill → analyze_intent → load_context 选表 三次顺序的 LLM 往返
+（workflow.preprocess = fused 时使用）。understand_node_async 为 graph.ainvoke 使用的异步版本。
+"""
+
+from __future__ import annotations
+
+import asyncio  # 异步执行
+import json  # JSON 序列化
+from typing import TYPE_CHECKING
+
+from langchain_core.messages import HumanMessage  # 人类消息类型
+
+from src.agents.intent_analysis_agent import analyze_intent_node, analyze_intent_node_async  # 结构化调用失败时的后备
+from src.config.logger_interface import get_logger  # 日志
+from src.core.llm import ainvoke_llm, get_llm  # LLM 工厂函数与异步调用
+from src.core.schemas import UnderstandingResult  # 结构化输出模型
+from src.prompts.manager import UNDERSTAND_PROMPT, render_prompt_template  # 理解节点提示模板
+from src.skills.middleware.skill_middleware import (
+    get_skill_middleware_singleton,
+    select_skill_node,
+    select_skill_node_async,
+)
+
+if TYPE_CHECKING:
+    from src.graph.graph import AgentState  # 工作流状态类型
+
+logger = get_logger("understand_agent")
+
+
+def _understand_prompt(state: AgentState):
+    """(技能中间件, 当前技能名, 提示词)"""
+    middleware = get_skill_middleware_singleton(
+        skill_path=None,
+        default_skill=state.get("skill_name") or "nl-to-sql-agent",
+    )
+    current_skill = state.get("skill_name") or middleware.default_skill
+    skill_context = state.get("skill_context")
+    if skill_context is None:
+        context = middleware.context_loader.load(current_skill)
+        skill_context = context.__dict__ if context else {}
+
+    prompt = render_prompt_template(
+        UNDERSTAND_PROMPT,
+        user_query=state.get("user_query", ""),
+        skills=json.dumps(
+            [s.to_dict() for s in middleware.selector.catalog.load_skill_summaries()], ensure_ascii=False
+        ),
+        skill_context=json.dumps(skill_context, ensure_ascii=False, indent=2),
+    )
+    return middleware, current_skill, prompt
+
+
+def _apply_understanding(
+    state: AgentState, middleware, current_skill: str, result: UnderstandingResult
+) -> AgentState:
+    """写入技能、意图与选表结果"""
+    if state.get("skill_selected_by") == "forced":
+        skill_name = current_skill
+    else:
+        selection = middleware.resolve(result.skill_name, result.skill_confidence, "understand")
+        skill_name = selection["skill_name"]
+        if skill_name != current_skill or state.get("skill_context") is None:
+            state.update(selection)
+        else:
+            state["skill_selected_by"] = selection["skill_selected_by"]
+            state["skill_confidence"] = selection["skill_confidence"]
+
+    state["intent_analysis"] = {"is_data_query": result.is_data_query, "reason": result.reason}
+    # 表是按当前技能上下文选出的；换了技能时交给 load_context 重新选表
+    state["selected_tables"] = (
+        [table.model_dump() for table in result.tables] if skill_name == current_skill else None
+    )
+    return state
+
+
+def understand_node(state: AgentState) -> AgentState:
+    """
+    理解节点 - 一次 LLM 调用返回技能、意图、表与字段
+
+    本节点完成以下功能：
+    1. 从技能目录中选择技能（调用方强制指定技能时保持不变）
+    2. 判断问题是否为数据查询
+    3. 按当前技能上下文选出需要的表与字段，写入 selected_tables，load_context 不再调用 LLM；
+       选中的技能与提供上下文的技能不同时不写入，由 load_context 按新技能上下文选表
+
+    结构化输出调用失败（提供商不支持等）时退回原有的 select_skill + analyze_intent，
+    选表同样交给 load_context。
+
+    参数:
+        state: 当前工作流状态
+
+    返回:
+        更新后的工作流状态
+    """
+    middleware, current_skill, prompt = _understand_prompt(state)
+
+    try:
+        llm = state.get("llm") or get_llm(node="understand")
+        result = llm.with_structured_output(UnderstandingResult).invoke([HumanMessage(content=prompt)])
+        if not isinstance(result, UnderstandingResult):
+            result = UnderstandingResult.model_validate(result)
+    except Exception as e:
+        logger.warning(f"[{state.get('trace_id')}] Fused understand call failed, using chain: {e}")
+        state["selected_tables"] = None
+        state = select_skill_node(state)
+        return analyze_intent_node(state)
+
+    return _apply_understanding(state, middleware, current_skill, result)
+
+
+async def understand_node_async(state: AgentState) -> AgentState:
+    """understand_node 的异步版本（技能文件在线程池中读取）"""
+    middleware, current_skill, prompt = await asyncio.to_thread(_understand_prompt, state)
+
+    try:
+        llm = state.get("llm") or get_llm(node="understand")
+        result = await ainvoke_llm(
+            llm.with_structured_output(UnderstandingResult), [HumanMessage(content=prompt)]
+        )
+        if not isinstance(result, UnderstandingResult):
+            result = UnderstandingResult.model_validate(result)
+    except Exception as e:
+        logger.warning(f"[{state.get('trace_id')}] Fused understand call failed, using chain: {e}")
+        state["selected_tables"] = None
+        state = await select_skill_node_async(state)
+        return await analyze_intent_node_async(state)
+
+    return await asyncio.to_thread(_apply_understanding, state, middleware, current_skill, result)
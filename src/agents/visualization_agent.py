@@ -90,7 +90,7 @@ def visualization_node(state: AgentState) -> AgentState:
     )
 
     # 获取 LLM 实例
-    llm = state.get("llm") or get_llm()
+    llm = state.get("llm") or get_llm(node="visualization")
 
     try:
         # 调用 LLM 生成图表配置
@@ -1,12 +1,42 @@
 from .base import DataSourceStrategy
 from .excel_source import ExcelDataSource
 from .postgres_source import PostgreSQLDataSource
+from .async_postgres_source import AsyncPostgreSQLDataSource
+from .federated import FederatedDataSource, FederatedQueryError
 
 try:
     from .sql_source import SqlServerDataSource
 except ImportError:
     SqlServerDataSource = None
 
+from .session import (
+    DataSourceSession,
+    open_session,
+    get_session,
+    release_session,
+)
+
+from .router import (
+    DataSourceRouter,
+    RoutingDecision,
+    get_data_source_router,
+)
+
+from .result_cache import (
+    ResultCache,
+    get_result_cache,
+)
+
+from .replicas import ReplicaPool
+
+from .engines import dispose_shared_engines, get_shared_engine
+
+from .single_flight import (
+    SingleFlight,
+    get_query_flight,
+    get_question_flight,
+)
+
 from .executor import (
     DataSourceExecutor,
     get_executor,
@@ -0,0 +1,274 @@
+"""PostgreSQL 异步数据源策略（asyncpg 连接池）
+
+同步方法继承自 PostgreSQLDataSource；execute_query_async / get_schema_info_async 使用 asyncpg
+连接池原生执行，在途查询不占用操作系统线程。asyncpg 连接池绑定创建它的事件循环，
+因此按事件循环分别创建连接池。
+"""
+
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .cancellation import CancellationToken, QueryCancelledError, abort_error, resolve_timeout
+from .postgres_source import PostgreSQLDataSource, _QUERY_CANCELED_SQLSTATE
+from .replicas import is_read_only
+from src.config.settings import get_config
+
+
+def async_driver_available() -> bool:
+    """asyncpg 是否已安装"""
+    try:
+        import asyncpg  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class AsyncPostgreSQLDataSource(PostgreSQLDataSource):
+    """基于 asyncpg 连接池的 PostgreSQL 数据源策略"""
+
+    def __init__(
+        self,
+        *args: Any,
+        pool_min_size: Optional[int] = None,
+        pool_max_size: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            pool_min_size: 连接池最小连接数，默认读取 async_pool_min_size 配置
+            pool_max_size: 连接池最大连接数，默认读取 async_pool_max_size 配置
+            其余参数同 PostgreSQLDataSource
+        """
+        super().__init__(*args, **kwargs)
+        pg_config = get_config().data_source.postgresql
+        self.pool_min_size = pool_min_size or pg_config.async_pool_min_size
+        self.pool_max_size = pool_max_size or pg_config.async_pool_max_size
+        # 事件循环 -> 创建连接池的 Task
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Future]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _connect_kwargs(self) -> Dict[str, Any]:
+        """asyncpg 连接参数（connection_params 中的 host/port/sslmode 优先）"""
+        kwargs: Dict[str, Any] = {
+            "host": self.connection_params.get("host", self.host),
+            "port": int(self.connection_params.get("port", self.port)),
+            "user": self.user,
+            "password": self.password or None,
+            "database": self.database,
+        }
+        if "sslmode" in self.connection_params:
+            kwargs["ssl"] = self.connection_params["sslmode"]
+        if self.connect_timeout:
+            kwargs["timeout"] = float(self.connect_timeout)
+        # 连接级默认超时：覆盖 schema 探测等未显式设置超时的语句
+        if self.statement_timeout:
+            kwargs["server_settings"] = {
+                "statement_timeout": str(int(self.statement_timeout * 1000))
+            }
+        return kwargs
+
+    async def _get_pool(self) -> Any:
+        """获取当前事件循环的连接池（首次调用时创建）"""
+        try:
+            import asyncpg
+        except ImportError:
+            raise ImportError(
+                "asyncpg is required for async PostgreSQL queries. "
+                "Install it with: pip install asyncpg"
+            )
+
+        loop = asyncio.get_running_loop()
+        pool_future = self._pools.get(loop)
+        if pool_future is None:
+            # 检查与赋值之间没有 await，并发协程只会创建一个连接池
+            pool_future = asyncio.ensure_future(
+                asyncpg.create_pool(
+                    min_size=self.pool_min_size,
+                    max_size=self.pool_max_size,
+                    **self._connect_kwargs(),
+                )
+            )
+            self._pools[loop] = pool_future
+        try:
+            return await asyncio.shield(pool_future)
+        except Exception:
+            if self._pools.get(loop) is pool_future and pool_future.done():
+                del self._pools[loop]
+            raise
+
+    async def execute_query_async(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> pd.DataFrame:
+        """
+        异步执行SQL查询
+
+        Args:
+            query: SQL查询语句
+            timeout: 语句超时（秒），默认使用 statement_timeout 配置
+            cancel_token: 请求级取消令牌，取消时中止当前 Task，asyncpg 随之向服务端发送取消请求
+
+        Returns:
+            包含查询结果的DataFrame
+        """
+        # 配置了只读副本时走同步路径的副本路由（asyncpg 连接池只连接主库）
+        if self._get_replicas() is not None and is_read_only(query):
+            return await asyncio.to_thread(
+                self.execute_query, query, timeout=timeout, cancel_token=cancel_token
+            )
+
+        import asyncpg
+
+        timeout = resolve_timeout(
+            self.statement_timeout if timeout is None else timeout, cancel_token
+        )
+        pool = await self._get_pool()
+
+        async def _fetch() -> Tuple[List[Any], List[str]]:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    # SET LOCAL 仅作用于当前事务
+                    if timeout:
+                        await conn.execute(
+                            f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}"
+                        )
+                    statement = await conn.prepare(query)
+                    rows = await statement.fetch()
+                    return rows, [attr.name for attr in statement.get_attributes()]
+
+        # 在子 Task 中执行：取消令牌只取消子 Task，调用方 Task 的取消计数不变
+        # （外层 asyncio.timeout()/TaskGroup 不会误判为自身被取消）；调用方被取消时子 Task 随之取消
+        loop = asyncio.get_running_loop()
+        fetch = asyncio.ensure_future(_fetch())
+        cancelled_by_token = False
+
+        def _cancel_fetch() -> None:
+            nonlocal cancelled_by_token
+            if not fetch.done():
+                cancelled_by_token = True
+                fetch.cancel()
+
+        unregister = None
+        if cancel_token is not None:
+            # 回调可能在其他线程触发，需切回事件循环线程
+            unregister = cancel_token.register(
+                lambda: loop.call_soon_threadsafe(_cancel_fetch)
+            )
+
+        try:
+            rows, columns = await fetch
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            externally_cancelled = getattr(task, "cancelling", lambda: 0)() > 0
+            if cancelled_by_token and not externally_cancelled:
+                raise abort_error(cancel_token, timeout, query) from None
+            raise
+        except QueryCancelledError:
+            raise
+        except asyncpg.PostgresError as e:
+            if getattr(e, "sqlstate", None) == _QUERY_CANCELED_SQLSTATE:
+                raise abort_error(cancel_token, timeout, query) from e
+            raise Exception(f"Failed to execute query: {str(e)}\nQuery: {query}")
+        except Exception as e:
+            raise Exception(f"Failed to execute query: {str(e)}\nQuery: {query}")
+        finally:
+            if unregister:
+                unregister()
+
+        return pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+    async def get_schema_info_async(self, table_names: List[str]) -> str:
+        """
+        异步获取指定表的schema信息（输出格式与 get_schema_info 一致）
+
+        Args:
+            table_names: 表名列表
+
+        Returns:
+            包含schema信息的字符串
+        """
+        pool = await self._get_pool()
+        schema_info = []
+
+        def _quote_ident(name: str) -> str:
+            return '"' + name.replace('"', '""') + '"'
+
+        def _format_samples(values: List[Any], max_len: int = 50) -> str:
+            if not values:
+                return "N/A"
+            formatted = []
+            for v in values:
+                if isinstance(v, str):
+                    v = v.strip()
+                    if len(v) > max_len:
+                        v = v[: max_len - 3] + "..."
+                    formatted.append(f"'{v}'")
+                else:
+                    formatted.append(str(v))
+            return ", ".join(formatted)
+
+        table_name = None
+        try:
+            async with pool.acquire() as conn:
+                for table_name in table_names:
+                    columns = await conn.fetch(
+                        """
+                        SELECT column_name, data_type, character_maximum_length, is_nullable
+                        FROM information_schema.columns
+                        WHERE table_name = $1 AND table_schema = $2
+                        ORDER BY ordinal_position
+                        """,
+                        table_name.lower(),
+                        self.schema,
+                    )
+
+                    schema_info.append(f"\n=== Table: {table_name} ===\n")
+
+                    for col in columns:
+                        column_name = col[0]
+                        try:
+                            sample_values = [
+                                row[0]
+                                for row in await conn.fetch(
+                                    f"""
+                                    SELECT DISTINCT {_quote_ident(column_name)}
+                                    FROM {_quote_ident(self.schema)}.{_quote_ident(table_name)}
+                                    WHERE {_quote_ident(column_name)} IS NOT NULL
+                                    LIMIT 3
+                                    """
+                                )
+                            ]
+                        except Exception:
+                            sample_values = []
+
+                        schema_info.append(
+                            f"{column_name:<30} {col[1]} "
+                            f"(max length: {col[2] or 'N/A'}, nullable: {col[3]}, "
+                            f"samples: {_format_samples(sample_values)})"
+                        )
+
+        except Exception as e:
+            schema_info.append(f"\nError getting schema for {table_name}: {str(e)}")
+
+        return "\n".join(schema_info)
+
+    async def close_async(self) -> None:
+        """关闭当前事件循环的连接池"""
+        pool_future = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool_future is not None and not pool_future.cancelled():
+            pool = await pool_future
+            await pool.close()
+
+    def close(self):
+        """关闭同步连接与所有异步连接池（无法 await 时强制终止连接）"""
+        for pool_future in list(self._pools.values()):
+            if pool_future.done() and not pool_future.cancelled() and pool_future.exception() is None:
+                pool_future.result().terminate()
+        self._pools.clear()
+        super().close()
@@ -1,11 +1,21 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 import pandas as pd
 
+from .cancellation import CancellationToken
+
 
 class DataSourceStrategy(ABC):
     """Abstract base class for data source strategies."""
 
+    #: How ``get_schema_info`` output relates to the requested tables, used by
+    #: the request session to prefetch and reuse schema snapshots:
+    #: "table" - one block per table joined by newlines (multi-table output can
+    #: be composed from single-table snapshots); "source" - independent of the
+    #: table list; None - snapshots are only reused for the same table list.
+    schema_info_scope: Optional[str] = None
+
     @abstractmethod
     def load_data(self) -> pd.DataFrame:
         """Load data into a pandas DataFrame."""
@@ -26,14 +36,28 @@ class DataSourceStrategy(ABC):
         pass
 
     @abstractmethod
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def execute_query(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> pd.DataFrame:
         """Execute a SQL query against the data source.
 
+        Implementations must enforce the per-query deadline natively and
+        abort the running statement when ``cancel_token`` is cancelled.
+
         Args:
             query: SQL query string to execute
+            timeout: Statement timeout in seconds (None uses the source default)
+            cancel_token: Request-scoped cancellation token
 
         Returns:
             DataFrame containing query results
+
+        Raises:
+            QueryTimeoutError: The statement exceeded its timeout
+            QueryCancelledError: The request was cancelled
         """
         pass
 
@@ -49,6 +73,68 @@ class DataSourceStrategy(ABC):
         """
         pass
 
+    async def execute_query_async(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> pd.DataFrame:
+        """Async counterpart of ``execute_query``.
+
+        The default implementation offloads the blocking call to the event
+        loop's default thread pool; strategies with a native async driver
+        override it.
+
+        Args:
+            query: SQL query string to execute
+            timeout: Statement timeout in seconds (None uses the source default)
+            cancel_token: Request-scoped cancellation token
+
+        Returns:
+            DataFrame containing query results
+        """
+        return await asyncio.to_thread(
+            self.execute_query, query, timeout=timeout, cancel_token=cancel_token
+        )
+
+    async def get_schema_info_async(self, table_names: List[str]) -> str:
+        """Async counterpart of ``get_schema_info`` (thread-offloaded by default)."""
+        return await asyncio.to_thread(self.get_schema_info, table_names)
+
+    def sample_tables(self, limit: int, max_tables: int) -> Dict[str, pd.DataFrame]:
+        """Sample rows of each table, used to build the field value index.
+
+        The default lists tables from ``get_context()["tables"]`` and reads
+        them with ``load_data(table_name, limit=...)``; tables that cannot be
+        read are skipped.
+
+        Args:
+            limit: Maximum rows read per table
+            max_tables: Maximum number of tables sampled
+
+        Returns:
+            Mapping of table name to sampled rows
+        """
+        samples: Dict[str, pd.DataFrame] = {}
+        for table_name in list(self.get_context().get("tables") or {})[:max_tables]:
+            try:
+                samples[table_name] = self.load_data(table_name, limit=limit)
+            except Exception:
+                continue
+        return samples
+
+    def data_version(self) -> Optional[str]:
+        """Identify the version of the data currently served by this source.
+
+        The result cache folds it into its keys so that entries written
+        before a data change are never returned afterwards.
+
+        Returns:
+            Opaque version string, or None when the source cannot tell
+            (cache entries then expire by TTL only)
+        """
+        return None
+
     @abstractmethod
     def is_available(self) -> bool:
         """Check if this data source is available/connected."""
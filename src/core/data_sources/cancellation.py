@@ -0,0 +1,191 @@
+"""查询超时与协作式取消
+
+为所有数据源策略提供统一的取消令牌：
+- 每个请求 (trace_id) 持有一个 CancellationToken，可设置整体截止时间
+- 数据源策略在执行语句前注册中止回调（PostgreSQL cancel、ODBC cursor.cancel、SQLite interrupt）
+- 图中取消请求时触发回调，正在运行的语句被中止，连接随上下文管理器归还连接池
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class QueryCancelledError(RuntimeError):
+    """查询被调用方取消"""
+
+
+class QueryTimeoutError(QueryCancelledError):
+    """查询超过语句超时时间被数据库中止"""
+
+
+class CancellationToken:
+    """请求级取消令牌 - 线程安全"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout: 请求整体截止时间（秒），None 表示不限制
+        """
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已被显式取消"""
+        return self._event.is_set()
+
+    def expired(self) -> bool:
+        """是否已超过截止时间"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def should_abort(self) -> bool:
+        """当前语句是否应当中止"""
+        return self.cancelled or self.expired()
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数，未设置截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled by caller") -> None:
+        """取消请求并触发所有已注册的中止回调"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                # 中止回调失败不应影响取消流程（连接可能已关闭）
+                pass
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """注册中止回调
+
+        Args:
+            callback: 取消时调用的函数（如 dbapi_connection.cancel）
+
+        Returns:
+            注销函数，语句结束后必须调用
+        """
+        with self._lock:
+            already_cancelled = self._event.is_set()
+            if not already_cancelled:
+                self._callbacks.append(callback)
+
+        if already_cancelled:
+            try:
+                callback()
+            except Exception:
+                pass
+
+        def _unregister() -> None:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return _unregister
+
+    def raise_if_aborted(self) -> None:
+        """已取消或已超时则抛出异常"""
+        if self.cancelled:
+            raise QueryCancelledError(f"Query cancelled: {self.reason}")
+        if self.expired():
+            raise QueryTimeoutError("Query deadline exceeded before execution started")
+
+
+def resolve_timeout(
+    default_timeout: Optional[float], cancel_token: Optional[CancellationToken] = None
+) -> Optional[float]:
+    """计算单条语句的有效超时时间
+
+    取数据源默认超时与请求剩余时间中的较小值。
+
+    Args:
+        default_timeout: 数据源配置的语句超时（秒），0/None 表示不限制
+        cancel_token: 请求级取消令牌
+
+    Returns:
+        有效超时秒数，None 表示不限制
+    """
+    timeout = default_timeout if default_timeout and default_timeout > 0 else None
+    if cancel_token is None:
+        return timeout
+
+    cancel_token.raise_if_aborted()
+    remaining = cancel_token.remaining()
+    if remaining is None:
+        return timeout
+    if timeout is None:
+        return remaining
+    return min(timeout, remaining)
+
+
+def abort_error(
+    cancel_token: Optional[CancellationToken], timeout: Optional[float], query: str
+) -> QueryCancelledError:
+    """根据取消原因构造中止异常（供各策略在捕获驱动异常后使用）"""
+    if cancel_token is not None and cancel_token.cancelled:
+        return QueryCancelledError(
+            f"Query cancelled: {cancel_token.reason}\nQuery: {query}"
+        )
+    limit = f"{timeout:g}s" if timeout else "the configured limit"
+    return QueryTimeoutError(
+        f"Query exceeded statement timeout of {limit} and was aborted. "
+        "Simplify the query (add filters, join conditions or aggregation) and retry.\n"
+        f"Query: {query}"
+    )
+
+
+# ==================== 请求级注册表 ====================
+
+_tokens: Dict[str, CancellationToken] = {}
+_tokens_lock = threading.Lock()
+
+
+def open_cancellation_scope(
+    request_id: str, timeout: Optional[float] = None
+) -> CancellationToken:
+    """为请求创建取消令牌"""
+    token = CancellationToken(timeout=timeout)
+    with _tokens_lock:
+        _tokens[request_id] = token
+    return token
+
+
+def get_cancellation_token(request_id: Optional[str]) -> Optional[CancellationToken]:
+    """获取请求的取消令牌"""
+    if not request_id:
+        return None
+    with _tokens_lock:
+        return _tokens.get(request_id)
+
+
+def cancel_request(request_id: str, reason: str = "cancelled by caller") -> bool:
+    """取消请求，中止其正在运行的语句
+
+    Returns:
+        是否找到对应请求
+    """
+    token = get_cancellation_token(request_id)
+    if token is None:
+        return False
+    token.cancel(reason)
+    return True
+
+
+def release_cancellation_scope(request_id: Optional[str]) -> None:
+    """请求结束后释放取消令牌"""
+    if not request_id:
+        return
+    with _tokens_lock:
+        _tokens.pop(request_id, None)
@@ -2,35 +2,48 @@
 
 from typing import Dict, Any, Optional, List
 import pandas as pd
+import threading
 import uuid
 
+from .session import session_for
+
 
 class DataSourceContextProvider:
-    """数据源上下文提供者 - 工作流与数据源交互的唯一入口"""
+    """数据源上下文提供者 - 工作流与数据源交互的唯一入口
+
+    本对象只持有进程级只读依赖；按请求变化的数据源策略与 schema 快照保存在
+    以 trace_id 注册的 DataSourceSession 中。
+    """
 
     _instance: Optional["DataSourceContextProvider"] = None
+    _init_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._init_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._initialized = False
+                    cls._instance = instance
         return cls._instance
 
-    def __init__(self):
-        self._initialized = False
-
     def _ensure_initialized(self) -> None:
-        """确保初始化完成"""
+        """确保初始化完成（仅首次调用时写入，之后只读）"""
         if self._initialized:
             return
 
-        from src.core.loader.excel_loader import get_loader
-        from src.core.data_sources.manager import get_data_source_manager
-        from src.core.data_sources.executor import get_executor
+        with self._init_lock:
+            if self._initialized:
+                return
+
+            from src.core.loader.excel_loader import get_loader
+            from src.core.data_sources.manager import get_data_source_manager
+            from src.core.data_sources.executor import get_executor
 
-        self._loader = get_loader()
-        self._manager = get_data_source_manager()
-        self._executor = get_executor()
-        self._initialized = True
+            self._loader = get_loader()
+            self._manager = get_data_source_manager()
+            self._executor = get_executor()
+            self._initialized = True
 
     def detect_sources(self, table_names: List[str]) -> Dict[str, Any]:
         """检测并准备数据源
@@ -44,54 +57,98 @@ class DataSourceContextProvider:
         self._ensure_initialized()
         return self._manager.detect_sources(table_names)
 
-    def get_data_source_context(self, table_names: Optional[List[str]] = None, skill: Optional[Any] = None) -> str:
+    def get_data_source_context(
+        self,
+        table_names: Optional[List[str]] = None,
+        skill: Optional[Any] = None,
+        trace_id: Optional[str] = None,
+        data_source_type: Optional[str] = None,
+    ) -> str:
         """获取数据源上下文
 
         Args:
             table_names: 表名列表（SQL模式需要）
             skill: 业务技能对象 (可选)
+            trace_id: 请求 ID (可选)，用于复用请求会话中的数据源与 schema 快照
+            data_source_type: 数据源类型 (可选)，默认使用请求会话的数据源
 
         Returns:
             上下文字符串
         """
         self._ensure_initialized()
 
-        context_str = ""
-
         # 1. 优先从 Skill 获取业务规则
-        if skill:
-            from src.core.metadata import get_business_logic_context
-            business_logic = get_business_logic_context(skill)
-            if business_logic:
-                context_str += "## Business Logic & Rules\n"
-                context_str += business_logic + "\n\n"
-
-        # 2. 获取数据库 Schema
-        if self._manager.get_strategy():
-            context = self._manager.get_context()
-            available_tables = []
-            if "tables" in context:
-                available_tables = list(context["tables"].keys())
+        context_str = self._business_logic(skill)
 
-            target_tables = table_names if table_names else available_tables
+        # 2. 获取数据库 Schema（请求内只读取一次）
+        session = session_for(trace_id, data_source_type)
+        if data_source_type:
+            session.use(data_source_type)
+        if session.data_source_type or self._manager.get_strategy():
+            try:
+                context = session.get_context()
+                target_tables = table_names or list(context.get("tables", {}).keys())
+                if not target_tables:
+                    context_str += "No active tables loaded in data source."
+                    return context_str
 
-            if not target_tables:
-                context_str += "No active tables loaded in data source."
+                # Return detailed schema info
+                context_str += "## Database Schema\n"
+                context_str += session.get_schema_info(target_tables)
                 return context_str
+            except Exception as e:
+                return context_str + f"Error getting schema info: {str(e)}"
 
+        # 3. Fallback to Excel Loader
+        return context_str + self._loader_context()
+
+    async def get_data_source_context_async(
+        self,
+        table_names: Optional[List[str]] = None,
+        skill: Optional[Any] = None,
+        trace_id: Optional[str] = None,
+        data_source_type: Optional[str] = None,
+    ) -> str:
+        """get_data_source_context 的异步版本（数据源上下文与表结构经会话的异步接口读取）"""
+        self._ensure_initialized()
+
+        context_str = self._business_logic(skill)
+
+        session = session_for(trace_id, data_source_type)
+        if data_source_type:
+            session.use(data_source_type)
+        if session.data_source_type or self._manager.get_strategy():
             try:
-                # Return detailed schema info
+                context = await session.get_context_async()
+                target_tables = table_names or list(context.get("tables", {}).keys())
+                if not target_tables:
+                    context_str += "No active tables loaded in data source."
+                    return context_str
+
                 context_str += "## Database Schema\n"
-                context_str += self._manager.get_schema_info(target_tables)
+                context_str += await session.get_schema_info_async(target_tables)
                 return context_str
             except Exception as e:
                 return context_str + f"Error getting schema info: {str(e)}"
 
-        # 3. Fallback to Excel Loader
+        return context_str + self._loader_context()
+
+    @staticmethod
+    def _business_logic(skill: Optional[Any]) -> str:
+        """技能中的业务规则（放在上下文最前面）"""
+        if skill:
+            from src.core.metadata import get_business_logic_context
+            business_logic = get_business_logic_context(skill)
+            if business_logic:
+                return "## Business Logic & Rules\n" + business_logic + "\n\n"
+        return ""
+
+    def _loader_context(self) -> str:
+        """未配置数据源策略时，列出 Excel Loader 中已加载的表"""
         loaded_tables = self._loader.list_tables()
 
         if not loaded_tables:
-            return context_str + "No active tables loaded."
+            return "No active tables loaded."
 
         lines = ["## Available Tables\n\n"]
 
@@ -134,7 +191,7 @@ class DataSourceContextProvider:
             lines.append("JOIN TableB b ON a.Key = b.Key\n")
             lines.append("```\n")
         
-        return context_str + "".join(lines)
+        return "".join(lines)
 
     def get_sql_rules(self) -> str:
         """获取SQL规则 - 根据数据源类型返回对应规则"""
@@ -166,13 +223,17 @@ class DataSourceContextProvider:
         return self._manager.sql_server_available
 
     def execute_sql(
-        self, sql_query: str, data_source_type: Optional[str] = None
+        self,
+        sql_query: str,
+        data_source_type: Optional[str] = None,
+        trace_id: Optional[str] = None,
     ) -> pd.DataFrame:
         """执行SQL查询
 
         Args:
             sql_query: SQL查询语句
             data_source_type: 数据源类型 (可选)
+            trace_id: 请求 ID (可选)，用于关联取消令牌
 
         Returns:
             查询结果DataFrame
@@ -182,19 +243,37 @@ class DataSourceContextProvider:
         # If type is provided, use it
         if data_source_type:
             return self._executor.execute_from_state(
-                {"sql_query": sql_query, "data_source_type": data_source_type}
+                {
+                    "sql_query": sql_query,
+                    "data_source_type": data_source_type,
+                    "trace_id": trace_id,
+                }
             )
 
         # Fallback logic
         if self.is_excel_mode():
             return self._executor.execute_from_state(
-                {"sql_query": sql_query, "data_source_type": "excel"}
+                {"sql_query": sql_query, "data_source_type": "excel", "trace_id": trace_id}
             )
         else:
             return self._executor.execute_from_state(
-                {"sql_query": sql_query, "data_source_type": "sqlserver"}
+                {"sql_query": sql_query, "data_source_type": "sqlserver", "trace_id": trace_id}
             )
 
+    async def execute_sql_async(
+        self,
+        sql_query: str,
+        data_source_type: Optional[str] = None,
+        trace_id: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """execute_sql 的异步版本（经请求会话的 execute_async 执行）"""
+        self._ensure_initialized()
+
+        if not data_source_type:
+            data_source_type = "excel" if self.is_excel_mode() else "sqlserver"
+        session = session_for(trace_id, data_source_type)
+        return await session.execute_async(sql_query, data_source_type=data_source_type)
+
     def clear(self) -> None:
         """清除所有数据源状态"""
         from src.core.loader.excel_loader import reset_loader
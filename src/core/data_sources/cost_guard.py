@@ -0,0 +1,277 @@
+"""执行前成本守卫 - 基于 EXPLAIN 估算拦截高代价 SQL
+
+在 LLM 生成的 SQL 真正执行前：
+- PostgreSQL 使用 EXPLAIN (FORMAT JSON)
+- SQL Server 使用 SET SHOWPLAN_XML ON
+估算总代价与返回行数，超过阈值时拒绝执行或自动追加行数限制。
+拒绝信息包含代价最高的计划节点与笛卡尔积提示，便于 generate_sql 节点一次修正。
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("cost_guard")
+
+_SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+_JOIN_OPS = {
+    "nested loop",
+    "nested loops",
+    "hash join",
+    "merge join",
+}
+
+
+class QueryCostExceededError(RuntimeError):
+    """查询估算代价超过阈值"""
+
+
+@dataclass
+class PlanNode:
+    """归一化后的执行计划节点"""
+
+    op: str
+    rows: float = 0.0
+    cost: float = 0.0
+    relation: Optional[str] = None
+    has_join_condition: bool = True
+    children: List["PlanNode"] = field(default_factory=list)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def relations(self) -> List[str]:
+        """当前节点及其子树涉及的表（去重，保持顺序）"""
+        return list(dict.fromkeys(n.relation for n in self.walk() if n.relation))
+
+
+@dataclass
+class PlanEstimate:
+    """整条语句的代价估算"""
+
+    total_cost: float
+    estimated_rows: float
+    root: Optional[PlanNode] = None
+
+
+# ==================== 计划解析 ====================
+
+
+def parse_postgres_plan(plan_json: Any) -> PlanEstimate:
+    """解析 EXPLAIN (FORMAT JSON) 输出"""
+    import json
+
+    if isinstance(plan_json, str):
+        plan_json = json.loads(plan_json)
+    if isinstance(plan_json, list):
+        plan_json = plan_json[0]
+    plan = plan_json["Plan"]
+
+    def _convert(node: Dict[str, Any]) -> PlanNode:
+        op = node.get("Node Type", "")
+        has_condition = True
+        if op.lower() in _JOIN_OPS:
+            has_condition = any(
+                key in node for key in ("Join Filter", "Hash Cond", "Merge Cond")
+            ) or any(
+                "Index Cond" in child or "Recheck Cond" in child
+                for child in node.get("Plans", [])
+            )
+        return PlanNode(
+            op=op,
+            rows=float(node.get("Plan Rows", 0)),
+            cost=float(node.get("Total Cost", 0)),
+            relation=node.get("Relation Name"),
+            has_join_condition=has_condition,
+            children=[_convert(child) for child in node.get("Plans", [])],
+        )
+
+    root = _convert(plan)
+    return PlanEstimate(total_cost=root.cost, estimated_rows=root.rows, root=root)
+
+
+def parse_showplan_xml(showplan: str) -> PlanEstimate:
+    """解析 SQL Server SHOWPLAN_XML 输出（取最后一条语句）"""
+    tree = ET.fromstring(showplan)
+    statements = list(tree.iter(f"{_SHOWPLAN_NS}StmtSimple"))
+    if not statements:
+        raise ValueError("SHOWPLAN_XML contains no statements")
+    stmt = statements[-1]
+
+    def _convert(relop: ET.Element) -> PlanNode:
+        op = relop.get("PhysicalOp", "")
+        children = []
+        for child in relop:
+            # RelOp 子节点嵌套在具体算子元素之下
+            for grandchild in child.findall(f"{_SHOWPLAN_NS}RelOp"):
+                children.append(_convert(grandchild))
+        relation = None
+        obj = relop.find(f".//{_SHOWPLAN_NS}Object")
+        if obj is not None and op.lower().endswith(("scan", "seek")):
+            relation = (obj.get("Table") or "").strip("[]") or None
+        has_condition = True
+        if op.lower() in _JOIN_OPS:
+            has_condition = any(
+                relop.find(f".//{_SHOWPLAN_NS}{tag}") is not None
+                for tag in ("Predicate", "OuterReferences", "HashKeysProbe", "InnerSideJoinColumns")
+            )
+        return PlanNode(
+            op=op,
+            rows=float(relop.get("EstimateRows", 0)),
+            cost=float(relop.get("EstimatedTotalSubtreeCost", 0)),
+            relation=relation,
+            has_join_condition=has_condition,
+            children=children,
+        )
+
+    relop = stmt.find(f".//{_SHOWPLAN_NS}RelOp")
+    root = _convert(relop) if relop is not None else None
+    return PlanEstimate(
+        total_cost=float(stmt.get("StatementSubTreeCost", 0)),
+        estimated_rows=float(stmt.get("StatementEstRows", 0)),
+        root=root,
+    )
+
+
+# ==================== 守卫 ====================
+
+
+class QueryCostGuard:
+    """执行前成本守卫"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_total_cost: float = 1_000_000.0,
+        max_estimated_rows: float = 1_000_000.0,
+        action: str = "reject",
+        auto_limit_rows: int = 1000,
+    ):
+        self.enabled = enabled
+        self.max_total_cost = max_total_cost
+        self.max_estimated_rows = max_estimated_rows
+        self.action = action
+        self.auto_limit_rows = auto_limit_rows
+
+    @classmethod
+    def from_config(cls, guard_config: Any = None) -> "QueryCostGuard":
+        """从 data_source.cost_guard 配置创建"""
+        if guard_config is None:
+            try:
+                from src.config.settings import get_config
+
+                guard_config = get_config().data_source.cost_guard
+            except Exception:
+                return cls(enabled=False)
+        return cls(
+            enabled=guard_config.enabled,
+            max_total_cost=guard_config.max_total_cost,
+            max_estimated_rows=guard_config.max_estimated_rows,
+            action=guard_config.action,
+            auto_limit_rows=guard_config.auto_limit_rows,
+        )
+
+    def enforce(self, strategy: Any, query: str) -> str:
+        """估算代价并返回可执行的 SQL
+
+        Args:
+            strategy: 数据源策略（需实现 explain）
+            query: 待执行 SQL
+
+        Returns:
+            原 SQL 或追加行数限制后的 SQL
+
+        Raises:
+            QueryCostExceededError: 估算代价超过阈值且无法自动限制
+        """
+        if not self.enabled or not hasattr(strategy, "explain"):
+            return query
+
+        try:
+            estimate = strategy.explain(query)
+        except Exception as e:
+            # EXPLAIN 失败（语法错误等）交给真正执行去报告具体错误
+            logger.warning(f"Cost guard EXPLAIN failed, skipping guard: {e}")
+            return query
+
+        cost_exceeded = estimate.total_cost > self.max_total_cost
+        rows_exceeded = estimate.estimated_rows > self.max_estimated_rows
+        if not cost_exceeded and not rows_exceeded:
+            return query
+
+        dialect = strategy.get_metadata().get("source_type", "")
+        if self.action == "limit" and not cost_exceeded:
+            limited = apply_row_limit(query, self.auto_limit_rows, dialect)
+            if limited is not None:
+                logger.info(
+                    f"Cost guard auto-limited query to {self.auto_limit_rows} rows "
+                    f"(estimated {estimate.estimated_rows:,.0f} rows)"
+                )
+                return limited
+
+        raise QueryCostExceededError(self.describe_rejection(estimate))
+
+    def describe_rejection(self, estimate: PlanEstimate) -> str:
+        """生成可直接反馈给 SQL 生成节点的拒绝原因"""
+        parts = [
+            "Query rejected by cost guard before execution: "
+            f"estimated {estimate.estimated_rows:,.0f} rows and total cost "
+            f"{estimate.total_cost:,.0f} (limits: {self.max_estimated_rows:,.0f} rows, "
+            f"cost {self.max_total_cost:,.0f})."
+        ]
+
+        if estimate.root is not None:
+            cartesian = [
+                node
+                for node in estimate.root.walk()
+                if node.op.lower() in _JOIN_OPS and not node.has_join_condition
+            ]
+            if cartesian:
+                node = max(cartesian, key=lambda n: n.rows)
+                parts.append(
+                    f"The {node.op} join over {', '.join(node.relations()) or 'its inputs'} "
+                    f"has no join condition (cartesian product, ~{node.rows:,.0f} rows); "
+                    "add the missing ON conditions (e.g. year, scenario, key, month)."
+                )
+            else:
+                heaviest = max(estimate.root.walk(), key=lambda n: n.rows)
+                tables = heaviest.relations()
+                target = f" over {', '.join(tables)}" if tables else ""
+                parts.append(
+                    f"Largest plan step: {heaviest.op}{target} (~{heaviest.rows:,.0f} rows)."
+                )
+
+        parts.append(
+            "Rewrite the SQL to touch fewer rows: filter by year/scenario/month, "
+            "aggregate with GROUP BY, or return only the top N rows."
+        )
+        return " ".join(parts)
+
+
+def apply_row_limit(query: str, limit: int, dialect: str) -> Optional[str]:
+    """为 SQL 追加行数限制，无法安全改写时返回 None"""
+    stripped = query.strip().rstrip(";").strip()
+
+    if dialect == "postgresql":
+        return f"SELECT * FROM (\n{stripped}\n) AS cost_guarded LIMIT {int(limit)}"
+
+    if dialect == "sqlserver":
+        # SQL Server 不允许在子查询中使用 WITH / ORDER BY，只改写简单 SELECT
+        if not re.match(r"(?i)^select\s", stripped) or re.match(
+            r"(?i)^select\s+(distinct\s+)?top\b", stripped
+        ):
+            return None
+        return re.sub(
+            r"(?i)^select\s+(distinct\s+)?",
+            lambda m: f"SELECT {(m.group(1) or '').upper()}TOP ({int(limit)}) ",
+            stripped,
+            count=1,
+        )
+
+    return None
@@ -0,0 +1,99 @@
+"""数据版本 - etl_data_version
+
+导入脚本每次实际改动数据后插入一行，版本号单调递增；下游缓存把当前版本号纳入缓存键，
+数据变化后旧缓存自然失效。
+"""
+
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("data_version")
+
+DATA_VERSION_TABLE = "etl_data_version"
+
+
+def ensure_data_version_table(conn: Any) -> None:
+    """创建数据版本表（已存在时跳过）
+
+    Args:
+        conn: SQLAlchemy 连接（PostgreSQL）
+    """
+    from sqlalchemy import text
+
+    conn.execute(
+        text(
+            f"""CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} (
+    version BIGSERIAL PRIMARY KEY,
+    tables TEXT,
+    partitions INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)"""
+        )
+    )
+
+
+def bump_data_version(conn: Any, tables: Iterable[str], partitions: int = 0) -> int:
+    """记录一次数据变更并返回新版本号
+
+    在数据变更提交之后调用（导入脚本在刷新预聚合表之后、独立事务中调用，刷新失败时也会调用），
+    使缓存键中的版本号变化时对应的数据已可见。
+
+    Args:
+        conn: SQLAlchemy 连接
+        tables: 发生变化的表
+        partitions: 替换的分区数
+
+    Returns:
+        新版本号
+    """
+    from sqlalchemy import text
+
+    ensure_data_version_table(conn)
+    version = conn.execute(
+        text(
+            f"INSERT INTO {DATA_VERSION_TABLE} (tables, partitions) "
+            "VALUES (:tables, :partitions) RETURNING version"
+        ),
+        {"tables": ",".join(sorted(set(tables))), "partitions": partitions},
+    ).scalar()
+    logger.info(f"Data version bumped to {version}")
+    return int(version)
+
+
+def get_data_version(engine: Any) -> Optional[int]:
+    """读取当前数据版本号
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        当前版本号；版本表不存在时返回 None
+    """
+    from sqlalchemy import text
+
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(text(f"SELECT MAX(version) FROM {DATA_VERSION_TABLE}")).scalar()
+    except Exception:
+        return None
+    return int(version or 0)
+
+
+def get_data_refreshed_at(engine: Any) -> Optional[datetime]:
+    """读取最近一次数据变更时间（数据源路由用于判断快照新鲜度）
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        最近一次 bump_data_version 的时间；版本表不存在或为空时返回 None
+    """
+    from sqlalchemy import text
+
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(f"SELECT MAX(created_at) FROM {DATA_VERSION_TABLE}")).scalar()
+    except Exception:
+        return None
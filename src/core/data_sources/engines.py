@@ -0,0 +1,79 @@
+"""共享 SQLAlchemy engine - 相同 DSN 与连接参数在进程内复用同一个 engine
+
+每个数据源实例各自 create_engine 时，各有一个连接池，登录握手无法复用；
+通过 get_shared_engine 创建的 engine 按 (DSN, 连接/连接池参数) 缓存，
+同一数据库的所有数据源实例与只读副本路由共用一个连接池。
+共享 engine 的生命周期与进程相同，数据源的 close() 只释放自身引用，
+需要真正断开连接时调用 dispose_shared_engines()。
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("data_source_engines")
+
+_engines: Dict[Tuple[str, Hashable], Any] = {}
+_lock = threading.Lock()
+
+
+def _freeze(value: Any) -> Hashable:
+    """把连接参数转换为可哈希的缓存键"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def get_shared_engine(
+    url: str, on_create: Optional[Callable[[Any], None]] = None, **kwargs: Any
+) -> Any:
+    """获取（或创建）DSN 对应的共享 engine
+
+    Args:
+        url: SQLAlchemy URL
+        on_create: engine 首次创建后调用（注册事件钩子等，每个 engine 只调用一次）
+        **kwargs: 传给 create_engine 的参数（连接池大小、connect_args 等），参与缓存键
+
+    Returns:
+        SQLAlchemy Engine
+    """
+    key = (url, _freeze(kwargs))
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            from sqlalchemy import create_engine
+
+            engine = create_engine(url, **kwargs)
+            if on_create is not None:
+                on_create(engine)
+            _engines[key] = engine
+            logger.debug(f"Created shared engine for {engine.url!r}")
+    return engine
+
+
+def dispose_shared_engines(url: Optional[str] = None) -> int:
+    """释放共享 engine 的连接池
+
+    Args:
+        url: 只释放该 DSN 的 engine，None 表示全部
+
+    Returns:
+        释放的 engine 数
+    """
+    with _lock:
+        keys = [key for key in _engines if url is None or key[0] == url]
+        engines = [_engines.pop(key) for key in keys]
+    for engine in engines:
+        engine.dispose()
+    return len(engines)
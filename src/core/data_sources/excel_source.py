@@ -2,15 +2,57 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 import pandas as pd
 from .base import DataSourceStrategy
+from .cancellation import CancellationToken, abort_error, resolve_timeout
+import hashlib
 import sqlite3
+import threading
+import time
 import re
 
+# SQLite 进度回调的虚拟机指令间隔
+_PROGRESS_HANDLER_OPS = 10000
+
+# 内存 SQLite 目录快照，按 _catalog_key 缓存：serialize() 字节；
+# Python 3.10 的 sqlite3 没有 serialize()/deserialize()，改为保存一份只用于 backup() 复制的连接
+_catalog_snapshots: Dict[tuple, Any] = {}
+_catalog_lock = threading.Lock()
+_HAS_SERIALIZE = hasattr(sqlite3.Connection, "serialize")
+
+
+def _snapshot_catalog(conn: sqlite3.Connection) -> Any:
+    """目录快照（serialize() 字节，或 backup() 出的独立连接）"""
+    if _HAS_SERIALIZE:
+        return conn.serialize()
+    copy = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.backup(copy)
+    return copy
+
+
+def _restore_catalog(snapshot: Any) -> sqlite3.Connection:
+    """从快照得到新的内存连接"""
+    conn = sqlite3.connect(":memory:")
+    if isinstance(snapshot, bytes):
+        conn.deserialize(snapshot)
+    else:
+        with _catalog_lock:  # 快照连接跨线程共享，复制时串行
+            snapshot.backup(conn)
+    return conn
+
+
 class ExcelDataSource(DataSourceStrategy):
     """Strategy for loading data from Excel files."""
 
-    def __init__(self, file_path: str, sheet_name: Optional[str] = None):
+    schema_info_scope = "source"  # 列信息只取决于当前工作表
+
+    def __init__(
+        self,
+        file_path: str,
+        sheet_name: Optional[str] = None,
+        query_timeout: Optional[float] = None,
+    ):
         self.file_path = file_path
         self.sheet_name = sheet_name
+        self.query_timeout = query_timeout
         self.all_sheets: List[str] = []
         self._business_logic_context = ""
         self._common_questions_context = ""
@@ -32,13 +74,7 @@ class ExcelDataSource(DataSourceStrategy):
 
         target_sheet = self.sheet_name
         if target_sheet is None:
-            data_sheets = [
-                s for s in self.all_sheets if s not in ["解释和逻辑", "问题"]
-            ]
-            if data_sheets:
-                target_sheet = data_sheets[0]
-            else:
-                target_sheet = self.all_sheets[0]
+            target_sheet = self._default_sheet(self.all_sheets)
         elif target_sheet not in self.all_sheets:
             raise ValueError(
                 f"工作表 '{target_sheet}' 不存在，可用工作表: {self.all_sheets}"
@@ -48,7 +84,89 @@ class ExcelDataSource(DataSourceStrategy):
         self._loaded_df = pd.read_excel(self.file_path, sheet_name=target_sheet)
         return self._loaded_df
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+    @staticmethod
+    def _default_sheet(all_sheets: List[str]) -> str:
+        """未指定工作表时使用第一个数据工作表（跳过说明与问题工作表）"""
+        data_sheets = [s for s in all_sheets if s not in ["解释和逻辑", "问题"]]
+        return data_sheets[0] if data_sheets else all_sheets[0]
+
+    def _resolve_sheet(self) -> None:
+        """未指定工作表时只读取工作簿的工作表列表来确定，使缓存键与元数据在加载前后一致"""
+        if self.sheet_name is not None or not Path(self.file_path).exists():
+            return
+        try:
+            with pd.ExcelFile(self.file_path) as xlsx:
+                all_sheets = xlsx.sheet_names
+        except Exception:
+            return  # 由 load_data 报告文件错误
+        self.all_sheets = all_sheets
+        self.sheet_name = self._default_sheet(all_sheets)
+
+    def _default_query_timeout(self) -> Optional[float]:
+        if self.query_timeout is not None:
+            return self.query_timeout
+        try:
+            from src.config.settings import get_config
+            return get_config().data_source.excel.query_timeout
+        except Exception:
+            return None
+
+    def _catalog_key(self) -> tuple:
+        """内存 SQLite 目录快照的缓存键：文件版本 + 已加载表 + 索引配置"""
+        self._resolve_sheet()  # 否则首个快照缓存在 None 工作表的键下，之后不再命中
+        path = Path(self.file_path)
+        mtime = path.stat().st_mtime if path.exists() else None
+        loader_state: tuple = ()
+        try:
+            from core.loader.excel_loader import get_loader
+            loader_state = tuple(
+                (t.get("id"), t.get("sheet_name"), t.get("total_rows"), t.get("loaded_at"))
+                for t in get_loader().list_tables()
+            )
+        except Exception:
+            pass
+        indexes = tuple(
+            (table, tuple(tuple(cols) for cols in index_list))
+            for table, index_list in sorted(self._configured_indexes().items())
+        )
+        return (str(path.resolve()), self.sheet_name, mtime, loader_state, indexes)
+
+    def data_version(self) -> Optional[str]:
+        """文件修改时间 + 已加载表 + 索引配置（与目录快照缓存键一致）"""
+        return hashlib.sha1(repr(self._catalog_key()).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _configured_indexes() -> Dict[str, List[List[str]]]:
+        try:
+            from src.config.settings import get_config
+            return get_config().data_source.excel.indexes
+        except Exception:
+            return {}
+
+    def _open_catalog(self) -> sqlite3.Connection:
+        """打开内存 SQLite 目录
+
+        首次构建后缓存快照（见 _snapshot_catalog），之后每次查询复制到独立连接，
+        避免每条查询重新读取 Excel、写入 SQLite 和建立索引。
+        """
+        key = self._catalog_key()
+        with _catalog_lock:
+            snapshot = _catalog_snapshots.get(key)
+
+        if snapshot is None:
+            conn = self.build_catalog()
+            snapshot = _snapshot_catalog(conn)
+            with _catalog_lock:
+                # 同一文件只保留最新版本的快照
+                for stale in [k for k in _catalog_snapshots if k[:2] == key[:2]]:
+                    del _catalog_snapshots[stale]  # 快照连接可能正被其他线程复制，由引用计数释放
+                _catalog_snapshots[key] = snapshot
+            return conn
+
+        return _restore_catalog(snapshot)
+
+    def build_catalog(self) -> sqlite3.Connection:
+        """把工作表及已加载的表写入新的内存 SQLite 连接，并建立配置中的索引"""
         if self._loaded_df is None:
             self.load_data()
 
@@ -112,6 +230,51 @@ class ExcelDataSource(DataSourceStrategy):
         except Exception:
             pass
 
+        self._create_configured_indexes(conn)
+        return conn
+
+    def _create_configured_indexes(self, conn: sqlite3.Connection) -> None:
+        """按 data_source.excel.indexes 配置建立索引（表或列不存在时跳过）"""
+        for table, index_list in self._configured_indexes().items():
+            for columns in index_list:
+                name = "idx_" + "_".join([table, *columns])
+                column_sql = ", ".join(f'"{c}"' for c in columns)
+                try:
+                    conn.execute(
+                        f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_sql})'
+                    )
+                except sqlite3.Error:
+                    continue
+
+    def execute_query(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> pd.DataFrame:
+        timeout = resolve_timeout(
+            self._default_query_timeout() if timeout is None else timeout, cancel_token
+        )
+        return self.run_on_catalog(self._open_catalog(), query, timeout, cancel_token)
+
+    @staticmethod
+    def run_on_catalog(
+        conn: sqlite3.Connection,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> pd.DataFrame:
+        """在内存 SQLite 目录上执行查询，超时或取消时中止语句，结束后关闭连接
+
+        Args:
+            conn: 内存 SQLite 连接（通常来自 _open_catalog）
+            query: SQL 查询语句
+            timeout: 已解析的语句超时（秒），None 表示不限制
+            cancel_token: 请求级取消令牌
+
+        Returns:
+            DataFrame 包含查询结果
+        """
         top_match = re.match(
             r"(?i)^\s*SELECT\s+TOP\s+(\d+)\s+(.+)", query, re.DOTALL
         )
@@ -120,8 +283,28 @@ class ExcelDataSource(DataSourceStrategy):
             rest_query = top_match.group(2)
             query = f"SELECT {rest_query} LIMIT {limit_n}"
 
-        result_df = pd.read_sql_query(query, conn)
-        conn.close()
+        # 进度回调在截止时间到达或请求被取消时返回非零，SQLite 随即中止语句
+        deadline = time.monotonic() + timeout if timeout else None
+
+        def _should_interrupt() -> int:
+            if cancel_token is not None and cancel_token.should_abort():
+                return 1
+            if deadline is not None and time.monotonic() >= deadline:
+                return 1
+            return 0
+
+        conn.set_progress_handler(_should_interrupt, _PROGRESS_HANDLER_OPS)
+        unregister = cancel_token.register(conn.interrupt) if cancel_token else None
+        try:
+            result_df = pd.read_sql_query(query, conn)
+        except Exception as e:
+            if "interrupted" in str(e).lower():
+                raise abort_error(cancel_token, timeout, query) from e
+            raise
+        finally:
+            if unregister:
+                unregister()
+            conn.close()
         return result_df
 
     def _load_context_sheets(self):
@@ -147,6 +330,7 @@ class ExcelDataSource(DataSourceStrategy):
             print(f"Warning: Failed to load context sheets: {e}")
 
     def get_metadata(self) -> Dict[str, Any]:
+        self._resolve_sheet()
         return {
             "source_type": "excel",
             "file_path": self.file_path,
@@ -167,6 +351,20 @@ class ExcelDataSource(DataSourceStrategy):
         cols = ", ".join([f"{c} ({self._loaded_df[c].dtype})" for c in self._loaded_df.columns])
         return f"表 {Path(self.file_path).name} ({self.sheet_name}) 列信息:\n  - {cols}"
 
+    def sample_tables(self, limit: int, max_tables: int) -> Dict[str, pd.DataFrame]:
+        """当前工作表与 Excel 加载器中已加载的表（数据已在内存中，读取全部行）"""
+        if self._loaded_df is None:
+            self.load_data()
+        samples = {self.sheet_name: self._loaded_df}
+        try:
+            from src.core.loader.excel_loader import get_loader
+
+            for name, df in get_loader().get_loaded_dataframes().items():
+                samples.setdefault(name, df)
+        except Exception:
+            pass
+        return dict(list(samples.items())[:max_tables])
+
     def is_available(self) -> bool:
         if self._is_available is None:
             self._is_available = Path(self.file_path).exists()
@@ -1,15 +1,17 @@
 """统一的数据源执行器 - 策略模式实现"""
 
+import asyncio
+import time
 from typing import Optional, Dict, Any, List
 import pandas as pd
 from .base import DataSourceStrategy
-from .excel_source import ExcelDataSource
-from .postgres_source import PostgreSQLDataSource
-
-try:
-    from .sqlserver_source import SQLServerDataSource
-except ImportError:
-    SQLServerDataSource = None
+from .cancellation import CancellationToken, QueryCancelledError, QueryTimeoutError
+from .cost_guard import QueryCostGuard
+from .query_log import get_slow_query_log
+from .result_cache import get_result_cache
+from .single_flight import get_query_flight
+from .router import get_data_source_router
+from .session import resolve_strategy, session_for
 
 try:
     from src.config.settings import get_config
@@ -24,8 +26,216 @@ from src.config.logger_interface import get_logger
 logger = get_logger("data_source_executor")
 
 
+def run_query(
+    strategy: DataSourceStrategy,
+    query: str,
+    timeout: Optional[float] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    trace_id: Optional[str] = None,
+) -> pd.DataFrame:
+    """在指定策略上执行 SQL 查询（无共享可变状态，可并发调用）
+
+    相同结果缓存键的查询优先命中缓存；并发进行中的相同查询只执行一次，
+    其余调用方等待并共享结果（single-flight）。
+
+    Args:
+        strategy: 数据源策略
+        query: SQL 查询语句
+        timeout: 语句超时（秒），None 使用数据源默认配置
+        cancel_token: 请求级取消令牌
+        trace_id: 请求 ID（写入慢查询日志）
+
+    Returns:
+        DataFrame 包含查询结果
+
+    Raises:
+        QueryCostExceededError: 启用成本守卫且估算代价超过阈值
+    """
+    if not strategy.is_available():
+        raise RuntimeError(f"数据源不可用: {strategy}")
+
+    # 结果缓存：规范化 SQL + 数据源标识 + 数据版本相同时直接返回
+    cache = get_result_cache()
+    cache_key = cache.make_key(strategy, query)
+    if cache_key is None:
+        return _execute(strategy, query, timeout, cancel_token, trace_id, None)
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.debug(f"[{trace_id}] Result cache hit")
+        return cached
+
+    if not _single_flight_enabled():
+        return _execute(strategy, query, timeout, cancel_token, trace_id, cache_key)
+
+    df, shared = get_query_flight().do(
+        cache_key,
+        lambda: _execute(strategy, query, timeout, cancel_token, trace_id, cache_key),
+        cancel_token=cancel_token,
+    )
+    if shared:
+        logger.debug(f"[{trace_id}] Shared result of an identical in-flight query")
+        return df.copy()
+    return df
+
+
+def _single_flight_enabled() -> bool:
+    config = get_config()
+    return config.single_flight.queries if config else True
+
+
+def _execute(
+    strategy: DataSourceStrategy,
+    query: str,
+    timeout: Optional[float],
+    cancel_token: Optional[CancellationToken],
+    trace_id: Optional[str],
+    cache_key: Optional[str],
+) -> pd.DataFrame:
+    """成本守卫 → 执行 → 路由统计 / 结果缓存 / 慢查询日志"""
+    # 执行前成本守卫：估算超限时抛出 QueryCostExceededError 或追加行数限制
+    query = QueryCostGuard.from_config().enforce(strategy, query)
+
+    source_type = strategy.get_metadata().get("source_type", "unknown")
+    started = time.perf_counter()
+    try:
+        df = strategy.execute_query(query, timeout=timeout, cancel_token=cancel_token)
+    except Exception as e:
+        _record_failure(strategy, source_type, query, started, e, trace_id)
+        raise
+    _record_success(strategy, source_type, query, df, started, trace_id, cache_key)
+    return df
+
+
+def _record_failure(
+    strategy: DataSourceStrategy,
+    source_type: str,
+    query: str,
+    started: float,
+    error: Exception,
+    trace_id: Optional[str],
+) -> None:
+    """执行失败：路由统计 / 慢查询日志（调用方取消不反映数据源与语句本身，只有超时计入）"""
+    if isinstance(error, QueryCancelledError) and not isinstance(error, QueryTimeoutError):
+        return
+    latency_ms = (time.perf_counter() - started) * 1000
+    get_data_source_router().record(source_type, latency_ms, ok=False, error=str(error))
+    get_slow_query_log().record(
+        query,
+        source_type=source_type,
+        latency_ms=latency_ms,
+        trace_id=trace_id,
+        strategy=strategy,
+        error=str(error) or type(error).__name__,
+        timed_out=isinstance(error, QueryTimeoutError),
+    )
+
+
+def _record_success(
+    strategy: DataSourceStrategy,
+    source_type: str,
+    query: str,
+    df: pd.DataFrame,
+    started: float,
+    trace_id: Optional[str],
+    cache_key: Optional[str],
+) -> None:
+    """执行成功：路由统计 / 结果缓存 / 慢查询日志"""
+    latency_ms = (time.perf_counter() - started) * 1000
+    get_data_source_router().record(source_type, latency_ms)
+    if cache_key is not None:
+        get_result_cache().put(cache_key, df)
+    get_slow_query_log().record(
+        query,
+        source_type=source_type,
+        latency_ms=latency_ms,
+        rows=len(df),
+        result_bytes=int(df.memory_usage(deep=True).sum()),
+        trace_id=trace_id,
+        strategy=strategy,
+    )
+
+
+async def run_query_async(
+    strategy: DataSourceStrategy,
+    query: str,
+    timeout: Optional[float] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    trace_id: Optional[str] = None,
+) -> pd.DataFrame:
+    """run_query 的异步版本
+
+    通过策略的 execute_query_async 执行（asyncpg 连接池等原生驱动直接在事件循环中等待，
+    其余策略在线程池中执行）；结果缓存与 single-flight 同 run_query，
+    相同查询的并发协程在同一事件循环内合并。
+
+    Args:
+        strategy: 数据源策略
+        query: SQL 查询语句
+        timeout: 语句超时（秒），None 使用数据源默认配置
+        cancel_token: 请求级取消令牌
+        trace_id: 请求 ID（写入慢查询日志）
+
+    Returns:
+        DataFrame 包含查询结果
+    """
+    if not strategy.is_available():
+        raise RuntimeError(f"数据源不可用: {strategy}")
+
+    cache = get_result_cache()
+    cache_key = cache.make_key(strategy, query)
+    if cache_key is None:
+        return await _execute_async(strategy, query, timeout, cancel_token, trace_id, None)
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.debug(f"[{trace_id}] Result cache hit")
+        return cached
+
+    if not _single_flight_enabled():
+        return await _execute_async(strategy, query, timeout, cancel_token, trace_id, cache_key)
+
+    df, shared = await get_query_flight().do_async(
+        cache_key,
+        lambda: _execute_async(strategy, query, timeout, cancel_token, trace_id, cache_key),
+        cancel_token=cancel_token,
+    )
+    if shared:
+        logger.debug(f"[{trace_id}] Shared result of an identical in-flight query")
+        return df.copy()
+    return df
+
+
+async def _execute_async(
+    strategy: DataSourceStrategy,
+    query: str,
+    timeout: Optional[float],
+    cancel_token: Optional[CancellationToken],
+    trace_id: Optional[str],
+    cache_key: Optional[str],
+) -> pd.DataFrame:
+    """_execute 的异步版本（成本守卫的 EXPLAIN 为同步调用，启用时在线程池中执行）"""
+    guard = QueryCostGuard.from_config()
+    if guard.enabled:
+        query = await asyncio.to_thread(guard.enforce, strategy, query)
+
+    source_type = strategy.get_metadata().get("source_type", "unknown")
+    started = time.perf_counter()
+    try:
+        df = await strategy.execute_query_async(query, timeout=timeout, cancel_token=cancel_token)
+    except Exception as e:
+        _record_failure(strategy, source_type, query, started, e, trace_id)
+        raise
+    _record_success(strategy, source_type, query, df, started, trace_id, cache_key)
+    return df
+
+
 class DataSourceExecutor:
-    """统一的数据源执行器 - 提供一致的 SQL 执行接口"""
+    """统一的数据源执行器 - 提供一致的 SQL 执行接口
+
+    configure()/execute() 保留给单线程脚本使用；工作流经 execute_from_state 按请求会话执行，
+    不修改执行器状态。
+    """
 
     _instance: Optional["DataSourceExecutor"] = None
 
@@ -42,17 +252,11 @@ class DataSourceExecutor:
     def _get_manager(self):
         """延迟导入 manager 避免循环依赖"""
         if self._manager is None:
-            from .manager import DataSourceManager
+            from .manager import get_data_source_manager
 
-            self._manager = DataSourceManager()
+            self._manager = get_data_source_manager()
         return self._manager
 
-    @classmethod
-    def get_instance(cls) -> "DataSourceExecutor":
-        if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
-
     def configure(self, source_type: str = "auto", **kwargs) -> None:
         """根据配置选择数据源策略
 
@@ -63,52 +267,45 @@ class DataSourceExecutor:
                 - file_path: Excel 文件路径
                 - sheet_name: Excel 工作表名称
         """
-        config = get_config()
-
-        if source_type == "sqlserver" or (
-            source_type == "auto" and self._manager.sql_server_available
-        ):
-            if SQLServerDataSource:
-                self._strategy = SQLServerDataSource(
-                    # query=kwargs.get("query", ""), # SQLServerDataSource __init__ doesn't accept query
-                    # table_name_alias=kwargs.get("table_name_alias", "SQL Query Result"),
-                )
-            else:
-                raise ImportError("SQLServerDataSource not available")
-
-        elif source_type == "postgresql":
-            if PostgreSQLDataSource:
-                self._strategy = PostgreSQLDataSource()
-            else:
-                raise ImportError("PostgreSQLDataSource not available")
-
-        elif source_type == "excel" or (
-            source_type == "auto" and kwargs.get("file_path")
-        ):
-            file_path = kwargs.get("file_path")
-            sheet_name = kwargs.get("sheet_name")
-            self._strategy = ExcelDataSource(file_path=file_path, sheet_name=sheet_name)
-
-        else:
-            raise ValueError(f"无法配置数据源策略: 未知的类型 {source_type}")
-
-    def execute(self, query: str) -> pd.DataFrame:
+        if source_type == "auto":
+            if self._get_manager().sql_server_available:
+                source_type = "sqlserver"
+            elif kwargs.get("file_path"):
+                source_type = "excel"
+
+        self._strategy = resolve_strategy(
+            source_type,
+            file_path=kwargs.get("file_path"),
+            sheet_name=kwargs.get("sheet_name"),
+        )
+
+    def execute(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        trace_id: Optional[str] = None,
+    ) -> pd.DataFrame:
         """执行 SQL 查询
 
         Args:
             query: SQL 查询语句
+            timeout: 语句超时（秒），None 使用数据源默认配置
+            cancel_token: 请求级取消令牌
+            trace_id: 请求 ID（写入慢查询日志）
 
         Returns:
             DataFrame 包含查询结果
+
+        Raises:
+            QueryCostExceededError: 启用成本守卫且估算代价超过阈值
         """
         if self._strategy is None:
             raise RuntimeError("数据源策略未配置，请先调用 configure()")
 
-        if not self._strategy.is_available():
-            raise RuntimeError(f"数据源不可用: {self._strategy}")
-
-        # logger.info(f"执行查询: {query[:100]}...")
-        return self._strategy.execute_query(query)
+        return run_query(
+            self._strategy, query, timeout=timeout, cancel_token=cancel_token, trace_id=trace_id
+        )
 
     def execute_from_state(self, state: Dict[str, Any]) -> pd.DataFrame:
         """从 AgentState 中获取配置并执行查询
@@ -117,31 +314,15 @@ class DataSourceExecutor:
             state: Agent 状态字典，需包含:
                 - sql_query: SQL 查询语句
                 - data_source_type: 数据源类型 ("sql_server", "excel")
+                - trace_id: 请求 ID（可选，用于查找取消令牌）
 
         Returns:
             DataFrame 包含查询结果
         """
         sql_query = state.get("sql_query", "")
         data_source_type = state.get("data_source_type", "auto")
-
-        kwargs = {"query": sql_query}
-
-        if data_source_type == "excel":
-            try:
-                config = get_config()
-                if config and hasattr(config, 'data_source') and hasattr(config.data_source, 'excel'):
-                    excel_config = config.data_source.excel
-                    if hasattr(excel_config, 'file_paths') and excel_config.file_paths:
-                        first_table = list(excel_config.file_paths.keys())[0]
-                        file_path = excel_config.file_paths.get(first_table)
-                        if file_path:
-                            kwargs["file_path"] = file_path
-                            kwargs["sheet_name"] = first_table
-            except Exception as e:
-                logger.warning(f"无法获取 Excel 配置: {e}")
-
-        self.configure(source_type=data_source_type, **kwargs)
-        return self.execute(sql_query)
+        session = session_for(state.get("trace_id"), data_source_type)
+        return session.execute(sql_query, data_source_type=data_source_type)
 
     def get_schema_info(self, table_names: List[str]) -> str:
         """获取表结构信息"""
@@ -216,9 +397,10 @@ def execute_query(query: str, source_type: str = "auto", **kwargs) -> pd.DataFra
     Returns:
         DataFrame 包含查询结果
     """
-    executor = get_executor()
-    executor.configure(source_type=source_type, **kwargs)
-    return executor.execute(query)
+    strategy = resolve_strategy(
+        source_type, file_path=kwargs.get("file_path"), sheet_name=kwargs.get("sheet_name")
+    )
+    return run_query(strategy, query)
 
 
 def execute_from_state(state: Dict[str, Any]) -> pd.DataFrame:
@@ -0,0 +1,615 @@
+"""跨数据源联邦查询 - Excel 表与 PostgreSQL 表关联
+
+LLM 按 SQLite 语法生成一条同时引用 Excel 工作表与 PostgreSQL 表的查询，执行分三步：
+1. 规划：只引用远程表的 CTE 整体下推到 PostgreSQL（过滤、聚合在远端完成）；
+   主查询中直接引用的远程表只下推用到的列与仅涉及该表的顶层 WHERE 条件
+2. 拉取：每个下推查询追加 LIMIT（行数上限 + 1），超过上限即报错，绝不拉取整张远程表
+3. 本地执行：下推结果写入内存 SQLite 目录（与 Excel 表同库），在本地完成关联
+
+整个过程共享请求的行数上限（excel.max_result_limit）、语句超时与取消令牌。
+"""
+
+import decimal
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from src.config.logger_interface import get_logger
+
+from .base import DataSourceStrategy
+from .cancellation import CancellationToken, resolve_timeout
+
+logger = get_logger("federated_query")
+
+_KEYWORDS = {
+    "ALL", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CAST", "CROSS", "DESC",
+    "DISTINCT", "ELSE", "END", "EXCEPT", "EXISTS", "FALSE", "FROM", "FULL", "GLOB",
+    "GROUP", "HAVING", "IN", "INNER", "INTERSECT", "IS", "JOIN", "LEFT", "LIKE",
+    "LIMIT", "NOT", "NULL", "OFFSET", "ON", "OR", "ORDER", "OUTER", "OVER", "RIGHT",
+    "SELECT", "THEN", "TRUE", "UNION", "USING", "WHEN", "WHERE", "WINDOW", "WITH",
+}
+
+_IDENT = r'(?:"[^"]+"|\[[^\]]+\]|[A-Za-z_]\w*)'
+_TABLE_REF = re.compile(
+    rf"\b(FROM|JOIN)\s+((?:{_IDENT}\.)?{_IDENT})(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.I
+)
+_CTE_HEAD = re.compile(rf"\s*({_IDENT})\s*(\([^()]*\))?\s*AS\s*(?:NOT\s+)?(?:MATERIALIZED\s*)?\(", re.I)
+_QUALIFIED = re.compile(rf"({_IDENT})\s*\.\s*({_IDENT}|\*)")
+_WORD = re.compile(rf"{_IDENT}")
+_TEXT_TYPE = re.compile(r"char|text|uuid|date|time", re.I)
+_CLAUSE_END = re.compile(
+    r"\b(GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|WINDOW|UNION|INTERSECT|EXCEPT)\b", re.I
+)
+
+
+class FederatedQueryError(RuntimeError):
+    """联邦查询无法在行数上限内完成（需要用户增加过滤或聚合）"""
+
+
+def _unquote(name: str) -> str:
+    if name[:1] in ('"', "[") and len(name) >= 2:
+        return name[1:-1]
+    return name
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _mask(sql: str) -> Tuple[str, List[int]]:
+    """把字符串字面量与注释替换为空白，并计算每个字符的括号深度
+
+    Returns:
+        (等长的掩码文本, 每个字符所处的括号深度)
+    """
+    chars = list(sql)
+    depths = [0] * len(sql)
+    depth = 0
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'":
+            end = i + 1
+            while end < len(sql):
+                if sql[end] == "'" and sql[end + 1:end + 2] == "'":
+                    end += 2
+                    continue
+                if sql[end] == "'":
+                    break
+                end += 1
+            for j in range(i + 1, min(end, len(sql))):
+                chars[j] = " "
+                depths[j] = depth
+            depths[i] = depth
+            if end < len(sql):
+                depths[end] = depth
+            i = end + 1
+            continue
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = len(sql) if end < 0 else end
+            for j in range(i, end):
+                chars[j] = " "
+                depths[j] = depth
+            i = end
+            continue
+        if ch == "(":
+            depth += 1
+            depths[i] = depth
+        elif ch == ")":
+            depths[i] = depth
+            depth -= 1
+        else:
+            depths[i] = depth
+        i += 1
+    return "".join(chars), depths
+
+
+def _top_level(masked: str, depths: List[int], base: int = 0) -> str:
+    """只保留括号深度为 base 的字符（其余替换为空格），位置不变"""
+    return "".join(c if d == base else " " for c, d in zip(masked, depths))
+
+
+def _split_top_level(text: str, flat: str, separator: re.Pattern) -> List[str]:
+    parts, start = [], 0
+    for match in separator.finditer(flat):
+        parts.append(text[start:match.start()])
+        start = match.end()
+    parts.append(text[start:])
+    return parts
+
+
+@dataclass
+class RemoteFetch:
+    """一次下推到远程数据源的查询"""
+
+    name: str  # 写入本地目录的表名
+    sql: str  # 在远程执行的 SQL（已包含行数上限）
+    source_tables: List[str]
+    kind: str = "table"  # "cte" 整个 CTE 下推；"table" 列裁剪 + 过滤下推
+
+
+@dataclass
+class FederatedPlan:
+    """联邦查询执行计划"""
+
+    local_query: str
+    fetches: List[RemoteFetch] = field(default_factory=list)
+
+    def describe(self) -> str:
+        lines = [f"[{f.kind}] {f.name} <- {f.sql}" for f in self.fetches]
+        lines.append(f"[local] {self.local_query}")
+        return "\n".join(lines)
+
+
+def _split_ctes(sql: str) -> Tuple[List[Tuple[str, Optional[str], str]], str, bool]:
+    """拆分顶层 WITH 子句
+
+    Returns:
+        ([(CTE 名, 列清单, 主体)], 主查询, 是否 RECURSIVE)；没有 WITH 时列表为空
+    """
+    masked, depths = _mask(sql)
+    head = re.match(r"\s*WITH\s+(RECURSIVE\s+)?", masked, re.I)
+    if not head:
+        return [], sql, False
+
+    ctes = []
+    pos = head.end()
+    while True:
+        match = _CTE_HEAD.match(masked, pos)
+        if not match:
+            return [], sql, False
+        open_at = match.end() - 1
+        close_at = open_at + 1
+        while close_at < len(sql) and not (sql[close_at] == ")" and depths[close_at] == depths[open_at]):
+            close_at += 1
+        if close_at >= len(sql):
+            return [], sql, False
+        ctes.append((_unquote(match.group(1)), match.group(2), sql[open_at + 1:close_at]))
+        pos = close_at + 1
+        comma = re.match(r"\s*,", masked[pos:])
+        if not comma:
+            break
+        pos += comma.end()
+    return ctes, sql[pos:].strip(), bool(head.group(1))
+
+
+def _join_ctes(ctes: List[Tuple[str, Optional[str], str]], main: str, recursive: bool) -> str:
+    if not ctes:
+        return main
+    parts = [f"{_quote(name)}{columns or ''} AS ({body})" for name, columns, body in ctes]
+    return ("WITH RECURSIVE " if recursive else "WITH ") + ",\n".join(parts) + "\n" + main
+
+
+def _table_refs(sql: str) -> List[Tuple[str, Optional[str], int]]:
+    """查询中所有 FROM/JOIN 引用的表 (表名, 别名, 括号深度)，含子查询"""
+    masked, depths = _mask(sql)
+    refs = []
+    for match in _TABLE_REF.finditer(masked):
+        name = _unquote(match.group(2).split(".")[-1])
+        alias = match.group(3)
+        if alias and alias.upper() in _KEYWORDS:
+            alias = None
+        refs.append((name, alias, depths[match.start()]))
+    return refs
+
+
+def _where_conjuncts(main: str) -> Optional[Tuple[List[str], str]]:
+    """主查询顶层 WHERE 的 AND 条件列表与 FROM 子句；含顶层 OR / 集合运算时返回 None"""
+    masked, depths = _mask(main)
+    flat = _top_level(masked, depths)
+    if re.search(r"\b(UNION|INTERSECT|EXCEPT)\b", flat, re.I):
+        return None
+    from_match = re.search(r"\bFROM\b", flat, re.I)
+    if not from_match:
+        return None
+    where_match = re.search(r"\bWHERE\b", flat, re.I)
+    end_match = _CLAUSE_END.search(flat, (where_match or from_match).end())
+    end = end_match.start() if end_match else len(main)
+    if not where_match:
+        return [], main[from_match.end():end]
+
+    from_clause = main[from_match.end():where_match.start()]
+    where_text = main[where_match.end():end]
+    where_flat = flat[where_match.end():end]
+    if re.search(r"\bOR\b", where_flat, re.I):
+        return None
+
+    conjuncts: List[str] = []
+    for part in _split_top_level(where_text, where_flat, re.compile(r"\bAND\b", re.I)):
+        # BETWEEN x AND y 中的 AND 不是连接词
+        if conjuncts and re.search(r"\bBETWEEN\b(?!.*\bAND\b)", conjuncts[-1], re.I | re.S):
+            conjuncts[-1] = f"{conjuncts[-1].strip()} AND {part.strip()}"
+        else:
+            conjuncts.append(part)
+    return [c.strip() for c in conjuncts if c.strip()], from_clause
+
+
+def _column_tokens(expression: str) -> Tuple[Set[str], Set[str]]:
+    """表达式中的 (限定符集合, 未限定列名集合)，均为小写"""
+    masked, _ = _mask(expression)
+    qualifiers = {_unquote(m.group(1)).lower() for m in _QUALIFIED.finditer(masked)}
+    stripped = _QUALIFIED.sub(" ", masked)
+    columns = set()
+    for match in _WORD.finditer(stripped):
+        word = match.group(0)
+        following = stripped[match.end():].lstrip()[:1]
+        if following == "(" or word.upper() in _KEYWORDS or word[:1].isdigit():
+            continue
+        columns.add(_unquote(word).lower())
+    return qualifiers, columns
+
+
+def _pushable(expression: str, column_types: Dict[str, str]) -> bool:
+    """只下推不含子查询、函数调用的简单比较（SQLite 与 PostgreSQL 语义一致）
+
+    SQLite 会对文本列与数字字面量做隐式转换而 PostgreSQL 直接报错，
+    因此涉及文本列且包含数字字面量的条件保留在本地执行。
+    """
+    masked, _ = _mask(expression)
+    if re.search(r"\bSELECT\b", masked, re.I):
+        return False
+    for match in re.finditer(r"([A-Za-z_]\w*)\s*\(", masked):
+        if match.group(1).upper() not in {"IN"}:
+            return False
+    if re.search(r"(?<![\w.])\d", masked):
+        _, bare = _column_tokens(expression)
+        referenced = bare | {
+            _unquote(m.group(2)).lower() for m in _QUALIFIED.finditer(masked)
+        }
+        types = {c.lower(): t.lower() for c, t in column_types.items()}
+        if any(_TEXT_TYPE.search(types.get(c, "")) for c in referenced):
+            return False
+    return True
+
+
+def _canonicalize(expression: str, columns: Dict[str, str]) -> str:
+    """把条件中的列名替换为远程表中带引号的规范列名（SQLite 列名不区分大小写）"""
+    canonical = {c.lower(): c for c in columns}
+    masked, _ = _mask(expression)
+    pieces, last = [], 0
+    for match in _WORD.finditer(masked):
+        word = _unquote(match.group(0))
+        following = masked[match.end():].lstrip()[:1]
+        if following in (".", "(") or word.upper() in _KEYWORDS:
+            continue
+        if word.lower() in canonical:
+            pieces.append(expression[last:match.start()])
+            pieces.append(_quote(canonical[word.lower()]))
+            last = match.end()
+    pieces.append(expression[last:])
+    return "".join(pieces)
+
+
+def _referenced_columns(sql: str, columns: Dict[str, str]) -> Optional[List[str]]:
+    """查询文本中出现的列（不区分大小写）；出现 SELECT * / 别名.* 时返回 None 表示全部列"""
+    masked, _ = _mask(sql)
+    if re.search(r"(\bSELECT\s+(DISTINCT\s+)?\*|\.\s*\*)", masked, re.I):
+        return None
+    words = {_unquote(m.group(0)).lower() for m in _WORD.finditer(masked)}
+    return [c for c in columns if c.lower() in words]
+
+
+def plan_federated_query(
+    sql: str,
+    remote_catalog: Dict[str, Dict[str, str]],
+    local_catalog: Dict[str, Set[str]],
+    max_rows: int,
+) -> FederatedPlan:
+    """生成联邦查询计划
+
+    Args:
+        sql: SQLite 语法的查询
+        remote_catalog: 远程表名 -> {列名: 数据类型}（只包含应从远程读取的表）
+        local_catalog: 本地（Excel）表名 -> 列名集合
+        max_rows: 每个下推查询允许返回的最大行数
+
+    Returns:
+        FederatedPlan
+    """
+    remote = {name.lower(): name for name in remote_catalog}
+    limit = max_rows + 1
+    fetches: List[RemoteFetch] = []
+
+    # 1. 只引用远程表的 CTE 整体下推（RECURSIVE 的 CTE 可能自引用，保持本地执行）
+    ctes, main, recursive = _split_ctes(sql)
+    kept: List[Tuple[str, Optional[str], str]] = []
+    local_names = {name.lower() for name in local_catalog}
+    for name, columns, body in ctes:
+        sources = [ref[0] for ref in _table_refs(body)]
+        earlier = {c[0].lower() for c in kept} | {f.name.lower() for f in fetches}
+        if (
+            not recursive
+            and sources
+            and all(s.lower() in remote and s.lower() not in earlier for s in sources)
+        ):
+            alias = f"_cte{columns or ''}"
+            fetches.append(
+                RemoteFetch(
+                    name=name,
+                    sql=f"SELECT * FROM ({body.strip()}) AS {alias} LIMIT {limit}",
+                    source_tables=sorted({remote[s.lower()] for s in sources}),
+                    kind="cte",
+                )
+            )
+        else:
+            kept.append((name, columns, body))
+    local_query = _join_ctes(kept, main, recursive) if fetches else sql
+
+    # 2. 剩余的远程表引用：列裁剪 + 仅涉及该表的顶层过滤条件
+    shadowed = {c[0].lower() for c in kept} | {f.name.lower() for f in fetches}
+    refs = [r for r in _table_refs(local_query) if r[0].lower() not in shadowed]
+    remote_refs: Dict[str, List[Tuple[Optional[str], int]]] = {}
+    for name, alias, depth in refs:
+        if name.lower() in remote and name.lower() not in local_names:
+            remote_refs.setdefault(name.lower(), []).append((alias, depth))
+
+    if remote_refs:
+        main_depth = 0
+        where = _where_conjuncts(main)
+        masked_main, main_depths = _mask(main)
+        outer_join = re.search(
+            r"\b(LEFT|RIGHT|FULL)\b", _top_level(masked_main, main_depths), re.I
+        )
+        main_refs = [r for r in _table_refs(main) if r[2] == main_depth]
+        known_columns: Dict[str, Set[str]] = {
+            **{k.lower(): {c.lower() for c in v} for k, v in local_catalog.items()},
+            **{k.lower(): {c.lower() for c in v} for k, v in remote_catalog.items()},
+        }
+        comma_join = where is not None and "," in _top_level(*_mask(where[1]))
+
+        for key, uses in remote_refs.items():
+            table = remote[key]
+            columns = _referenced_columns(local_query, remote_catalog[table])
+            column_sql = "*" if columns is None else ", ".join(_quote(c) for c in columns) or "1"
+
+            alias = uses[0][0]
+            pushed: List[str] = []
+            single_main_use = (
+                len(uses) == 1
+                and uses[0][1] == main_depth
+                and any(r[0].lower() == key for r in main_refs)
+            )
+            if single_main_use and where is not None and not outer_join:
+                others = [r for r in main_refs if r[0].lower() != key]
+                other_columns: Set[str] = set()
+                unknown_other = comma_join
+                for name, _, _ in others:
+                    if name.lower() in known_columns:
+                        other_columns |= known_columns[name.lower()]
+                    else:
+                        unknown_other = True
+                own = known_columns[key]
+                for conjunct in where[0]:
+                    if not _pushable(conjunct, remote_catalog[table]):
+                        continue
+                    qualifiers, bare = _column_tokens(conjunct)
+                    if qualifiers - {(alias or table).lower(), key}:
+                        continue
+                    if bare and (unknown_other or not bare <= own or bare & other_columns):
+                        continue
+                    if not qualifiers and not bare:
+                        continue
+                    pushed.append(_canonicalize(conjunct, remote_catalog[table]))
+
+            where_sql = f" WHERE {' AND '.join(f'({c})' for c in pushed)}" if pushed else ""
+            fetches.append(
+                RemoteFetch(
+                    name=table,
+                    sql=(
+                        f"SELECT {column_sql} FROM {_quote(table)}{f' AS {alias}' if alias else ''}"
+                        f"{where_sql} LIMIT {limit}"
+                    ),
+                    source_tables=[table],
+                )
+            )
+
+    return FederatedPlan(local_query=local_query, fetches=fetches)
+
+
+def _to_sqlite_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """把 SQLite 无法绑定的 Decimal 列转为浮点"""
+    for column in df.columns:
+        if df[column].dtype == object:
+            sample = df[column].dropna()
+            if not sample.empty and isinstance(sample.iloc[0], decimal.Decimal):
+                df[column] = df[column].astype(float)
+    return df
+
+
+class FederatedDataSource(DataSourceStrategy):
+    """联邦数据源 - 远程 PostgreSQL 表下推过滤/聚合后与 Excel 表在本地关联"""
+
+    def __init__(
+        self,
+        remote: DataSourceStrategy,
+        local: DataSourceStrategy,
+        remote_tables: Optional[List[str]] = None,
+        max_rows: Optional[int] = None,
+        query_timeout: Optional[float] = None,
+    ):
+        """
+        Args:
+            remote: 远程数据源策略（PostgreSQL）
+            local: 本地数据源策略（ExcelDataSource，提供内存 SQLite 目录）
+            remote_tables: 从远程读取的表；为空时使用远程目录中 Excel 不存在的表
+            max_rows: 每次下推允许拉取的最大行数，默认 excel.max_result_limit
+            query_timeout: 整条联邦查询的超时（秒），默认 Excel 查询超时
+        """
+        self.remote = remote
+        self.local = local
+        self.remote_tables = list(remote_tables or [])
+        self.max_rows = max_rows
+        self.query_timeout = query_timeout
+        self._remote_catalog: Optional[Dict[str, Dict[str, str]]] = None
+        self._catalog_lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, remote: DataSourceStrategy, local: DataSourceStrategy
+    ) -> "FederatedDataSource":
+        """按 data_source.federation 配置创建"""
+        try:
+            from src.config.settings import get_config
+
+            config = get_config()
+            return cls(
+                remote,
+                local,
+                remote_tables=config.data_source.federation.remote_tables,
+                max_rows=config.excel.max_result_limit,
+                query_timeout=config.data_source.excel.query_timeout,
+            )
+        except Exception as e:
+            logger.warning(f"无法读取联邦查询配置，使用默认值: {e}")
+            return cls(remote, local)
+
+    def _row_cap(self) -> int:
+        return self.max_rows if self.max_rows and self.max_rows > 0 else 1000
+
+    def remote_catalog(self) -> Dict[str, Dict[str, str]]:
+        """远程表名 -> {列名: 数据类型}（首次调用时读取 information_schema 并缓存）"""
+        if self._remote_catalog is not None:
+            return self._remote_catalog
+        with self._catalog_lock:
+            if self._remote_catalog is None:
+                schema = getattr(self.remote, "schema", None) or "public"
+                df = self.remote.execute_query(
+                    "SELECT table_name, column_name, data_type FROM information_schema.columns "
+                    f"WHERE table_schema = '{schema}' ORDER BY table_name, ordinal_position"
+                )
+                catalog: Dict[str, Dict[str, str]] = {}
+                for table, column, data_type in df.itertuples(index=False):
+                    catalog.setdefault(table, {})[column] = data_type
+                self._remote_catalog = catalog
+        return self._remote_catalog
+
+    @staticmethod
+    def _local_catalog(conn: sqlite3.Connection) -> Dict[str, Set[str]]:
+        catalog: Dict[str, Set[str]] = {}
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        for (table,) in tables:
+            info = conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+            catalog[table] = {row[1] for row in info}
+        return catalog
+
+    def _federated_tables(
+        self, local_catalog: Dict[str, Set[str]]
+    ) -> Dict[str, Dict[str, str]]:
+        """应从远程读取的表：配置的 remote_tables，或远程存在而 Excel 目录中没有的表"""
+        remote = self.remote_catalog()
+        if self.remote_tables:
+            wanted = {t.lower() for t in self.remote_tables}
+            return {t: cols for t, cols in remote.items() if t.lower() in wanted}
+        local = {t.lower() for t in local_catalog}
+        return {t: cols for t, cols in remote.items() if t.lower() not in local}
+
+    def plan(self, query: str) -> FederatedPlan:
+        """生成查询计划（不执行），用于调试与测试"""
+        conn = self.local._open_catalog()
+        try:
+            local_catalog = self._local_catalog(conn)
+        finally:
+            conn.close()
+        return plan_federated_query(
+            query, self._federated_tables(local_catalog), local_catalog, self._row_cap()
+        )
+
+    def execute_query(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> pd.DataFrame:
+        timeout = resolve_timeout(
+            self.query_timeout if timeout is None else timeout, cancel_token
+        )
+        # 远程拉取与本地关联共享同一截止时间；请求被取消时同步取消
+        scope = CancellationToken(timeout)
+        unlink = (
+            cancel_token.register(lambda: scope.cancel(cancel_token.reason or "cancelled by caller"))
+            if cancel_token
+            else None
+        )
+        conn = self.local._open_catalog()
+        try:
+            local_catalog = self._local_catalog(conn)
+            plan = plan_federated_query(
+                query, self._federated_tables(local_catalog), local_catalog, self._row_cap()
+            )
+            cap = self._row_cap()
+            for fetch in plan.fetches:
+                df = self.remote.execute_query(
+                    fetch.sql, timeout=scope.remaining(), cancel_token=scope
+                )
+                if len(df) > cap:
+                    raise FederatedQueryError(
+                        f"远程表 {', '.join(fetch.source_tables)} 的下推结果超过 {cap} 行上限，"
+                        "请在查询中增加过滤条件，或先在只引用该表的 CTE 中完成聚合后再与 Excel 表关联。\n"
+                        f"Pushed query: {fetch.sql}"
+                    )
+                logger.debug(f"Federated fetch {fetch.name}: {len(df)} rows <- {fetch.sql}")
+                _to_sqlite_frame(df).to_sql(fetch.name, conn, index=False, if_exists="replace")
+        except BaseException:
+            conn.close()
+            if unlink:
+                unlink()
+            raise
+
+        try:
+            return self.local.run_on_catalog(
+                conn, plan.local_query, scope.remaining(), scope
+            )
+        finally:
+            if unlink:
+                unlink()
+
+    def data_version(self) -> Optional[str]:
+        remote, local = self.remote.data_version(), self.local.data_version()
+        if remote is None or local is None:
+            return None
+        return f"{remote}/{local}"
+
+    def get_schema_info(self, table_names: List[str]) -> str:
+        remote = {t.lower(): t for t in self.remote_catalog()}
+        remote_names = [remote[t.lower()] for t in table_names if t.lower() in remote]
+        local_names = [t for t in table_names if t.lower() not in remote]
+        parts = []
+        if local_names or not remote_names:
+            parts.append(self.local.get_schema_info(local_names))
+        if remote_names:
+            parts.append(self.remote.get_schema_info(remote_names))
+            parts.append(
+                f"说明: {', '.join(remote_names)} 位于 PostgreSQL，每个远程表最多拉取 "
+                f"{self._row_cap()} 行；请先在只引用远程表的 CTE 中过滤/聚合，再与 Excel 表关联。"
+            )
+        return "\n\n".join(parts)
+
+    def load_data(self) -> pd.DataFrame:
+        return self.local.load_data()
+
+    def sample_tables(self, limit: int, max_tables: int) -> Dict[str, pd.DataFrame]:
+        samples = self.local.sample_tables(limit, max_tables)
+        for name, df in self.remote.sample_tables(limit, max_tables).items():
+            samples.setdefault(name, df)
+        return dict(list(samples.items())[:max_tables])
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            "source_type": "federated",
+            "remote": self.remote.get_metadata(),
+            "local": self.local.get_metadata(),
+        }
+
+    def get_context(self) -> Dict[str, Any]:
+        context: Dict[str, Any] = dict(self.remote.get_context())
+        context.update({k: v for k, v in self.local.get_context().items() if v})
+        context["data_source_type"] = "federated"
+        return context
+
+    def is_available(self) -> bool:
+        return self.local.is_available() and self.remote.is_available()
@@ -0,0 +1,403 @@
+"""索引顾问 - 基于已执行查询日志推荐索引
+
+流程：
+1. 读取慢查询日志（scripts/slow_query_report.py 同一来源），解析归一化 SQL 中的过滤列与连接列
+2. 按表聚合高频列组合，按耗时加权生成候选索引（过滤掉已有索引前缀覆盖的组合）
+3. 估算收益：
+   - PostgreSQL：HypoPG 假设索引 + EXPLAIN；未安装时在事务内建索引、EXPLAIN 后回滚
+   - Excel(SQLite)：在内存目录副本上做建索引前后的基准测试
+4. 可选应用：PostgreSQL CREATE INDEX CONCURRENTLY，Excel 写入 data_source.excel.indexes 配置
+"""
+
+import json
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("index_advisor")
+
+_RESERVED = {
+    "ALL", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CROSS", "DESC", "DISTINCT",
+    "ELSE", "END", "EXISTS", "FROM", "FULL", "GROUP", "HAVING", "IN", "INNER", "IS",
+    "JOIN", "LEFT", "LIKE", "LIMIT", "NOT", "NULL", "OFFSET", "ON", "OR", "ORDER",
+    "OUTER", "OVER", "RIGHT", "SELECT", "THEN", "TOP", "UNION", "USING", "WHEN",
+    "WHERE", "WINDOW", "WITH",
+}
+
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.I
+)
+_JOIN_PREDICATE = re.compile(r"\b([A-Za-z_]\w*)\.([A-Za-z_]\w*)\s*=\s*([A-Za-z_]\w*)\.([A-Za-z_]\w*)")
+_FILTER_PREDICATE = re.compile(
+    r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)\s*"
+    r"(=|<>|!=|>=|<=|>|<|\s(?:NOT\s+)?IN\b|\s(?:NOT\s+)?LIKE\b|\sBETWEEN\b)\s*(?=\?|\()",
+    re.I,
+)
+
+
+def _strip_identifier_quotes(sql: str) -> str:
+    return re.sub(r'"([^"]+)"|\[([^\]]+)\]', lambda m: m.group(1) or m.group(2), sql)
+
+
+def parse_query_columns(
+    sql: str, catalog: Optional[Dict[str, Set[str]]] = None
+) -> Dict[str, Dict[str, List[str]]]:
+    """解析归一化 SQL 中每张表的过滤列与连接列
+
+    Args:
+        sql: 归一化 SQL（字面量已替换为 ?）
+        catalog: 表名 -> 列名集合，用于解析未加表别名的列；None 时仅单表查询可解析
+
+    Returns:
+        {表名: {"eq": [...], "range": [...], "join": [...]}}
+    """
+    text = _strip_identifier_quotes(sql)
+    lowered_catalog = {
+        t.lower(): {c.lower(): c for c in cols} for t, cols in (catalog or {}).items()
+    }
+
+    aliases: Dict[str, str] = {}
+    tables: List[str] = []
+    for match in _TABLE_REF.finditer(text):
+        table = match.group(1).split(".")[-1]
+        if catalog is not None and table.lower() not in lowered_catalog:
+            continue  # CTE 或子查询别名
+        tables.append(table)
+        aliases[table.lower()] = table
+        alias = match.group(2)
+        if alias and alias.upper() not in _RESERVED:
+            aliases[alias.lower()] = table
+
+    result: Dict[str, Dict[str, List[str]]] = {}
+
+    def _resolve(qualifier: Optional[str], column: str) -> Optional[Tuple[str, str]]:
+        if column.upper() in _RESERVED:
+            return None
+        if qualifier:
+            table = aliases.get(qualifier.lower())
+            if table is None:
+                return None
+        else:
+            owners = [
+                t for t in dict.fromkeys(tables)
+                if column.lower() in lowered_catalog.get(t.lower(), {})
+            ] if catalog is not None else list(dict.fromkeys(tables))
+            if len(owners) != 1:
+                return None
+            table = owners[0]
+        columns = lowered_catalog.get(table.lower())
+        if columns is not None:
+            if column.lower() not in columns:
+                return None
+            column = columns[column.lower()]
+        return table, column
+
+    def _add(table: str, kind: str, column: str) -> None:
+        bucket = result.setdefault(table, {"eq": [], "range": [], "join": []})[kind]
+        if column not in bucket:
+            bucket.append(column)
+
+    for match in _JOIN_PREDICATE.finditer(text):
+        for qualifier, column in ((match.group(1), match.group(2)), (match.group(3), match.group(4))):
+            resolved = _resolve(qualifier, column)
+            if resolved:
+                _add(resolved[0], "join", resolved[1])
+
+    for match in _FILTER_PREDICATE.finditer(text):
+        resolved = _resolve(match.group(1), match.group(2))
+        if not resolved:
+            continue
+        operator = match.group(3).strip().upper()
+        kind = "eq" if operator in ("=", "IN") else "range"
+        _add(resolved[0], kind, resolved[1])
+
+    return result
+
+
+@dataclass
+class IndexCandidate:
+    """候选索引"""
+
+    table: str
+    columns: Tuple[str, ...]
+    queries: int = 0
+    weight_ms: float = 0.0
+    samples: List[str] = field(default_factory=list)
+    benefit: Optional[float] = None  # 估算的代价/耗时下降比例 (0-1)
+    method: str = ""
+
+    @property
+    def name(self) -> str:
+        raw = "idx_adv_" + "_".join([self.table, *self.columns]).lower()
+        return re.sub(r"\W", "_", raw)[:63]
+
+    def ddl(self, schema: Optional[str] = None, concurrently: bool = False) -> str:
+        """生成 CREATE INDEX 语句"""
+        columns = ", ".join(f'"{c}"' for c in self.columns)
+        target = f'"{schema}"."{self.table}"' if schema else f'"{self.table}"'
+        online = "CONCURRENTLY " if concurrently else ""
+        return f'CREATE INDEX {online}IF NOT EXISTS "{self.name}" ON {target} ({columns})'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "columns": list(self.columns),
+            "queries": self.queries,
+            "weight_ms": round(self.weight_ms, 1),
+            "benefit": None if self.benefit is None else round(self.benefit, 3),
+            "method": self.method,
+        }
+
+
+def load_workload(files: Iterable[Path]) -> List[Dict[str, Any]]:
+    """读取慢查询日志中的执行记录"""
+    entries = []
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("event") == "slow_query" and entry.get("sql"):
+                    entries.append(entry)
+    return entries
+
+
+def propose_indexes(
+    workload: List[Dict[str, Any]],
+    catalog: Optional[Dict[str, Set[str]]] = None,
+    existing: Optional[Dict[str, List[Tuple[str, ...]]]] = None,
+    max_columns: int = 3,
+    min_queries: int = 2,
+    max_samples: int = 5,
+) -> List[IndexCandidate]:
+    """根据查询负载生成候选索引
+
+    每条查询在每张表上的列按 等值过滤 > 连接 > 范围过滤 排序，等值列内部按全局频率排序；
+    已有索引的列前缀覆盖的候选会被跳过。
+
+    Args:
+        workload: load_workload 返回的执行记录
+        catalog: 表名 -> 列名集合
+        existing: 表名 -> 已有索引列组合
+        max_columns: 复合索引最多列数
+        min_queries: 至少被多少条执行命中才推荐
+        max_samples: 每个候选保留的样本 SQL 数
+
+    Returns:
+        按加权耗时降序的候选索引
+    """
+    parsed = []
+    frequency: Dict[Tuple[str, str], int] = defaultdict(int)
+    for entry in workload:
+        columns_by_table = parse_query_columns(entry["sql"], catalog)
+        parsed.append((entry, columns_by_table))
+        for table, kinds in columns_by_table.items():
+            for column in set(kinds["eq"] + kinds["join"] + kinds["range"]):
+                frequency[(table, column)] += 1
+
+    candidates: Dict[Tuple[str, Tuple[str, ...]], IndexCandidate] = {}
+    for entry, columns_by_table in parsed:
+        for table, kinds in columns_by_table.items():
+            ordered: List[str] = []
+            for group in ("eq", "join", "range"):
+                for column in sorted(kinds[group], key=lambda c: -frequency[(table, c)]):
+                    if column not in ordered:
+                        ordered.append(column)
+            key_columns = tuple(ordered[:max_columns])
+            if not key_columns:
+                continue
+            candidate = candidates.setdefault(
+                (table, key_columns), IndexCandidate(table=table, columns=key_columns)
+            )
+            candidate.queries += 1
+            candidate.weight_ms += float(entry.get("latency_ms", 0))
+            sample = entry.get("sample")
+            if sample and len(candidate.samples) < max_samples and sample not in candidate.samples:
+                candidate.samples.append(sample)
+
+    def _covered(candidate: IndexCandidate) -> bool:
+        for index_columns in (existing or {}).get(candidate.table, []):
+            lowered = tuple(c.lower() for c in index_columns)
+            if lowered[: len(candidate.columns)] == tuple(c.lower() for c in candidate.columns):
+                return True
+        return False
+
+    result = [
+        c for c in candidates.values() if c.queries >= min_queries and not _covered(c)
+    ]
+    result.sort(key=lambda c: c.weight_ms, reverse=True)
+    return result
+
+
+# ==================== PostgreSQL ====================
+
+
+def postgres_catalog(engine, schema: str = "public") -> Dict[str, Set[str]]:
+    """读取 PostgreSQL 表与列"""
+    from sqlalchemy import text
+
+    catalog: Dict[str, Set[str]] = defaultdict(set)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT table_name, column_name FROM information_schema.columns "
+                "WHERE table_schema = :schema"
+            ),
+            {"schema": schema},
+        )
+        for table, column in rows:
+            catalog[table].add(column)
+    return dict(catalog)
+
+
+def postgres_existing_indexes(engine, schema: str = "public") -> Dict[str, List[Tuple[str, ...]]]:
+    """读取 PostgreSQL 已有索引的列组合"""
+    from sqlalchemy import text
+
+    existing: Dict[str, List[Tuple[str, ...]]] = defaultdict(list)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                """
+                SELECT t.relname, array_agg(a.attname ORDER BY k.ord)
+                FROM pg_index i
+                JOIN pg_class t ON t.oid = i.indrelid
+                JOIN pg_namespace n ON n.oid = t.relnamespace
+                CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                WHERE n.nspname = :schema
+                GROUP BY t.relname, i.indexrelid
+                """
+            ),
+            {"schema": schema},
+        )
+        for table, columns in rows:
+            existing[table].append(tuple(columns))
+    return dict(existing)
+
+
+def _explain_cost(conn, sql: str) -> float:
+    from sqlalchemy import text
+
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql.strip().rstrip(';')}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def estimate_postgres_benefit(
+    engine, candidates: List[IndexCandidate], schema: str = "public"
+) -> None:
+    """用假设索引估算每个候选的代价下降比例（结果写回 candidate.benefit）
+
+    优先使用 HypoPG；扩展不可用时在事务内真实建索引、EXPLAIN 后回滚
+    （会短暂持有表锁，建议在本地副本上运行）。
+    """
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS hypopg"))
+            conn.commit()
+            use_hypopg = True
+        except Exception:
+            conn.rollback()
+            use_hypopg = False
+
+    for candidate in candidates:
+        if not candidate.samples:
+            continue
+        with engine.connect() as conn:
+            try:
+                before = sum(_explain_cost(conn, sql) for sql in candidate.samples)
+                ddl = candidate.ddl(schema=schema)  # 事务内不能 CONCURRENTLY
+                if use_hypopg:
+                    conn.execute(text("SELECT * FROM hypopg_create_index(:ddl)"), {"ddl": ddl})
+                else:
+                    conn.execute(text(ddl))
+                after = sum(_explain_cost(conn, sql) for sql in candidate.samples)
+                candidate.benefit = 1 - after / before if before > 0 else 0.0
+                candidate.method = "hypopg" if use_hypopg else "explain-rollback"
+            except Exception as e:
+                logger.warning(f"Benefit estimation failed for {candidate.name}: {e}")
+            finally:
+                if use_hypopg:
+                    try:
+                        conn.execute(text("SELECT hypopg_reset()"))
+                    except Exception:
+                        pass
+                conn.rollback()
+
+
+def apply_postgres_indexes(
+    engine, candidates: List[IndexCandidate], schema: str = "public"
+) -> List[str]:
+    """在线创建索引（CONCURRENTLY，不阻塞写入）"""
+    from sqlalchemy import text
+
+    applied = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for candidate in candidates:
+            ddl = candidate.ddl(schema=schema, concurrently=True)
+            conn.execute(text(ddl))
+            applied.append(ddl)
+        for table in {c.table for c in candidates}:
+            conn.execute(text(f'ANALYZE "{schema}"."{table}"'))
+    return applied
+
+
+# ==================== Excel (SQLite) ====================
+
+
+def sqlite_catalog(conn: sqlite3.Connection) -> Dict[str, Set[str]]:
+    """读取内存 SQLite 目录的表与列"""
+    catalog = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"):
+        catalog[table] = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    return catalog
+
+
+def sqlite_existing_indexes(conn: sqlite3.Connection) -> Dict[str, List[Tuple[str, ...]]]:
+    """读取内存 SQLite 目录已有索引"""
+    existing: Dict[str, List[Tuple[str, ...]]] = defaultdict(list)
+    for table in sqlite_catalog(conn):
+        for index in conn.execute(f'PRAGMA index_list("{table}")'):
+            columns = tuple(row[2] for row in conn.execute(f'PRAGMA index_info("{index[1]}")'))
+            existing[table].append(columns)
+    return dict(existing)
+
+
+def _time_queries(conn: sqlite3.Connection, samples: List[str], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for sql in samples:
+            conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def estimate_sqlite_benefit(
+    conn: sqlite3.Connection, candidates: List[IndexCandidate], repeats: int = 3
+) -> None:
+    """在内存目录副本上做建索引前后的基准测试（结果写回 candidate.benefit）"""
+    for candidate in candidates:
+        if not candidate.samples:
+            continue
+        try:
+            before = _time_queries(conn, candidate.samples, repeats)
+            conn.execute(candidate.ddl())
+            after = _time_queries(conn, candidate.samples, repeats)
+            conn.execute(f'DROP INDEX IF EXISTS "{candidate.name}"')
+            candidate.benefit = 1 - after / before if before > 0 else 0.0
+            candidate.method = "sqlite-benchmark"
+        except sqlite3.Error as e:
+            logger.warning(f"Benchmark failed for {candidate.name}: {e}")
@@ -16,6 +16,14 @@ try:
 except ImportError:
     PostgreSQLDataSource = None
 
+try:
+    from src.core.data_sources.async_postgres_source import (
+        AsyncPostgreSQLDataSource,
+        async_driver_available,
+    )
+except ImportError:
+    AsyncPostgreSQLDataSource = None
+
 try:
     from src.core.data_sources.sqlserver_source import SQLServerDataSource
 except ImportError:
@@ -50,7 +58,11 @@ class DataSourceManager:
         # 检查PostgreSQL
         if PostgreSQLDataSource:
             try:
-                pg_source = PostgreSQLDataSource()
+                # 安装了 asyncpg 时使用带异步连接池的子类（同步接口行为不变）
+                if AsyncPostgreSQLDataSource and async_driver_available():
+                    pg_source = AsyncPostgreSQLDataSource()
+                else:
+                    pg_source = PostgreSQLDataSource()
                 if pg_source.is_available():
                     strategies["postgresql"] = pg_source
             except Exception as e:
@@ -152,6 +164,41 @@ class DataSourceManager:
         """
         return self._current_strategy_name
     
+    def get_detected_strategy(self, strategy_name: str) -> Optional[Any]:
+        """
+        获取初始化时探测到的策略实例（Excel 需要文件路径，返回 None）
+
+        Args:
+            strategy_name: 策略名称
+
+        Returns:
+            策略实例
+        """
+        return self._available_strategies.get(strategy_name)
+
+    def route(self, table_names: Optional[List[str]] = None):
+        """
+        按观测耗时、错误率、表可用性与新鲜度为一次查询选择数据源（auto 模式）
+
+        配置了 data_source_priority 时只在其中列出的可用数据源之间选择。
+
+        Args:
+            table_names: 查询涉及的表名
+
+        Returns:
+            RoutingDecision
+        """
+        from src.core.data_sources.router import get_data_source_router
+
+        config = get_config()
+        priority = (config.data_source.data_source_priority or {}) if config else {}
+        candidates = {
+            name: strategy
+            for name, strategy in self._available_strategies.items()
+            if not priority or name in priority
+        }
+        return get_data_source_router().route(table_names, candidates)
+
     def list_available_strategies(self) -> List[str]:
         """
         列出所有可用的数据源策略
@@ -11,12 +11,28 @@ from typing import Any, Dict, List, Optional
 import pandas as pd
 from sqlalchemy import create_engine, text
 from .base import DataSourceStrategy
+from .cancellation import CancellationToken, abort_error, resolve_timeout
+from .cost_guard import PlanEstimate, parse_postgres_plan
+from .replicas import ReplicaPool, is_read_only
 from src.config.settings import get_config
 
+# PostgreSQL query_canceled (statement_timeout 与 pg_cancel_backend 共用)
+_QUERY_CANCELED_SQLSTATE = "57014"
+
+
+def _is_query_canceled(error: Exception) -> bool:
+    """判断驱动异常是否为语句被中止"""
+    orig = getattr(error, "orig", error)
+    # psycopg2 使用 pgcode，psycopg 3 使用 sqlstate
+    sqlstate = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return sqlstate == _QUERY_CANCELED_SQLSTATE
+
 
 class PostgreSQLDataSource(DataSourceStrategy):
     """PostgreSQL数据源策略实现"""
 
+    schema_info_scope = "table"  # 每张表一段，按换行拼接
+
     def __init__(
         self,
         host: str = "localhost",
@@ -59,41 +75,65 @@ class PostgreSQLDataSource(DataSourceStrategy):
         )
         self.schema = schema if schema != "public" else (pg_config.schema or "public")
         self.connection_params = connection_params or {}
+        self.connect_timeout = pg_config.connect_timeout
+        self.statement_timeout = pg_config.statement_timeout
+        self.replica_config = pg_config.replicas
 
         self._engine = None
         self._connection = None
+        self._replicas: Optional[ReplicaPool] = None
 
     def _get_connection_string(self) -> str:
         """构建PostgreSQL连接字符串"""
         base_url = f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
         return base_url
 
+    def _create_engine(self, connection_string: str):
+        """按连接字符串创建 engine（主库与只读副本共用连接级超时设置）"""
+        try:
+            from sqlalchemy import create_engine
+        except ImportError:
+            raise ImportError(
+                "sqlalchemy is required for PostgreSQL data source. "
+                "Install it with: pip install sqlalchemy psycopg2-binary"
+            )
+
+        # 连接级默认超时：覆盖 schema 探测等不经过 execute_query 的语句
+        connect_args: Dict[str, Any] = {}
+        if self.connect_timeout:
+            connect_args["connect_timeout"] = int(self.connect_timeout)
+        if self.statement_timeout:
+            connect_args["options"] = (
+                f"-c statement_timeout={int(self.statement_timeout * 1000)}"
+            )
+
+        return create_engine(connection_string, connect_args=connect_args)
+
     def _get_engine(self):
         """获取SQLAlchemy engine"""
         if self._engine is None:
-            try:
-                from sqlalchemy import create_engine
-
-                connection_string = self._get_connection_string()
+            connection_string = self._get_connection_string()
 
-                # 添加额外的连接参数
-                if self.connection_params:
-                    connection_string += "?"
-                    params = "&".join(
-                        [f"{k}={v}" for k, v in self.connection_params.items()]
-                    )
-                    connection_string += params
-
-                self._engine = create_engine(connection_string)
-
-            except ImportError:
-                raise ImportError(
-                    "sqlalchemy is required for PostgreSQL data source. "
-                    "Install it with: pip install sqlalchemy psycopg2-binary"
+            # 添加额外的连接参数
+            if self.connection_params:
+                connection_string += "?"
+                params = "&".join(
+                    [f"{k}={v}" for k, v in self.connection_params.items()]
                 )
+                connection_string += params
+
+            self._engine = self._create_engine(connection_string)
 
         return self._engine
 
+    def _get_replicas(self) -> Optional[ReplicaPool]:
+        """只读副本池；未配置副本时为 None"""
+        if self._replicas is None and self.replica_config.endpoints:
+            self._replicas = ReplicaPool.from_config(
+                self.replica_config, "postgresql", self._create_engine
+            )
+        return self._replicas
+
     def load_data(self, table_name: str, limit: Optional[int] = None) -> pd.DataFrame:
         """
         从PostgreSQL表加载数据到DataFrame
@@ -193,7 +233,11 @@ class PostgreSQLDataSource(DataSourceStrategy):
         return context
 
     def execute_query(
-        self, query: str, params: Optional[Dict[str, Any]] = None
+        self,
+        query: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
     ) -> pd.DataFrame:
         """
         执行SQL查询
@@ -201,28 +245,118 @@ class PostgreSQLDataSource(DataSourceStrategy):
         Args:
             query: SQL查询语句
             params: 查询参数
+            timeout: 语句超时（秒），默认使用 statement_timeout 配置
+            cancel_token: 请求级取消令牌，取消时通过 PQcancel 中止语句
 
         Returns:
             包含查询结果的DataFrame
         """
-        engine = self._get_engine()
+        # 只读语句优先分发到副本，连接失败时转移到其他副本或主库
+        replicas = self._get_replicas()
+        if replicas is not None and is_read_only(query):
+            return replicas.execute(
+                lambda engine: self._execute_on(engine, query, params, timeout, cancel_token),
+                primary=self._get_engine,
+            )
+        return self._execute_on(self._get_engine(), query, params, timeout, cancel_token)
+
+    def _execute_on(
+        self,
+        engine,
+        query: str,
+        params: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+        cancel_token: Optional[CancellationToken],
+    ) -> pd.DataFrame:
+        """在指定 engine（主库或副本）上执行一次查询"""
+        timeout = resolve_timeout(
+            self.statement_timeout if timeout is None else timeout, cancel_token
+        )
 
         try:
             from sqlalchemy import text
 
             with engine.connect() as conn:
-                result = conn.execute(text(query), params or {})
-                # Get column names
-                columns = [desc[0] for desc in result.cursor.description]
-                # Fetch rows
-                rows = result.fetchall()
+                # SET LOCAL 仅作用于当前事务，连接归还连接池时随回滚失效
+                if timeout:
+                    conn.execute(
+                        text(f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}")
+                    )
+
+                unregister = None
+                if cancel_token is not None:
+                    unregister = cancel_token.register(
+                        conn.connection.dbapi_connection.cancel
+                    )
+                try:
+                    result = conn.execute(text(query), params or {})
+                    # Get column names
+                    columns = [desc[0] for desc in result.cursor.description]
+                    # Fetch rows
+                    rows = result.fetchall()
+                finally:
+                    if unregister:
+                        unregister()
                 # Create DataFrame
                 df = pd.DataFrame(rows, columns=columns)
 
             return df
 
         except Exception as e:
-            raise Exception(f"Failed to execute query: {str(e)}\nQuery: {query}")
+            if _is_query_canceled(e):
+                raise abort_error(cancel_token, timeout, query) from e
+            raise Exception(f"Failed to execute query: {str(e)}\nQuery: {query}") from e
+
+    def data_version(self) -> Optional[str]:
+        """etl_data_version 中的当前版本号；版本表不存在时返回 None"""
+        from .data_version import get_data_version
+
+        version = get_data_version(self._get_engine())
+        return None if version is None else str(version)
+
+    def explain(self, query: str) -> PlanEstimate:
+        """
+        使用 EXPLAIN (FORMAT JSON) 估算查询代价（不执行查询）
+
+        Args:
+            query: SQL查询语句
+
+        Returns:
+            PlanEstimate 估算结果
+        """
+        engine = self._get_engine()
+        statement = query.strip().rstrip(";")
+
+        with engine.connect() as conn:
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+
+        return parse_postgres_plan(plan)
+
+    def explain_analyze(self, query: str) -> Any:
+        """
+        使用 EXPLAIN (ANALYZE, BUFFERS) 获取实际执行计划
+
+        注意：ANALYZE 会真正执行语句，事务在连接关闭时回滚。
+
+        Args:
+            query: SQL查询语句
+
+        Returns:
+            JSON 格式的执行计划
+        """
+        engine = self._get_engine()
+        statement = query.strip().rstrip(";")
+
+        with engine.connect() as conn:
+            if self.statement_timeout:
+                conn.execute(
+                    text(
+                        f"SET LOCAL statement_timeout = {int(self.statement_timeout * 1000)}"
+                    )
+                )
+            return conn.execute(
+                text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+            ).scalar()
 
     def get_schema_info(self, table_names: List[str]) -> str:
         """
@@ -358,12 +492,21 @@ class PostgreSQLDataSource(DataSourceStrategy):
         except Exception as e:
             raise Exception(f"Failed to get row count for table {table_name}: {str(e)}")
 
+    def get_replica_stats(self) -> Optional[Dict[str, Any]]:
+        """只读副本状态；未配置副本时返回 None"""
+        replicas = self._get_replicas()
+        return replicas.get_stats() if replicas is not None else None
+
     def close(self):
         """关闭数据库连接"""
         if self._connection:
             self._connection.close()
             self._connection = None
 
+        if self._replicas is not None:
+            self._replicas.close()
+            self._replicas = None
+
         if self._engine:
             self._engine.dispose()
             self._engine = None
@@ -0,0 +1,301 @@
+"""慢查询日志 - 记录超过阈值的 SQL 执行
+
+每条超过 threshold_ms 的执行写入一行 JSON（滚动文件），包括超时或出错的执行：
+- 归一化 SQL（字面量替换为 ?）与指纹，用于按查询形状聚合
+- 数据源、耗时、返回行数、结果字节数、trace_id，失败时的错误信息与是否超时
+- 原始 SQL 样本（可关闭），供索引顾问在 EXPLAIN / 基准测试中重放
+- PostgreSQL 按采样率在后台线程补充 EXPLAIN (ANALYZE, BUFFERS) 计划（失败的执行不抓取，避免再次运行超时语句）
+
+聚合排名见 scripts/slow_query_report.py。
+"""
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("slow_query_log")
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_LINE_COMMENT = re.compile(r"--[^\n]*")
+_BLOCK_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """将 SQL 归一化为查询形状
+
+    去掉注释、折叠空白、字面量替换为 ?，IN 列表折叠为 (?...)。
+
+    Args:
+        sql: 原始 SQL
+
+    Returns:
+        归一化后的 SQL
+    """
+    text = _BLOCK_COMMENT.sub(" ", sql)
+    text = _LINE_COMMENT.sub(" ", text)
+    text = _STRING_LITERAL.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _IN_LIST.sub("(?...)", text)
+    text = _WHITESPACE.sub(" ", text).strip().rstrip(";").strip()
+    return text
+
+
+def sql_fingerprint(sql: str) -> str:
+    """计算查询形状指纹（大小写不敏感）"""
+    return hashlib.sha1(normalize_sql(sql).lower().encode("utf-8")).hexdigest()[:16]
+
+
+class SlowQueryLog:
+    """滚动 JSONL 慢查询日志"""
+
+    def __init__(
+        self,
+        path: str = "logs/slow_queries.jsonl",
+        threshold_ms: float = 1000.0,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        explain_sample_rate: float = 0.1,
+        enabled: bool = True,
+        keep_sample: bool = True,
+    ):
+        self.path = Path(path)
+        self.threshold_ms = threshold_ms
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.explain_sample_rate = explain_sample_rate
+        self.enabled = enabled
+        self.keep_sample = keep_sample
+        self._writer: Optional[logging.Logger] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "SlowQueryLog":
+        """从 data_source.slow_query_log 配置创建"""
+        try:
+            from src.config.settings import get_config
+
+            log_config = get_config().data_source.slow_query_log
+        except Exception:
+            return cls(enabled=False)
+        return cls(
+            path=log_config.path,
+            threshold_ms=log_config.threshold_ms,
+            max_bytes=log_config.max_bytes,
+            backup_count=log_config.backup_count,
+            explain_sample_rate=log_config.explain_sample_rate,
+            enabled=log_config.enabled,
+            keep_sample=log_config.keep_sample,
+        )
+
+    def _get_writer(self) -> logging.Logger:
+        """延迟创建独立的滚动文件 logger（不向上传播到控制台）"""
+        with self._lock:
+            if self._writer is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                writer = logging.getLogger(f"slow_query_log.{self.path.resolve()}")
+                writer.setLevel(logging.INFO)
+                writer.propagate = False
+                if not writer.handlers:
+                    handler = RotatingFileHandler(
+                        self.path,
+                        maxBytes=self.max_bytes,
+                        backupCount=self.backup_count,
+                        encoding="utf-8",
+                    )
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    writer.addHandler(handler)
+                self._writer = writer
+            return self._writer
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._get_writer().info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def record(
+        self,
+        query: str,
+        source_type: str,
+        latency_ms: float,
+        rows: int = 0,
+        result_bytes: int = 0,
+        trace_id: Optional[str] = None,
+        strategy: Any = None,
+        error: Optional[str] = None,
+        timed_out: bool = False,
+    ) -> bool:
+        """记录一次执行，未超过阈值时忽略
+
+        Args:
+            query: 实际执行的 SQL
+            source_type: 数据源类型
+            latency_ms: 执行耗时（毫秒）
+            rows: 返回行数
+            result_bytes: 结果集内存字节数
+            trace_id: 请求 ID
+            strategy: 数据源策略，支持 explain_analyze 时按采样率抓取实际计划
+            error: 执行失败时的错误信息
+            timed_out: 是否因语句超时失败
+
+        Returns:
+            是否写入了慢查询日志
+        """
+        if not self.enabled or latency_ms < self.threshold_ms:
+            return False
+
+        entry = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "event": "slow_query",
+            "fingerprint": sql_fingerprint(query),
+            "sql": normalize_sql(query),
+            "sample": query[:4000] if self.keep_sample else None,
+            "source": source_type,
+            "latency_ms": round(latency_ms, 1),
+            "rows": rows,
+            "bytes": result_bytes,
+            "trace_id": trace_id,
+            "error": error[:1000] if error else None,
+            "timed_out": timed_out,
+        }
+        try:
+            self._write(entry)
+        except Exception as e:
+            logger.warning(f"Failed to write slow query log: {e}")
+            return False
+
+        if (
+            strategy is not None
+            and error is None
+            and hasattr(strategy, "explain_analyze")
+            and random.random() < self.explain_sample_rate
+        ):
+            # EXPLAIN ANALYZE 会再次执行语句，放到后台避免拖慢当前请求
+            threading.Thread(
+                target=self._capture_plan,
+                args=(strategy, query, entry),
+                daemon=True,
+            ).start()
+
+        return True
+
+    def _capture_plan(self, strategy: Any, query: str, entry: Dict[str, Any]) -> None:
+        """抓取 EXPLAIN (ANALYZE, BUFFERS) 计划并追加一条 plan 记录"""
+        try:
+            plan = strategy.explain_analyze(query)
+        except Exception as e:
+            logger.debug(f"Slow query plan capture failed: {e}")
+            return
+        try:
+            self._write(
+                {
+                    "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                    "event": "plan",
+                    "fingerprint": entry["fingerprint"],
+                    "trace_id": entry["trace_id"],
+                    "source": entry["source"],
+                    "plan": plan,
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Failed to write slow query plan: {e}")
+
+
+def iter_log_files(path: str) -> List[Path]:
+    """返回日志文件及其滚动备份（旧文件在前）"""
+    base = Path(path)
+    backups = sorted(
+        base.parent.glob(base.name + ".*"),
+        key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0,
+        reverse=True,
+    )
+    return [p for p in backups if p.suffix[1:].isdigit()] + (
+        [base] if base.exists() else []
+    )
+
+
+def summarize_slow_queries(files: Iterable[Path]) -> List[Dict[str, Any]]:
+    """按查询形状聚合慢查询日志
+
+    Args:
+        files: JSONL 日志文件
+
+    Returns:
+        每个指纹一条汇总（次数、总耗时、p50/p95/最大耗时、平均行数、失败与超时次数等），按总耗时降序
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                group = groups.setdefault(
+                    entry.get("fingerprint", ""),
+                    {"latencies": [], "rows": [], "bytes": [], "sources": set(), "plans": 0, "errors": 0, "timeouts": 0},
+                )
+                if entry.get("event") == "plan":
+                    group["plans"] += 1
+                    group["last_plan"] = entry.get("plan")
+                    continue
+                group["sql"] = entry.get("sql", "")
+                group["latencies"].append(float(entry.get("latency_ms", 0)))
+                group["rows"].append(int(entry.get("rows", 0)))
+                group["bytes"].append(int(entry.get("bytes", 0)))
+                group["sources"].add(entry.get("source", "unknown"))
+                group["errors"] += 1 if entry.get("error") else 0
+                group["timeouts"] += 1 if entry.get("timed_out") else 0
+                group["last_trace_id"] = entry.get("trace_id")
+
+    def _percentile(values: List[float], pct: float) -> float:
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, max(0, int(round(pct * (len(ordered) - 1)))))
+        return ordered[index]
+
+    summary = []
+    for fingerprint, group in groups.items():
+        latencies = group["latencies"]
+        if not latencies:
+            continue
+        summary.append(
+            {
+                "fingerprint": fingerprint,
+                "sql": group["sql"],
+                "count": len(latencies),
+                "total_ms": round(sum(latencies), 1),
+                "p50_ms": round(_percentile(latencies, 0.5), 1),
+                "p95_ms": round(_percentile(latencies, 0.95), 1),
+                "max_ms": round(max(latencies), 1),
+                "avg_rows": round(sum(group["rows"]) / len(group["rows"]), 1),
+                "avg_bytes": int(sum(group["bytes"]) / len(group["bytes"])),
+                "sources": sorted(group["sources"]),
+                "plans": group["plans"],
+                "errors": group["errors"],
+                "timeouts": group["timeouts"],
+                "last_trace_id": group.get("last_trace_id"),
+                "last_plan": group.get("last_plan"),
+            }
+        )
+    summary.sort(key=lambda item: item["total_ms"], reverse=True)
+    return summary
+
+
+_slow_query_log: Optional[SlowQueryLog] = None
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """获取慢查询日志单例"""
+    global _slow_query_log
+    if _slow_query_log is None:
+        _slow_query_log = SlowQueryLog.from_config()
+    return _slow_query_log
@@ -0,0 +1,316 @@
+"""只读副本路由 - PostgreSQL / SQL Server 的读流量分发到副本
+
+智能体只执行只读 SELECT，配置了副本（data_source.<type>.replicas）时：
+1. 候选副本：不在失败冷却期内，且复制延迟不超过 max_lag_seconds
+   （延迟按 lag_check_interval_seconds 周期探测，探测失败视为不可用）
+2. 选择：weighted 按权重随机；least_latency 选耗时 EWMA 最低的（无样本的副本优先试探）
+3. 故障转移：连接类错误（OperationalError/InterfaceError、连接失效）时副本进入冷却期，
+   依次尝试其余副本；全部失败或没有可用副本时回到主库（fallback_to_primary）
+SQL 错误与调用方取消/超时不触发转移，直接抛出。
+
+数据版本（etl_data_version）仍从主库读取；副本延迟受 max_lag_seconds 约束。
+"""
+
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config.logger_interface import get_logger
+from .cancellation import QueryCancelledError
+
+logger = get_logger("data_source_replicas")
+
+# 复制延迟探测语句（秒）；主库或无延迟时返回 0
+_LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+    "sqlserver": (
+        "SELECT ISNULL(MAX(secondary_lag_seconds), 0) FROM sys.dm_hadr_database_replica_states "
+        "WHERE is_local = 1 AND database_id = DB_ID()"
+    ),
+}
+
+_READ_ONLY = re.compile(r"^\s*(?:\(\s*)*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITE_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|CREATE|ALTER|DROP|TRUNCATE|GRANT|INTO)\b", re.IGNORECASE
+)
+
+
+def is_read_only(query: str) -> bool:
+    """只有 SELECT/WITH 且不含写入关键字的语句才会路由到副本"""
+    return bool(_READ_ONLY.match(query)) and not _WRITE_KEYWORDS.search(query)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """是否为连接/可用性类错误（可在其他副本或主库上重试）
+
+    数据源会把驱动异常包装成 Exception(...) from e，这里沿异常链查找。
+    """
+    try:
+        from sqlalchemy import exc
+    except ImportError:
+        return False
+
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, QueryCancelledError):
+            return False
+        if isinstance(current, exc.DBAPIError) and (
+            current.connection_invalidated
+            or isinstance(current, (exc.OperationalError, exc.InterfaceError))
+        ):
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+@dataclass
+class Replica:
+    """单个副本及其观测状态"""
+
+    name: str
+    dsn: str
+    weight: float = 1.0
+    engine: Any = None
+    latency_ms: Optional[float] = None  # 耗时 EWMA
+    lag_seconds: Optional[float] = None
+    lag_checked_at: float = 0.0
+    unhealthy_until: float = 0.0
+    samples: int = 0
+    errors: int = 0
+    last_error: Optional[str] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class ReplicaPool:
+    """一组只读副本 - 线程安全"""
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        engine_factory: Callable[[str], Any],
+        lag_probe: Optional[Callable[[Any], float]] = None,
+        strategy: str = "weighted",
+        max_lag_seconds: float = 30.0,
+        lag_check_interval_seconds: float = 10.0,
+        failure_cooldown_seconds: float = 30.0,
+        fallback_to_primary: bool = True,
+        latency_ewma_alpha: float = 0.2,
+    ):
+        """
+        Args:
+            replicas: 副本列表
+            engine_factory: DSN -> SQLAlchemy engine
+            lag_probe: engine -> 复制延迟（秒），None 表示不探测
+            strategy: weighted 或 least_latency
+            max_lag_seconds: 允许的最大复制延迟，0 表示不限制
+            lag_check_interval_seconds: 延迟探测间隔
+            failure_cooldown_seconds: 连接失败后的排除时长
+            fallback_to_primary: 没有可用副本时是否回到主库
+            latency_ewma_alpha: 耗时 EWMA 平滑系数
+        """
+        if strategy not in ("weighted", "least_latency"):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.replicas = replicas
+        self.engine_factory = engine_factory
+        self.lag_probe = lag_probe
+        self.strategy = strategy
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_interval_seconds = lag_check_interval_seconds
+        self.failure_cooldown_seconds = failure_cooldown_seconds
+        self.fallback_to_primary = fallback_to_primary
+        self.latency_ewma_alpha = latency_ewma_alpha
+        self._lock = threading.Lock()
+        self._metrics = {"replica": 0, "primary": 0, "failovers": 0}
+
+    @classmethod
+    def from_config(
+        cls, config: Any, dialect: str, engine_factory: Callable[[str], Any]
+    ) -> Optional["ReplicaPool"]:
+        """按 ReplicaSetConfig 创建；未配置副本时返回 None
+
+        Args:
+            config: ReplicaSetConfig
+            dialect: postgresql 或 sqlserver（决定延迟探测语句）
+            engine_factory: DSN -> SQLAlchemy engine
+        """
+        if config is None or not config.endpoints:
+            return None
+        replicas = [
+            Replica(name=r.name or f"replica{i}", dsn=r.dsn, weight=r.weight)
+            for i, r in enumerate(config.endpoints, start=1)
+        ]
+        return cls(
+            replicas,
+            engine_factory=engine_factory,
+            lag_probe=make_lag_probe(dialect),
+            strategy=config.strategy,
+            max_lag_seconds=config.max_lag_seconds,
+            lag_check_interval_seconds=config.lag_check_interval_seconds,
+            failure_cooldown_seconds=config.failure_cooldown_seconds,
+            fallback_to_primary=config.fallback_to_primary,
+        )
+
+    # ==================== 选择 ====================
+
+    def _engine(self, replica: Replica) -> Any:
+        with replica.lock:
+            if replica.engine is None:
+                replica.engine = self.engine_factory(replica.dsn)
+            return replica.engine
+
+    def _check_lag(self, replica: Replica, now: float) -> None:
+        """到期时探测复制延迟；探测失败时进入冷却期"""
+        if self.lag_probe is None or not self.max_lag_seconds:
+            return
+        if now - replica.lag_checked_at < self.lag_check_interval_seconds:
+            return
+        replica.lag_checked_at = now
+        try:
+            replica.lag_seconds = float(self.lag_probe(self._engine(replica)))
+        except Exception as e:
+            self._mark_failed(replica, f"lag probe failed: {e}")
+
+    def _healthy(self, replica: Replica, now: float) -> bool:
+        if replica.unhealthy_until > now:
+            return False
+        if self.max_lag_seconds and replica.lag_seconds is not None:
+            return replica.lag_seconds <= self.max_lag_seconds
+        return True
+
+    def candidates(self) -> List[Replica]:
+        """本次查询依次尝试的副本（首选在前）"""
+        now = time.monotonic()
+        for replica in self.replicas:
+            if replica.unhealthy_until <= now:
+                self._check_lag(replica, now)
+        healthy = [r for r in self.replicas if self._healthy(r, now)]
+        if not healthy:
+            return []
+
+        if self.strategy == "least_latency":
+            # 无样本的副本视为 0 耗时，保证每个副本都会被试探
+            return sorted(healthy, key=lambda r: r.latency_ms or 0.0)
+
+        ordered: List[Replica] = []
+        remaining = list(healthy)
+        while remaining:
+            weights = [max(r.weight, 0.0) for r in remaining]
+            if not any(weights):
+                ordered.extend(remaining)
+                break
+            choice = random.choices(remaining, weights=weights)[0]
+            ordered.append(choice)
+            remaining.remove(choice)
+        return ordered
+
+    # ==================== 统计 ====================
+
+    def _mark_failed(self, replica: Replica, error: str) -> None:
+        error = error.splitlines()[0] if error else error
+        with self._lock:
+            replica.errors += 1
+            replica.last_error = error
+            replica.unhealthy_until = time.monotonic() + self.failure_cooldown_seconds
+        logger.warning(f"Replica {replica.name} excluded for {self.failure_cooldown_seconds}s: {error}")
+
+    def _record_success(self, replica: Replica, latency_ms: float) -> None:
+        alpha = self.latency_ewma_alpha
+        with self._lock:
+            replica.samples += 1
+            replica.latency_ms = (
+                latency_ms
+                if replica.latency_ms is None
+                else (1 - alpha) * replica.latency_ms + alpha * latency_ms
+            )
+            self._metrics["replica"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各副本状态与路由计数"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                **self._metrics,
+                "replicas": {
+                    r.name: {
+                        "weight": r.weight,
+                        "latency_ms": r.latency_ms,
+                        "lag_seconds": r.lag_seconds,
+                        "healthy": self._healthy(r, now),
+                        "samples": r.samples,
+                        "errors": r.errors,
+                        "last_error": r.last_error,
+                    }
+                    for r in self.replicas
+                },
+            }
+
+    # ==================== 执行 ====================
+
+    def execute(self, run: Callable[[Any], Any], primary: Callable[[], Any]) -> Any:
+        """在副本上执行，连接类错误时转移到下一个副本或主库
+
+        Args:
+            run: engine -> 结果（数据源的单次执行逻辑）
+            primary: 返回主库 engine
+
+        Returns:
+            run 的结果
+
+        Raises:
+            run 抛出的非连接类异常；没有可用副本且不允许回到主库时抛出最后一次连接错误
+        """
+        last_error: Optional[BaseException] = None
+        for replica in self.candidates():
+            started = time.perf_counter()
+            try:
+                result = run(self._engine(replica))
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                last_error = e
+                self._mark_failed(replica, str(e))
+                with self._lock:
+                    self._metrics["failovers"] += 1
+                continue
+            self._record_success(replica, (time.perf_counter() - started) * 1000)
+            return result
+
+        if not self.fallback_to_primary and last_error is not None:
+            raise last_error
+        if not self.fallback_to_primary and self.replicas:
+            raise RuntimeError("No healthy read replica available and fallback_to_primary is disabled")
+        with self._lock:
+            self._metrics["primary"] += 1
+        return run(primary())
+
+    def close(self) -> None:
+        """释放副本连接池"""
+        for replica in self.replicas:
+            with replica.lock:
+                if replica.engine is not None:
+                    replica.engine.dispose()
+                    replica.engine = None
+
+
+def make_lag_probe(dialect: str) -> Optional[Callable[[Any], float]]:
+    """按方言返回复制延迟探测函数"""
+    statement = _LAG_QUERIES.get(dialect)
+    if statement is None:
+        return None
+
+    def probe(engine: Any) -> float:
+        from sqlalchemy import text
+
+        with engine.connect() as conn:
+            return float(conn.execute(text(statement)).scalar() or 0)
+
+    return probe
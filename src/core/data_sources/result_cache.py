@@ -0,0 +1,392 @@
+"""查询结果缓存 - 内存 LRU + 可选磁盘列式存储（Parquet）
+
+位于 executor.run_query 之前：重试循环（review → generate_sql → validate → execute）
+与重复提问生成的相同或仅空白/大小写不同的 SQL 直接返回缓存结果。
+
+缓存键 = 规范化 SQL + 数据源标识 + 数据版本：
+- 规范化：去注释、折叠空白、字符串/引号标识符之外统一小写
+- 数据源标识：类型、文件/工作表或主机/库/schema
+- 数据版本：DataSourceStrategy.data_version()（Excel 文件版本、etl_data_version 版本号），
+  数据变化后旧条目自然失效
+- 无法获取数据版本的数据源（SQL Server 等）写入后旧结果无法失效：默认不缓存（unversioned_ttl_seconds = 0），
+  大于 0 时只在内存层保存该时长；缓存键照常计算，执行器的 single-flight 合并仍可使用
+
+两个层级都有字节上限与 TTL；磁盘层命中后提升到内存层。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("result_cache")
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\]")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SPACE_AROUND = re.compile(r"\s*([(),=<>])\s*")
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.I)
+_UNVERSIONED = "u-"  # 无数据版本的数据源的缓存键前缀
+_IDENTITY_KEYS = ("source_type", "file_path", "sheet_name", "host", "port", "database", "schema")
+
+
+def canonicalize_sql(sql: str) -> str:
+    """规范化 SQL 文本（保留字面量与引号标识符原样）
+
+    Args:
+        sql: 原始 SQL
+
+    Returns:
+        规范化后的 SQL
+    """
+    parts = []
+    last = 0
+    for match in _LITERAL.finditer(sql):
+        parts.append(_canonical_code(sql[last:match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(_canonical_code(sql[last:]))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _canonical_code(text: str) -> str:
+    text = _COMMENT.sub(" ", text)
+    text = re.sub(r"\s+", " ", text)
+    text = _SPACE_AROUND.sub(r"\1", text)
+    return text.lower()
+
+
+def source_identity(metadata: Dict[str, Any]) -> str:
+    """从数据源元数据中提取稳定的标识（联邦数据源递归合并远程/本地）"""
+    identity = {k: metadata.get(k) for k in _IDENTITY_KEYS if metadata.get(k) is not None}
+    for nested in ("remote", "local"):
+        if isinstance(metadata.get(nested), dict):
+            identity[nested] = source_identity(metadata[nested])
+    return json.dumps(identity, sort_keys=True, default=str)
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class _MemoryTier:
+    """按字节数约束的 LRU"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[pd.DataFrame, int, float, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        df, size, stored_at, ttl = entry
+        if ttl and time.monotonic() - stored_at > ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame, size: int, ttl: Optional[float] = None) -> None:
+        """写入条目；ttl 为 None 时使用层级的 TTL"""
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (df, size, time.monotonic(), self.ttl_seconds if ttl is None else ttl)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _DiskTier:
+    """Parquet 文件目录，按访问时间淘汰"""
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "Disk result cache requires pyarrow. Install with: pip install pyarrow"
+            )
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.parquet"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        file = self._file(key)
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            return None
+        if self.ttl_seconds and time.time() - stat.st_mtime > self.ttl_seconds:
+            file.unlink(missing_ok=True)
+            return None
+        try:
+            df = pd.read_parquet(file)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache file {file.name}: {e}")
+            file.unlink(missing_ok=True)
+            return None
+        # 访问时间用于 LRU 淘汰，修改时间保留为写入时间（TTL）
+        os.utime(file, (time.time(), stat.st_mtime))
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> bool:
+        file = self._file(key)
+        tmp = file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, file)
+        except Exception as e:
+            # 列名重复、混合类型对象列等无法写入 Parquet 的结果只缓存在内存
+            tmp.unlink(missing_ok=True)
+            logger.debug(f"Result not cached on disk: {e}")
+            return False
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        files = []
+        for file in self.path.glob("*.parquet"):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, stat.st_size, file))
+        total = sum(size for _, size, _ in files)
+        for _, size, file in sorted(files, key=lambda f: f[0]):
+            if total <= self.max_bytes:
+                break
+            file.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.path.glob("*.parquet") if f.exists())
+
+    def clear(self) -> None:
+        for file in self.path.glob("*.parquet"):
+            file.unlink(missing_ok=True)
+
+
+class ResultCache:
+    """查询结果缓存 - 线程安全"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        max_entry_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 900.0,
+        disk_enabled: bool = False,
+        disk_path: str = ".cache/query_results",
+        max_disk_bytes: int = 2 * 1024 * 1024 * 1024,
+        disk_ttl_seconds: float = 86400.0,
+        data_version_ttl_seconds: float = 5.0,
+        unversioned_ttl_seconds: float = 0.0,
+    ):
+        """
+        Args:
+            enabled: 是否启用
+            max_memory_bytes: 内存层字节上限
+            max_entry_bytes: 单个结果的字节上限，超过时不缓存
+            ttl_seconds: 内存层条目存活时间，0 表示不过期
+            disk_enabled: 是否启用磁盘层（需要 pyarrow）
+            disk_path: 磁盘层目录
+            max_disk_bytes: 磁盘层字节上限
+            disk_ttl_seconds: 磁盘层条目存活时间，0 表示不过期
+            data_version_ttl_seconds: 数据版本查询结果的复用时间
+            unversioned_ttl_seconds: 无数据版本的数据源的结果在内存层的存活时间，0 表示不缓存
+        """
+        self.enabled = enabled
+        self.max_entry_bytes = max_entry_bytes
+        self.data_version_ttl_seconds = data_version_ttl_seconds
+        self.unversioned_ttl_seconds = unversioned_ttl_seconds
+        self._memory = _MemoryTier(max_memory_bytes, ttl_seconds)
+        self._disk: Optional[_DiskTier] = None
+        if enabled and disk_enabled:
+            try:
+                self._disk = _DiskTier(disk_path, max_disk_bytes, disk_ttl_seconds)
+            except ImportError as e:
+                logger.warning(f"{e}; disk tier disabled")
+        self._versions: Dict[str, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "skipped": 0, "unversioned": 0,
+        }
+
+    @classmethod
+    def from_config(cls) -> "ResultCache":
+        """按 data_source.result_cache 配置创建"""
+        try:
+            from src.config.settings import get_config
+
+            config = get_config().data_source.result_cache
+            return cls(
+                enabled=config.enabled,
+                max_memory_bytes=int(config.max_memory_mb * 1024 * 1024),
+                max_entry_bytes=int(config.max_entry_mb * 1024 * 1024),
+                ttl_seconds=config.ttl_seconds,
+                disk_enabled=config.disk_enabled,
+                disk_path=config.disk_path,
+                max_disk_bytes=int(config.max_disk_mb * 1024 * 1024),
+                disk_ttl_seconds=config.disk_ttl_seconds,
+                data_version_ttl_seconds=config.data_version_ttl_seconds,
+                unversioned_ttl_seconds=config.unversioned_ttl_seconds,
+            )
+        except Exception as e:
+            logger.warning(f"无法读取结果缓存配置，使用默认值: {e}")
+            return cls()
+
+    def _data_version(self, identity: str, strategy: Any) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(identity)
+        if cached is not None and now - cached[1] < self.data_version_ttl_seconds:
+            return cached[0]
+        version = strategy.data_version()
+        with self._lock:
+            self._versions[identity] = (version, now)
+        return version
+
+    def make_key(self, strategy: Any, query: str) -> Optional[str]:
+        """计算缓存键；不可缓存（非只读语句、获取数据版本失败）时返回 None
+
+        缓存关闭时同样计算（执行器的 single-flight 合并复用该键）。
+
+        Args:
+            strategy: 数据源策略
+            query: SQL 查询语句
+
+        Returns:
+            缓存键
+        """
+        if not _READ_ONLY.match(query):
+            return None
+        try:
+            identity = source_identity(strategy.get_metadata())
+            version = self._data_version(identity, strategy)
+        except Exception as e:
+            logger.debug(f"Result cache bypassed: {e}")
+            return None
+        raw = json.dumps([canonicalize_sql(query), identity, version])
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return _UNVERSIONED + digest if version is None else digest
+
+    def _cacheable(self, key: str) -> bool:
+        """无数据版本的数据源只在 unversioned_ttl_seconds > 0 时缓存"""
+        return self.enabled and (self.unversioned_ttl_seconds > 0 or not key.startswith(_UNVERSIONED))
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """读取缓存结果（返回副本）"""
+        if not self._cacheable(key):
+            return None
+        with self._lock:
+            df = self._memory.get(key)
+            if df is not None:
+                self._metrics["memory_hits"] += 1
+                return df.copy()
+
+        unversioned = key.startswith(_UNVERSIONED)
+        df = self._disk.get(key) if self._disk is not None and not unversioned else None
+        with self._lock:
+            if df is None:
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["disk_hits"] += 1
+            self._memory.put(key, df, _frame_bytes(df))
+        return df.copy()
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """写入查询结果（超过单条上限、无数据版本且未设置 unversioned_ttl_seconds 时跳过）"""
+        if not self.enabled:
+            return
+        unversioned = key.startswith(_UNVERSIONED)
+        if not self._cacheable(key):
+            with self._lock:
+                self._metrics["unversioned"] += 1
+            return
+        size = _frame_bytes(df)
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self._metrics["skipped"] += 1
+            return
+        stored = df.copy()
+        ttl = None
+        if unversioned:
+            ttl = min(self._memory.ttl_seconds or self.unversioned_ttl_seconds, self.unversioned_ttl_seconds)
+        with self._lock:
+            self._memory.put(key, stored, size, ttl)
+            self._metrics["stores"] += 1
+        if self._disk is not None and not unversioned:
+            self._disk.put(key, stored)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率、条目数与字节数"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory.bytes
+            stats["evictions"] = self._memory.evictions
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        if self._disk is not None:
+            stats["disk_bytes"] = self._disk.size_bytes()
+            stats["evictions"] += self._disk.evictions
+        return stats
+
+    def clear(self) -> None:
+        """清空两个层级与数据版本缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._versions.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """获取结果缓存单例"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache.from_config()
+    return _cache
+
+
+def reset_result_cache() -> None:
+    """重置结果缓存单例（重新读取配置）"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,190 @@
+"""分摊预聚合表 - alloc_cost_rollup
+
+几乎所有分摊问题都执行同一形状的计算（generate_allocation_sql 中的 monthly_alloc CTE）：
+CostDataBase LEFT JOIN Rate ON year/scenario/key/month，amount * rate_no 后汇总。
+本模块把该结果按 (year, scenario, function, key, month, bl, cc) 预先聚合到 alloc_cost_rollup，
+并按 (year, scenario, month) 分区增量刷新（先删后插，单事务）。
+
+PostgreSQL 物化视图只能整体 REFRESH，因此使用普通表实现增量刷新。
+"""
+
+from typing import Any, Iterable, List, Optional, Tuple
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("rollups")
+
+ROLLUP_TABLE = "alloc_cost_rollup"
+ROLLUP_DIMENSIONS = ("year", "scenario", "function", "key", "month", "bl", "cc")
+
+Partition = Tuple[str, str, str]  # (year, scenario, month)
+
+
+class AllocationRollup:
+    """分摊预聚合表的建表与刷新"""
+
+    def __init__(
+        self,
+        engine: Any,
+        dialect: str = "postgresql",
+        cost_table: str = "cost_database",
+        rate_table: str = "rate_table",
+        rollup_table: str = ROLLUP_TABLE,
+    ):
+        """
+        Args:
+            engine: SQLAlchemy engine
+            dialect: postgresql 或 sqlserver
+            cost_table: 成本表名
+            rate_table: 费率表名
+            rollup_table: 预聚合表名
+        """
+        self.engine = engine
+        self.dialect = dialect
+        self.cost_table = cost_table
+        self.rate_table = rate_table
+        self.rollup_table = rollup_table
+
+    def _q(self, name: str) -> str:
+        """按方言引用标识符（function/key 在 SQL Server 中为保留字）"""
+        return f"[{name}]" if self.dialect == "sqlserver" else f'"{name}"'
+
+    def create_table_sql(self) -> List[str]:
+        """返回建表与索引语句"""
+        q = self._q
+        text_type = "NVARCHAR(200)" if self.dialect == "sqlserver" else "VARCHAR(200)"
+        ts_type = "DATETIME2" if self.dialect == "sqlserver" else "TIMESTAMP"
+        columns = ",\n    ".join(f"{q(d)} {text_type}" for d in ROLLUP_DIMENSIONS)
+        table = q(self.rollup_table)
+        create = f"""CREATE TABLE {table} (
+    {columns},
+    {q("cost_amount")} FLOAT,
+    {q("allocated_amount")} FLOAT,
+    {q("source_rows")} INTEGER,
+    {q("refreshed_at")} {ts_type} DEFAULT CURRENT_TIMESTAMP
+)"""
+        indexes = [
+            (f"idx_{self.rollup_table}_partition", ("year", "scenario", "month")),
+            (f"idx_{self.rollup_table}_function", ("year", "scenario", "function")),
+        ]
+        if self.dialect == "sqlserver":
+            statements = [
+                f"IF OBJECT_ID(N'{self.rollup_table}', N'U') IS NULL {create}"
+            ]
+            for name, cols in indexes:
+                statements.append(
+                    f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'{name}') "
+                    f"CREATE INDEX {q(name)} ON {table} ({', '.join(q(c) for c in cols)})"
+                )
+            return statements
+
+        statements = [create.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1)]
+        for name, cols in indexes:
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {q(name)} ON {table} ({', '.join(q(c) for c in cols)})"
+            )
+        return statements
+
+    def _insert_sql(self, partitioned: bool) -> str:
+        q = self._q
+        dims = ", ".join(q(d) for d in ROLLUP_DIMENSIONS)
+        select_dims = ", ".join(
+            f"r.{q(d)}" if d in ("bl", "cc") else f"c.{q(d)}" for d in ROLLUP_DIMENSIONS
+        )
+        where = (
+            f"WHERE c.{q('year')} = :year AND c.{q('scenario')} = :scenario "
+            f"AND c.{q('month')} = :month"
+            if partitioned
+            else ""
+        )
+        return f"""INSERT INTO {q(self.rollup_table)} ({dims}, {q("cost_amount")}, {q("allocated_amount")}, {q("source_rows")}, {q("refreshed_at")})
+SELECT {select_dims},
+       SUM(CAST(c.{q("amount")} AS FLOAT)),
+       SUM(CAST(c.{q("amount")} AS FLOAT) * COALESCE(r.{q("rate_no")}, 0)),
+       COUNT(*),
+       CURRENT_TIMESTAMP
+FROM {q(self.cost_table)} c
+LEFT JOIN {q(self.rate_table)} r
+    ON c.{q("year")} = r.{q("year")}
+    AND c.{q("scenario")} = r.{q("scenario")}
+    AND c.{q("key")} = r.{q("key")}
+    AND c.{q("month")} = r.{q("month")}
+{where}
+GROUP BY {select_dims}"""
+
+    def ensure_table(self) -> None:
+        """创建预聚合表（已存在时跳过）"""
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            for statement in self.create_table_sql():
+                conn.execute(text(statement))
+
+    def refresh(self, partitions: Optional[Iterable[Partition]] = None) -> int:
+        """刷新预聚合表
+
+        Args:
+            partitions: 需要刷新的 (year, scenario, month) 分区；None 表示全量重建
+
+        Returns:
+            写入的预聚合行数
+        """
+        from sqlalchemy import text
+
+        self.ensure_table()
+        q = self._q
+        written = 0
+        with self.engine.begin() as conn:
+            if partitions is None:
+                conn.execute(text(f"DELETE FROM {q(self.rollup_table)}"))
+                written = conn.execute(text(self._insert_sql(partitioned=False))).rowcount
+            else:
+                delete = text(
+                    f"DELETE FROM {q(self.rollup_table)} WHERE {q('year')} = :year "
+                    f"AND {q('scenario')} = :scenario AND {q('month')} = :month"
+                )
+                insert = text(self._insert_sql(partitioned=True))
+                for year, scenario, month in sorted(set(partitions)):
+                    params = {"year": year, "scenario": scenario, "month": month}
+                    conn.execute(delete, params)
+                    written += conn.execute(insert, params).rowcount
+        logger.info(
+            f"Refreshed {self.rollup_table}: {written} rows "
+            f"({'full rebuild' if partitions is None else 'incremental'})"
+        )
+        return written
+
+    def missing_partitions(self) -> List[Partition]:
+        """源数据中存在但预聚合表中尚未刷新的分区（如新导入的月份）"""
+        from sqlalchemy import text
+
+        self.ensure_table()
+        q = self._q
+        partition_cols = f"{q('year')}, {q('scenario')}, {q('month')}"
+        sql = (
+            f"SELECT DISTINCT {partition_cols} FROM {q(self.cost_table)} "
+            f"EXCEPT SELECT DISTINCT {partition_cols} FROM {q(self.rollup_table)}"
+        )
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(text(sql))]
+
+    def refresh_missing(self) -> int:
+        """只刷新缺失的分区"""
+        partitions = self.missing_partitions()
+        if not partitions:
+            return 0
+        return self.refresh(partitions)
+
+
+def rollup_sql_rules(dialect: str = "postgresql", rollup_table: str = ROLLUP_TABLE) -> str:
+    """引导 LLM 在粒度允许时查询预聚合表的 SQL 生成规则"""
+    q = (lambda n: f"[{n}]") if dialect == "sqlserver" else (lambda n: n)
+    return f"""
+### 分摊预聚合表 {rollup_table}（优先使用）
+- 已按 (year, scenario, function, {q("key")}, month, bl, cc) 预先计算 CostDataBase 与 Rate 的分摊结果
+- 字段: year, scenario, {q("function")}, {q("key")}, month, bl, cc, cost_amount, allocated_amount, source_rows
+- allocated_amount = SUM(amount * rate_no)（与 monthly_alloc 相同的 LEFT JOIN 口径），cost_amount = 同口径下的 SUM(amount)
+- 问题只涉及上述维度的汇总（按年/场景/Function/月份/BL/CC 的分摊金额、趋势、对比）时，
+  直接对 {rollup_table} 做 SUM/GROUP BY，不要再 JOIN 成本表与费率表
+- 需要 cost_text、account、category 等明细字段，或需要费率本身时，才使用原始表
+"""
@@ -0,0 +1,351 @@
+"""数据源自动路由 - 按观测到的耗时、错误率、表可用性与新鲜度选择数据源
+
+data_source.type 为 auto 时，load_context 节点在识别出涉及的表之后调用路由器：
+1. 候选数据源：管理器探测到的可用数据源（配置了 data_source_priority 时仅限其中列出的）
+2. 过滤：缺少任一所需表的数据源不参与；快照数据（Excel 文件、导入到 PostgreSQL 的数据）
+   超过 max_staleness_seconds 且存在更新鲜的候选时不参与
+3. 排序：期望耗时 = 耗时 EWMA（无样本时为 cold_start_latency_ms）× (1 + error_penalty × 错误率)，
+   相同时按 data_source_priority 决定
+路由结果写入 AgentState.routing_decision，并随 trace_id 记录日志。
+
+统计由 executor.run_query 在每次执行后写入，进程内共享。
+"""
+
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("data_source_router")
+
+
+@dataclass
+class SourceStats:
+    """单个数据源的观测统计"""
+
+    latency_ms: Optional[float] = None  # 耗时 EWMA
+    error_rate: float = 0.0  # 失败率 EWMA
+    samples: int = 0
+    errors: int = 0
+    last_error: Optional[str] = None
+    # 表清单缓存：小写表名集合、每张表的最近刷新时间（epoch 秒，None 表示实时数据）
+    tables: Optional[Set[str]] = None
+    refreshed_at: Dict[str, Optional[float]] = field(default_factory=dict)
+    tables_checked_at: float = 0.0
+
+
+@dataclass
+class RoutingDecision:
+    """一次路由决策（可序列化，写入 AgentState）"""
+
+    source: str
+    table_names: List[str]
+    reason: str
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _clean_table_name(name: str) -> str:
+    """与 ExcelDataSource 目录一致的表名清洗规则"""
+    clean = name.replace(" ", "_").replace("-", "_")
+    if clean and clean[0].isdigit():
+        clean = f"df_{clean}"
+    return clean
+
+
+class DataSourceRouter:
+    """数据源路由器 - 线程安全，进程内单例"""
+
+    def __init__(
+        self,
+        priority: Optional[Dict[str, int]] = None,
+        table_aliases: Optional[Dict[str, str]] = None,
+        latency_ewma_alpha: float = 0.2,
+        error_penalty: float = 4.0,
+        cold_start_latency_ms: float = 200.0,
+        max_staleness_seconds: float = 86400.0,
+        table_cache_ttl_seconds: float = 300.0,
+    ):
+        """
+        Args:
+            priority: data_source_priority（数值越小越优先，同时限定候选范围）
+            table_aliases: data_source.table_names（逻辑表名 -> 物理表名）
+            latency_ewma_alpha: 耗时/错误率 EWMA 的平滑系数
+            error_penalty: 错误率对期望耗时的放大系数
+            cold_start_latency_ms: 没有样本时假定的耗时
+            max_staleness_seconds: 快照数据允许的最大年龄，0 表示不限制
+            table_cache_ttl_seconds: 表清单与新鲜度缓存时间
+        """
+        self.priority = dict(priority or {})
+        self.table_aliases = dict(table_aliases or {})
+        self.latency_ewma_alpha = latency_ewma_alpha
+        self.error_penalty = error_penalty
+        self.cold_start_latency_ms = cold_start_latency_ms
+        self.max_staleness_seconds = max_staleness_seconds
+        self.table_cache_ttl_seconds = table_cache_ttl_seconds
+        self._stats: Dict[str, SourceStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "DataSourceRouter":
+        """按 data_source.router 配置创建"""
+        try:
+            from src.config.settings import get_config
+
+            data_source = get_config().data_source
+            router = data_source.router
+            return cls(
+                priority=data_source.data_source_priority,
+                table_aliases=data_source.table_names,
+                latency_ewma_alpha=router.latency_ewma_alpha,
+                error_penalty=router.error_penalty,
+                cold_start_latency_ms=router.cold_start_latency_ms,
+                max_staleness_seconds=router.max_staleness_seconds,
+                table_cache_ttl_seconds=router.table_cache_ttl_seconds,
+            )
+        except Exception as e:
+            logger.warning(f"无法读取路由配置，使用默认值: {e}")
+            return cls()
+
+    # ==================== 统计 ====================
+
+    def record(
+        self, source: str, latency_ms: float, ok: bool = True, error: Optional[str] = None
+    ) -> None:
+        """记录一次执行结果
+
+        Args:
+            source: 数据源类型
+            latency_ms: 执行耗时（毫秒）
+            ok: 是否成功
+            error: 失败原因
+        """
+        alpha = self.latency_ewma_alpha
+        with self._lock:
+            stats = self._stats.setdefault(source, SourceStats())
+            stats.samples += 1
+            stats.error_rate = (1 - alpha) * stats.error_rate + alpha * (0.0 if ok else 1.0)
+            if ok:
+                stats.latency_ms = (
+                    latency_ms
+                    if stats.latency_ms is None
+                    else (1 - alpha) * stats.latency_ms + alpha * latency_ms
+                )
+            else:
+                stats.errors += 1
+                stats.last_error = error
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各数据源统计快照（不含表清单）"""
+        with self._lock:
+            return {
+                source: {
+                    "latency_ms": stats.latency_ms,
+                    "error_rate": stats.error_rate,
+                    "samples": stats.samples,
+                    "errors": stats.errors,
+                    "last_error": stats.last_error,
+                }
+                for source, stats in self._stats.items()
+            }
+
+    def invalidate_tables(self, source: Optional[str] = None) -> None:
+        """使表清单缓存失效（导入或切换文件后调用）"""
+        with self._lock:
+            for name, stats in self._stats.items():
+                if source is None or name == source:
+                    stats.tables = None
+
+    # ==================== 表清单与新鲜度 ====================
+
+    def _inventory(self, source: str, strategy: Any) -> Tuple[Set[str], Dict[str, Optional[float]]]:
+        """数据源中的表（小写）与每张表的刷新时间，按 TTL 缓存"""
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(source, SourceStats())
+            if stats.tables is not None and now - stats.tables_checked_at < self.table_cache_ttl_seconds:
+                return stats.tables, stats.refreshed_at
+
+        if source == "excel":
+            tables, refreshed = self._excel_inventory()
+        else:
+            tables, refreshed = self._database_inventory(source, strategy)
+
+        with self._lock:
+            stats.tables = tables
+            stats.refreshed_at = refreshed
+            stats.tables_checked_at = now
+        return tables, refreshed
+
+    @staticmethod
+    def _excel_inventory() -> Tuple[Set[str], Dict[str, Optional[float]]]:
+        """配置的 Excel 文件与已加载的表；刷新时间为文件修改时间"""
+        files: Dict[str, str] = {}
+        try:
+            from src.config.settings import get_config
+
+            files.update(
+                {k: v for k, v in get_config().data_source.excel.file_paths.items() if v}
+            )
+        except Exception:
+            pass
+        try:
+            from src.core.loader.excel_loader import get_loader
+
+            for table in get_loader().list_tables():
+                if table.get("sheet_name") and table.get("file_path"):
+                    files[table["sheet_name"]] = table["file_path"]
+        except Exception:
+            pass
+
+        tables: Set[str] = set()
+        refreshed: Dict[str, Optional[float]] = {}
+        for name, path in files.items():
+            file = Path(path)
+            if not file.exists():
+                continue
+            mtime = file.stat().st_mtime
+            for alias in {name.lower(), _clean_table_name(name).lower()}:
+                tables.add(alias)
+                refreshed[alias] = mtime
+        return tables, refreshed
+
+    @staticmethod
+    def _database_inventory(
+        source: str, strategy: Any
+    ) -> Tuple[Set[str], Dict[str, Optional[float]]]:
+        """数据库中的表；导入生成的 PostgreSQL 数据以 etl_data_version 的时间作为刷新时间"""
+        context = strategy.get_context() if strategy is not None else {}
+        if context.get("error"):
+            raise RuntimeError(context["error"])
+        tables = {name.lower() for name in context.get("tables", {})}
+
+        refreshed_at: Optional[float] = None
+        if source == "postgresql" and hasattr(strategy, "_get_engine"):
+            from .data_version import get_data_refreshed_at
+
+            refreshed = get_data_refreshed_at(strategy._get_engine())
+            refreshed_at = refreshed.timestamp() if refreshed else None
+        return tables, {name: refreshed_at for name in tables}
+
+    def _resolve_table(self, table: str, available: Set[str]) -> Optional[str]:
+        """按逻辑名/物理名/清洗后的名称匹配数据源中的表"""
+        names = {table, _clean_table_name(table), self.table_aliases.get(table, "")}
+        names |= {logical for logical, physical in self.table_aliases.items() if physical == table}
+        for name in names:
+            if name and name.lower() in available:
+                return name.lower()
+        return None
+
+    # ==================== 路由 ====================
+
+    def _priority_rank(self, source: str) -> int:
+        return self.priority.get(source, len(self.priority) + 1)
+
+    def route(
+        self, table_names: Optional[List[str]], candidates: Dict[str, Any]
+    ) -> RoutingDecision:
+        """为一次查询选择数据源
+
+        Args:
+            table_names: 查询涉及的表（可为空）
+            candidates: 候选数据源名称 -> 策略实例（Excel 为 None）
+
+        Returns:
+            RoutingDecision
+
+        Raises:
+            ValueError: 没有候选数据源
+        """
+        if not candidates:
+            raise ValueError("No data source available for routing.")
+        table_names = [t for t in (table_names or []) if t]
+        now = time.time()
+        stats_snapshot = self.get_stats()
+
+        report: List[Dict[str, Any]] = []
+        for source, strategy in candidates.items():
+            stats = stats_snapshot.get(source, {})
+            latency = stats.get("latency_ms")
+            error_rate = stats.get("error_rate", 0.0)
+            entry: Dict[str, Any] = {
+                "source": source,
+                "latency_ms": latency,
+                "error_rate": round(error_rate, 4),
+                "samples": stats.get("samples", 0),
+                "expected_ms": (
+                    latency if latency is not None else self.cold_start_latency_ms
+                ) * (1 + self.error_penalty * error_rate),
+                "missing_tables": [],
+                "age_seconds": None,
+                "excluded": None,
+            }
+            try:
+                available, refreshed = self._inventory(source, strategy)
+            except Exception as e:
+                self.record(source, 0.0, ok=False, error=str(e))
+                entry["excluded"] = f"inventory failed: {e}"
+                report.append(entry)
+                continue
+
+            resolved = {t: self._resolve_table(t, available) for t in table_names}
+            entry["missing_tables"] = [t for t, name in resolved.items() if name is None]
+            if entry["missing_tables"]:
+                entry["excluded"] = "missing tables"
+            stamps = [refreshed.get(name) for name in resolved.values() if name]
+            stamps = [s for s in stamps if s is not None]
+            if stamps:
+                entry["age_seconds"] = round(now - min(stamps), 1)
+            report.append(entry)
+
+        eligible = [e for e in report if e["excluded"] is None]
+        if self.max_staleness_seconds and eligible:
+            fresh = [
+                e for e in eligible
+                if e["age_seconds"] is None or e["age_seconds"] <= self.max_staleness_seconds
+            ]
+            if fresh:
+                for entry in eligible:
+                    if entry not in fresh:
+                        entry["excluded"] = "stale snapshot"
+                eligible = fresh
+
+        if eligible:
+            best = min(eligible, key=lambda e: (e["expected_ms"], self._priority_rank(e["source"])))
+            basis = "observed latency" if best["samples"] else "cold start (priority order)"
+            reason = f"fastest source with all tables ({basis}, expected {best['expected_ms']:.0f} ms)"
+        else:
+            best = min(report, key=lambda e: self._priority_rank(e["source"]))
+            reason = "no source has all referenced tables; fell back to priority order"
+
+        for entry in report:
+            entry["expected_ms"] = round(entry["expected_ms"], 1)
+        return RoutingDecision(
+            source=best["source"], table_names=table_names, reason=reason, candidates=report
+        )
+
+
+_router: Optional[DataSourceRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_data_source_router() -> DataSourceRouter:
+    """获取数据源路由器单例"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = DataSourceRouter.from_config()
+    return _router
+
+
+def reset_data_source_router() -> None:
+    """重置路由器（清空统计，重新读取配置）"""
+    global _router
+    with _router_lock:
+        _router = None
@@ -0,0 +1,379 @@
+"""请求级数据源会话
+
+每次图调用（trace_id）持有一个 DataSourceSession，保存本请求解析出的数据源策略、
+schema 快照与请求内缓存。进程级共享的只有只读对象：
+- 数据源策略实例按 (类型, 文件, 工作表) 构建一次后复用（内部持有连接池），之后不再修改
+- DataSourceManager 只在初始化时探测可用数据源
+
+会话本身不放入 AgentState（检查点无法序列化任意对象），而是与取消令牌一样
+按 trace_id 注册，节点通过 state["trace_id"] 查找。
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.config.logger_interface import get_logger
+
+from .base import DataSourceStrategy
+from .cancellation import get_cancellation_token
+
+logger = get_logger("data_source_session")
+
+
+# ==================== 共享（只读）策略实例 ====================
+
+_strategies: Dict[Tuple[str, Optional[str], Optional[str]], DataSourceStrategy] = {}
+_strategies_lock = threading.RLock()  # 联邦策略构建时会递归解析远程/本地策略
+
+
+def _default_excel_target() -> Tuple[Optional[str], Optional[str]]:
+    """配置中的第一个 Excel 文件与对应工作表"""
+    try:
+        from src.config.settings import get_config
+
+        file_paths = get_config().data_source.excel.file_paths or {}
+        for sheet_name, file_path in file_paths.items():
+            if file_path:
+                return file_path, sheet_name
+    except Exception as e:
+        logger.warning(f"无法获取 Excel 配置: {e}")
+    return None, None
+
+
+def resolve_strategy(
+    source_type: str,
+    file_path: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+) -> DataSourceStrategy:
+    """获取共享的数据源策略实例（首次调用时构建）
+
+    Args:
+        source_type: 数据源类型 ("postgresql", "sqlserver", "sql_server", "excel", "federated", "auto")
+        file_path: Excel 文件路径，默认使用配置中的第一个文件
+        sheet_name: Excel 工作表名称
+
+    Returns:
+        数据源策略实例；调用方不得修改其状态
+    """
+    if source_type == "sql_server":
+        source_type = "sqlserver"
+    if source_type == "auto":
+        from .manager import get_data_source_manager
+
+        source_type = get_data_source_manager().get_strategy_name() or "excel"
+    if source_type in ("excel", "federated") and not file_path:
+        file_path, sheet_name = _default_excel_target()
+
+    key = (source_type, file_path, sheet_name)
+    strategy = _strategies.get(key)
+    if strategy is not None:
+        return strategy
+
+    with _strategies_lock:
+        strategy = _strategies.get(key)
+        if strategy is None:
+            strategy = _build_strategy(source_type, file_path, sheet_name)
+            _strategies[key] = strategy
+    return strategy
+
+
+def _build_strategy(
+    source_type: str, file_path: Optional[str], sheet_name: Optional[str]
+) -> DataSourceStrategy:
+    if source_type in ("postgresql", "sqlserver"):
+        # 优先复用管理器初始化时探测到的实例，避免重复创建连接池
+        from .manager import get_data_source_manager
+
+        detected = get_data_source_manager().get_detected_strategy(source_type)
+        if detected is not None:
+            return detected
+
+    if source_type == "postgresql":
+        from .async_postgres_source import AsyncPostgreSQLDataSource, async_driver_available
+        from .postgres_source import PostgreSQLDataSource
+
+        if async_driver_available():
+            return AsyncPostgreSQLDataSource()
+        return PostgreSQLDataSource()
+
+    if source_type == "sqlserver":
+        try:
+            from .sqlserver_source import SQLServerDataSource
+        except ImportError:
+            raise ImportError("SQLServerDataSource not available")
+        return SQLServerDataSource()
+
+    if source_type == "excel":
+        from .excel_source import ExcelDataSource
+
+        return ExcelDataSource(file_path=file_path, sheet_name=sheet_name)
+
+    if source_type == "federated":
+        from src.config.settings import get_config
+        from .federated import FederatedDataSource
+
+        remote_type = get_config().data_source.federation.remote_type
+        return FederatedDataSource.from_config(
+            remote=resolve_strategy(remote_type),
+            local=resolve_strategy("excel", file_path=file_path, sheet_name=sheet_name),
+        )
+
+    raise ValueError(f"无法配置数据源策略: 未知的类型 {source_type}")
+
+
+def reset_strategies() -> None:
+    """关闭并清空共享策略实例（仅用于测试或重新加载配置）"""
+    with _strategies_lock:
+        strategies = list(_strategies.values())
+        _strategies.clear()
+    for strategy in strategies:
+        if hasattr(strategy, "close"):
+            try:
+                strategy.close()
+            except Exception:
+                pass
+
+
+# ==================== 请求级会话 ====================
+
+
+class DataSourceSession:
+    """请求级数据源会话 - 只被一次图调用使用"""
+
+    def __init__(self, session_id: Optional[str], data_source_type: Optional[str] = None):
+        """
+        Args:
+            session_id: 会话 ID（即 trace_id）
+            data_source_type: 本请求显式指定的数据源类型；None 表示使用配置的默认数据源
+        """
+        self.session_id = session_id
+        self.data_source_type = data_source_type
+        # 请求内缓存，供各节点按需存放中间结果
+        self.cache: Dict[str, Any] = {}
+        self._strategies: Dict[str, DataSourceStrategy] = {}
+        self._schema_snapshots: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._contexts: Dict[str, Dict[str, Any]] = {}
+        # 同一请求内的并行分支可能同时访问
+        self._lock = threading.Lock()
+
+    def use(self, data_source_type: str) -> None:
+        """切换本请求的默认数据源（如自动路由选定数据源后）"""
+        self.data_source_type = data_source_type
+
+    def strategy(self, data_source_type: Optional[str] = None) -> DataSourceStrategy:
+        """解析本请求使用的数据源策略
+
+        Args:
+            data_source_type: 数据源类型，默认使用会话类型
+
+        Returns:
+            数据源策略
+        """
+        source_type = data_source_type or self.data_source_type or "auto"
+        with self._lock:
+            strategy = self._strategies.get(source_type)
+        if strategy is None:
+            strategy = resolve_strategy(source_type)
+            with self._lock:
+                self._strategies.setdefault(source_type, strategy)
+        return strategy
+
+    def bind_strategy(
+        self, strategy: DataSourceStrategy, data_source_type: Optional[str] = None
+    ) -> None:
+        """为本请求绑定指定的策略实例（如用户上传的 Excel 文件）
+
+        Args:
+            strategy: 数据源策略
+            data_source_type: 绑定到的数据源类型，默认使用会话类型
+        """
+        source_type = data_source_type or self.data_source_type or "auto"
+        with self._lock:
+            self._strategies[source_type] = strategy
+            self._contexts.pop(source_type, None)
+            for key in [k for k in self._schema_snapshots if k[0] == source_type]:
+                del self._schema_snapshots[key]
+
+    def get_context(self, data_source_type: Optional[str] = None) -> Dict[str, Any]:
+        """数据源上下文（表列表等），请求内只查询一次"""
+        source_type = data_source_type or self.data_source_type or "auto"
+        with self._lock:
+            context = self._contexts.get(source_type)
+        if context is None:
+            context = self.strategy(source_type).get_context()
+            with self._lock:
+                self._contexts.setdefault(source_type, context)
+        return context
+
+    def get_schema_info(
+        self, table_names: List[str], data_source_type: Optional[str] = None
+    ) -> str:
+        """表结构快照：同一请求内重试、校验等多次读取时不再访问数据源"""
+        source_type = data_source_type or self.data_source_type or "auto"
+        strategy = self.strategy(source_type)
+        key, snapshot = self._cached_schema(strategy, source_type, table_names)
+        if snapshot is None:
+            snapshot = strategy.get_schema_info(list(table_names))
+            with self._lock:
+                self._schema_snapshots.setdefault(key, snapshot)
+        return snapshot
+
+    def _cached_schema(
+        self, strategy: DataSourceStrategy, source_type: str, table_names: List[str]
+    ) -> Tuple[Tuple[str, Tuple[str, ...]], Optional[str]]:
+        """快照键与已缓存的快照（按表输出的数据源可由预取过的单表快照拼接）"""
+        scope = getattr(strategy, "schema_info_scope", None)
+        key = (source_type, ("*",) if scope == "source" else tuple(table_names))
+        with self._lock:
+            snapshot = self._schema_snapshots.get(key)
+            if snapshot is None and scope == "table" and len(table_names) > 1:
+                # 预取过的单表快照可直接拼接
+                parts = [self._schema_snapshots.get((source_type, (name,))) for name in table_names]
+                if all(part is not None for part in parts):
+                    snapshot = self._schema_snapshots[key] = "\n".join(parts)
+        return key, snapshot
+
+    async def get_context_async(self, data_source_type: Optional[str] = None) -> Dict[str, Any]:
+        """get_context 的异步版本（首次读取在线程池中进行）"""
+        source_type = data_source_type or self.data_source_type or "auto"
+        with self._lock:
+            context = self._contexts.get(source_type)
+        if context is None:
+            context = await asyncio.to_thread(self.get_context, source_type)
+        return context
+
+    async def get_schema_info_async(
+        self, table_names: List[str], data_source_type: Optional[str] = None
+    ) -> str:
+        """get_schema_info 的异步版本（未缓存时调用策略的 get_schema_info_async）"""
+        source_type = data_source_type or self.data_source_type or "auto"
+        strategy = self.strategy(source_type)
+        key, snapshot = self._cached_schema(strategy, source_type, table_names)
+        if snapshot is None:
+            snapshot = await strategy.get_schema_info_async(list(table_names))
+            with self._lock:
+                self._schema_snapshots.setdefault(key, snapshot)
+        return snapshot
+
+    def prefetch_schema(
+        self, table_names: List[str], data_source_type: Optional[str] = None
+    ) -> List[str]:
+        """在选表完成前预取候选表的结构快照（与选表等并行分支同时进行）
+
+        按表输出的数据源逐表缓存，之后 get_schema_info 拼接选中表的快照；
+        与表名无关的数据源缓存一份；其余数据源不预取。
+
+        Args:
+            table_names: 候选表名
+            data_source_type: 数据源类型，默认使用会话类型
+
+        Returns:
+            已就绪的表名（与表名无关的数据源返回全部候选表）
+        """
+        source_type = data_source_type or self.data_source_type or "auto"
+        scope = getattr(self.strategy(source_type), "schema_info_scope", None)
+        if scope == "source":
+            self.get_schema_info([], source_type)
+            return list(table_names)
+        if scope != "table":
+            return []
+        for name in table_names:
+            self.get_schema_info([name], source_type)
+        return list(table_names)
+
+    async def prefetch_schema_async(
+        self, table_names: List[str], data_source_type: Optional[str] = None
+    ) -> List[str]:
+        """prefetch_schema 的异步版本，候选表的结构并发读取"""
+        source_type = data_source_type or self.data_source_type or "auto"
+        scope = getattr(self.strategy(source_type), "schema_info_scope", None)
+        if scope == "source":
+            await self.get_schema_info_async([], source_type)
+            return list(table_names)
+        if scope != "table":
+            return []
+        await asyncio.gather(*(self.get_schema_info_async([name], source_type) for name in table_names))
+        return list(table_names)
+
+    def execute(
+        self,
+        query: str,
+        data_source_type: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """在本请求的数据源上执行查询（成本守卫、慢查询日志与取消令牌同执行器）
+
+        Args:
+            query: SQL 查询语句
+            data_source_type: 数据源类型，默认使用会话类型
+            timeout: 语句超时（秒）
+
+        Returns:
+            DataFrame 包含查询结果
+        """
+        from .executor import run_query
+
+        return run_query(
+            self.strategy(data_source_type),
+            query,
+            timeout=timeout,
+            cancel_token=get_cancellation_token(self.session_id),
+            trace_id=self.session_id,
+        )
+
+    async def execute_async(
+        self,
+        query: str,
+        data_source_type: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """execute 的异步版本（经 run_query_async 调用策略的 execute_query_async）"""
+        from .executor import run_query_async
+
+        return await run_query_async(
+            self.strategy(data_source_type),
+            query,
+            timeout=timeout,
+            cancel_token=get_cancellation_token(self.session_id),
+            trace_id=self.session_id,
+        )
+
+
+_sessions: Dict[str, DataSourceSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(
+    session_id: str, data_source_type: Optional[str] = None
+) -> DataSourceSession:
+    """为请求创建数据源会话"""
+    session = DataSourceSession(session_id, data_source_type)
+    with _sessions_lock:
+        _sessions[session_id] = session
+    return session
+
+
+def get_session(session_id: Optional[str]) -> Optional[DataSourceSession]:
+    """获取请求的数据源会话"""
+    if not session_id:
+        return None
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+
+def session_for(
+    session_id: Optional[str], data_source_type: Optional[str] = None
+) -> DataSourceSession:
+    """获取已注册的会话；未注册时（如直接调用节点）返回一次性会话"""
+    return get_session(session_id) or DataSourceSession(session_id, data_source_type)
+
+
+def release_session(session_id: Optional[str]) -> None:
+    """请求结束后释放数据源会话"""
+    if not session_id:
+        return
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
@@ -0,0 +1,192 @@
+"""Single-flight 合并 - 相同的并发执行只运行一次
+
+同一时刻多个调用方以相同的键发起执行时，第一个调用方（leader）真正执行，
+其余调用方（follower）等待并共享其结果或异常。用于两层：
+- 数据源执行器：键为 结果缓存键（规范化 SQL + 数据源标识 + 数据版本）
+- NLToSQLAgent.query：键为 规范化问题 + 技能 + 请求参数
+
+follower 等待期间遵守自己的取消令牌与截止时间；leader 因调用方取消或自身超时而中止时，
+follower 不共享该异常（截止时间更长的 follower 不应随之失败），而是按自己的截止时间重新竞争执行。
+
+异步调用方使用 do_async：在同一事件循环内按键合并协程，等待不阻塞事件循环。
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .cancellation import CancellationToken, QueryCancelledError
+
+# follower 检查自身取消令牌的间隔（秒）
+_WAIT_SLICE = 0.05
+
+
+class _Call:
+    """一次进行中的执行"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+def _leader_aborted(error: BaseException) -> bool:
+    """leader 被自己的取消令牌或超时中止（QueryTimeoutError 是 QueryCancelledError 的子类）"""
+    return isinstance(error, QueryCancelledError)
+
+
+class SingleFlight:
+    """按键合并并发执行 - 线程安全"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self._metrics = {"executions": 0, "shared": 0}
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Tuple[Any, bool]:
+        """执行 fn；相同键已有执行在进行时等待并共享其结果
+
+        Args:
+            key: 合并键
+            fn: 实际执行函数
+            cancel_token: 调用方的取消令牌（follower 等待期间检查）
+
+        Returns:
+            (结果, 是否共享了其他调用方的执行)
+
+        Raises:
+            fn 抛出的异常；follower 等待期间被取消或超时时抛出 QueryCancelledError/QueryTimeoutError
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._metrics["executions"] += 1
+                else:
+                    call.followers += 1
+
+            if leader:
+                try:
+                    call.result = fn()
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        self._calls.pop(key, None)
+                    call.done.set()
+                return call.result, False
+
+            while not call.done.wait(_WAIT_SLICE):
+                if cancel_token is not None:
+                    cancel_token.raise_if_aborted()
+
+            if call.error is not None:
+                if _leader_aborted(call.error):
+                    continue
+                raise call.error
+            with self._lock:
+                self._metrics["shared"] += 1
+            return call.result, True
+
+    async def do_async(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Tuple[Any, bool]:
+        """do 的异步版本：同一事件循环内相同键的协程只执行一次
+
+        Args:
+            key: 合并键
+            fn: 返回协程的执行函数
+            cancel_token: 调用方的取消令牌（follower 等待期间检查）
+
+        Returns:
+            (结果, 是否共享了其他调用方的执行)
+
+        Raises:
+            fn 抛出的异常；follower 等待期间被取消或超时时抛出 QueryCancelledError/QueryTimeoutError
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                calls = self._async_calls.setdefault(loop, {})
+                future = calls.get(key)
+                leader = future is None
+                if leader:
+                    future = calls[key] = loop.create_future()
+                    # 没有 follower 取走异常时避免“exception was never retrieved”
+                    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                    self._metrics["executions"] += 1
+
+            if leader:
+                try:
+                    result = await fn()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                else:
+                    future.set_result(result)
+                finally:
+                    with self._lock:
+                        calls.pop(key, None)
+                return result, False
+
+            if cancel_token is None:
+                await asyncio.wait([future])
+            else:
+                while not future.done():
+                    await asyncio.wait([future], timeout=_WAIT_SLICE)
+                    cancel_token.raise_if_aborted()
+
+            if future.cancelled() or _leader_aborted(future.exception()):
+                continue
+            if future.exception() is not None:
+                raise future.exception()
+            with self._lock:
+                self._metrics["shared"] += 1
+            return future.result(), True
+
+    def _in_flight(self) -> int:
+        return len(self._calls) + sum(len(calls) for calls in self._async_calls.values())
+
+    def in_flight(self) -> int:
+        """当前进行中的执行数（含各事件循环中的异步执行）"""
+        with self._lock:
+            return self._in_flight()
+
+    def get_stats(self) -> Dict[str, int]:
+        """实际执行次数与共享次数"""
+        with self._lock:
+            return dict(self._metrics, in_flight=self._in_flight())
+
+
+_query_flight = SingleFlight()
+_question_flight = SingleFlight()
+
+
+def get_query_flight() -> SingleFlight:
+    """数据源执行器层的 single-flight"""
+    return _query_flight
+
+
+def get_question_flight() -> SingleFlight:
+    """自然语言问题层（NLToSQLAgent.query）的 single-flight"""
+    return _question_flight
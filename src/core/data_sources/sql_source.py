@@ -15,7 +15,7 @@ class SqlServerDataSource(DataSourceStrategy):
     def load_data(self) -> pd.DataFrame:
         raise NotImplementedError("SQL Server data source is not available. Please configure sqlserver module.")
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def execute_query(self, query: str, **kwargs) -> pd.DataFrame:
         raise NotImplementedError("SQL Server data source is not available. Please configure sqlserver module.")
 
     def get_metadata(self) -> Dict[str, Any]:
@@ -7,16 +7,107 @@
 - 上下文信息返回
 """
 
+import datetime
+import math
 from typing import Any, Dict, List, Optional
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 from .base import DataSourceStrategy
+from .cancellation import CancellationToken, abort_error, resolve_timeout
+from .cost_guard import PlanEstimate, parse_showplan_xml
+from .engines import get_shared_engine
+from .replicas import ReplicaPool, is_read_only
 from src.config.settings import get_config
 
+# ODBC SQLSTATE：HYT00 查询超时，HY008 操作被取消
+_ABORT_SQLSTATES = {"HYT00", "HY008"}
+
+
+def _is_query_aborted(error: Exception) -> bool:
+    """判断驱动异常是否为查询超时或被取消"""
+    orig = getattr(error, "orig", error)
+    args = getattr(orig, "args", ()) or ()
+    return bool(args) and str(args[0]) in _ABORT_SQLSTATES
+
+
+def _object_column(values: List[Any]) -> np.ndarray:
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _typed_column(values: List[Any], type_code: Any) -> np.ndarray:
+    """按 pyodbc 报告的列类型（description 中的 Python 类型）构建列数组"""
+    try:
+        if type_code is bool:
+            return np.array(values, dtype=bool) if None not in values else _object_column(values)
+        if type_code is int:
+            # 含 NULL 的整数列与 pandas 推断一致，转为 float64
+            dtype = np.int64 if None not in values else np.float64
+            return np.array(values, dtype=dtype)
+        if type_code is float:
+            return np.array(values, dtype=np.float64)
+        if type_code is datetime.datetime:
+            return pd.to_datetime(values).to_numpy()
+    except (TypeError, ValueError, OverflowError):
+        pass
+    # Decimal、字符串、日期等保持原始对象
+    return _object_column(values)
+
+
+def _as_object(chunk: np.ndarray) -> np.ndarray:
+    if chunk.dtype.kind == "M":
+        return pd.Series(chunk).astype(object).to_numpy()
+    return chunk.astype(object)
+
+
+def _concat_chunks(chunks: List[np.ndarray], type_code: Any) -> np.ndarray:
+    """拼接各批的列数组；类型不一致（如某批含 NULL 的整数列）时按 numpy 规则提升，无法提升时退回对象数组"""
+    if not chunks:
+        return _typed_column([], type_code)
+    if len(chunks) == 1:
+        return chunks[0]
+    if all(chunk.dtype.kind != "O" for chunk in chunks):
+        try:
+            return np.concatenate(chunks)
+        except (TypeError, ValueError):
+            pass
+    return np.concatenate([_as_object(chunk) for chunk in chunks])
+
+
+def _fetch_frame(cursor: Any, batch_size: int) -> pd.DataFrame:
+    """按 arraysize 分批 fetchmany，每批立即转换为按列类型的数组
+
+    数值/布尔/时间列在每批转换后即释放驱动返回的行对象与 Python 标量，
+    大结果集的峰值内存不再是“全部行对象 + 对象矩阵 + DataFrame”。
+    """
+    description = cursor.description
+    names = [desc[0] for desc in description]
+    type_codes = [desc[1] for desc in description]
+    chunks: List[List[np.ndarray]] = [[] for _ in names]
+    batch_size = max(1, int(batch_size or 1))
+    cursor.arraysize = batch_size
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for column_chunks, values, type_code in zip(chunks, zip(*rows), type_codes):
+            column_chunks.append(_typed_column(list(values), type_code))
+        del rows
+
+    df = pd.DataFrame(
+        {i: _concat_chunks(column_chunks, type_code) for i, (column_chunks, type_code) in enumerate(zip(chunks, type_codes))}
+    )
+    df.columns = names
+    return df
+
 
 class SQLServerDataSource(DataSourceStrategy):
     """SQL Server数据源策略实现"""
 
+    schema_info_scope = "table"  # 每张表一段，按换行拼接
+
     def __init__(
         self,
         host: str = "localhost",
@@ -66,9 +157,19 @@ class SQLServerDataSource(DataSourceStrategy):
         )
         self.schema = schema if schema != "dbo" else (mssql_config.schema or "dbo")
         self.connection_params = connection_params or {}
+        self.query_timeout = mssql_config.query_timeout
+        self.login_timeout = mssql_config.login_timeout
+        self.pool_size = mssql_config.pool_size
+        self.max_overflow = mssql_config.max_overflow
+        self.pool_timeout = mssql_config.pool_timeout
+        self.pool_recycle = mssql_config.pool_recycle
+        self.pool_pre_ping = mssql_config.pool_pre_ping
+        self.arraysize = mssql_config.arraysize
+        self.replica_config = mssql_config.replicas
 
         self._engine = None
         self._connection = None
+        self._replicas: Optional[ReplicaPool] = None
 
     def _get_connection_string(self) -> str:
         """构建SQL Server连接字符串
@@ -82,38 +183,76 @@ class SQLServerDataSource(DataSourceStrategy):
         base_url = f"mssql+pyodbc://{self.user}:{encoded_password}@{self.host}:{self.port}/{self.database}"
         return base_url
 
+    def _create_engine(self, connection_string: str):
+        """获取连接字符串对应的共享 engine（主库与只读副本共用 driver、连接池设置与取消钩子）"""
+        # 必须指定driver
+        if "driver=" not in connection_string:
+            driver_param = f"driver={self.driver}"
+            if "?" in connection_string:
+                connection_string += f"&{driver_param}"
+            else:
+                connection_string += f"?{driver_param}"
+
+        # pyodbc.connect(timeout=...) 为登录超时；查询超时在 execute_query 中按语句设置
+        connect_args: Dict[str, Any] = {}
+        if self.login_timeout:
+            connect_args["timeout"] = int(self.login_timeout)
+
+        try:
+            return get_shared_engine(
+                connection_string,
+                on_create=self._register_cancel_hook,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_timeout=self.pool_timeout,
+                pool_recycle=self.pool_recycle,
+                pool_pre_ping=self.pool_pre_ping,
+                connect_args=connect_args,
+            )
+        except ImportError:
+            raise ImportError(
+                "sqlalchemy and pyodbc are required for SQL Server data source. "
+                "Install them with: pip install sqlalchemy pyodbc"
+            )
+
     def _get_engine(self):
         """获取SQLAlchemy engine"""
         if self._engine is None:
-            try:
-                from sqlalchemy import create_engine
-
-                connection_string = self._get_connection_string()
-                
-                # 必须指定driver
-                driver_param = f"driver={self.driver}"
-                if "?" in connection_string:
-                    connection_string += f"&{driver_param}"
-                else:
-                    connection_string += f"?{driver_param}"
+            connection_string = self._get_connection_string()
+            connection_string += f"?driver={self.driver}"
 
-                # 添加额外的连接参数
-                if self.connection_params:
-                    params = "&".join(
-                        [f"{k}={v}" for k, v in self.connection_params.items()]
-                    )
-                    connection_string += f"&{params}"
-
-                self._engine = create_engine(connection_string)
-
-            except ImportError:
-                raise ImportError(
-                    "sqlalchemy and pyodbc are required for SQL Server data source. "
-                    "Install them with: pip install sqlalchemy pyodbc"
+            # 添加额外的连接参数
+            if self.connection_params:
+                params = "&".join(
+                    [f"{k}={v}" for k, v in self.connection_params.items()]
                 )
+                connection_string += f"&{params}"
+
+            self._engine = self._create_engine(connection_string)
 
         return self._engine
 
+    def _get_replicas(self) -> Optional[ReplicaPool]:
+        """只读副本池（Always On 可读辅助副本）；未配置副本时为 None"""
+        if self._replicas is None and self.replica_config.endpoints:
+            self._replicas = ReplicaPool.from_config(
+                self.replica_config, "sqlserver", self._create_engine
+            )
+        return self._replicas
+
+    @staticmethod
+    def _register_cancel_hook(engine) -> None:
+        """在游标执行前把 cursor.cancel 注册到连接上挂载的取消令牌"""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _attach_cursor_cancel(conn, cursor, statement, parameters, context, executemany):
+            token = conn.info.get("cancel_token")
+            if token is not None and hasattr(cursor, "cancel"):
+                conn.info.setdefault("cancel_unregister", []).append(
+                    token.register(cursor.cancel)
+                )
+
     def load_data(self, table_name: str, limit: Optional[int] = None) -> pd.DataFrame:
         """
         从SQL Server表加载数据到DataFrame
@@ -207,7 +346,11 @@ class SQLServerDataSource(DataSourceStrategy):
         return context
 
     def execute_query(
-        self, query: str, params: Optional[Dict[str, Any]] = None
+        self,
+        query: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
     ) -> pd.DataFrame:
         """
         执行SQL查询
@@ -215,29 +358,87 @@ class SQLServerDataSource(DataSourceStrategy):
         Args:
             query: SQL查询语句
             params: 查询参数
+            timeout: 查询超时（秒），默认使用 query_timeout 配置
+            cancel_token: 请求级取消令牌，取消时调用 ODBC cursor.cancel
 
         Returns:
             包含查询结果的DataFrame
         """
-        engine = self._get_engine()
+        # 只读语句优先分发到副本，连接失败时转移到其他副本或主库
+        replicas = self._get_replicas()
+        if replicas is not None and is_read_only(query):
+            return replicas.execute(
+                lambda engine: self._execute_on(engine, query, params, timeout, cancel_token),
+                primary=self._get_engine,
+            )
+        return self._execute_on(self._get_engine(), query, params, timeout, cancel_token)
+
+    def _execute_on(
+        self,
+        engine,
+        query: str,
+        params: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+        cancel_token: Optional[CancellationToken],
+    ) -> pd.DataFrame:
+        """在指定 engine（主库或副本）上执行一次查询"""
+        timeout = resolve_timeout(
+            self.query_timeout if timeout is None else timeout, cancel_token
+        )
 
         try:
             from sqlalchemy import text
 
             with engine.connect() as conn:
-                result = conn.execute(text(query), params or {})
-                if result.cursor:
-                    columns = [desc[0] for desc in result.cursor.description]
-                    rows = result.fetchall()
-                    df = pd.DataFrame(rows, columns=columns)
-                else:
-                    # 对于非查询语句（如INSERT/UPDATE），可能没有结果集
-                    df = pd.DataFrame()
+                # ODBC 查询超时挂在连接上，结束后恢复，避免影响连接池中的其他请求
+                raw_connection = conn.connection.dbapi_connection
+                previous_timeout = getattr(raw_connection, "timeout", 0)
+                if timeout:
+                    raw_connection.timeout = max(1, int(math.ceil(timeout)))
+                conn.info["cancel_token"] = cancel_token
+
+                try:
+                    result = conn.execute(text(query), params or {})
+                    if result.cursor:
+                        df = _fetch_frame(result.cursor, self.arraysize)
+                    else:
+                        # 对于非查询语句（如INSERT/UPDATE），可能没有结果集
+                        df = pd.DataFrame()
+                finally:
+                    for unregister in conn.info.pop("cancel_unregister", []):
+                        unregister()
+                    conn.info.pop("cancel_token", None)
+                    if timeout:
+                        raw_connection.timeout = previous_timeout
 
             return df
 
         except Exception as e:
-            raise Exception(f"Failed to execute query: {str(e)}\nQuery: {query}")
+            if _is_query_aborted(e):
+                raise abort_error(cancel_token, timeout, query) from e
+            raise Exception(f"Failed to execute query: {str(e)}\nQuery: {query}") from e
+
+    def explain(self, query: str) -> PlanEstimate:
+        """
+        使用 SHOWPLAN_XML 估算查询代价（不执行查询）
+
+        Args:
+            query: SQL查询语句
+
+        Returns:
+            PlanEstimate 估算结果
+        """
+        engine = self._get_engine()
+
+        with engine.connect() as conn:
+            # SHOWPLAN_XML 必须单独成批；开启期间语句只编译不执行
+            conn.exec_driver_sql("SET SHOWPLAN_XML ON")
+            try:
+                showplan = conn.exec_driver_sql(query).scalar()
+            finally:
+                conn.exec_driver_sql("SET SHOWPLAN_XML OFF")
+
+        return parse_showplan_xml(showplan)
 
     def get_schema_info(self, table_names: List[str]) -> str:
         """
@@ -368,15 +569,20 @@ class SQLServerDataSource(DataSourceStrategy):
         except Exception as e:
             raise Exception(f"Failed to get row count for table {table_name}: {str(e)}")
 
+    def get_replica_stats(self) -> Optional[Dict[str, Any]]:
+        """只读副本状态；未配置副本时返回 None"""
+        replicas = self._get_replicas()
+        return replicas.get_stats() if replicas is not None else None
+
     def close(self):
         """关闭数据库连接"""
         if self._connection:
             self._connection.close()
             self._connection = None
 
-        if self._engine:
-            self._engine.dispose()
-            self._engine = None
+        # 主库与副本的 engine 按 DSN 共享，这里只释放引用；断开连接池使用 dispose_shared_engines()
+        self._replicas = None
+        self._engine = None
 
     def __enter__(self):
         """上下文管理器入口"""
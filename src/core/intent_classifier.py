@@ -0,0 +1,360 @@
+"""本地意图/选表分类器 - 置信时跳过意图分析与选表的 LLM 调用
+
+大部分问题的意图与涉及的表可以从问题文本直接判断：包含“统计”“总额”等词、年份月份等实体、
+字段取值（“IT”“华东区”）的问题是数据查询；命中技能元数据 keyword_table_map 关键词、
+或字段取值所在的表就是要查询的表。分类器把这些证据合成置信度：
+
+- 意图：数据查询证据与非数据证据（问候、致谢、询问助手本身）分别按 noisy-OR 合并，
+  confidence(数据) = P+ × (1 − P−)，confidence(非数据) = P− × (1 − P+)
+- 选表：每张候选表的证据（关键词映射、字段取值、模型）按 noisy-OR 合并；
+  达到阈值的表被选中，只要有表落在 [阈值/2, 阈值) 的模糊区间就交给 LLM
+- n-gram 模型：按字符 1/2-gram（ASCII 按词）训练的朴素贝叶斯，样本来自 LLM 判定
+  并经结果审查确认的问题（NLToSQLAgent 写入 log_path），样本数达到 min_samples 后参与打分
+
+置信度未达到 threshold 的部分仍由 LLM 判断；每次判断的证据记录在 LocalDecision.trace 中。
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.config.logger_interface import get_logger
+from src.core.metadata import resolve_table_names
+from src.core.question_cache import extract_entities
+
+logger = get_logger("intent_classifier")
+
+# 数据查询关键词（意图分析 LLM 失败时的启发式后备也使用这份列表）
+DATA_KEYWORDS = (
+    "查询", "统计", "报表", "数据", "sql", "select", "趋势", "对比", "分析",
+    "合计", "总额", "金额", "多少", "排名", "同比", "环比", "占比", "明细",
+)
+_SMALL_TALK = re.compile(
+    r"^\s*(?:你好|您好|hi|hello|hey|谢谢|多谢|thanks|thank you|再见|bye)(?![a-z])"
+    r"|你是谁|你叫什么|你能做什么|你会什么|怎么使用|如何使用|who are you|what can you do",
+    re.I,
+)
+_ASCII_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+
+# 各类证据的权重（noisy-OR 合并）
+DATA_KEYWORD_WEIGHT = 0.6
+SKILL_KEYWORD_WEIGHT = 0.7
+VALUE_HINT_WEIGHT = 0.6
+ENTITY_WEIGHT = 0.5
+SMALL_TALK_WEIGHT = 0.9
+TABLE_KEYWORD_WEIGHT = 0.8
+TABLE_VALUE_WEIGHT = 0.8
+MODEL_WEIGHT = 0.9  # 模型概率的上限（朴素贝叶斯概率偏极端）
+
+
+def ngram_features(question: str) -> List[str]:
+    """问题的特征：ASCII 词（数字归一为 0）与中文字符 1/2-gram
+
+    Args:
+        question: 用户问题
+
+    Returns:
+        特征列表（可重复）
+    """
+    text = question.casefold()
+    features = [f"w:{re.sub(r'[0-9]+', '0', word)}" for word in _ASCII_WORD.findall(text)]
+    for run in _CJK_RUN.findall(text):
+        features.extend(run)
+        features.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return features
+
+
+def _noisy_or(weights: Iterable[float]) -> float:
+    remaining = 1.0
+    for weight in weights:
+        remaining *= 1.0 - weight
+    return 1.0 - remaining
+
+
+class _NaiveBayes:
+    """多项式朴素贝叶斯：意图（数据/非数据）与逐表（含该表/不含）二分类"""
+
+    def __init__(self):
+        self.counts: Dict[str, Counter] = {"data": Counter(), "other": Counter()}
+        self.docs: Counter = Counter()
+        self.vocab: set = set()
+
+    def add(self, features: List[str], is_data_query: bool, tables: List[str]) -> None:
+        label = "data" if is_data_query else "other"
+        self.counts[label].update(features)
+        self.docs[label] += 1
+        for table in tables if is_data_query else []:
+            self.counts.setdefault(f"table:{table}", Counter()).update(features)
+            self.docs[f"table:{table}"] += 1
+        self.vocab.update(features)
+
+    @property
+    def samples(self) -> int:
+        return self.docs["data"] + self.docs["other"]
+
+    def tables(self) -> List[str]:
+        return [label[6:] for label in self.counts if label.startswith("table:")]
+
+    def _posterior(self, features: List[str], pos: Counter, pos_docs: int, neg: Counter, neg_docs: int) -> float:
+        if pos_docs <= 0 or neg_docs <= 0:
+            return 1.0 if pos_docs > 0 else 0.0
+        vocab = len(self.vocab) + 1
+        pos_total = sum(pos.values()) + vocab
+        neg_total = sum(neg.values()) + vocab
+        log_odds = math.log(pos_docs / neg_docs)
+        for feature in features:
+            log_odds += math.log((pos[feature] + 1) / pos_total) - math.log((neg[feature] + 1) / neg_total)
+        return 1.0 / (1.0 + math.exp(-max(min(log_odds, 50.0), -50.0)))
+
+    def p_data(self, features: List[str]) -> float:
+        return self._posterior(
+            features, self.counts["data"], self.docs["data"], self.counts["other"], self.docs["other"]
+        )
+
+    def p_table(self, features: List[str], table: str) -> float:
+        pos = self.counts.get(f"table:{table}", Counter())
+        rest = self.counts["data"] - pos  # 不含该表的数据查询
+        return self._posterior(
+            features, pos, self.docs[f"table:{table}"], rest, self.docs["data"] - self.docs[f"table:{table}"]
+        )
+
+
+@dataclass
+class LocalDecision:
+    """本地分类结果与判断依据"""
+
+    is_data_query: bool
+    intent_confidence: float
+    intent_accepted: bool
+    tables: List[str]
+    table_confidence: float
+    tables_accepted: bool
+    threshold: float
+    trace: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "is_data_query": self.is_data_query,
+            "intent_confidence": round(self.intent_confidence, 4),
+            "intent_accepted": self.intent_accepted,
+            "tables": list(self.tables),
+            "table_confidence": round(self.table_confidence, 4),
+            "tables_accepted": self.tables_accepted,
+            "threshold": self.threshold,
+            "trace": list(self.trace),
+        }
+
+
+class LocalIntentClassifier:
+    """置信度打分的本地意图/选表分类器"""
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        log_path: Optional[str] = None,
+        min_samples: int = 20,
+        max_samples: int = 20000,
+    ):
+        """
+        Args:
+            threshold: 置信度阈值
+            log_path: 训练样本 JSONL 文件；为空时只保存在内存
+            min_samples: 样本数达到后模型才参与打分
+            max_samples: 启动时最多加载的样本数（取最新）
+        """
+        self.threshold = threshold
+        self.log_path = Path(log_path) if log_path else None
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._model = _NaiveBayes()
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_config(cls) -> "LocalIntentClassifier":
+        from src.config.settings import IntentClassifierConfig, get_config
+
+        try:
+            config = get_config().intent_classifier
+        except Exception:
+            config = IntentClassifierConfig()
+        return cls(
+            threshold=config.threshold,
+            log_path=config.log_path,
+            min_samples=config.min_samples,
+            max_samples=config.max_samples,
+        )
+
+    def _load(self) -> None:
+        if self.log_path is None or not self.log_path.exists():
+            return
+        try:
+            lines = self.log_path.read_text(encoding="utf-8").splitlines()[-self.max_samples:]
+        except OSError as e:
+            logger.warning(f"Failed to read question log {self.log_path}: {e}")
+            return
+        for line in lines:
+            try:
+                sample = json.loads(line)
+                self._model.add(
+                    ngram_features(sample["question"]), bool(sample["is_data_query"]), list(sample.get("tables") or [])
+                )
+            except (ValueError, KeyError, TypeError):
+                continue
+        logger.info(f"Intent classifier loaded {self._model.samples} samples from {self.log_path}")
+
+    @property
+    def samples(self) -> int:
+        return self._model.samples
+
+    def record(self, question: str, is_data_query: bool, tables: Optional[List[str]] = None, **extra: Any) -> None:
+        """记录一条已确认的样本（LLM 判定的意图；数据查询的表须经结果审查确认）
+
+        Args:
+            question: 用户问题
+            is_data_query: 是否为数据查询
+            tables: 查询涉及的表
+            **extra: 一并写入日志的附加字段（如技能名）
+        """
+        tables = list(tables or []) if is_data_query else []
+        with self._lock:
+            self._model.add(ngram_features(question), is_data_query, tables)
+            if self.log_path is None:
+                return
+            sample = {"question": question, "is_data_query": is_data_query, "tables": tables, "ts": time.time(), **extra}
+            try:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.log_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"Failed to append question log {self.log_path}: {e}")
+
+    def classify(
+        self,
+        question: str,
+        skill_metadata: Optional[Dict[str, Any]] = None,
+        value_hints: Optional[List[Dict[str, str]]] = None,
+        catalog: Optional[List[str]] = None,
+    ) -> LocalDecision:
+        """判断问题意图与涉及的表
+
+        Args:
+            question: 用户问题
+            skill_metadata: 技能元数据（keyword_table_map 等）
+            value_hints: 问题中匹配到的字段取值（ValueHint.to_dict()）
+            catalog: 数据源中实际存在的表；提供时不在其中的表被忽略
+
+        Returns:
+            分类结果（未达到阈值的部分 accepted 为 False）
+        """
+        skill_metadata = skill_metadata or {}
+        value_hints = value_hints or []
+        lowered = question.casefold()
+        features = ngram_features(question)
+        trace: List[str] = []
+        with self._lock:
+            use_model = self._model.samples >= self.min_samples
+            p_data = self._model.p_data(features) if use_model else None
+            model_tables = {
+                table: self._model.p_table(features, table) for table in self._model.tables()
+            } if use_model else {}
+
+        # ---- 意图 ----
+        positive: List[float] = []
+        negative: List[float] = []
+        keywords = [key for key in DATA_KEYWORDS if key in lowered]
+        if keywords:
+            positive.append(DATA_KEYWORD_WEIGHT)
+            trace.append(f"data keywords {keywords}: +{DATA_KEYWORD_WEIGHT}")
+        skill_keywords = [key for key in skill_metadata.get("keyword_table_map") or {} if key.casefold() in lowered]
+        if skill_keywords:
+            positive.append(SKILL_KEYWORD_WEIGHT)
+            trace.append(f"skill keywords {skill_keywords}: +{SKILL_KEYWORD_WEIGHT}")
+        if value_hints:
+            positive.append(VALUE_HINT_WEIGHT)
+            trace.append(f"field values {[hint['value'] for hint in value_hints]}: +{VALUE_HINT_WEIGHT}")
+        entities = extract_entities(question)
+        if entities:
+            positive.append(ENTITY_WEIGHT)
+            trace.append(f"entities {list(entities)}: +{ENTITY_WEIGHT}")
+        if _SMALL_TALK.search(question):
+            negative.append(SMALL_TALK_WEIGHT)
+            trace.append(f"small talk: -{SMALL_TALK_WEIGHT}")
+        if p_data is not None:
+            positive.append(MODEL_WEIGHT * p_data)
+            negative.append(MODEL_WEIGHT * (1.0 - p_data))
+            trace.append(f"n-gram model P(data)={p_data:.3f} ({self._model.samples} samples)")
+
+        pos, neg = _noisy_or(positive), _noisy_or(negative)
+        data_confidence, other_confidence = pos * (1.0 - neg), neg * (1.0 - pos)
+        is_data_query = data_confidence >= other_confidence
+        intent_confidence = max(data_confidence, other_confidence)
+        intent_accepted = intent_confidence >= self.threshold
+
+        # ---- 选表 ----
+        evidence: Dict[str, List[float]] = {}
+        for table in resolve_table_names(question, skill_metadata=skill_metadata, use_defaults=False):
+            evidence.setdefault(table, []).append(TABLE_KEYWORD_WEIGHT)
+        for table in dict.fromkeys(hint["table"] for hint in value_hints):
+            evidence.setdefault(table, []).append(TABLE_VALUE_WEIGHT)
+        for table, p_table in model_tables.items():
+            evidence.setdefault(table, []).append(MODEL_WEIGHT * p_table)
+
+        if catalog is not None:
+            known = {name.casefold(): name for name in catalog}
+            resolved: Dict[str, List[float]] = {}
+            for table, weights in evidence.items():
+                name = known.get(table.casefold())
+                if name is None:
+                    trace.append(f"table {table} not in data source: ignored")
+                    continue
+                resolved.setdefault(name, []).extend(weights)
+            evidence = resolved
+
+        scores = {table: _noisy_or(weights) for table, weights in evidence.items()}
+        tables = [table for table, score in scores.items() if score >= self.threshold]
+        ambiguous = [table for table, score in scores.items() if self.threshold / 2 <= score < self.threshold]
+        for table, score in scores.items():
+            if score >= self.threshold / 2:
+                trace.append(f"table {table}: {score:.3f}")
+        tables_accepted = is_data_query and bool(tables) and not ambiguous
+        if tables and ambiguous:
+            trace.append(f"ambiguous tables {ambiguous}: defer to LLM")
+
+        return LocalDecision(
+            is_data_query=is_data_query,
+            intent_confidence=intent_confidence,
+            intent_accepted=intent_accepted,
+            tables=tables,
+            table_confidence=min((scores[table] for table in tables), default=0.0),
+            tables_accepted=tables_accepted,
+            threshold=self.threshold,
+            trace=trace,
+        )
+
+
+_classifier: Optional[LocalIntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_local_intent_classifier() -> LocalIntentClassifier:
+    """获取全局本地分类器（首次调用时按配置创建并加载样本）"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = LocalIntentClassifier.from_config()
+        return _classifier
+
+
+def reset_local_intent_classifier() -> None:
+    """丢弃全局分类器（下次获取时重新加载配置与样本）"""
+    global _classifier
+    with _classifier_lock:
+        _classifier = None
@@ -7,8 +7,13 @@ from langchain_core.callbacks import BaseCallbackHandler
 from src.config.settings import get_config
 from src.core.interfaces import ILLMProvider
 
+import asyncio
+import json
 import os
-from typing import List, Optional, Dict
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, List, Optional, Dict, Sequence, Tuple
 
 
 class OpenAILLMProvider(ILLMProvider):
@@ -114,30 +119,115 @@ def get_llm_callbacks() -> List[BaseCallbackHandler]:
     return _global_callbacks
 
 
-def get_llm(callbacks: list = None) -> ChatOpenAI:
-    """获取 LLM 实例 - 支持回调
+# 进程内 LLM 客户端缓存：键 = 提供商配置 + 回调 + 事件循环 id，值 = 聊天模型实例
+_llm_cache: "OrderedDict[Tuple[Any, ...], ChatOpenAI]" = OrderedDict()
+# 缓存键中的事件循环 id → 弱引用（键不持有循环，循环关闭或回收后其模型与连接池被清除）
+_cache_loops: Dict[int, "weakref.ReferenceType[asyncio.AbstractEventLoop]"] = {}
+_llm_cache_lock = threading.Lock()
+_llm_cache_stats = {"hits": 0, "misses": 0}
+# 每个提供商一个 keep-alive 连接池，外层是该提供商的限流/重试传输层（见 llm_transport）
+_http_clients: Dict[str, Any] = {}
+# 异步连接绑定事件循环：每个循环每个提供商一个连接池，以及每个提供商的并发槽位
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+# get_llm 创建的模型 → 提供商名（id 为键，模型回收时移除）
+_model_providers: Dict[int, str] = {}
+_provider_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
 
-    Args:
-        callbacks: 可选的回调处理器列表，用于捕获 LLM 调用
-    """
-    config = get_config()
-    provider = config.model.get_active_provider()
-    active_name = config.model.active
 
-    # 合并全局回调和传入的回调
-    all_callbacks = []
-    all_callbacks.extend(_global_callbacks)
-    if callbacks:
-        all_callbacks.extend(callbacks)
+def _transport_options(client_config: Any, name: str, provider: Any, retry: bool = True) -> Dict[str, Any]:
+    """传输层参数：提供商的限流器与重试策略（retry=False 时不重试，见 _client_name）"""
+    from src.core.llm_transport import get_rate_limiter
+
+    return {
+        "limiter": get_rate_limiter(name, provider.requests_per_minute, provider.tokens_per_minute),
+        "max_retries": client_config.max_retries if retry else 0,
+        "backoff": client_config.retry_backoff,
+        "max_wait": client_config.retry_max_wait,
+    }
+
+
+def _limits(http: Any, client_config: Any):
+    return http.Limits(
+        max_connections=client_config.max_connections,
+        max_keepalive_connections=client_config.max_keepalive_connections,
+        keepalive_expiry=client_config.keepalive_expiry,
+    )
+
+
+def _client_name(name: str, retry: bool) -> str:
+    """连接池名：按节点路由时链中非最后一个提供商使用不重试的连接池，
+    超时、429 与 5xx 直接交给 with_fallbacks 切换到下一个提供商（限流器仍与该提供商共用）"""
+    return name if retry else f"{name}#failover"
+
+
+def _get_http_client(client_config: Any, name: str, provider: Any, retry: bool = True):
+    """提供商的所有客户端共用的 keep-alive HTTP 连接池（经限流/重试传输层发送）"""
+    client = _http_clients.get(_client_name(name, retry))
+    if client is None:
+        from openai import DefaultHttpxClient
+
+        from src.core.llm_transport import RateLimitedTransport, http_module
+
+        http = http_module()
+        transport = RateLimitedTransport(
+            http.HTTPTransport(limits=_limits(http, client_config)),
+            **_transport_options(client_config, name, provider, retry),
+        )
+        client = _http_clients[_client_name(name, retry)] = DefaultHttpxClient(transport=transport, timeout=client_config.timeout)
+    return client
+
 
-    # Azure OpenAI handling
-    use_azure = (
+def _get_async_http_client(
+    client_config: Any, name: str, provider: Any, loop: asyncio.AbstractEventLoop, retry: bool = True
+):
+    """事件循环内提供商的所有客户端共用的异步 keep-alive HTTP 连接池（与同步连接共用限流器）"""
+    clients = _async_http_clients.setdefault(loop, {})
+    client = clients.get(_client_name(name, retry))
+    if client is None:
+        from openai import DefaultAsyncHttpxClient
+
+        from src.core.llm_transport import AsyncRateLimitedTransport, http_module
+
+        http = http_module()
+        transport = AsyncRateLimitedTransport(
+            http.AsyncHTTPTransport(limits=_limits(http, client_config)),
+            **_transport_options(client_config, name, provider, retry),
+        )
+        client = clients[_client_name(name, retry)] = DefaultAsyncHttpxClient(transport=transport, timeout=client_config.timeout)
+    return client
+
+
+def _use_azure(provider: Any, active_name: str) -> bool:
+    return (
         provider.provider in {"azure_openai", "azure"}
         or active_name == "azure_openai"
         or "api_version" in (provider.model_kwargs or {})
         or (provider.base_url and "/openai/deployments/" in provider.base_url)
     )
 
+
+def _create_llm(
+    provider: Any,
+    use_azure: bool,
+    callbacks: list,
+    http_client: Any = None,
+    cache: Any = None,
+    http_async_client: Any = None,
+    timeout: Optional[float] = None,
+) -> ChatOpenAI:
+    """按提供商配置创建聊天模型（使用限流/重试传输层时关闭 SDK 自带的重试）"""
+    extra: Dict[str, Any] = {"http_client": http_client, "max_retries": 0} if http_client is not None else {}
+    if timeout is not None:
+        extra["timeout"] = timeout
+    if http_async_client is not None:
+        extra["http_async_client"] = http_async_client
+    if cache is not None:
+        extra["cache"] = cache
+
     if use_azure:
         api_version = (provider.model_kwargs or {}).get("api_version")
         azure_endpoint = provider.base_url
@@ -158,8 +248,9 @@ def get_llm(callbacks: list = None) -> ChatOpenAI:
             api_key=provider.api_key,
             temperature=provider.temperature,
             max_tokens=provider.max_tokens,
-            callbacks=all_callbacks if all_callbacks else None,
+            callbacks=callbacks if callbacks else None,
             model_kwargs=model_kwargs,
+            **extra,
         )
 
     return ChatOpenAI(
@@ -168,11 +259,255 @@ def get_llm(callbacks: list = None) -> ChatOpenAI:
         base_url=provider.base_url if provider.base_url else None,
         temperature=provider.temperature,
         max_tokens=provider.max_tokens,
-        callbacks=all_callbacks if all_callbacks else None,
+        callbacks=callbacks if callbacks else None,
         model_kwargs=provider.model_kwargs,
+        **extra,
     )
 
 
+def _response_cache_for(node: Optional[str], provider: Any) -> Any:
+    """节点使用的 LLM 响应缓存；未启用时返回 None
+
+    节点是否缓存由 model.response_cache.nodes 决定（未列出的节点取 default），
+    提供商温度高于 max_temperature 时输出不再近似确定，一律不缓存。
+    """
+    config = get_config().model.response_cache
+    if not config.enabled or node is None:
+        return None
+    if not config.nodes.get(node, config.default):
+        return None
+    if provider.temperature > config.max_temperature:
+        return None
+
+    from src.core.llm_cache import get_llm_response_cache
+
+    return get_llm_response_cache()
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _cache_key(
+    provider: Any,
+    use_azure: bool,
+    callbacks: list,
+    response_cache: Any = None,
+    timeout: Optional[float] = None,
+    retry: bool = True,
+) -> Tuple[Any, ...]:
+    """缓存键：提供商配置 + 回调对象 + 响应缓存 + 请求超时 + 是否传输层重试 + 当前事件循环 id（在最后）
+
+    回调按对象身份区分（缓存中的模型持有回调引用，身份不会被复用）；
+    在事件循环中调用时按循环区分，异步 HTTP 连接不会跨循环复用。循环只以 id 出现在键中，
+    循环关闭后由 _purge_closed_loops 清除其条目，id 被新循环复用前旧条目已移除。
+    """
+    loop = _running_loop()
+    settings = json.dumps(provider.model_dump(), sort_keys=True, default=str)
+    cache_id = id(response_cache) if response_cache is not None else None
+    loop_id = id(loop) if loop is not None else None
+    return (settings, use_azure, tuple(id(cb) for cb in callbacks), cache_id, timeout, retry, loop_id)
+
+
+def _purge_closed_loops() -> None:
+    """移除已关闭或已回收的事件循环的模型、异步连接池与并发槽位（调用方持有 _llm_cache_lock）
+
+    每次 asyncio.run()（如每个 aquery）使用新的循环，循环结束后立即清除，不必等到 LRU 淘汰。
+    """
+    closed = set()
+    for loop_id, ref in _cache_loops.items():
+        loop = ref()
+        if loop is None or loop.is_closed():
+            closed.add(loop_id)
+            if loop is not None:
+                # 异步连接池只能在所属事件循环中关闭，这里只丢弃引用
+                _async_http_clients.pop(loop, None)
+                _provider_slots.pop(loop, None)
+    if not closed:
+        return
+    for loop_id in closed:
+        del _cache_loops[loop_id]
+    for key in [key for key in _llm_cache if key[-1] in closed]:
+        del _llm_cache[key]
+
+
+def get_llm(callbacks: list = None, node: Optional[str] = None) -> Any:
+    """获取 LLM 实例 - 支持回调
+
+    相同提供商配置与回调的调用返回进程内缓存的同一个实例（model.client.cache_clients），
+    同一提供商的实例共享一个 keep-alive HTTP 连接池；在事件循环中获取的实例另外共享该循环的异步连接池（供 ainvoke 使用）。
+    连接池外层按提供商限流（requests_per_minute / tokens_per_minute），429/5xx 在传输层重试（见 llm_transport；
+    回退链中非最后一个提供商不重试，直接回退）。
+    传入 node 时按 model.response_cache 为该节点挂载 LLM 响应缓存；
+    model.routing.nodes 为该节点指定了提供商链时按链创建并记录该节点的调用耗时，
+    多个提供商时返回 with_fallbacks 组合（见 model_router）。
+
+    Args:
+        callbacks: 可选的回调处理器列表，用于捕获 LLM 调用
+        node: 调用方的工作流节点名（intent_analysis、sql_validation 等）
+    """
+    from src.core.model_router import latency_callback, provider_chain
+
+    model_config = get_config().model
+
+    # 合并全局回调和传入的回调
+    all_callbacks = []
+    all_callbacks.extend(_global_callbacks)
+    if callbacks:
+        all_callbacks.extend(callbacks)
+
+    chain = provider_chain(model_config, node)
+    routed = node is not None and node in model_config.routing.nodes
+    fallback_timeout = model_config.routing.fallback_timeout or None
+    models = []
+    for index, name in enumerate(chain):
+        provider = model_config.providers[name] if name in model_config.providers else model_config.get_active_provider()
+        # 路由节点记录耗时（未路由的节点与其他节点共享同一个缓存实例）
+        node_callbacks = all_callbacks + [latency_callback(node, name)] if routed else all_callbacks
+        # 后面还有回退的提供商时缩短超时且传输层不重试，慢响应、429 与 5xx 立即回退
+        failover = index < len(chain) - 1
+        timeout = fallback_timeout if failover else None
+        models.append(_provider_llm(model_config.client, name, provider, node_callbacks, node, timeout, not failover))
+    return models[0] if len(models) == 1 else models[0].with_fallbacks(models[1:])
+
+
+def _provider_llm(
+    client_config: Any,
+    name: str,
+    provider: Any,
+    callbacks: list,
+    node: Optional[str],
+    timeout: Optional[float],
+    retry: bool = True,
+) -> ChatOpenAI:
+    """单个提供商的聊天模型（按 model.client.cache_clients 复用；retry=False 时传输层不重试）"""
+    use_azure = _use_azure(provider, name)
+    response_cache = _response_cache_for(node, provider)
+    if not client_config.cache_clients:
+        http_client, http_async_client = _http_clients_for(client_config, name, provider, retry)
+        llm = _create_llm(provider, use_azure, callbacks, http_client, response_cache, http_async_client, timeout)
+        return _register_provider(llm, name)
+
+    key = _cache_key(provider, use_azure, callbacks, response_cache, timeout, retry)
+    with _llm_cache_lock:
+        _purge_closed_loops()
+        llm = _llm_cache.get(key)
+        if llm is not None:
+            _llm_cache.move_to_end(key)
+            _llm_cache_stats["hits"] += 1
+            return llm
+
+    http_client, http_async_client = _http_clients_for(client_config, name, provider, retry)
+    llm = _create_llm(provider, use_azure, callbacks, http_client, response_cache, http_async_client, timeout)
+    with _llm_cache_lock:
+        _llm_cache_stats["misses"] += 1
+        llm = _llm_cache.setdefault(key, _register_provider(llm, name))
+        _llm_cache.move_to_end(key)
+        loop = _running_loop()
+        if loop is not None:
+            _cache_loops.setdefault(id(loop), weakref.ref(loop))
+        while len(_llm_cache) > max(1, client_config.max_cached_clients):
+            _llm_cache.popitem(last=False)
+    return llm
+
+
+def _register_provider(llm: ChatOpenAI, name: str) -> ChatOpenAI:
+    """记录模型所属的提供商（ainvoke_llm 据此选择并发槽位），模型回收时自动移除"""
+    _model_providers[id(llm)] = name
+    weakref.finalize(llm, _model_providers.pop, id(llm), None)
+    return llm
+
+
+def provider_of(llm: Any) -> Optional[str]:
+    """模型（或其 bind_tools / with_structured_output / with_fallbacks 包装）的首选提供商名"""
+    for _ in range(8):
+        if llm is None:
+            return None
+        name = _model_providers.get(id(llm))
+        if name is not None:
+            return name
+        llm = getattr(llm, "runnable", None) or getattr(llm, "bound", None) or getattr(llm, "first", None)
+    return None
+
+
+def _http_clients_for(client_config: Any, name: str, provider: Any, retry: bool = True) -> Tuple[Any, Any]:
+    """(同步连接池, 当前事件循环的异步连接池或 None)"""
+    with _llm_cache_lock:
+        http_client = _get_http_client(client_config, name, provider, retry)
+        loop = _running_loop()
+        http_async_client = (
+            _get_async_http_client(client_config, name, provider, loop, retry) if loop is not None else None
+        )
+    return http_client, http_async_client
+
+
+def get_llm_cache_stats() -> Dict[str, int]:
+    """LLM 客户端缓存命中统计"""
+    with _llm_cache_lock:
+        return dict(_llm_cache_stats, size=len(_llm_cache))
+
+
+def reset_llm_cache() -> None:
+    """清空 LLM 客户端缓存、限流器、路由状态并关闭共享连接池（切换提供商或修改配置后调用）"""
+    from src.core.llm_transport import reset_rate_limiters
+    from src.core.model_router import reset_model_router
+
+    with _llm_cache_lock:
+        _llm_cache.clear()
+        _cache_loops.clear()
+        _llm_cache_stats.update(hits=0, misses=0)
+        clients = list(_http_clients.values())
+        _http_clients.clear()
+        # 异步连接池只能在所属事件循环中关闭，这里只丢弃引用
+        _async_http_clients.clear()
+        _provider_slots.clear()
+    reset_rate_limiters()
+    reset_model_router()
+    for client in clients:
+        client.close()
+
+
+def llm_slot(provider_name: Optional[str] = None) -> asyncio.Semaphore:
+    """当前事件循环中提供商的并发槽位（model.client.max_concurrency）
+
+    Args:
+        provider_name: 提供商名，默认为 model.active
+
+    Returns:
+        信号量；在事件循环外调用时抛出 RuntimeError
+    """
+    loop = asyncio.get_running_loop()
+    config = get_config().model
+    name = provider_name or config.active
+    with _llm_cache_lock:
+        _purge_closed_loops()
+        # 信号量绑定所属循环（值引用键），由 _purge_closed_loops 在循环关闭后移除
+        _cache_loops.setdefault(id(loop), weakref.ref(loop))
+        slots = _provider_slots.setdefault(loop, {})
+        slot = slots.get(name)
+        if slot is None:
+            slot = slots[name] = asyncio.Semaphore(max(1, config.client.max_concurrency))
+    return slot
+
+
+async def ainvoke_llm(llm: Any, messages: Sequence[Any], provider_name: Optional[str] = None) -> Any:
+    """异步调用聊天模型（占用提供商的并发槽位，超过上限的调用在事件循环内排队）
+
+    Args:
+        llm: 聊天模型（或 bind_tools / with_structured_output 后的 Runnable）
+        messages: 消息列表
+        provider_name: 提供商名，默认为模型所属的提供商（按节点路由时为链中首选），无法识别时为 model.active
+
+    Returns:
+        模型输出
+    """
+    async with llm_slot(provider_name or provider_of(llm)):
+        return await llm.ainvoke(messages)
+
+
 def create_llm_provider() -> ILLMProvider:
     """创建 LLM 提供商实例"""
     config = get_config()
@@ -0,0 +1,298 @@
+"""LLM 响应缓存 - 内存 LRU + SQLite 磁盘层，挂在 get_llm() 返回的聊天模型上
+
+温度为 0.1 时，意图识别、技能选择、选表与 SQL 校验的提示词对重复问题输出近似确定，
+缓存命中时不再请求提供商。实现 langchain 的 BaseCache 接口，通过聊天模型的 cache 字段
+按节点启用（model.response_cache.nodes），流式调用不经过缓存。
+
+缓存键 = sha256(llm_string + 序列化消息列表)：
+- llm_string 由 langchain 生成，包含模型类型、模型名、base_url、温度/max_tokens 等参数与 stop
+- 消息列表序列化前已去掉消息 id
+
+两个层级都有条目上限与 TTL；磁盘层命中后提升到内存层，按访问时间淘汰。
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("llm_cache")
+
+
+def _serialize(generations: Sequence[Any]) -> str:
+    return dumps(list(generations))
+
+
+def _deserialize(value: str) -> Any:
+    with warnings.catch_warnings():
+        # loads 标记为 beta；缓存内容只来自本进程写入的生成结果
+        warnings.simplefilter("ignore")
+        return loads(value, allowed_objects="core")
+
+
+class _SQLiteTier:
+    """SQLite 单表存储，按访问时间淘汰"""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses (accessed_at)")
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0], row[1]
+
+    def put(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.ttl_seconds:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN "
+                "(SELECT key FROM llm_responses ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache(BaseCache):
+    """LLM 响应缓存 - 线程安全"""
+
+    def __init__(
+        self,
+        max_memory_entries: int = 1024,
+        ttl_seconds: float = 86400.0,
+        disk_enabled: bool = True,
+        disk_path: str = ".cache/llm_responses.sqlite",
+        max_disk_entries: int = 20000,
+        log_every: int = 50,
+    ):
+        """
+        Args:
+            max_memory_entries: 内存层条目上限
+            ttl_seconds: 条目存活时间（两个层级共用，按写入时间计算），0 表示不过期
+            disk_enabled: 是否启用 SQLite 磁盘层
+            disk_path: SQLite 文件路径
+            max_disk_entries: 磁盘层条目上限
+            log_every: 每 N 次查找输出一次命中率，0 表示不输出
+        """
+        self.max_memory_entries = max(1, max_memory_entries)
+        self.ttl_seconds = ttl_seconds
+        self.log_every = log_every
+        # 内存层保存序列化文本：langchain 会改写返回的消息（补充 id），不能共享对象
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._disk: Optional[_SQLiteTier] = None
+        if disk_enabled:
+            try:
+                self._disk = _SQLiteTier(disk_path, max_disk_entries, ttl_seconds)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"LLM response cache disk tier disabled: {e}")
+        self._lock = threading.Lock()
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @classmethod
+    def from_config(cls) -> "LLMResponseCache":
+        """按 model.response_cache 配置创建"""
+        try:
+            from src.config.settings import get_config
+
+            config = get_config().model.response_cache
+            return cls(
+                max_memory_entries=config.max_memory_entries,
+                ttl_seconds=config.ttl_seconds,
+                disk_enabled=config.disk_enabled,
+                disk_path=config.disk_path,
+                max_disk_entries=config.max_disk_entries,
+                log_every=config.log_every,
+            )
+        except Exception as e:
+            logger.warning(f"无法读取 LLM 响应缓存配置，使用默认值: {e}")
+            return cls()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """缓存键：模型标识与参数 + 序列化消息列表的哈希"""
+        digest = hashlib.sha256(llm_string.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        """按提示词与模型参数查找缓存的生成结果"""
+        key = self.make_key(prompt, llm_string)
+        tier = None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                tier = "memory"
+
+        if entry is None and self._disk is not None:
+            try:
+                entry = self._disk.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache disk lookup failed: {e}")
+            if entry is not None:
+                tier = "disk"
+
+        generations = None
+        if entry is not None:
+            try:
+                generations = _deserialize(entry[0])
+            except Exception as e:
+                logger.warning(f"Discarding unreadable LLM cache entry {key[:12]}: {e}")
+
+        with self._lock:
+            if generations is None:
+                self._metrics["misses"] += 1
+            else:
+                self._metrics[f"{tier}_hits"] += 1
+                if tier == "disk":
+                    self._remember(key, entry[0], entry[1])
+            lookups = self._metrics["memory_hits"] + self._metrics["disk_hits"] + self._metrics["misses"]
+        if generations is not None:
+            logger.debug(f"LLM response cache {tier} hit {key[:12]}")
+        if self.log_every and lookups % self.log_every == 0:
+            self._log_stats()
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        """写入生成结果（无法序列化的结果跳过）"""
+        key = self.make_key(prompt, llm_string)
+        try:
+            value = _serialize(return_val)
+        except Exception as e:
+            logger.debug(f"LLM response not cached: {e}")
+            return
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            self._metrics["stores"] += 1
+        if self._disk is not None:
+            try:
+                self._disk.put(key, value, created_at)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache disk write failed: {e}")
+
+    def clear(self, **kwargs: Any) -> None:
+        """清空两个层级"""
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率与各层条目数"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        if self._disk is not None:
+            stats["disk_entries"] = len(self._disk)
+            stats["evictions"] += self._disk.evictions
+        return stats
+
+    def _log_stats(self) -> None:
+        stats = self.get_stats()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        logger.info(
+            f"LLM response cache: hit rate {stats['hit_rate']:.1%} over {lookups} lookups "
+            f"(memory {stats['memory_hits']}, disk {stats['disk_hits']}), "
+            f"{stats['memory_entries']} entries in memory, {stats.get('disk_entries', 0)} on disk"
+        )
+
+    def close(self) -> None:
+        """关闭磁盘层连接"""
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """获取 LLM 响应缓存单例"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache.from_config()
+    return _cache
+
+
+def reset_llm_response_cache() -> None:
+    """重置 LLM 响应缓存单例（重新读取配置，已缓存的条目仍保留在磁盘层）"""
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,303 @@
+"""LLM 传输层 - 按提供商限流并在 429/5xx 时重试，包在 get_llm() 使用的 HTTP 连接池外层
+
+每个提供商一个令牌桶限流器（ProviderConfig.requests_per_minute / tokens_per_minute，0 表示不限），
+同步与异步连接共享同一个限流器，进程内各线程、各事件循环的请求一起计数：
+- 请求数桶每次请求取 1；令牌数桶按请求体估算（消息字数 + max_tokens，与提供商计算 TPM 的方式一致）
+- 桶不足时预扣并等待（允许欠额），排队的请求按到达顺序放行
+
+429、5xx 与连接错误按 model.client.max_retries 重试：
+- 响应带 Retry-After / retry-after-ms 且不超过 retry_max_wait 时按其等待（另加少量抖动），
+  并让同一提供商的其他请求一起暂停到该时刻
+- 否则按 retry_backoff * 2^n 指数退避（上限 retry_max_wait，半随机抖动）
+
+传输层重试只计入 get_llm_transport_stats() 与 count_llm_retries()，与工作流的 retry_count（SQL 重试）无关；
+使用本传输层的模型关闭 openai SDK 自带的重试，避免重试次数相乘。
+
+传输层按鸭子类型包装内层传输，内层与异常类型来自 openai SDK 实际使用的 HTTP 库（见 http_module）。
+"""
+
+import asyncio
+import contextvars
+import importlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from types import ModuleType
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.config.logger_interface import get_logger
+from src.core.prompt_budget import estimate_tokens
+
+logger = get_logger("llm_transport")
+
+# 当前请求（NLToSQLAgent 的一次查询）的传输层重试计数
+_request_counter: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar(
+    "llm_retry_counter", default=None
+)
+
+
+class TokenBucket:
+    """每分钟额度的令牌桶（容量 = 一分钟额度），预扣后返回需要等待的秒数"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """预扣 amount（超过容量时按容量计），返回额度补足前需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class ProviderRateLimiter:
+    """单个提供商的请求数/令牌数限流器与重试统计"""
+
+    def __init__(self, name: str, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "throttled_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """为一次请求预扣额度，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self.stats["requests"] += 1
+            self.stats["throttled_seconds"] += wait
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """提供商要求稍后重试：本提供商的后续请求至少等到该时刻"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def record_retry(self, rate_limited: bool) -> None:
+        with self._lock:
+            self.stats["retries"] += 1
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+        counter = _request_counter.get()
+        if counter is not None:
+            counter["retries"] += 1
+            if rate_limited:
+                counter["rate_limited"] += 1
+
+
+_limiters: Dict[str, Tuple[Tuple[int, int], ProviderRateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, requests_per_minute: int = 0, tokens_per_minute: int = 0) -> ProviderRateLimiter:
+    """提供商的限流器（进程内单例；额度配置变化时重建）"""
+    limits = (requests_per_minute, tokens_per_minute)
+    with _limiters_lock:
+        entry = _limiters.get(name)
+        if entry is None or entry[0] != limits:
+            entry = _limiters[name] = (limits, ProviderRateLimiter(name, *limits))
+        return entry[1]
+
+
+def reset_rate_limiters() -> None:
+    """清空限流器与统计"""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def get_llm_transport_stats() -> Dict[str, Dict[str, float]]:
+    """各提供商的请求数、传输层重试次数、其中 429 次数与限流等待总秒数"""
+    with _limiters_lock:
+        limiters = [entry[1] for entry in _limiters.values()]
+    stats = {}
+    for limiter in limiters:
+        with limiter._lock:
+            stats[limiter.name] = dict(limiter.stats)
+    return stats
+
+
+def http_module() -> ModuleType:
+    """openai SDK 使用的 HTTP 库（httpx，新版 SDK 为 httpx2），连接池与传输层须来自同一个库"""
+    from openai import DefaultHttpxClient
+
+    base = next(cls for cls in DefaultHttpxClient.__mro__ if cls.__name__ == "Client")
+    return importlib.import_module(base.__module__.split(".")[0])
+
+
+def _retry_errors(inner: Any) -> Tuple[type, ...]:
+    """内层传输所属 HTTP 库中可重试的连接错误（请求未送达或响应未完整读取）"""
+    http = importlib.import_module(type(inner).__module__.split(".")[0])
+    return (http.TimeoutException, http.NetworkError, http.RemoteProtocolError)
+
+
+@contextmanager
+def count_llm_retries() -> Iterator[Dict[str, int]]:
+    """统计当前上下文（含其中派生的线程与协程）内的传输层重试
+
+    Yields:
+        {"retries": 重试次数, "rate_limited": 其中 429 次数}，退出时仍可读取
+    """
+    counter = {"retries": 0, "rate_limited": 0}
+    token = _request_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _request_counter.reset(token)
+
+
+def estimate_request_tokens(request: Any) -> int:
+    """估算请求占用的令牌数：消息文本（见 prompt_budget.estimate_tokens）+ max_tokens"""
+    try:
+        body = json.loads(request.content or b"{}")
+    except Exception:  # 非 JSON 或流式请求体
+        return 1
+    if not isinstance(body, dict):
+        return 1
+    text = json.dumps(body.get("messages") or body.get("input") or "", ensure_ascii=False)
+    prompt_tokens = estimate_tokens(text)
+    completion_tokens = body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return max(1, prompt_tokens + int(completion_tokens))
+
+
+def _retry_after(response: Any) -> Optional[float]:
+    """响应要求的等待秒数（retry-after-ms 或 Retry-After 秒数/HTTP 日期）"""
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+    except ValueError:
+        pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _RetryPolicy:
+    """429/5xx/连接错误的重试判断与退避时间"""
+
+    def __init__(self, limiter: ProviderRateLimiter, max_retries: int, backoff: float, max_wait: float):
+        self.limiter = limiter
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.max_wait = max_wait
+
+    def delay(self, attempt: int, response: Any) -> Optional[float]:
+        """第 attempt 次失败后的等待秒数；不再重试时返回 None"""
+        if attempt >= self.max_retries:
+            return None
+        if response is not None and not (response.status_code in (408, 429) or response.status_code >= 500):
+            return None
+        rate_limited = response is not None and response.status_code == 429
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None and 0 <= retry_after <= self.max_wait:
+            delay = retry_after * random.uniform(1.0, 1.1)
+            self.limiter.pause(delay)
+        else:
+            ceiling = min(self.max_wait, self.backoff * (2 ** attempt))
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        self.limiter.record_retry(rate_limited)
+        status = response.status_code if response is not None else "connection error"
+        logger.warning(
+            f"LLM provider {self.limiter.name} returned {status}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s"
+        )
+        return delay
+
+
+class RateLimitedTransport:
+    """同步传输层：限流 + 重试，实际请求交给内层连接池"""
+
+    def __init__(self, inner: Any, limiter: ProviderRateLimiter, **retry: Any):
+        self.inner = inner
+        self.policy = _RetryPolicy(limiter, **retry)
+        self.retry_errors = _retry_errors(inner)
+
+    def handle_request(self, request: Any) -> Any:
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            wait = self.policy.limiter.reserve(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self.inner.handle_request(request)
+            except self.retry_errors:
+                delay = self.policy.delay(attempt, None)
+                if delay is None:
+                    raise
+            else:
+                delay = self.policy.delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def __enter__(self) -> "RateLimitedTransport":
+        self.inner.__enter__()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.inner.__exit__(*exc_info)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncRateLimitedTransport:
+    """异步传输层：与同步版本共享限流器，等待时不阻塞事件循环"""
+
+    def __init__(self, inner: Any, limiter: ProviderRateLimiter, **retry: Any):
+        self.inner = inner
+        self.policy = _RetryPolicy(limiter, **retry)
+        self.retry_errors = _retry_errors(inner)
+
+    async def handle_async_request(self, request: Any) -> Any:
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            wait = self.policy.limiter.reserve(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await self.inner.handle_async_request(request)
+            except self.retry_errors:
+                delay = self.policy.delay(attempt, None)
+                if delay is None:
+                    raise
+            else:
+                delay = self.policy.delay(attempt, response)
+                if delay is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def __aenter__(self) -> "AsyncRateLimitedTransport":
+        await self.inner.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.inner.__aexit__(*exc_info)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
@@ -3,6 +3,7 @@
 Provides table name resolution for natural language queries.
 """
 
+import json
 from typing import List, Optional, Dict, Any
 
 # We need a way to access the active skill.
@@ -16,6 +17,7 @@ def resolve_table_names(
     user_query: str,
     intent_analysis: Optional[Dict[str, Any]] = None,
     skill_metadata: Optional[Dict[str, Any]] = None,
+    use_defaults: bool = True,
 ) -> List[str]:
     """
     Resolve table names from user query and intent analysis using skill metadata.
@@ -24,6 +26,7 @@ def resolve_table_names(
         user_query: User's natural language query
         intent_analysis: Intent analysis results (optional)
         skill_metadata: Metadata from the active skill (optional)
+        use_defaults: Return default_tables when nothing matches (False returns [])
 
     Returns:
         List of table names that are likely relevant to the query
@@ -40,7 +43,7 @@ def resolve_table_names(
     tables = []
 
     keyword_map = skill_metadata.get("keyword_table_map", {})
-    tables_map = skill_metadata.get("tables", {})
+    tables_map = _tables_map(skill_metadata)
 
     for keyword, table_list in keyword_map.items():
         if keyword.lower() in query_lower:
@@ -55,6 +58,8 @@ def resolve_table_names(
 
     # If no specific tables detected, return default tables
     if not tables:
+        if not use_defaults:
+            return []
         default_tables = skill_metadata.get("default_tables", [])
         mapped = []
         for table in default_tables:
@@ -76,6 +81,37 @@ def resolve_table_names(
     return result
 
 
+def _tables_map(skill_metadata: Dict[str, Any]) -> Dict[str, str]:
+    """Logical -> physical table names ("tables" may also be a plain list of physical names)."""
+    tables = skill_metadata.get("tables") or {}
+    if isinstance(tables, dict):
+        return tables
+    return {name: name for name in tables}
+
+
+def parse_skill_metadata(skill_context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Parse the JSON block of references/metadata.md from a skill context.
+
+    The workflow state carries the skill context (SkillContext.__dict__) rather
+    than the Skill object, so the metadata is read from its modules.
+
+    Args:
+        skill_context: Skill context dict with a "modules" mapping
+
+    Returns:
+        Skill metadata, empty when missing or unparsable
+    """
+    content = ((skill_context or {}).get("modules") or {}).get("metadata") or ""
+    if "```json" not in content:
+        return {}
+    try:
+        metadata = json.loads(content.split("```json")[1].split("```")[0])
+    except (ValueError, IndexError):
+        return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
 def get_table_schema(
     table_name: str, skill_metadata: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
@@ -96,7 +132,7 @@ def get_table_schema(
 
     # Handle aliases if defined in metadata?
     # For now assume direct match or check tables dict
-    tables_map = skill_metadata.get("tables", {})
+    tables_map = _tables_map(skill_metadata)
 
     # Check if table_name is an alias key in "tables"
     real_name = tables_map.get(table_name, table_name)
@@ -122,7 +158,7 @@ def get_all_tables(skill_metadata: Optional[Dict[str, Any]] = None) -> List[str]
     if schemas:
         return list(schemas.keys())
 
-    tables_map = skill_metadata.get("tables", {})
+    tables_map = _tables_map(skill_metadata)
     # Prefer physical table names (values) if provided
     if tables_map:
         seen = set()
@@ -176,6 +212,20 @@ def get_business_logic_context(skill: Any = None) -> str:
     return ""
 
 
+def _with_rollup_rules(rules: str, dialect: str) -> str:
+    """启用分摊预聚合表时追加引导规则"""
+    try:
+        from src.config.settings import get_config
+        from src.core.data_sources.rollups import rollup_sql_rules
+
+        rollup_config = get_config().data_source.rollups
+        if rollup_config.enabled:
+            return rules + rollup_sql_rules(dialect, rollup_config.table)
+    except Exception:
+        pass
+    return rules
+
+
 def get_sql_generation_rules(
     data_source_type: str = "postgresql", skill: Any = None
 ) -> str:
@@ -193,7 +243,7 @@ def get_sql_generation_rules(
 
     # Fallback to generic rules if not provided by skill
     if data_source_type.lower() == "postgresql":
-        return """
+        return _with_rollup_rules("""
 ## PostgreSQL SQL 生成规则
 
 ### 通用规则
@@ -210,9 +260,9 @@ def get_sql_generation_rules(
 
 ### JOIN 语法
 - 通常使用 LEFT JOIN
-"""
+""", "postgresql")
     if data_source_type.lower() in {"sqlserver", "mssql", "ms_sql", "sql_server"}:
-        return """
+        return _with_rollup_rules("""
 ## SQL Server SQL 生成规则
 
 ### 通用规则
@@ -242,9 +292,13 @@ def get_sql_generation_rules(
 
 ### 类型转换
 - 使用 CAST(col AS FLOAT) 或 CAST(col AS DECIMAL(18, 4))
-"""
-    else:
-        return """
+""", "sqlserver")
+    if data_source_type.lower() == "federated":
+        return _SQLITE_RULES + _FEDERATED_RULES
+    return _SQLITE_RULES
+
+
+_SQLITE_RULES = """
     ## SQLite/Excel SQL 生成规则
 
     ### 通用规则
@@ -275,3 +329,11 @@ def get_sql_generation_rules(
     - 使用 CAST(col AS REAL) 进行数值转换
     - 使用 CAST(col AS TEXT) 进行字符串转换
     """
+
+_FEDERATED_RULES = """
+    ### 联邦查询（Excel 表 + PostgreSQL 表）
+    - 整条查询在本地 SQLite 中执行，PostgreSQL 表的过滤与聚合会被下推
+    - 远程表先写成只引用远程表的 CTE，在 CTE 内完成 WHERE 过滤与 GROUP BY 聚合，再与 Excel 表 JOIN
+    - 远程 CTE 内只使用 SQLite 与 PostgreSQL 通用的语法（禁止 strftime 等方言函数）
+    - 每个远程表/CTE 最多返回有限行数，超出会报错，禁止直接 SELECT * 整张远程表
+    """
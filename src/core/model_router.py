@@ -0,0 +1,205 @@
+"""按节点路由模型 - 每个工作流节点使用自己的提供商链，首选提供商慢或不可用时依次回退
+
+model.routing.nodes 为节点指定提供商链，例如意图分析、技能选择、结果审查用本地小模型，
+SQL 生成用强模型；未列出的节点使用 model.active。get_llm(node=...) 按链创建模型，
+链中有多个提供商时返回 with_fallbacks 组合：
+- 非最后一个提供商的单次请求超时为 routing.fallback_timeout，且传输层不重试：超时、429、5xx 或连接错误即交给下一个
+- 调用失败的提供商在 cooldown_seconds 内排到链尾，之后的请求直接从下一个开始
+
+路由节点的每次调用按 节点/提供商 记录耗时（响应缓存命中单独计数，不计入耗时），
+get_node_latency_stats() 返回各组合的调用数、失败数与耗时分位数，用于调整路由；
+只想先观察耗时的节点可配置为只含 active 的单元素链。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("model_router")
+
+
+class NodeLatencyStats:
+    """节点/提供商 组合的调用耗时（最近 window 个样本）与计数"""
+
+    def __init__(self, window: int = 200):
+        self.window = max(1, window)
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, key: Tuple[str, str]) -> Dict[str, int]:
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = {"calls": 0, "errors": 0, "cached": 0}
+            self._samples[key] = deque(maxlen=self.window)
+        return counts
+
+    def record(self, node: str, provider: str, seconds: float, error: bool = False, cached: bool = False) -> int:
+        """记录一次调用，返回该组合的累计调用数"""
+        key = (node, provider)
+        with self._lock:
+            counts = self._count(key)
+            counts["calls"] += 1
+            if error:
+                counts["errors"] += 1
+            elif cached:
+                counts["cached"] += 1
+            else:
+                self._samples[key].append(seconds)
+            return counts["calls"]
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """{节点: {提供商: 调用数、失败数、缓存命中数与耗时均值/p50/p95（毫秒）}}"""
+        with self._lock:
+            items = [(key, dict(counts), sorted(self._samples[key])) for key, counts in self._counts.items()]
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (node, provider), counts, samples in items:
+            entry: Dict[str, float] = dict(counts)
+            if samples:
+                entry["avg_ms"] = round(sum(samples) / len(samples) * 1000, 1)
+                entry["p50_ms"] = round(samples[len(samples) // 2] * 1000, 1)
+                entry["p95_ms"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1)
+            result.setdefault(node, {})[provider] = entry
+        return result
+
+
+class ProviderHealth:
+    """提供商调用失败后的冷却期（冷却中的提供商排到回退链尾）"""
+
+    def __init__(self):
+        self._down_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_failed(self, provider: str, cooldown: float) -> None:
+        if cooldown <= 0:
+            return
+        with self._lock:
+            self._down_until[provider] = time.monotonic() + cooldown
+
+    def mark_ok(self, provider: str) -> None:
+        with self._lock:
+            self._down_until.pop(provider, None)
+
+    def is_down(self, provider: str) -> bool:
+        with self._lock:
+            return self._down_until.get(provider, 0.0) > time.monotonic()
+
+
+_stats: Optional[NodeLatencyStats] = None
+_health = ProviderHealth()
+_handlers: Dict[Tuple[str, str], "NodeLatencyCallback"] = {}
+_router_lock = threading.Lock()
+
+
+def _routing_config() -> Any:
+    from src.config.settings import get_config
+
+    return get_config().model.routing
+
+
+def get_node_latency_stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """各节点/提供商的调用数、失败数、缓存命中数与耗时分位数"""
+    return _latency_stats().snapshot()
+
+
+def _latency_stats() -> NodeLatencyStats:
+    global _stats
+    with _router_lock:
+        if _stats is None:
+            _stats = NodeLatencyStats(_routing_config().latency_window)
+        return _stats
+
+
+def reset_model_router() -> None:
+    """清空耗时统计与提供商冷却状态"""
+    global _stats, _health
+    with _router_lock:
+        _stats = None
+        _health = ProviderHealth()
+
+
+class NodeLatencyCallback(BaseCallbackHandler):
+    """挂在 节点/提供商 模型上的回调：记录调用耗时，失败时让提供商进入冷却期"""
+
+    run_inline = True
+
+    def __init__(self, node: str, provider: str):
+        self.node = node
+        self.provider = provider
+        self._started: Dict[UUID, float] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Any, prompts: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def _elapsed(self, run_id: UUID) -> float:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        # 响应缓存命中时 llm_output 为空，不计入耗时
+        cached = not getattr(response, "llm_output", None)
+        self._record(self._elapsed(run_id), error=False, cached=cached)
+        if not cached:
+            _health.mark_ok(self.provider)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._record(self._elapsed(run_id), error=True)
+        try:
+            cooldown = _routing_config().cooldown_seconds
+        except Exception:
+            cooldown = 0.0
+        _health.mark_failed(self.provider, cooldown)
+        logger.warning(f"LLM call for node {self.node} failed on provider {self.provider}: {error}")
+
+    def _record(self, seconds: float, error: bool, cached: bool = False) -> None:
+        calls = _latency_stats().record(self.node, self.provider, seconds, error=error, cached=cached)
+        try:
+            log_every = _routing_config().log_every
+        except Exception:
+            log_every = 0
+        if log_every and calls % log_every == 0:
+            entry = get_node_latency_stats().get(self.node, {}).get(self.provider, {})
+            logger.info(f"LLM latency {self.node}/{self.provider}: {entry}")
+
+
+def latency_callback(node: str, provider: str) -> NodeLatencyCallback:
+    """节点/提供商 的耗时回调（同一组合复用同一个对象，模型缓存键保持稳定）"""
+    key = (node, provider)
+    with _router_lock:
+        handler = _handlers.get(key)
+        if handler is None:
+            handler = _handlers[key] = NodeLatencyCallback(node, provider)
+        return handler
+
+
+def provider_chain(model_config: Any, node: Optional[str]) -> List[str]:
+    """节点使用的提供商链：routing.nodes 中的配置（忽略未定义的提供商），冷却中的排到链尾
+
+    Args:
+        model_config: model 配置
+        node: 工作流节点名
+
+    Returns:
+        提供商名列表（至少包含一个；未配置路由时为 [model.active]）
+    """
+    configured = model_config.routing.nodes.get(node) if node else None
+    chain = [name for name in (configured or []) if name in model_config.providers]
+    if configured and len(chain) < len(configured):
+        logger.warning(f"Unknown providers in model.routing.nodes.{node} ignored: {configured}")
+    if not chain:
+        return [model_config.active]
+    healthy = [name for name in chain if not _health.is_down(name)]
+    return healthy + [name for name in chain if name not in healthy]
@@ -0,0 +1,432 @@
+"""提示词令牌预算 - 按节点限制提示词长度，超出时按与问题的相关度裁剪上下文
+
+prompt_budget.nodes 为节点指定令牌预算（本地估算，见 estimate_tokens）。PromptAssembler 把上下文拆成可裁剪单元：
+- 表结构：每个字段一行（=== Table: X === 下的各行），缩短形式只保留字段名与类型（去掉样本值等）
+- Markdown 文本（业务规则、SQL 规则、技能文档）：每个标题及其正文为一个章节，缩短形式只保留标题与首行
+- 技能上下文：文档与模块按章节拆分，脚本源码整体为一个单元（只能保留或省略）
+
+单元按与问题的相关度排序（标题/字段名命中问题词计 3 分，正文命中计 1 分；问题中出现取值的字段、选表给出的字段
+与包含调用方指定词（如技能表名）的章节另加分），
+未超预算时原样返回；超预算时相关单元按相关度优先保留完整形式，其余单元先保留缩短形式、剩余额度再恢复完整形式，
+放不下的省略并标注省略数量。
+相同输入的裁剪结果相同，不影响 LLM 响应缓存命中。每次裁剪记录节省的令牌数（get_prompt_budget_stats）。
+"""
+
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("prompt_budget")
+
+_ASCII_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile(r"[一-鿿]+")
+_HEADING = re.compile(r"^#{1,6}\s")
+_TABLE_HEADER = re.compile(r"^=== Table: (.+?) ===\s*$")
+
+NAME_WEIGHT = 3.0  # 标题/字段名命中问题词
+BODY_WEIGHT = 1.0  # 正文命中问题词
+KEEP_WEIGHT = 10.0  # 问题中出现取值的字段、选表给出的字段
+RESERVE_RATIO = 0.02  # 为省略标注预留的预算比例（仍超出时再逐个缩短相关度最低的单元）
+
+_OMITTED = {
+    "column": "  …（省略 {n} 个与问题无关的字段）",
+    "section": "（省略 {n} 个与问题无关的章节）",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """本地估算文本的令牌数：ASCII 约 4 字符 1 个令牌，其余字符（中文等）每字 1 个
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的令牌数
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def relevance_terms(text: str) -> Set[str]:
+    """相关度计算用的词：ASCII 词（至少 2 个字符）与中文 2-gram（单字词保留单字）"""
+    text = text.casefold()
+    terms = {word for word in _ASCII_WORD.findall(text) if len(word) > 1}
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+@dataclass
+class _Unit:
+    """可裁剪单元：完整形式、缩短形式（为空表示只能保留或省略）与相关度"""
+
+    kind: str
+    full: str
+    short: str = ""
+    score: float = 0.0
+    order: int = 0
+    escaped: bool = False  # 位于 JSON 字符串内（按转义后的长度计）
+    choice: str = "full"  # full / short / drop
+
+    def tokens(self, text: str) -> float:
+        """text 的令牌数（不取整，各单元相加时与整段估算一致；含换行）"""
+        if self.escaped:
+            text = json.dumps(text, ensure_ascii=False)[1:-1]
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return (ascii_chars + 1) / 4 + (len(text) - ascii_chars)
+
+    def demote(self) -> None:
+        """缩短一级：完整 → 缩短（无缩短形式时省略）→ 省略"""
+        self.choice = "short" if self.choice == "full" and self.short else "drop"
+
+
+class _Document:
+    """一段可裁剪文本：固定片段与可裁剪单元按原顺序排列"""
+
+    def __init__(self) -> None:
+        self.items: List[Union[str, _Unit]] = []
+
+    def render(self) -> str:
+        lines: List[str] = []
+        dropped = 0
+        dropped_kind = ""
+        for item in self.items:
+            if isinstance(item, _Unit) and item.choice == "drop":
+                if dropped and dropped_kind != item.kind:
+                    lines.append(_OMITTED[dropped_kind].format(n=dropped))
+                    dropped = 0
+                dropped += 1
+                dropped_kind = item.kind
+                continue
+            if dropped:
+                lines.append(_OMITTED[dropped_kind].format(n=dropped))
+                dropped = 0
+            if isinstance(item, _Unit):
+                lines.append(item.short if item.choice == "short" else item.full)
+            else:
+                lines.append(item)
+        if dropped:
+            lines.append(_OMITTED[dropped_kind].format(n=dropped))
+        return "\n".join(lines)
+
+
+@dataclass
+class PromptBudgetReport:
+    """一次组装的令牌估算与裁剪结果"""
+
+    node: str
+    budget: int
+    original_tokens: int
+    final_tokens: int
+    dropped: int = 0
+    truncated: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.original_tokens - self.final_tokens)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "budget": self.budget,
+            "original_tokens": self.original_tokens,
+            "final_tokens": self.final_tokens,
+            "saved_tokens": self.saved_tokens,
+            "dropped": self.dropped,
+            "truncated": self.truncated,
+        }
+
+
+@dataclass
+class _NodeStats:
+    calls: int = 0
+    trimmed: int = 0
+    original_tokens: int = 0
+    final_tokens: int = 0
+
+
+_stats: Dict[str, _NodeStats] = {}
+_stats_lock = threading.Lock()
+
+
+def get_prompt_budget_stats() -> Dict[str, Dict[str, int]]:
+    """各节点的组装次数、裁剪次数与估算令牌数（裁剪前/后/节省）"""
+    with _stats_lock:
+        return {
+            node: {
+                "calls": stats.calls,
+                "trimmed": stats.trimmed,
+                "original_tokens": stats.original_tokens,
+                "final_tokens": stats.final_tokens,
+                "saved_tokens": stats.original_tokens - stats.final_tokens,
+            }
+            for node, stats in _stats.items()
+        }
+
+
+def reset_prompt_budget_stats() -> None:
+    """清空令牌预算统计"""
+    with _stats_lock:
+        _stats.clear()
+
+
+def node_budget(node: str) -> int:
+    """节点的令牌预算（prompt_budget.nodes，未列出时为 default）；0 表示不限"""
+    try:
+        from src.config.settings import get_config
+
+        config = get_config().prompt_budget
+    except Exception:
+        return 0
+    if not config.enabled:
+        return 0
+    return config.nodes.get(node, config.default)
+
+
+class PromptAssembler:
+    """按令牌预算组装单个提示词
+
+    用法：先用 add_text / add_skill_context 登记可裁剪的部分，再以去掉这些部分后的提示词调用 fit，
+    得到各部分裁剪后的文本，代回提示词模板。
+    """
+
+    def __init__(
+        self,
+        node: str,
+        query: str,
+        budget: Optional[int] = None,
+        keep_columns: Iterable[str] = (),
+        keep_terms: Iterable[str] = (),
+    ):
+        """
+        Args:
+            node: 节点名（prompt_budget.nodes 的键，也用于统计）
+            query: 用户问题（相关度按问题中的词计算）
+            budget: 令牌预算，默认取 prompt_budget 配置；0 表示不限
+            keep_columns: 优先保留的字段名（问题中出现取值的字段、选表给出的字段）
+            keep_terms: 优先保留包含这些词的章节（如选表时的技能表名）
+        """
+        self.node = node
+        self.budget = node_budget(node) if budget is None else budget
+        self.terms = relevance_terms(query)
+        self.keep_columns = {str(name).casefold() for name in keep_columns if name}
+        self.keep_terms = sorted({str(term).casefold() for term in keep_terms if term})
+        self.report: Optional[PromptBudgetReport] = None
+        self._parts: Dict[str, Any] = {}
+        self._units: List[_Unit] = []
+        self._omitted_tokens = 0  # 按节点策略不发送的内容（计入节省）
+        self._priority = 0.0  # 正在登记的部分的基础分
+
+    # ==================== 拆分 ====================
+
+    def _score(self, name: str, body: str) -> float:
+        name_terms = relevance_terms(name)
+        body_terms = relevance_terms(body) - name_terms
+        return NAME_WEIGHT * len(self.terms & name_terms) + BODY_WEIGHT * len(self.terms & body_terms)
+
+    def _unit(self, kind: str, full: str, short: str, score: float, escaped: bool) -> _Unit:
+        score += self._priority
+        unit = _Unit(kind, full, short if short != full else "", score, len(self._units), escaped)
+        self._units.append(unit)
+        return unit
+
+    def _column(self, line: str, escaped: bool) -> _Unit:
+        stripped = line.strip()
+        name = stripped.split(None, 1)[0]
+        score = self._score(name, stripped[len(name):])
+        if name.strip('"[]').casefold() in self.keep_columns:
+            score += KEEP_WEIGHT
+        # 去掉括号中的长度、可空、样本值等细节，保留字段名与类型
+        short = re.sub(r"\s+", " ", line.split(" (", 1)[0]).strip()
+        return self._unit("column", line, short, score, escaped)
+
+    def _section(self, lines: List[str], escaped: bool) -> _Unit:
+        heading = lines[0] if _HEADING.match(lines[0]) else ""
+        body = "\n".join(lines[1:] if heading else lines)
+        first = next((line for line in (lines[1:] if heading else lines) if line.strip()), "")
+        short = "\n".join(part for part in (heading, first[:200]) if part)
+        score = self._score(heading, body)
+        text = body.casefold()
+        if any(term in text for term in self.keep_terms):
+            score += KEEP_WEIGHT
+        return self._unit("section", "\n".join(lines), short, score, escaped)
+
+    def _document(self, text: str, escaped: bool = False) -> _Document:
+        """按 Markdown 标题与 === Table: X === 拆分：章节为单元，表下的每行字段为单元"""
+        document = _Document()
+        section: List[str] = []
+        in_table = in_fence = False
+
+        def flush() -> None:
+            if not section:
+                return
+            if not any(line.strip() for line in section[1:]) and _HEADING.match(section[0]):
+                document.items.extend(section)  # 只有标题（如 ## Database Schema）时保留
+            elif any(line.strip() for line in section):
+                document.items.append(self._section(list(section), escaped))
+            else:
+                document.items.extend(section)
+            section.clear()
+
+        for line in text.split("\n"):
+            if line.lstrip().startswith("```"):
+                in_fence = not in_fence
+            if not in_fence and _TABLE_HEADER.match(line):
+                flush()
+                in_table = True
+                document.items.append(line)
+            elif not in_fence and _HEADING.match(line):
+                flush()
+                in_table = False
+                section.append(line)
+            elif in_table:
+                document.items.append(self._column(line, escaped) if line.strip() else line)
+            else:
+                section.append(line)
+        flush()
+        return document
+
+    def add_text(self, name: str, text: Any, priority: float = 0.0) -> None:
+        """登记可裁剪的文本（表结构、业务规则、SQL 规则等）
+
+        Args:
+            name: 部分名
+            text: 文本
+            priority: 该部分各单元的基础分（大于 0 时即使与问题无关也先于其他部分保留）
+        """
+        self._priority = priority
+        try:
+            self._parts[name] = self._document(text if isinstance(text, str) else str(text or ""))
+        finally:
+            self._priority = 0.0
+
+    def add_skill_context(self, name: str, skill_context: Any, include_scripts: bool = True) -> None:
+        """登记技能上下文（SkillContext 字典），结果为紧凑 JSON
+
+        Args:
+            name: 部分名
+            skill_context: 技能上下文字典（其他类型按文本处理）
+            include_scripts: 是否带脚本源码；不需要源码的节点（选表）只保留脚本列表
+        """
+        if not isinstance(skill_context, dict):
+            self.add_text(name, "" if skill_context is None else skill_context)
+            return
+        fields: Dict[str, Any] = {}
+        for key, value in skill_context.items():
+            if key == "skill_doc" and isinstance(value, str):
+                fields[key] = self._document(value, escaped=True)
+            elif key == "modules" and isinstance(value, dict):
+                fields[key] = {module: self._document(str(text), escaped=True) for module, text in value.items()}
+            elif key == "script_contents" and isinstance(value, dict):
+                if not include_scripts:
+                    self._omitted_tokens += estimate_tokens(json.dumps(value, ensure_ascii=False))
+                    continue
+                fields[key] = {
+                    script: self._unit("script", str(source), "", self._score(script, str(source)), True)
+                    for script, source in value.items()
+                }
+            else:
+                fields[key] = value
+        self._parts[name] = fields
+
+    # ==================== 组装 ====================
+
+    def _render(self, part: Any) -> Any:
+        if isinstance(part, _Document):
+            return part.render()
+        if isinstance(part, _Unit):
+            return part.full if part.choice == "full" else f"（源码已省略，{part.full.count(chr(10)) + 1} 行）"
+        if isinstance(part, dict):
+            return {key: self._render(value) for key, value in part.items()}
+        return part
+
+    def _render_parts(self) -> Dict[str, str]:
+        rendered = {}
+        for name, part in self._parts.items():
+            value = self._render(part)
+            rendered[name] = json.dumps(value, ensure_ascii=False) if isinstance(part, dict) else value
+        return rendered
+
+    def _allocate(self, available: float) -> None:
+        """与问题相关的单元按相关度优先给完整形式，其余单元先给缩短形式、再按顺序恢复完整形式，放不下的省略"""
+        ranked = sorted(self._units, key=lambda unit: (-unit.score, unit.order))
+        for unit in ranked:
+            unit.choice = "drop"
+        for unit in ranked:
+            forms = ("full", "short") if unit.score > 0 else ("short",)
+            for form in forms:
+                text = unit.short if form == "short" and unit.short else unit.full
+                cost = unit.tokens(text)
+                if cost <= available:
+                    unit.choice = form if unit.short else "full"
+                    available -= cost
+                    break
+        for unit in ranked:
+            if unit.choice == "short":
+                extra = unit.tokens(unit.full) - unit.tokens(unit.short)
+                if extra <= available:
+                    unit.choice = "full"
+                    available -= extra
+
+    def fit(self, fixed_prompt: str) -> Dict[str, str]:
+        """按预算裁剪已登记的部分
+
+        Args:
+            fixed_prompt: 不含可裁剪部分的提示词（模板、问题、错误信息等，不裁剪）
+
+        Returns:
+            {部分名: 裁剪后的文本}；技能上下文为 JSON 字符串
+        """
+        fixed_tokens = estimate_tokens(fixed_prompt)
+        full = self._render_parts()
+        full_tokens = fixed_tokens + sum(estimate_tokens(text) for text in full.values())
+        original_tokens = full_tokens + self._omitted_tokens
+        if self.budget <= 0 or full_tokens <= self.budget:
+            self._record(PromptBudgetReport(self.node, self.budget, original_tokens, full_tokens))
+            return full
+
+        unit_tokens = sum(unit.tokens(unit.full) for unit in self._units)
+        skeleton_tokens = full_tokens - fixed_tokens - unit_tokens  # 固定片段、表头与 JSON 结构
+        self._allocate(self.budget * (1 - RESERVE_RATIO) - fixed_tokens - skeleton_tokens)
+        fitted = self._render_parts()
+        final_tokens = fixed_tokens + sum(estimate_tokens(text) for text in fitted.values())
+        # 省略标注等估算误差：从相关度最低的单元开始逐级缩短，直到不超预算
+        kept = [unit for unit in sorted(self._units, key=lambda unit: (unit.score, -unit.order)) if unit.choice != "drop"]
+        while final_tokens > self.budget and kept:
+            kept[0].demote()
+            if kept[0].choice == "drop":
+                kept.pop(0)
+            fitted = self._render_parts()
+            final_tokens = fixed_tokens + sum(estimate_tokens(text) for text in fitted.values())
+        report = PromptBudgetReport(
+            self.node,
+            self.budget,
+            original_tokens,
+            final_tokens,
+            dropped=sum(1 for unit in self._units if unit.choice == "drop"),
+            truncated=sum(1 for unit in self._units if unit.choice == "short"),
+        )
+        self._record(report)
+        return fitted
+
+    def _record(self, report: PromptBudgetReport) -> None:
+        self.report = report
+        with _stats_lock:
+            stats = _stats.setdefault(self.node, _NodeStats())
+            stats.calls += 1
+            stats.trimmed += 1 if report.saved_tokens else 0
+            stats.original_tokens += report.original_tokens
+            stats.final_tokens += report.final_tokens
+        if report.saved_tokens:
+            logger.info(
+                f"Prompt for {self.node} (budget {self.budget}): {report.original_tokens} -> "
+                f"{report.final_tokens} tokens, saved {report.saved_tokens} "
+                f"(dropped {report.dropped}, truncated {report.truncated})"
+            )
@@ -0,0 +1,465 @@
+"""语义问题缓存 - 措辞相近的问题复用已校验的 SQL
+
+同一批常见问题会以不同措辞反复出现。NLToSQLAgent.query 在技能选择之后查找本缓存：
+相似度达到阈值、提取出的实体完全相同、技能版本与相关表结构未变化时，
+直接执行缓存的 SQL，跳过意图分析、上下文加载、SQL 生成与校验。
+
+- 向量索引：chromadb 持久化集合，位于 knowledge_base.vector_db_path
+- 向量：默认本地字符 n-gram 哈希向量（无需模型服务，对中文改写足够稳定），
+  也可使用 embedding.active 提供商
+- 实体：年份/数字、月份、季度、相对时间、排序方向、聚合方式、包含/排除与比较方向、前 N、引号内容、
+  大写或含数字的代码，以及调用方传入的维度取值（技能 keyword_table_map 关键词、字段取值索引命中的
+  部门/成本中心等），用于区分“2024 年 IT 成本”与“2025 年 IT 成本”、“分摊给财务部”与“分摊给人事部”、
+  “不包括外包”与“包括外包”这类向量上几乎相同的问题
+- SQL 取值：写入时记录缓存 SQL 中同时出现在原问题里的字符串字面量，命中要求新问题也包含这些取值
+- 失效：条目按技能名 + 技能版本 + 数据源过滤；命中前重新计算条目涉及表的结构版本
+  （只取 表/字段/类型，见 schema_signature），不一致时视为未命中；执行后审查未通过的条目由调用方删除
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("question_cache")
+
+_FILLERS = ("请问", "帮我", "给我", "查一下", "查询", "一下", "告诉我", "是多少", "多少", "什么", "吗", "呢", "的")
+_PUNCTUATION = re.compile(r"[\s\W_]+", re.UNICODE)
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_NUMBER = r"[零一二两三四五六七八九十]+"
+_RELATIVE = {
+    "今年": "year:0", "本年": "year:0", "去年": "year:-1", "上一年": "year:-1", "前年": "year:-2",
+    "明年": "year:+1", "本月": "month:0", "这个月": "month:0", "上个月": "month:-1", "上月": "month:-1",
+    "本季度": "quarter:0", "这个季度": "quarter:0", "上个季度": "quarter:-1", "上季度": "quarter:-1",
+    "同比": "compare:yoy", "环比": "compare:mom",
+}
+_ORDER = {
+    "最高": "order:max", "最大": "order:max", "最多": "order:max",
+    "最低": "order:min", "最小": "order:min", "最少": "order:min",
+    "升序": "order:asc", "降序": "order:desc",
+}
+_AGGREGATE = {
+    "平均": "agg:avg", "均值": "agg:avg", "合计": "agg:sum", "总计": "agg:sum", "总和": "agg:sum",
+    "汇总": "agg:sum", "总": "agg:sum", "人数": "agg:count", "数量": "agg:count", "个数": "agg:count",
+    "明细": "agg:detail", "清单": "agg:detail", "列表": "agg:detail",
+}
+_FILTER = {
+    "不包括": "filter:exclude", "不包含": "filter:exclude", "不含": "filter:exclude", "除了": "filter:exclude",
+    "除去": "filter:exclude", "排除": "filter:exclude", "剔除": "filter:exclude", "扣除": "filter:exclude",
+    "包括": "filter:include", "包含": "filter:include", "含有": "filter:include", "只看": "filter:only",
+    "仅": "filter:only", "只有": "filter:only",
+}
+_COMPARE = {
+    "不超过": "cmp:le", "不高于": "cmp:le", "不大于": "cmp:le", "以下": "cmp:le",
+    "不低于": "cmp:ge", "不少于": "cmp:ge", "不小于": "cmp:ge", "至少": "cmp:ge", "以上": "cmp:ge",
+    "超过": "cmp:gt", "高于": "cmp:gt", "大于": "cmp:gt", "多于": "cmp:gt",
+    "低于": "cmp:lt", "小于": "cmp:lt", "少于": "cmp:lt", "不到": "cmp:lt",
+}
+_QUOTED = re.compile(r"[\"“'‘「『]([^\"”'’」』]+)[\"”'’」』]")
+_TOP = re.compile(rf"(?:前|top\s*)(\d+|{_CN_NUMBER})", re.I)
+_QUARTER = re.compile(r"第?([一二三四1-4])季度|\bq([1-4])\b", re.I)
+_MONTH = re.compile(rf"({_CN_NUMBER}|\d{{1,2}})月份?")
+# 大写或含数字的英文代码（IT、HR、CC1001）；普通英文单词属于措辞，不作为实体
+_CODE = re.compile(r"(?<![A-Za-z0-9])(?=[A-Za-z0-9_\-]*(?:[A-Z]{2}|\d))[A-Za-z][A-Za-z0-9_\-]*")
+_NUMBER = re.compile(r"(\d+(?:\.\d+)?)(?:年度?)?")  # 年份连同“年”一起去掉
+_SQL_STRING = re.compile(r"'((?:[^']|'')+)'")
+_TABLE_HEADER = re.compile(r"^=== Table: (.+?) ===\s*$")
+_COLUMN_DETAIL = re.compile(r"\s*\(max length:.*\)\s*$")  # 长度、可空与样本值（样本值随数据变化）
+
+
+def _cn_to_int(text: str) -> int:
+    """阿拉伯数字或不超过 99 的中文数字"""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return _CN_DIGITS.get(tens, 1) * 10 + _CN_DIGITS.get(ones, 0)
+    return _CN_DIGITS.get(text, 0)
+
+
+def _split_entities(question: str, terms: Iterable[str] = ()) -> Tuple[Tuple[str, ...], str]:
+    """拆分出实体与去掉实体后的剩余文本（terms 为维度取值，较长的优先匹配，不区分大小写）"""
+    entities = set()
+    text = question
+
+    def take(pattern: "re.Pattern[str]", make: Callable[["re.Match[str]"], str]) -> None:
+        nonlocal text
+        for match in pattern.finditer(text):
+            entities.add(make(match))
+        text = pattern.sub(" ", text)
+
+    take(_QUOTED, lambda m: f"quoted:{m.group(1).strip().casefold()}")
+    for term in sorted({term.strip().casefold() for term in terms if term and term.strip()}, key=len, reverse=True):
+        pattern = re.compile(re.escape(term), re.I)
+        if pattern.search(text):
+            entities.add(f"value:{term}")
+            text = pattern.sub(" ", text)
+    for lexicon in (_RELATIVE, _ORDER, _AGGREGATE, _FILTER, _COMPARE):
+        for phrase in sorted(lexicon, key=len, reverse=True):
+            if phrase in text:
+                entities.add(lexicon[phrase])
+                text = text.replace(phrase, " ")
+    take(_TOP, lambda m: f"top:{_cn_to_int(m.group(1))}")
+    take(_QUARTER, lambda m: f"quarter:{_cn_to_int(m.group(1) or m.group(2))}")
+    take(_MONTH, lambda m: f"month:{_cn_to_int(m.group(1))}")
+    take(_CODE, lambda m: f"code:{m.group(0).casefold()}")
+    take(_NUMBER, lambda m: f"number:{float(m.group(1)):g}")
+    return tuple(sorted(entities)), text
+
+
+def extract_entities(question: str, terms: Iterable[str] = ()) -> Tuple[str, ...]:
+    """提取决定 SQL 取值的实体（排序后的元组，用于精确比较）
+
+    Args:
+        question: 用户问题
+        terms: 维度取值（部门、成本中心、技能关键词等），出现在问题中的作为 value 实体
+
+    Returns:
+        实体元组，例如 ("month:3", "number:2024", "order:max", "value:财务部")
+    """
+    return _split_entities(question, terms)[0]
+
+
+def sql_values_in_question(sql: str, question: str) -> List[str]:
+    """缓存 SQL 中同时出现在问题里的字符串字面量（小写、去掉 LIKE 通配符，纯数字除外）
+
+    Args:
+        sql: 已通过审查的 SQL
+        question: 生成该 SQL 的问题
+
+    Returns:
+        排序后的取值列表
+    """
+    lowered = question.casefold()
+    values = set()
+    for match in _SQL_STRING.finditer(sql):
+        value = match.group(1).replace("''", "'").strip("%_ ").casefold()
+        if value and not value.replace(".", "", 1).isdigit() and value in lowered:
+            values.add(value)
+    return sorted(values)
+
+
+def normalize_question(question: str) -> str:
+    """去除标点、空白与常见客套词，统一小写"""
+    text = question.casefold()
+    for filler in _FILLERS:
+        text = text.replace(filler, "")
+    return _PUNCTUATION.sub("", text)
+
+
+def schema_signature(schema_info: str) -> List[Tuple[str, ...]]:
+    """表结构快照中与数据无关的部分：(表, 字段, 类型) 元组
+
+    数据库数据源的快照每个字段一行“字段名 类型 (max length: ..., nullable: ..., samples: ...)”，
+    样本值来自不排序的 DISTINCT 查询，数据变化时也会变化，不计入结构版本；
+    其他格式的行（如 Excel 的列信息）不含样本值，原样保留。
+
+    Args:
+        schema_info: DataSourceSession.get_schema_info 的输出
+
+    Returns:
+        按快照顺序的元组列表
+    """
+    signature: List[Tuple[str, ...]] = []
+    table = ""
+    for line in schema_info.split("\n"):
+        header = _TABLE_HEADER.match(line.strip())
+        if header:
+            table = header.group(1)
+            signature.append((table,))
+        elif table and _COLUMN_DETAIL.search(line):
+            head = _COLUMN_DETAIL.sub("", line).strip()
+            # 字段名左对齐补齐到 30 列，与类型之间至少两个空格；更长的字段名只隔一个空格
+            parts = re.split(r"\s{2,}", head, maxsplit=1)
+            column, _, data_type = (parts[0], "", parts[1]) if len(parts) == 2 else head.partition(" ")
+            signature.append((table, column, data_type.strip()))
+        elif line.strip():
+            signature.append((line.strip(),))
+    return signature
+
+
+def local_embedding(question: str, dims: int = 1024) -> List[float]:
+    """本地字符 n-gram（1-2）哈希向量，L2 归一化
+
+    实体单独精确比较，向量只表示去掉实体后的措辞，
+    “2024年3月各部门费用”与“2024年三月份各部门的费用”得到相同的向量。
+
+    Args:
+        question: 用户问题
+        dims: 向量维度
+
+    Returns:
+        向量
+    """
+    import numpy as np
+
+    text = normalize_question(_split_entities(question)[1]) or normalize_question(question) or question
+    vector = np.zeros(dims, dtype=np.float32)
+    for n in (1, 2):
+        for i in range(len(text) - n + 1):
+            digest = hashlib.blake2b(text[i:i + n].encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vector[h % dims] += 1.0 if h >> 63 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+
+def _provider_embedder() -> Callable[[str], List[float]]:
+    """使用 embedding.active 提供商（OpenAI 兼容接口）"""
+    from langchain_openai import OpenAIEmbeddings
+
+    from src.config.settings import get_config
+
+    config = get_config().embedding
+    provider = config.providers[config.active]
+    embeddings = OpenAIEmbeddings(
+        model=provider.model,
+        base_url=provider.api_url,
+        api_key=provider.api_key or "none",
+        check_embedding_ctx_length=False,
+    )
+    return embeddings.embed_query
+
+
+@dataclass
+class QuestionCacheHit:
+    """命中的缓存条目"""
+
+    entry_id: str
+    question: str
+    sql: str
+    table_names: List[str]
+    similarity: float
+
+
+class QuestionCache:
+    """语义问题缓存 - 线程安全"""
+
+    def __init__(
+        self,
+        path: str = ".vector_db",
+        embed: Optional[Callable[[str], List[float]]] = None,
+        collection_name: str = "question_cache_local",
+        similarity_threshold: float = 0.8,
+        top_k: int = 3,
+        max_entries: int = 5000,
+    ):
+        """
+        Args:
+            path: chromadb 持久化目录
+            embed: 问题向量化函数，默认本地 n-gram 哈希向量
+            collection_name: 集合名（不同向量化方式的维度不同，各用一个集合）
+            similarity_threshold: 余弦相似度下限
+            top_k: 每次检查的近邻数
+            max_entries: 条目上限，超过时按最近使用时间淘汰
+        """
+        try:
+            import chromadb
+            from chromadb.config import Settings
+        except ImportError:
+            raise ImportError("Question cache requires chromadb. Install with: pip install chromadb")
+
+        self.embed = embed or local_embedding
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.max_entries = max_entries
+        self._client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        self._collection = self._client.get_or_create_collection(
+            collection_name, embedding_function=None, metadata={"hnsw:space": "cosine"}
+        )
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "rejected_entities": 0, "rejected_schema": 0, "stores": 0}
+
+    @classmethod
+    def from_config(cls) -> "QuestionCache":
+        """按 question_cache 与 knowledge_base.vector_db_path 配置创建"""
+        from src.config.settings import get_config
+
+        config = get_config()
+        cache_config = config.question_cache
+        if cache_config.embedding == "provider":
+            embed = _provider_embedder()
+        else:
+            dims = cache_config.dims
+            embed = lambda question: local_embedding(question, dims)  # noqa: E731
+        return cls(
+            path=config.knowledge_base.vector_db_path,
+            embed=embed,
+            collection_name=f"question_cache_{cache_config.embedding}",
+            similarity_threshold=cache_config.similarity_threshold,
+            top_k=cache_config.top_k,
+            max_entries=cache_config.max_entries,
+        )
+
+    @staticmethod
+    def _scope(skill_name: str, skill_version: str, source: str) -> Dict[str, Any]:
+        return {"$and": [{"skill": skill_name}, {"skill_version": skill_version}, {"source": source}]}
+
+    def lookup(
+        self,
+        question: str,
+        skill_name: str,
+        skill_version: str,
+        source: str,
+        schema_version_of: Callable[[List[str]], Optional[str]],
+        terms: Iterable[str] = (),
+    ) -> Optional[QuestionCacheHit]:
+        """查找可复用的 SQL
+
+        Args:
+            question: 用户问题
+            skill_name: 技能名
+            skill_version: 技能版本
+            source: 数据源标识
+            schema_version_of: 计算给定表当前结构版本的函数
+            terms: 维度取值（见 extract_entities）
+
+        Returns:
+            命中的条目；未命中返回 None
+        """
+        entities = json.dumps(extract_entities(question, terms), ensure_ascii=False)
+        lowered = question.casefold()
+        embedding = self.embed(question)
+        with self._lock:
+            result = self._collection.query(
+                query_embeddings=[embedding],
+                n_results=self.top_k,
+                where=self._scope(skill_name, skill_version, source),
+                include=["distances", "metadatas", "documents"],
+            )
+
+        hit = None
+        outcome = None
+        for entry_id, distance, metadata, document in zip(
+            result["ids"][0], result["distances"][0], result["metadatas"][0], result["documents"][0]
+        ):
+            similarity = 1.0 - distance
+            if similarity < self.similarity_threshold:
+                break
+            sql_values = json.loads(metadata.get("sql_values") or "[]")
+            if metadata["entities"] != entities or any(value not in lowered for value in sql_values):
+                outcome = "rejected_entities"
+                continue
+            table_names = json.loads(metadata["table_names"])
+            if schema_version_of(table_names) != metadata["schema_version"]:
+                outcome = "rejected_schema"
+                self.invalidate(entry_id)
+                continue
+            hit = QuestionCacheHit(entry_id, document, metadata["sql"], table_names, similarity)
+            with self._lock:
+                self._collection.update(
+                    ids=[entry_id],
+                    metadatas=[{**metadata, "last_used": time.time(), "hits": metadata.get("hits", 0) + 1}],
+                )
+            break
+
+        with self._lock:
+            if hit is not None:
+                self._metrics["hits"] += 1
+            else:
+                self._metrics["misses"] += 1
+                if outcome is not None:
+                    self._metrics[outcome] += 1
+        if hit is not None:
+            logger.info(f"Question cache hit ({hit.similarity:.3f}) reusing SQL of: {hit.question}")
+        return hit
+
+    def store(
+        self,
+        question: str,
+        sql: str,
+        table_names: List[str],
+        skill_name: str,
+        skill_version: str,
+        source: str,
+        schema_version: str,
+        terms: Iterable[str] = (),
+    ) -> str:
+        """写入已通过审查的 SQL（相同问题覆盖旧条目）
+
+        Args:
+            terms: 维度取值（见 extract_entities），应与查找时的来源一致
+
+        Returns:
+            条目 ID
+        """
+        raw = json.dumps([skill_name, source, normalize_question(question)], ensure_ascii=False)
+        entry_id = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+        now = time.time()
+        metadata = {
+            "skill": skill_name,
+            "skill_version": skill_version,
+            "source": source,
+            "entities": json.dumps(extract_entities(question, terms), ensure_ascii=False),
+            "sql_values": json.dumps(sql_values_in_question(sql, question), ensure_ascii=False),
+            "sql": sql,
+            "table_names": json.dumps(sorted(table_names), ensure_ascii=False),
+            "schema_version": schema_version,
+            "created_at": now,
+            "last_used": now,
+            "hits": 0,
+        }
+        embedding = self.embed(question)
+        with self._lock:
+            self._collection.upsert(ids=[entry_id], embeddings=[embedding], documents=[question], metadatas=[metadata])
+            self._metrics["stores"] += 1
+            self._evict()
+        return entry_id
+
+    def _evict(self) -> None:
+        excess = self._collection.count() - self.max_entries
+        if excess <= 0:
+            return
+        entries = self._collection.get(include=["metadatas"])
+        by_age = sorted(zip(entries["ids"], entries["metadatas"]), key=lambda e: e[1].get("last_used", 0))
+        self._collection.delete(ids=[entry_id for entry_id, _ in by_age[:excess]])
+
+    def invalidate(self, entry_id: str) -> None:
+        """删除条目（如复用的 SQL 未通过结果审查）"""
+        with self._lock:
+            self._collection.delete(ids=[entry_id])
+
+    def clear(self) -> None:
+        """删除全部条目"""
+        with self._lock:
+            ids = self._collection.get(include=[])["ids"]
+            if ids:
+                self._collection.delete(ids=ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率与条目数"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+            stats["entries"] = self._collection.count()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache: Optional[QuestionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_question_cache() -> QuestionCache:
+    """获取语义问题缓存单例"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QuestionCache.from_config()
+    return _cache
+
+
+def reset_question_cache() -> None:
+    """重置语义问题缓存单例（重新读取配置）"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -188,6 +188,35 @@ class ResultReviewResult(BaseModel):
         }
 
 
+class TableSelection(BaseModel):
+    """A table the query needs, with the fields it uses"""
+
+    table_name: str = Field(..., description="Table name exactly as listed in the skill context")
+    fields: List[str] = Field(
+        default_factory=list, description="Field names used for filters, grouping or output"
+    )
+
+
+class UnderstandingResult(BaseModel):
+    """Fused pre-processing result: skill selection, intent and table selection"""
+
+    skill_name: str = Field(..., description="Name of the best matching skill from the skill list")
+    skill_confidence: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Confidence of the skill selection (0.0 to 1.0)",
+    )
+    is_data_query: bool = Field(
+        ..., description="Whether the question asks for data query or data analysis"
+    )
+    reason: str = Field(default="", description="Short reason for the intent decision")
+    tables: List[TableSelection] = Field(
+        default_factory=list,
+        description="Tables (and fields) needed to answer the question; empty if not a data query",
+    )
+
+
 class AgentState(BaseModel):
     """Agent state for workflow"""
 
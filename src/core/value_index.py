@@ -0,0 +1,256 @@
+"""字段取值索引 - 问题中出现的维度取值 → 表.列
+
+用户常直接写出维度取值（“IT部门”、“华东区”、“Opex”），SQL 生成需要知道取值属于哪张表的哪一列。
+索引收录各表文本列的去重取值（只收录取值数不超过 max_distinct 的列，即部门、地区一类维度），
+查找时在问题中按子串匹配，较长的取值优先，已匹配的字符不再参与更短的匹配；
+ASCII 取值要求前后不是字母或数字（“IT” 不匹配 “ITEM”），纯数字取值不收录。
+
+索引按 数据源类型 + data_version 缓存；尚未建立或已过期时在后台线程构建，
+查找不等待构建完成（工作流中取值查找与选表并行，不能拖慢汇合节点）。
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from src.config.logger_interface import get_logger
+
+logger = get_logger("value_index")
+
+
+@dataclass
+class ValueHint:
+    """问题中匹配到的字段取值"""
+
+    value: str
+    table: str
+    column: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"value": self.value, "table": self.table, "column": self.column}
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+class ValueIndex:
+    """字段取值倒排索引（构建完成后只读）"""
+
+    def __init__(self, max_distinct: int = 200, min_length: int = 2, max_value_length: int = 50):
+        """
+        Args:
+            max_distinct: 只收录取值数不超过该值的列
+            min_length: 取值最短字符数
+            max_value_length: 取值最长字符数（更长的多为描述性文本）
+        """
+        self.max_distinct = max_distinct
+        self.min_length = min_length
+        self.max_value_length = max_value_length
+        self._values: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._lengths: List[int] = []
+        self.tables: Set[str] = set()
+        self.columns = 0
+
+    def add_frame(self, table: str, df: pd.DataFrame) -> int:
+        """收录一张表的文本列
+
+        Args:
+            table: 表名
+            df: 表数据（或样本）
+
+        Returns:
+            收录的列数
+        """
+        added = 0
+        for column in df.columns:
+            series = df[column]
+            if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+                continue
+            values = series.dropna().astype(str).str.strip().unique()
+            if len(values) == 0 or len(values) > self.max_distinct:
+                continue
+            for value in values:
+                if not self.min_length <= len(value) <= self.max_value_length or value.isdigit():
+                    continue
+                entries = self._values.setdefault(value.lower(), [])
+                if (value, table, str(column)) not in entries:
+                    entries.append((value, table, str(column)))
+            added += 1
+        if added:
+            self.tables.add(table)
+            self.columns += added
+            self._lengths = sorted({len(key) for key in self._values}, reverse=True)
+        return added
+
+    def lookup(self, question: str, max_hints: int = 10) -> List[ValueHint]:
+        """查找问题中出现的取值
+
+        Args:
+            question: 用户问题
+            max_hints: 最多返回的匹配数
+
+        Returns:
+            按问题中出现位置排序的匹配
+        """
+        text = (question or "").lower()
+        taken = [False] * len(text)
+        found: List[Tuple[int, ValueHint]] = []
+        for length in self._lengths:
+            for start in range(len(text) - length + 1):
+                end = start + length
+                if any(taken[start:end]):
+                    continue
+                entries = self._values.get(text[start:end])
+                if not entries:
+                    continue
+                if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(text[end - 1]) and end < len(text) and _is_word_char(text[end]):
+                    continue
+                for i in range(start, end):
+                    taken[i] = True
+                found.extend((start, ValueHint(value, table, column)) for value, table, column in entries)
+        found.sort(key=lambda item: item[0])
+        return [hint for _, hint in found[:max_hints]]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+# ==================== 按数据源缓存 ====================
+
+_indexes: Dict[str, Tuple[Optional[str], float, ValueIndex]] = {}
+_building: Dict[str, threading.Event] = {}
+_lock = threading.Lock()
+
+
+def build_value_index(strategy: Any, config: Optional[Any] = None) -> ValueIndex:
+    """从数据源策略的表样本构建索引
+
+    Args:
+        strategy: 数据源策略（DataSourceStrategy.sample_tables）
+        config: ValueIndexConfig，默认读取 value_index 配置
+
+    Returns:
+        构建好的索引
+    """
+    config = config or _config()
+    index = ValueIndex(max_distinct=config.max_distinct, min_length=config.min_length)
+    started = time.perf_counter()
+    for table, df in strategy.sample_tables(config.sample_rows, config.max_tables).items():
+        index.add_frame(table, df)
+    logger.info(
+        f"Value index built: {len(index)} values from {index.columns} columns in "
+        f"{len(index.tables)} tables ({(time.perf_counter() - started) * 1000:.0f} ms)"
+    )
+    return index
+
+
+def _config() -> Any:
+    from src.config.settings import ValueIndexConfig, get_config
+
+    try:
+        return get_config().value_index
+    except Exception:
+        return ValueIndexConfig()
+
+
+def get_value_index(
+    source_key: str,
+    strategy: Any,
+    wait: bool = False,
+    builder: Optional[Callable[[Any], ValueIndex]] = None,
+) -> Optional[ValueIndex]:
+    """获取数据源的取值索引
+
+    数据版本变化或（无版本时）超过 ttl_seconds 后重建；重建期间继续返回旧索引。
+
+    Args:
+        source_key: 数据源标识（数据源类型）
+        strategy: 数据源策略
+        wait: 是否等待构建完成；False 时尚无索引则返回 None，由后台线程构建
+        builder: 构建函数，默认 build_value_index
+
+    Returns:
+        索引；尚未构建完成且 wait=False 时为 None
+    """
+    try:
+        version = strategy.data_version()
+    except Exception:
+        version = None
+    ttl = _config().ttl_seconds
+
+    with _lock:
+        cached = _indexes.get(source_key)
+        fresh = cached is not None and cached[0] == version and (
+            version is not None or not ttl or time.time() - cached[1] < ttl
+        )
+        if fresh:
+            return cached[2]
+        event = _building.get(source_key)
+        start = event is None
+        if start:
+            event = _building[source_key] = threading.Event()
+
+    def build() -> None:
+        try:
+            index = (builder or build_value_index)(strategy)
+            with _lock:
+                _indexes[source_key] = (version, time.time(), index)
+        except Exception as e:
+            logger.warning(f"Value index build failed for {source_key}: {e}")
+        finally:
+            with _lock:
+                _building.pop(source_key, None)
+            event.set()
+
+    if start:
+        if wait:
+            build()
+        else:
+            threading.Thread(target=build, name=f"value-index-{source_key}", daemon=True).start()
+    if wait:
+        event.wait()
+        with _lock:
+            cached = _indexes.get(source_key)
+    return cached[2] if cached else None
+
+
+def reset_value_indexes() -> None:
+    """清空已构建的索引（下次查找时重建）"""
+    with _lock:
+        _indexes.clear()
+
+
+def lookup_question_values(
+    question: str, session_id: Optional[str], data_source_type: Optional[str] = None
+) -> List[ValueHint]:
+    """在请求数据源的取值索引中查找问题里出现的取值（索引尚未建好时返回空列表）
+
+    Args:
+        question: 用户问题
+        session_id: 请求的数据源会话（trace_id）
+        data_source_type: 数据源类型，默认使用会话的类型
+
+    Returns:
+        匹配到的取值
+    """
+    config = _config()
+    if not config.enabled or not question:
+        return []
+    from src.core.data_sources.session import session_for
+
+    try:
+        session = session_for(session_id, data_source_type)
+        source_type = session.data_source_type or "auto"
+        strategy = session.strategy(source_type)
+        source_key = f"{source_type}:{getattr(strategy, 'file_path', '')}"  # 上传的 Excel 按文件区分
+        index = get_value_index(source_key, strategy)
+    except Exception as e:
+        logger.debug(f"[{session_id}] Value lookup skipped: {e}")
+        return []
+    return index.lookup(question, config.max_hints) if index is not None else []
@@ -2,26 +2,48 @@
 
 工作流流程:
 用户问题 → 选择技能 → 意图分析 → 加载上下文 → 生成SQL → 校验SQL → 执行SQL(ReAct Agent) → 审查结果 → 精炼答案 → 结束
+
+workflow.preprocess = fused 时，选择技能与意图分析由 understand 节点一次调用完成，并同时选出表与字段：
+用户问题 → 理解 → 加载上下文 → 生成SQL → ...
+
+workflow.fan_out = true 时，加载上下文之前互不依赖的步骤并行执行，在加载上下文节点汇合：
+chain: 选择技能 → [意图分析 | 选表 | 预取表结构 | 查找字段取值] → 加载上下文 → ...
+fused: 准备 → [理解 | 预取表结构 | 查找字段取值] → 加载上下文 → ...
+
+各节点同时注册同步与异步实现：graph.invoke 使用同步节点，graph.ainvoke 使用 *_async 节点
+（LLM 调用受各服务商的并发上限约束，数据源调用在事件循环中等待），供 NLToSQLAgent.aquery 使用。
 """
 
+import asyncio
+import uuid
 from langchain_core.messages.base import BaseMessage
-from typing import Annotated, Any, Dict, List, Literal, TypedDict, Optional
+from langchain_core.runnables import RunnableLambda
+from typing import Annotated, Any, Callable, Dict, List, Literal, TypedDict, Optional
 from langgraph.graph import END, StateGraph
 from langgraph.graph.message import add_messages
 
 from src.config.logger_interface import get_logger
-from src.agents.load_context_agent import load_context_node
-from src.agents.intent_analysis_agent import analyze_intent_node
-from src.agents.sql_generation_agent import generate_sql_node
+from src.agents.load_context_agent import (
+    load_context_node,
+    load_context_node_async,
+    select_tables_node,
+    select_tables_node_async,
+)
+from src.agents.intent_analysis_agent import analyze_intent_node, analyze_intent_node_async
+from src.agents.sql_generation_agent import generate_sql_node, generate_sql_node_async
 from src.agents.sql_execution_agent import (
     sql_validation_node,
+    sql_validation_node_async,
     sql_execution_node,
+    sql_execution_node_async,
     create_validate_sql_tool,
     create_execute_sql_tool,
 )
-from src.agents.result_review_agent import review_result_node
-from src.agents.refine_answer_agent import refine_answer_node
-from src.skills.middleware.skill_middleware import select_skill_node
+from src.agents.result_review_agent import review_result_node, review_result_node_async
+from src.agents.refine_answer_agent import refine_answer_node, refine_answer_node_async
+from src.agents.understand_agent import understand_node, understand_node_async
+from src.agents.prefetch_agent import lookup_values_node, prefetch_schema_node, prefetch_schema_node_async
+from src.skills.middleware.skill_middleware import select_skill_node, select_skill_node_async
 from langgraph.checkpoint.memory import MemorySaver
 
 logger = get_logger("graph")
@@ -31,7 +53,7 @@ class AgentState(TypedDict):
     """智能体状态 - 定义工作流中传递的状态数据"""
 
     # 基础信息
-    trace_id: Annotated[Optional[str], lambda x, y: y]  # 追踪ID
+    trace_id: Annotated[Optional[str], lambda x, y: y]  # 追踪ID（同时用作取消令牌与数据源会话的键）
     messages: Annotated[List[BaseMessage], add_messages]  # 消息历史
 
     # 用户查询
@@ -52,8 +74,13 @@ class AgentState(TypedDict):
 
     # 数据源信息
     table_names: Annotated[Optional[List[str]], lambda x, y: y]  # 涉及的表名列表
+    selected_tables: Annotated[Optional[List[Dict[str, Any]]], lambda x, y: y]  # 理解节点选出的表与字段
     data_source_type: Annotated[Optional[str], lambda x, y: y]  # 数据源类型
     data_source_schema: Annotated[Optional[Dict[str, Any]], lambda x, y: y]  # 数据源模式
+    routing_decision: Annotated[Optional[Dict[str, Any]], lambda x, y: y]  # auto 模式的数据源路由决策
+    prefetched_tables: Annotated[Optional[List[str]], lambda x, y: y]  # 选表前已预取结构的表
+    value_hints: Annotated[Optional[List[Dict[str, str]]], lambda x, y: y]  # 问题中出现的字段取值 → 表.列
+    local_decision: Annotated[Optional[Dict[str, Any]], lambda x, y: y]  # 本地意图/选表分类器的判断与依据
 
     # 错误与重试
     error_message: Annotated[Optional[str], lambda x, y: y]  # 错误信息
@@ -63,6 +90,7 @@ class AgentState(TypedDict):
     chart_config: Annotated[Optional[Dict[str, Any]], lambda x, y: y]  # 图表配置
 
     # 技能上下文
+    skill_name: Annotated[Optional[str], lambda x, y: y]  # 选中的技能名
     skill_context: Annotated[Optional[Dict[str, Any]], lambda x, y: y]  # 技能上下文
     skill_selected_by: Annotated[Optional[str], lambda x, y: y]  # 技能选择方式
     skill_confidence: Annotated[Optional[float], lambda x, y: y]  # 技能选择置信度
@@ -74,13 +102,140 @@ class AgentState(TypedDict):
     human_edited_sql: Annotated[Optional[str], lambda x, y: y]  # 用户编辑后的SQL
 
 
+def _branch(node: Callable[[Dict[str, Any]], Any], *keys: str) -> Callable[[Dict[str, Any]], Any]:
+    """包装返回完整状态的节点，供并行分支使用：只写回指定且有变化的字段（异步节点返回异步包装）
+
+    并行分支在同一步提交更新，返回完整状态时未改动的旧值会覆盖其他分支写入的新值。
+    """
+
+    def changed(state: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: result.get(key) for key in keys if result.get(key) != state.get(key)}
+
+    if asyncio.iscoroutinefunction(node):
+        async def arun(state: Dict[str, Any]) -> Dict[str, Any]:
+            return changed(state, await node(dict(state)))
+
+        arun.__name__ = getattr(node, "__name__", "branch")
+        return arun
+
+    def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        return changed(state, node(dict(state)))
+
+    run.__name__ = getattr(node, "__name__", "branch")
+    return run
+
+
+def _node(func: Callable[[Dict[str, Any]], Any], afunc: Optional[Callable[[Dict[str, Any]], Any]] = None):
+    """同时带同步与异步实现的节点（invoke 调用 func，ainvoke 调用 afunc）
+
+    没有异步实现的节点（只读内存的取值查找等）在 ainvoke 时由 langgraph 放到线程池执行。
+    """
+    if afunc is None:
+        return func
+    return RunnableLambda(func, afunc=afunc, name=getattr(func, "__name__", None))
+
+
+def prepare_node(state: AgentState) -> Dict[str, Any]:
+    """准备节点 - fused 并行预处理的分叉点，确保各分支使用同一个 trace_id（数据源会话）"""
+    return {"trace_id": state.get("trace_id") or str(uuid.uuid4())}
+
+
 class GraphWorkflow:
     """基于图的工作流 - 管理整个查询流程"""
 
-    def __init__(self):
-        """初始化工作流"""
+    def __init__(self, preprocess: Optional[str] = None, fan_out: Optional[bool] = None):
+        """初始化工作流
+
+        Args:
+            preprocess: 预处理方式 chain | fused，默认读取 workflow.preprocess
+            fan_out: 加载上下文之前的步骤是否并行执行，默认读取 workflow.fan_out
+        """
+        try:
+            from src.config.settings import get_config
+
+            workflow_config = get_config().workflow
+            if preprocess is None:
+                preprocess = workflow_config.preprocess
+            if fan_out is None:
+                fan_out = workflow_config.fan_out
+        except Exception:
+            preprocess = preprocess or "chain"
+        if preprocess not in ("chain", "fused"):
+            raise ValueError(f"Unknown workflow preprocess mode: {preprocess}")
+        self.preprocess = preprocess
+        self.fan_out = bool(fan_out)
         self.graph = None
-        sel
+        self.cached_sql_graph = None
+
+    def _add_preprocess(self, workflow: StateGraph) -> str:
+        """添加加载上下文之前的节点（入口 → ... → load_context）
+
+        Args:
+            workflow: 工作流图
+
+        Returns:
+            重新分析意图时的目标节点（并行模式下为分叉点，使汇合节点等到的分支完整）
+        """
+        if self.preprocess == "fused":
+            # 理解节点 - 一次调用完成技能选择、意图分析与选表
+            keys = (
+                "skill_name", "skill_context", "skill_selected_by", "skill_confidence",
+                "intent_analysis", "selected_tables", "error_message",
+            )
+            intent = _node(
+                _branch(understand_node, *keys), _branch(understand_node_async, *keys)
+            ) if self.fan_out else _node(understand_node, understand_node_async)
+            workflow.add_node("understand", intent)
+            intent_node = "understand"
+        else:
+            # 技能选择节点 - 根据用户问题选择合适的技能
+            workflow.add_node("select_skill", _node(select_skill_node, select_skill_node_async))
+            # 意图分析节点 - 分析用户的查询意图
+            keys = ("intent_analysis", "local_decision", "error_message")
+            intent = _node(
+                _branch(analyze_intent_node, *keys), _branch(analyze_intent_node_async, *keys)
+            ) if self.fan_out else _node(analyze_intent_node, analyze_intent_node_async)
+            workflow.add_node("analyze_intent", intent)
+            intent_node = "analyze_intent"
+
+        # 上下文加载节点 - 加载数据源上下文（并行模式下为汇合节点）
+        workflow.add_node("load_context", _node(load_context_node, load_context_node_async))
+
+        if not self.fan_out:
+            if self.preprocess == "chain":
+                workflow.set_entry_point("select_skill")
+                workflow.add_edge("select_skill", "analyze_intent")  # 选择技能 → 分析意图
+            else:
+                workflow.set_entry_point("understand")
+            workflow.add_edge(intent_node, "load_context")  # 分析意图/理解 → 加载上下文
+            return intent_node
+
+        # 不依赖意图结果的数据源步骤：预取候选表结构、查找问题中的字段取值
+        workflow.add_node("prefetch_schema", _node(prefetch_schema_node, prefetch_schema_node_async))
+        workflow.add_node("lookup_values", lookup_values_node)
+        branches = [intent_node, "prefetch_schema", "lookup_values"]
+
+        if self.preprocess == "chain":
+            # 选表依赖技能上下文，不依赖意图分析
+            workflow.add_node("select_tables", _node(select_tables_node, select_tables_node_async))
+            branches.append("select_tables")
+            fork = "select_skill"
+        else:
+            workflow.add_node("prepare", prepare_node)
+            fork = "prepare"
+
+        workflow.set_entry_point(fork)
+        for branch in branches:
+            workflow.add_edge(fork, branch)
+        workflow.add_edge(branches, "load_context")  # 全部分支完成后汇合
+        return fork
+
+    def build_preprocess_graph(self):
+        """只包含加载上下文及之前节点的图（用于对比顺序/并行预处理的关键路径耗时）"""
+        workflow = StateGraph(AgentState)
+        self._add_preprocess(workflow)
+        workflow.add_edge("load_context", END)
+        return workflow.compile()
 
     def build_graph(self) -> StateGraph:
         """构建工作流图"""
@@ -88,37 +243,26 @@ class GraphWorkflow:
 
         # ========== 核心节点 ==========
 
-        # 1. 技能选择节点 - 根据用户问题选择合适的技能
-        workflow.add_node("select_skill", select_skill_node)
-
-        # 2. 意图分析节点 - 分析用户的查询意图
-        workflow.add_node("analyze_intent", analyze_intent_node)
-
-        # 3. 上下文加载节点 - 加载数据源上下文
-        workflow.add_node("load_context", load_context_node)
+        # 1-3. 技能选择、意图分析（或理解）与上下文加载，入口与边一并设置
+        intent_node = self._add_preprocess(workflow)
 
         # 4. SQL生成节点 - 根据意图生成SQL语句
-        workflow.add_node("generate_sql", generate_sql_node)
+        workflow.add_node("generate_sql", _node(generate_sql_node, generate_sql_node_async))
 
         # 5. SQL校验节点 - 校验SQL安全性
-        workflow.add_node("sql_validation", sql_validation_node)
+        workflow.add_node("sql_validation", _node(sql_validation_node, sql_validation_node_async))
 
         # 6. SQL执行节点 - ReAct Agent 模式执行SQL（带人在回路）
-        workflow.add_node("sql_execution", sql_execution_node)
+        workflow.add_node("sql_execution", _node(sql_execution_node, sql_execution_node_async))
 
         # 7. 结果审查节点 - 审查执行结果
-        workflow.add_node("review_result", review_result_node)
+        workflow.add_node("review_result", _node(review_result_node, review_result_node_async))
 
         # 8. 答案精炼节点 - 生成最终答案
-        workflow.add_node("refine_answer", refine_answer_node)
-
-        # ========== 设置入口点 ==========
-        workflow.set_entry_point("select_skill")
+        workflow.add_node("refine_answer", _node(refine_answer_node, refine_answer_node_async))
 
         # ========== 设置边（节点之间的连接） ==========
 
-        workflow.add_edge("select_skill", "analyze_intent")  # 选择技能 → 分析意图
-        workflow.add_edge("analyze_intent", "load_context")  # 分析意图 → 加载上下文
         workflow.add_edge("load_context", "generate_sql")    # 加载上下文 → 生成SQL
         workflow.add_edge("generate_sql", "sql_validation")  # 生成SQL → 校验SQL
         workflow.add_edge("sql_validation", "sql_execution") # 校验SQL → 执行SQL
@@ -145,7 +289,7 @@ class GraphWorkflow:
             {
                 "refine_answer": "refine_answer",   # 审查通过，精炼答案
                 "generate_sql": "generate_sql",     # 审查失败，重试生成
-                "analyze_intent": "analyze_intent", # 多次失败，重新分析意图
+                "analyze_intent": intent_node,      # 多次失败，重新分析意图（fused 重新理解，并行模式回到分叉点）
             },
         )
 
@@ -193,6 +337,7 @@ class GraphWorkflow:
         # 重试次数大于2次，重新分析意图
         if state.get("retry_count", 0) > 2:
             state["intent_analysis"] = None
+            state["selected_tables"] = None
             return "analyze_intent"
 
         # 否则重新生成SQL
@@ -204,4 +349,32 @@ class GraphWorkflow:
             self.graph = self.build_graph()
         return self.graph
 
+    def build_cached_sql_graph(self) -> StateGraph:
+        """构建复用缓存 SQL 的图：执行SQL → 审查结果 → 精炼答案
+
+        语义问题缓存命中时使用，跳过意图分析、上下文加载、SQL 生成与校验；
+        审查未通过时直接结束，由调用方删除缓存条目并改走完整工作流。
+        """
+        workflow = StateGraph(AgentState)
+        workflow.add_node("sql_execution", _node(sql_execution_node, sql_execution_node_async))
+        workflow.add_node("review_result", _node(review_result_node, review_result_node_async))
+        workflow.add_node("refine_answer", _node(refine_answer_node, refine_answer_node_async))
+
+        workflow.set_entry_point("sql_execution")
+        workflow.add_edge("sql_execution", "review_result")
+        workflow.add_conditional_edges(
+            "review_result",
+            lambda state: "refine_answer" if state.get("review_passed") else END,
+            {"refine_answer": "refine_answer", END: END},
+        )
+        workflow.add_edge("refine_answer", END)
+
+        return workflow.compile(checkpointer=MemorySaver())
+
+    def get_cached_sql_graph(self):
+        """获取复用缓存 SQL 的图"""
+        if self.cached_sql_graph is None:
+            self.cached_sql_graph = self.build_cached_sql_graph()
+        return self.cached_sql_graph
+
 
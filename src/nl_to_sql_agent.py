@@ -1,7 +1,12 @@
 """NL to SQL Agent Main Entry Point - Graph-based Version"""
 
 import argparse
+import asyncio
+import hashlib
+import json
 import logging
+import re
+import uuid
 from typing import Optional
 from pathlib import Path
 
@@ -10,6 +15,17 @@ from src.skills.loader import SkillLoader, Skill
 from src.graph.graph import GraphWorkflow, AgentState
 from src.skills.middleware import SkillMiddleware
 from src.core.llm import get_llm
+from src.core.llm_transport import count_llm_retries
+from src.config.settings import get_config
+from src.core.data_sources.cancellation import (
+    QueryCancelledError,
+    QueryTimeoutError,
+    cancel_request,
+    open_cancellation_scope,
+    release_cancellation_scope,
+)
+from src.core.data_sources.session import open_session, release_session
+from src.core.data_sources.single_flight import get_question_flight
 
 logger = get_logger("main")
 
@@ -25,7 +41,7 @@ class NLToSQLAgent:
         self.skill_middleware = SkillMiddleware(
             skill_path=str(self.skill_path),
             default_skill=self.skill_name,
-            llm=get_llm(),
+            llm=get_llm(node="skill_selection"),
         )
 
         self._initialize()
@@ -42,19 +58,138 @@ class NLToSQLAgent:
             self.workflow = GraphWorkflow()
 
     def query(self, user_query: str, **kwargs) -> dict:
-        """Execute a natural language query"""
+        """Execute a natural language query
 
+        Concurrent calls with the same question (whitespace/case normalized) and
+        the same keyword arguments run the workflow once; the others wait and get
+        a copy of the result marked ``coalesced`` (see ``single_flight.questions``).
+        Paraphrases of a previously answered question with the same entities reuse
+        its reviewed SQL and skip intent analysis through validation; the result
+        then carries ``question_cache`` (see ``question_cache`` config).
+
+        Keyword Args:
+            trace_id: Request ID; generated when omitted. Pass it to ``cancel()``
+                to abort the running statement from another thread.
+            query_timeout: Overall deadline (seconds) shared by every statement
+                executed for this request.
+        """
+        trace_id = kwargs.pop("trace_id", None) or str(uuid.uuid4())
+        query_timeout = kwargs.pop("query_timeout", None)
+
+        token = open_cancellation_scope(trace_id, timeout=query_timeout)
+        try:
+            if not self._coalesce_questions():
+                return self._run_query(user_query, trace_id, kwargs)
+
+            # 相同问题（规范化后）+ 相同参数并发进入时只运行一次工作流，其余调用共享结果
+            key = self._question_key(user_query, kwargs)
+
+            def leader() -> dict:
+                result = self._run_query(user_query, trace_id, kwargs)
+                self._raise_if_aborted(token, result)
+                return result
+
+            try:
+                result, shared = get_question_flight().do(key, leader, cancel_token=token)
+            except QueryCancelledError as e:
+                return self._error_result(user_query, trace_id, e)
+            return self._flight_result(user_query, trace_id, result, shared)
+        finally:
+            release_cancellation_scope(trace_id)
+
+    async def aquery(self, user_query: str, **kwargs) -> dict:
+        """Async variant of ``query`` running the workflow with ``graph.ainvoke``
+
+        Many questions can run concurrently on one event loop: LLM calls are
+        bounded per provider (``model.client.max_concurrency``) and data source
+        calls use the strategies' async execution. Coalescing applies to calls
+        on the same event loop. Keyword arguments are the same as ``query``.
+        """
+        trace_id = kwargs.pop("trace_id", None) or str(uuid.uuid4())
+        query_timeout = kwargs.pop("query_timeout", None)
+
+        token = open_cancellation_scope(trace_id, timeout=query_timeout)
+        try:
+            if not self._coalesce_questions():
+                return await self._run_query_async(user_query, trace_id, kwargs)
+
+            key = self._question_key(user_query, kwargs)
+
+            async def leader() -> dict:
+                result = await self._run_query_async(user_query, trace_id, kwargs)
+                self._raise_if_aborted(token, result)
+                return result
+
+            try:
+                result, shared = await get_question_flight().do_async(key, leader, cancel_token=token)
+            except QueryCancelledError as e:
+                return self._error_result(user_query, trace_id, e)
+            return self._flight_result(user_query, trace_id, result, shared)
+        finally:
+            release_cancellation_scope(trace_id)
+
+    @staticmethod
+    def _raise_if_aborted(token, result: dict) -> None:
+        """leader 被取消或超过自己的截止时间时抛出，让等待中的调用方按各自的截止时间重新执行，
+        而不是共享一个被中止的结果"""
+        if token.cancelled:
+            raise QueryCancelledError(result.get("error") or "Query cancelled")
+        if token.expired():
+            raise QueryTimeoutError(result.get("error") or "Query deadline exceeded")
+
+    def _error_result(self, user_query: str, trace_id: str, error: Exception) -> dict:
+        return {
+            "success": False,
+            "query": user_query,
+            "error": str(error),
+            "trace_id": trace_id,
+            "skill": self.skill_name,
+        }
+
+    @staticmethod
+    def _flight_result(user_query: str, trace_id: str, result: dict, shared: bool) -> dict:
+        """follower 拿到的是 leader 的结果，改写为本次调用的问题与 trace_id"""
+        if not shared:
+            return result
+        logger.info(f"[{trace_id}] Shared result of in-flight request {result.get('trace_id')}")
+        return {
+            **result,
+            "query": user_query,
+            "trace_id": trace_id,
+            "coalesced": True,
+            "leader_trace_id": result.get("trace_id"),
+        }
+
+    @staticmethod
+    def _coalesce_questions() -> bool:
+        config = get_config()
+        return config.single_flight.questions if config else True
+
+    def _question_key(self, user_query: str, kwargs: dict) -> str:
+        """合并键：规范化问题（折叠空白、忽略大小写）+ 当前技能 + 请求参数"""
+        question = re.sub(r"\s+", " ", user_query.strip()).casefold()
+        params = repr(sorted(kwargs.items(), key=lambda item: item[0]))
+        return f"{self.skill_name}\x00{question}\x00{params}"
+
+    def _preselected_skill(self, kwargs: dict) -> Optional[dict]:
+        """调用方强制指定技能或 fused 模式时的技能选择（无需运行技能中间件）；否则返回 None"""
         if kwargs.get("force_skill"):
-            selection = {
-                "skill": self.skill,
-                "skill_name": self.skill_name,
-                "skill_context": None,
-                "skill_selected_by": "forced",
-                "skill_confidence": None,
-            }
+            selected_by = "forced"
+        elif self.workflow.preprocess == "fused":
+            # 技能由图中的 understand 节点与意图、选表在同一次调用中选出
+            selected_by = None
         else:
-            selection = self.skill_middleware.run(user_query)
+            return None
+        return {
+            "skill": self.skill,
+            "skill_name": self.skill_name,
+            "skill_context": None,
+            "skill_selected_by": selected_by,
+            "skill_confidence": None,
+        }
 
+    def _initial_state(self, user_query: str, trace_id: str, selection: dict, kwargs: dict) -> AgentState:
+        """应用技能选择并构建图的初始状态"""
         selected_skill = selection.get("skill") or self.skill
         selected_skill_name = selection.get("skill_name") or self.skill_name
 
@@ -62,8 +197,8 @@ class NLToSQLAgent:
             self.skill_name = selected_skill_name
             self.skill = selected_skill
 
-        initial_state: AgentState = {
-            "trace_id": kwargs.get("trace_id"),
+        return {
+            "trace_id": trace_id,
             "messages": [],
             "user_query": user_query,
             "intent_analysis": None,
@@ -84,36 +219,270 @@ class NLToSQLAgent:
             **kwargs,
         }
 
+    @staticmethod
+    def _graph_config(trace_id: str, kwargs: dict) -> dict:
+        # 图带检查点（MemorySaver），每次运行需要 thread_id；按请求 ID 区分
+        config = {"configurable": {"thread_id": trace_id}}
+        if "recursion_limit" in kwargs:
+            config["recursion_limit"] = kwargs["recursion_limit"]
+        return config
+
+    def _run_query(self, user_query: str, trace_id: str, kwargs: dict) -> dict:
+        """运行一次完整工作流（取消令牌已由 query 打开），结果附带本次请求的 LLM 传输层重试次数"""
+        with count_llm_retries() as llm_retries:
+            result = self._run_workflow(user_query, trace_id, kwargs)
+        return {**result, "llm_retries": llm_retries["retries"]}
+
+    async def _run_query_async(self, user_query: str, trace_id: str, kwargs: dict) -> dict:
+        """_run_query 的异步版本"""
+        with count_llm_retries() as llm_retries:
+            result = await self._run_workflow_async(user_query, trace_id, kwargs)
+        return {**result, "llm_retries": llm_retries["retries"]}
+
+    def _run_workflow(self, user_query: str, trace_id: str, kwargs: dict) -> dict:
+        """技能选择 → 语义问题缓存 → 工作流图"""
+        selection = self._preselected_skill(kwargs) or self.skill_middleware.run(user_query)
+        initial_state = self._initial_state(user_query, trace_id, selection, kwargs)
+
+        # 请求级数据源会话：解析出的策略、schema 快照与缓存只属于本次调用
+        session = open_session(trace_id, kwargs.get("data_source_type"))
         try:
-            graph = self.workflow.get_graph()
+            config = self._graph_config(trace_id, kwargs)
 
-            # Extract config parameters from kwargs if present
-            config = {}
-            if "recursion_limit" in kwargs:
-                config["recursion_limit"] = kwargs["recursion_limit"]
+            scope = self._question_cache_scope(
+                initial_state["skill"], initial_state["skill_name"], initial_state, session
+            )
+            if scope is not None:
+                result = self._run_cached_sql(user_query, initial_state, scope, session, config)
+                if result is not None:
+                    return result
 
+            graph = self.workflow.get_graph()
             final_state = graph.invoke(initial_state, config=config)
 
-            return {
-                "success": final_state.get("review_passed", False)
-                or final_state.get("sql_valid", False),
-                "query": user_query,
-                "sql": final_state.get("sql_query"),
-                "result": final_state.get("execution_result"),
-                "answer": final_state.get("review_message"),
-                "error": final_state.get("error_message"),
-                "trace_id": final_state.get("trace_id"),
-                "skill": self.skill_name,
-            }
+            if scope is not None:
+                self._remember_sql(user_query, final_state, scope, session)
+            self._record_question(user_query, final_state)
+            return self._result_from_state(user_query, final_state)
+
+        except Exception as e:
+            logger.error(f"Query execution failed: {e}")
+            return self._error_result(user_query, trace_id, e)
+
+        finally:
+            release_session(trace_id)
+
+    async def _run_workflow_async(self, user_query: str, trace_id: str, kwargs: dict) -> dict:
+        """_run_workflow 的异步版本：图经 ainvoke 运行，本地文件/缓存读写放到线程池"""
+        selection = self._preselected_skill(kwargs) or await self.skill_middleware.run_async(user_query)
+        initial_state = self._initial_state(user_query, trace_id, selection, kwargs)
+
+        session = open_session(trace_id, kwargs.get("data_source_type"))
+        try:
+            config = self._graph_config(trace_id, kwargs)
+
+            scope = await asyncio.to_thread(
+                self._question_cache_scope,
+                initial_state["skill"], initial_state["skill_name"], initial_state, session,
+            )
+            if scope is not None:
+                result = await self._run_cached_sql_async(user_query, initial_state, scope, session, config)
+                if result is not None:
+                    return result
+
+            graph = self.workflow.get_graph()
+            final_state = await graph.ainvoke(initial_state, config=config)
+
+            if scope is not None:
+                await asyncio.to_thread(self._remember_sql, user_query, final_state, scope, session)
+            await asyncio.to_thread(self._record_question, user_query, final_state)
+            return self._result_from_state(user_query, final_state)
 
         except Exception as e:
             logger.error(f"Query execution failed: {e}")
-            return {
-                "success": False,
-                "query": user_query,
-                "error": str(e),
-                "skill": self.skill_name,
-            }
+            return self._error_result(user_query, trace_id, e)
+
+        finally:
+            release_session(trace_id)
+
+    def _result_from_state(self, user_query: str, final_state: dict) -> dict:
+        return {
+            "success": final_state.get("review_passed", False)
+            or final_state.get("sql_valid", False),
+            "query": user_query,
+            "sql": final_state.get("sql_query"),
+            "result": final_state.get("execution_result"),
+            "answer": final_state.get("review_message"),
+            "error": final_state.get("error_message"),
+            "trace_id": final_state.get("trace_id"),
+            "routing_decision": final_state.get("routing_decision"),
+            "local_decision": final_state.get("local_decision"),
+            "skill": final_state.get("skill_name") or self.skill_name,
+        }
+
+    def _record_question(self, user_query: str, final_state: dict) -> None:
+        """把 LLM 的判定作为本地意图/选表分类器的训练样本
+
+        非数据查询直接记录；数据查询须通过结果审查才记录涉及的表。
+        意图与选表都由本地分类器完成时不记录（避免用自己的判断训练自己）。
+        """
+        config = get_config()
+        if config is None or not config.intent_classifier.enabled:
+            return
+        local = final_state.get("local_decision") or {}
+        if local.get("intent_accepted") and local.get("tables_accepted"):
+            return
+        intent = final_state.get("intent_analysis")
+        if not isinstance(intent, dict) or "is_data_query" not in intent:
+            return
+        is_data_query = bool(intent["is_data_query"])
+        table_names = final_state.get("table_names")
+        if is_data_query and not (final_state.get("review_passed") and table_names):
+            return
+        try:
+            from src.core.intent_classifier import get_local_intent_classifier
+
+            get_local_intent_classifier().record(
+                user_query,
+                is_data_query,
+                list(table_names or []),
+                skill=final_state.get("skill_name") or self.skill_name,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record question sample: {e}")
+
+    @staticmethod
+    def _question_cache_scope(skill, skill_name: str, state: dict, session) -> Optional[dict]:
+        """语义问题缓存的作用域（技能名 + 技能版本 + 数据源）；未启用或不可用时返回 None"""
+        config = get_config()
+        if config is None or not config.question_cache.enabled:
+            return None
+        data_source_type = state.get("data_source_type")
+        try:
+            from src.core.data_sources.result_cache import source_identity
+            from src.core.question_cache import get_question_cache
+
+            cache = get_question_cache()
+            identity = source_identity(session.strategy(data_source_type).get_metadata())
+        except Exception as e:
+            logger.debug(f"Question cache bypassed: {e}")
+            return None
+        return {
+            "cache": cache,
+            "skill_name": skill_name,
+            "skill_version": getattr(skill, "version", None) or "",
+            "source": hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16],
+            "data_source_type": data_source_type,
+            "terms": NLToSQLAgent._question_terms(state),
+        }
+
+    @staticmethod
+    def _question_terms(state: dict) -> list:
+        """问题中的维度取值：技能 keyword_table_map 关键词 + 字段取值索引命中的取值（作为缓存实体精确比较）"""
+        from src.core.metadata import parse_skill_metadata
+        from src.core.value_index import lookup_question_values
+
+        terms = list(parse_skill_metadata(state.get("skill_context")).get("keyword_table_map") or {})
+        hints = lookup_question_values(state.get("user_query", ""), state.get("trace_id"), state.get("data_source_type"))
+        return terms + [hint.value for hint in hints]
+
+    @staticmethod
+    def _schema_version(session, table_names: list, data_source_type: Optional[str]) -> str:
+        """相关表的结构版本（表/字段/类型的哈希，不含随数据变化的样本值）"""
+        from src.core.question_cache import schema_signature
+
+        schema = session.get_schema_info(sorted(table_names), data_source_type)
+        signature = json.dumps(schema_signature(schema), ensure_ascii=False)
+        return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+    def _lookup_cached_sql(self, user_query: str, scope: dict, session):
+        try:
+            return scope["cache"].lookup(
+                user_query,
+                scope["skill_name"],
+                scope["skill_version"],
+                scope["source"],
+                lambda tables: self._schema_version(session, tables, scope["data_source_type"]),
+                scope.get("terms", ()),
+            )
+        except Exception as e:
+            logger.warning(f"Question cache lookup failed: {e}")
+            return None
+
+    @staticmethod
+    def _cached_sql_input(initial_state: dict, hit, config: dict):
+        """(缓存 SQL 图的初始状态, 运行配置)"""
+        state = {**initial_state, "sql_query": hit.sql, "sql_valid": True, "table_names": hit.table_names}
+        return state, {**config, "configurable": {"thread_id": initial_state["trace_id"]}}
+
+    def _cached_sql_result(self, user_query: str, final_state: dict, scope: dict, hit) -> Optional[dict]:
+        if not final_state.get("review_passed"):
+            logger.info(f"Cached SQL rejected by review, dropping entry: {hit.question}")
+            scope["cache"].invalidate(hit.entry_id)
+            return None
+
+        result = self._result_from_state(user_query, final_state)
+        result["question_cache"] = {"matched_question": hit.question, "similarity": round(hit.similarity, 4)}
+        return result
+
+    def _run_cached_sql(
+        self, user_query: str, initial_state: dict, scope: dict, session, config: dict
+    ) -> Optional[dict]:
+        """复用语义相近问题的已校验 SQL，跳过意图分析、上下文加载、生成与校验
+
+        Returns:
+            结果字典；未命中或复用的 SQL 未通过审查时返回 None（改走完整工作流）
+        """
+        hit = self._lookup_cached_sql(user_query, scope, session)
+        if hit is None:
+            return None
+
+        state, run_config = self._cached_sql_input(initial_state, hit, config)
+        final_state = self.workflow.get_cached_sql_graph().invoke(state, config=run_config)
+        return self._cached_sql_result(user_query, final_state, scope, hit)
+
+    async def _run_cached_sql_async(
+        self, user_query: str, initial_state: dict, scope: dict, session, config: dict
+    ) -> Optional[dict]:
+        """_run_cached_sql 的异步版本"""
+        hit = await asyncio.to_thread(self._lookup_cached_sql, user_query, scope, session)
+        if hit is None:
+            return None
+
+        state, run_config = self._cached_sql_input(initial_state, hit, config)
+        final_state = await self.workflow.get_cached_sql_graph().ainvoke(state, config=run_config)
+        return await asyncio.to_thread(self._cached_sql_result, user_query, final_state, scope, hit)
+
+    def _remember_sql(self, user_query: str, final_state: dict, scope: dict, session) -> None:
+        """把通过审查的 SQL 写入语义问题缓存（缺少表名时无法跟踪结构版本，不写入）"""
+        sql = final_state.get("sql_query")
+        table_names = final_state.get("table_names")
+        if not (final_state.get("review_passed") and sql and table_names):
+            return
+        if final_state.get("skill_name", scope["skill_name"]) != scope["skill_name"]:
+            # fused 模式下图内改选了技能，条目不属于查找时的作用域
+            return
+        try:
+            scope["cache"].store(
+                user_query,
+                sql,
+                list(table_names),
+                scope["skill_name"],
+                scope["skill_version"],
+                scope["source"],
+                self._schema_version(session, table_names, scope["data_source_type"]),
+                scope.get("terms", ()),
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store question cache entry: {e}")
+
+    def cancel(self, trace_id: str) -> bool:
+        """Cancel an in-flight query and abort its running statement
+
+        Returns:
+            True if the request was found
+        """
+        return cancel_request(trace_id)
 
     def reload_skill(self, skill_name: Optional[str] = None):
         """Reload skill configuration"""
@@ -189,6 +189,26 @@ SQL_VALIDATION_PROMPT = """
 """
 
 
+UNDERSTAND_PROMPT = """
+你是数据问答系统的预处理助手。请一次完成以下三项判断。
+
+## 用户问题
+{user_query}
+
+## 技能列表（JSON，每个元素包含 name 与 description）
+{skills}
+
+## 当前技能上下文（JSON，包含可用的表、字段与业务规则）
+{skill_context}
+
+## 指令
+1. 技能选择：从技能列表中选择最匹配的技能，给出置信度（0.0 到 1.0）
+2. 意图分析：判断问题是否与数据查询/数据分析相关，并给出简短原因
+3. 选表：若为数据查询，根据当前技能上下文列出需要的表（table_name）及用到的字段（fields），
+   表名与字段名必须与上下文中的写法一致；不是数据查询时返回空列表
+"""
+
+
 RESULT_REVIEW_PROMPT = """
 你是专业的 SQL 结果评审员。
 
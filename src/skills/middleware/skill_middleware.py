@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import re
 from dataclasses import dataclass
@@ -10,7 +11,7 @@ from typing import Any, Dict, List, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableLambda
-from src.core.llm import get_llm
+from src.core.llm import ainvoke_llm, get_llm
 from src.skills.loader import SkillLoader
 
 
@@ -188,10 +189,7 @@ class SkillSelectorReActAgent:
 
         return None
 
-    def select(self, user_query: str) -> Dict[str, Any]:
-        if not self.llm:
-            return {"skill_name": self.default_skill, "confidence": 0.0}
-
+    def _messages(self, user_query: str) -> List[Any]:
         summaries = self.catalog.load_skill_summaries()
         payload = [s.to_dict() for s in summaries]
 
@@ -200,7 +198,7 @@ class SkillSelectorReActAgent:
             "技能列表是一个数组，每个元素包含 name 与 description。"
             "只返回 JSON：{\"skill_name\":\"...\", \"confidence\":0.0, \"reasoning_summary\":\"...\"}"
         )
-        messages = [
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(
                 content=(
@@ -212,7 +210,7 @@ class SkillSelectorReActAgent:
             ),
         ]
 
-        response = self.llm.invoke(messages)
+    def _selection_from(self, response: Any) -> Dict[str, Any]:
         selection = self._parse_selection(response.content)
 
         if not selection:
@@ -223,6 +221,22 @@ class SkillSelectorReActAgent:
 
         return selection
 
+    def select(self, user_query: str) -> Dict[str, Any]:
+        if not self.llm:
+            return {"skill_name": self.default_skill, "confidence": 0.0}
+
+        response = self.llm.invoke(self._messages(user_query))
+        return self._selection_from(response)
+
+    async def select_async(self, user_query: str) -> Dict[str, Any]:
+        """Async variant of select (the LLM call is bounded by the provider's concurrency slot)."""
+        if not self.llm:
+            return {"skill_name": self.default_skill, "confidence": 0.0}
+
+        messages = await asyncio.to_thread(self._messages, user_query)
+        response = await ainvoke_llm(self.llm, messages)
+        return self._selection_from(response)
+
 
 class SkillMiddleware:
     def __init__(
@@ -247,16 +261,31 @@ class SkillMiddleware:
 
     def run(self, user_query: str) -> Dict[str, Any]:
         selection = self.selector.select(user_query)
-        skill_name = selection.get("skill_name")
-        confidence = selection.get("confidence", 0.0)
+        return self.resolve(
+            selection.get("skill_name"),
+            selection.get("confidence", 0.0),
+            "react_agent" if self.llm else "heuristic",
+        )
 
-        context = self.context_loader.load(skill_name) if skill_name else None
-        skill_obj = self.context_loader.loader.load_skill(skill_name) if skill_name else None
+    async def run_async(self, user_query: str) -> Dict[str, Any]:
+        """Async variant of run; skill files are loaded in a worker thread."""
+        selection = await self.selector.select_async(user_query)
+        return await asyncio.to_thread(
+            self.resolve,
+            selection.get("skill_name"),
+            selection.get("confidence", 0.0),
+            "react_agent" if self.llm else "heuristic",
+        )
 
-        selected_by = "react_agent" if self.llm else "heuristic"
+    def resolve(self, skill_name: Optional[str], confidence: float, selected_by: str) -> Dict[str, Any]:
+        """Load the chosen skill and its context (low confidence falls back to the default skill)."""
         if confidence < self.confidence_threshold:
+            skill_name = self.default_skill
             selected_by = "fallback"
 
+        context = self.context_loader.load(skill_name) if skill_name else None
+        skill_obj = self.context_loader.loader.load_skill(skill_name) if skill_name else None
+
         return {
             "skill": skill_obj,
             "skill_name": skill_name,
@@ -283,28 +312,50 @@ def get_skill_middleware_singleton(
         _skill_middleware_instance = SkillMiddleware(
             skill_path=skill_path,
             default_skill=default_skill,
-            llm=llm or get_llm(),
+            llm=llm or get_llm(node="skill_selection"),
             confidence_threshold=confidence_threshold,
         )
     return _skill_middleware_instance
 
 
+def _apply_selection(state: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    state["skill"] = result.get("skill")
+    state["skill_name"] = result.get("skill_name")
+    state["skill_context"] = result.get("skill_context")
+    state["skill_selected_by"] = result.get("skill_selected_by")
+    state["skill_confidence"] = result.get("skill_confidence")
+    return state
+
+
 def select_skill_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Workflow node: select skill and inject skill context into state."""
+    """Workflow node: select skill and inject skill context into state.
+
+    Skipped when the caller already selected the skill (NLToSQLAgent.query runs
+    the middleware before invoking the graph).
+    """
+    if state.get("skill_name") and state.get("skill_selected_by"):
+        return state
+
     user_query = state.get("user_query") or ""
     middleware = get_skill_middleware_singleton(
         skill_path=None,
         default_skill=state.get("skill_name") or "nl-to-sql-agent",
     )
 
-    result = middleware.run(user_query)
-    state["skill"] = result.get("skill")
-    state["skill_name"] = result.get("skill_name")
-    state["skill_context"] = result.get("skill_context")
-    state["skill_selected_by"] = result.get("skill_selected_by")
-    state["skill_confidence"] = result.get("skill_confidence")
+    return _apply_selection(state, middleware.run(user_query))
 
-    return state
+
+async def select_skill_node_async(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async variant of select_skill_node."""
+    if state.get("skill_name") and state.get("skill_selected_by"):
+        return state
+
+    middleware = get_skill_middleware_singleton(
+        skill_path=None,
+        default_skill=state.get("skill_name") or "nl-to-sql-agent",
+    )
+
+    return _apply_selection(state, await middleware.run_async(state.get("user_query") or ""))
 
 
 def get_skill_middleware(
@@ -317,6 +368,6 @@ def get_skill_middleware(
     return SkillMiddleware(
         skill_path=skill_path,
         default_skill=default_skill,
-        llm=llm or get_llm(),
+        llm=llm or get_llm(node="skill_selection"),
         confidence_threshold=confidence_threshold,
     )
@@ -0,0 +1,144 @@
+"""
+异步数据源接口 单元测试
+验证基类默认的线程卸载实现（含取消）以及 asyncpg 连接参数映射。
+"""
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.core.data_sources.async_postgres_source import AsyncPostgreSQLDataSource
+from src.core.data_sources.cancellation import CancellationToken, QueryCancelledError
+from src.core.data_sources.excel_source import ExcelDataSource
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_cost_data.xlsx"
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+class TestThreadOffloadedFallback:
+    """测试 Excel 策略通过线程池执行异步查询"""
+
+    def test_concurrent_async_queries_match_sync(self):
+        source = ExcelDataSource(str(FIXTURE))
+        query = "SELECT COUNT(*) AS n FROM Sheet1"
+        expected = source.execute_query(query)["n"].iloc[0]
+
+        async def run():
+            return await asyncio.gather(*(source.execute_query_async(query) for _ in range(8)))
+
+        results = asyncio.run(run())
+        assert [df["n"].iloc[0] for df in results] == [expected] * 8
+        assert source.get_schema_info(["Sheet1"]) == asyncio.run(
+            source.get_schema_info_async(["Sheet1"])
+        )
+
+    def test_cancel_token_aborts_offloaded_query(self):
+        source = ExcelDataSource(str(FIXTURE))
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+        runaway = (
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+            "SELECT COUNT(*) FROM c"
+        )
+        with pytest.raises(QueryCancelledError):
+            asyncio.run(source.execute_query_async(runaway, timeout=10, cancel_token=token))
+
+
+class TestAsyncPostgresConnectArgs:
+    """测试 asyncpg 连接参数"""
+
+    def test_connection_params_override_host_and_ssl(self):
+        source = AsyncPostgreSQLDataSource(
+            database="analytics",
+            password="",
+            connection_params={"host": "/tmp/pgdata", "sslmode": "require"},
+            pool_max_size=7,
+        )
+        kwargs = source._connect_kwargs()
+        assert kwargs["host"] == "/tmp/pgdata"
+        assert kwargs["database"] == "analytics"
+        assert kwargs["ssl"] == "require"
+        assert source.pool_max_size == 7
+        if source.statement_timeout:
+            assert kwargs["server_settings"]["statement_timeout"] == str(
+                int(source.statement_timeout * 1000)
+            )
+
+
+class _StallingPool:
+    """acquire → transaction → prepare → fetch 一直等待的假连接池"""
+
+    def __init__(self):
+        self.fetch_cancelled = False
+
+    def acquire(self):
+        return self
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, sql):
+        pass
+
+    async def prepare(self, query):
+        return self
+
+    async def fetch(self):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.fetch_cancelled = True
+            raise
+
+
+class TestAsyncPostgresCancellation:
+    """测试取消令牌只中止查询，不改变调用方 Task 的取消状态"""
+
+    def _source(self, pool, monkeypatch):
+        source = AsyncPostgreSQLDataSource(database="analytics", password="")
+        monkeypatch.setattr(source, "_get_replicas", lambda: None)
+
+        async def get_pool():
+            return pool
+
+        monkeypatch.setattr(source, "_get_pool", get_pool)
+        return source
+
+    def test_cancel_token_leaves_caller_task_uncancelled(self, monkeypatch):
+        pool = _StallingPool()
+        source = self._source(pool, monkeypatch)
+
+        async def main():
+            token = CancellationToken()
+            asyncio.get_running_loop().call_later(0.05, token.cancel)
+            with pytest.raises(QueryCancelledError):
+                await source.execute_query_async("SELECT 1", timeout=10, cancel_token=token)
+            task = asyncio.current_task()
+            # 调用方之后的等待不受影响（未被残留的取消打断）
+            await asyncio.sleep(0.01)
+            return getattr(task, "cancelling", lambda: 0)()
+
+        assert asyncio.run(main()) == 0
+        assert pool.fetch_cancelled
+
+    def test_caller_cancellation_propagates_to_fetch(self, monkeypatch):
+        pool = _StallingPool()
+        source = self._source(pool, monkeypatch)
+
+        async def main():
+            query = asyncio.ensure_future(source.execute_query_async("SELECT 1", timeout=10))
+            await asyncio.sleep(0.05)
+            query.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await query
+
+        asyncio.run(main())
+        assert pool.fetch_cancelled
@@ -0,0 +1,178 @@
+"""
+异步图执行 单元测试
+验证提供商并发槽位、异步 single-flight 合并与取消或超时后重跑、异步节点在同一事件循环内并发，以及图经 ainvoke 走异步节点。
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.config.settings import AppConfig, IntentClassifierConfig, LLMClientConfig, ModelConfig, get_config, set_config
+from src.core.data_sources.cancellation import QueryTimeoutError
+from src.core.data_sources.single_flight import SingleFlight
+from src.core.llm import ainvoke_llm, reset_llm_cache
+
+DELAY = 0.05
+
+
+class _AsyncLLM:
+    """ainvoke 固定耗时的假模型，记录同时进行的调用数"""
+
+    def __init__(self, content="{}"):
+        self.content = content
+        self.running = 0
+        self.max_running = 0
+
+    def invoke(self, messages):
+        raise AssertionError("sync invoke should not be used")
+
+    async def ainvoke(self, messages):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(DELAY)
+        self.running -= 1
+        return AIMessage(content=self.content)
+
+
+@pytest.fixture
+def async_config():
+    original = get_config()
+    set_config(AppConfig(
+        model=ModelConfig(client=LLMClientConfig(max_concurrency=3)),
+        intent_classifier=IntentClassifierConfig(enabled=False),
+    ))
+    reset_llm_cache()
+    yield
+    reset_llm_cache()
+    set_config(original)
+
+
+def test_ainvoke_llm_respects_provider_concurrency(async_config):
+    llm = _AsyncLLM()
+
+    async def main():
+        await asyncio.gather(*(ainvoke_llm(llm, []) for _ in range(10)))
+
+    asyncio.run(main())
+    assert llm.max_running == 3
+
+
+def test_do_async_coalesces_same_key():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(DELAY)
+        return {"value": 1}
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("k", fn) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flight.get_stats() == {"executions": 1, "shared": 4, "in_flight": 0}
+
+
+def test_do_async_follower_reruns_after_leader_cancelled():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(DELAY)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("k", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("k", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == (2, False)
+
+
+def test_do_async_follower_reruns_after_leader_timeout():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(DELAY)
+        if len(calls) == 1:
+            raise QueryTimeoutError("leader deadline exceeded")
+        return len(calls)
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("k", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("k", fn))
+        with pytest.raises(QueryTimeoutError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == (2, False)
+
+
+# ==================== 异步节点与图 ====================
+
+graph_module = pytest.importorskip("src.graph.graph", reason="workflow graph not importable", exc_type=ImportError)
+from src.agents.intent_analysis_agent import analyze_intent_node_async  # noqa: E402
+
+
+def test_async_nodes_multiplex_on_one_loop(async_config):
+    llm = _AsyncLLM('{"is_data_query": true, "reason": "stub"}')
+
+    async def main():
+        return await asyncio.gather(*(
+            analyze_intent_node_async({"user_query": f"问题 {i}", "llm": llm}) for i in range(9)
+        ))
+
+    started = time.perf_counter()
+    states = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    assert all(state["intent_analysis"]["is_data_query"] for state in states)
+    assert llm.max_running == 3 and elapsed < 6 * DELAY
+
+
+def test_preprocess_graph_ainvoke_uses_async_nodes(monkeypatch):
+    def sync_node(state):
+        raise AssertionError("sync node should not run under ainvoke")
+
+    def stub(update, full_state=True):
+        async def node(state):
+            await asyncio.sleep(DELAY)
+            return {**state, **update} if full_state else dict(update)
+        return node
+
+    monkeypatch.setattr(graph_module, "select_skill_node_async", stub({"skill_context": {"tables": ["costs"]}}))
+    monkeypatch.setattr(graph_module, "analyze_intent_node_async", stub({"intent_analysis": {"is_data_query": True}}))
+    monkeypatch.setattr(graph_module, "select_tables_node_async", stub(
+        {"selected_tables": [{"table_name": "costs"}]}, full_state=False,
+    ))
+    monkeypatch.setattr(graph_module, "prefetch_schema_node_async", stub({"prefetched_tables": ["costs"]}, full_state=False))
+    monkeypatch.setattr(graph_module, "lookup_values_node", lambda state: {"value_hints": []})
+
+    async def load_context(state):
+        return {**state, "table_names": [t["table_name"] for t in state["selected_tables"]]}
+
+    monkeypatch.setattr(graph_module, "load_context_node_async", load_context)
+    for name in ("select_skill_node", "analyze_intent_node", "select_tables_node", "prefetch_schema_node", "load_context_node"):
+        monkeypatch.setattr(graph_module, name, sync_node)
+
+    graph = graph_module.GraphWorkflow(preprocess="chain", fan_out=True).build_preprocess_graph()
+    started = time.perf_counter()
+    state = asyncio.run(graph.ainvoke({"trace_id": "t1", "user_query": "IT 成本"}))
+    elapsed = time.perf_counter() - started
+
+    assert state["table_names"] == ["costs"] and state["prefetched_tables"] == ["costs"]
+    assert state["intent_analysis"] == {"is_data_query": True}
+    assert elapsed < 4 * DELAY  # select_skill 之后三个异步分支并发
@@ -0,0 +1,175 @@
+"""
+执行前成本守卫 单元测试
+验证 PostgreSQL / SQL Server 计划解析、超限拒绝信息以及自动行数限制。
+"""
+
+import pytest
+
+from src.core.data_sources.cost_guard import (
+    PlanEstimate,
+    QueryCostExceededError,
+    QueryCostGuard,
+    apply_row_limit,
+    parse_postgres_plan,
+    parse_showplan_xml,
+)
+
+CROSS_JOIN_PLAN = [
+    {
+        "Plan": {
+            "Node Type": "Nested Loop",
+            "Total Cost": 5000706.0,
+            "Plan Rows": 400000000,
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "cost_database", "Total Cost": 289.0, "Plan Rows": 20000},
+                {
+                    "Node Type": "Materialize",
+                    "Total Cost": 389.0,
+                    "Plan Rows": 20000,
+                    "Plans": [
+                        {"Node Type": "Seq Scan", "Relation Name": "rate_table", "Total Cost": 289.0, "Plan Rows": 20000}
+                    ],
+                },
+            ],
+        }
+    }
+]
+
+HASH_JOIN_PLAN = [
+    {
+        "Plan": {
+            "Node Type": "Hash Join",
+            "Total Cost": 1200.0,
+            "Plan Rows": 20000,
+            "Hash Cond": "(c.key = r.key)",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "cost_database", "Total Cost": 289.0, "Plan Rows": 20000},
+                {"Node Type": "Hash", "Total Cost": 289.0, "Plan Rows": 100, "Plans": []},
+            ],
+        }
+    }
+]
+
+SHOWPLAN_XML = """<?xml version="1.0" encoding="utf-16"?>
+<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan">
+  <BatchSequence><Batch><Statements>
+    <StmtSimple StatementSubTreeCost="8123.5" StatementEstRows="250000000">
+      <QueryPlan>
+        <RelOp PhysicalOp="Nested Loops" EstimateRows="250000000" EstimatedTotalSubtreeCost="8123.5">
+          <NestedLoops Optimized="false">
+            <RelOp PhysicalOp="Table Scan" EstimateRows="50000" EstimatedTotalSubtreeCost="1.2">
+              <TableScan><Object Table="[SSME_FI_InsightBot_CostDataBase]" /></TableScan>
+            </RelOp>
+            <RelOp PhysicalOp="Table Scan" EstimateRows="5000" EstimatedTotalSubtreeCost="0.4">
+              <TableScan><Object Table="[SSME_FI_InsightBot_Rate]" /></TableScan>
+            </RelOp>
+          </NestedLoops>
+        </RelOp>
+      </QueryPlan>
+    </StmtSimple>
+  </Statements></Batch></BatchSequence>
+</ShowPlanXML>"""
+
+
+class FakeStrategy:
+    """返回固定估算结果的数据源策略"""
+
+    def __init__(self, estimate: PlanEstimate, source_type: str = "postgresql"):
+        self.estimate = estimate
+        self.source_type = source_type
+        self.explained = []
+
+    def explain(self, query):
+        self.explained.append(query)
+        return self.estimate
+
+    def get_metadata(self):
+        return {"source_type": self.source_type}
+
+
+class TestPlanParsing:
+    """测试执行计划解析"""
+
+    def test_postgres_cross_join_detected(self):
+        estimate = parse_postgres_plan(CROSS_JOIN_PLAN)
+        assert estimate.total_cost == pytest.approx(5000706.0)
+        assert estimate.estimated_rows == 400000000
+        assert not estimate.root.has_join_condition
+        assert estimate.root.relations() == ["cost_database", "rate_table"]
+
+    def test_postgres_hash_join_has_condition(self):
+        estimate = parse_postgres_plan(HASH_JOIN_PLAN)
+        assert estimate.root.has_join_condition
+
+    def test_showplan_xml(self):
+        estimate = parse_showplan_xml(SHOWPLAN_XML)
+        assert estimate.total_cost == pytest.approx(8123.5)
+        assert estimate.estimated_rows == 250000000
+        assert not estimate.root.has_join_condition
+        assert estimate.root.relations() == [
+            "SSME_FI_InsightBot_CostDataBase",
+            "SSME_FI_InsightBot_Rate",
+        ]
+
+
+class TestQueryCostGuard:
+    """测试守卫决策"""
+
+    def test_disabled_guard_skips_explain(self):
+        strategy = FakeStrategy(parse_postgres_plan(CROSS_JOIN_PLAN))
+        guard = QueryCostGuard(enabled=False)
+        assert guard.enforce(strategy, "SELECT 1") == "SELECT 1"
+        assert strategy.explained == []
+
+    def test_cheap_query_passes(self):
+        strategy = FakeStrategy(parse_postgres_plan(HASH_JOIN_PLAN))
+        guard = QueryCostGuard(enabled=True)
+        assert guard.enforce(strategy, "SELECT 1") == "SELECT 1"
+
+    def test_rejection_names_cartesian_join(self):
+        strategy = FakeStrategy(parse_postgres_plan(CROSS_JOIN_PLAN))
+        guard = QueryCostGuard(enabled=True, max_total_cost=1e6, max_estimated_rows=1e5)
+        with pytest.raises(QueryCostExceededError) as exc_info:
+            guard.enforce(strategy, "SELECT * FROM cost_database, rate_table")
+        message = str(exc_info.value)
+        assert "cartesian product" in message
+        assert "cost_database, rate_table" in message
+
+    def test_limit_action_when_only_rows_exceeded(self):
+        strategy = FakeStrategy(PlanEstimate(total_cost=10.0, estimated_rows=5e6))
+        guard = QueryCostGuard(
+            enabled=True, max_estimated_rows=1e5, action="limit", auto_limit_rows=500
+        )
+        limited = guard.enforce(strategy, "SELECT * FROM cost_database;")
+        assert limited.endswith("LIMIT 500")
+
+    def test_limit_action_still_rejects_when_cost_exceeded(self):
+        strategy = FakeStrategy(parse_postgres_plan(CROSS_JOIN_PLAN))
+        guard = QueryCostGuard(enabled=True, max_total_cost=1e6, action="limit")
+        with pytest.raises(QueryCostExceededError):
+            guard.enforce(strategy, "SELECT * FROM cost_database, rate_table")
+
+    def test_explain_failure_lets_query_through(self):
+        class BrokenStrategy(FakeStrategy):
+            def explain(self, query):
+                raise RuntimeError("syntax error")
+
+        guard = QueryCostGuard(enabled=True)
+        assert guard.enforce(BrokenStrategy(None), "SELEC 1") == "SELEC 1"
+
+
+class TestApplyRowLimit:
+    """测试自动行数限制改写"""
+
+    def test_sqlserver_injects_top(self):
+        assert (
+            apply_row_limit("select distinct Function from t", 100, "sqlserver")
+            == "SELECT DISTINCT TOP (100) Function from t"
+        )
+
+    def test_sqlserver_cte_not_rewritten(self):
+        assert apply_row_limit("WITH a AS (SELECT 1) SELECT * FROM a", 10, "sqlserver") is None
+        assert apply_row_limit("SELECT TOP 5 * FROM t", 10, "sqlserver") is None
+
+    def test_unknown_dialect(self):
+        assert apply_row_limit("SELECT 1", 10, "excel") is None
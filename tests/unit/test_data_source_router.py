@@ -0,0 +1,109 @@
+"""
+数据源自动路由 单元测试
+验证按表可用性、观测耗时、错误率与快照新鲜度选择数据源，以及执行统计的采集。
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.executor import run_query
+from src.core.data_sources.router import DataSourceRouter, get_data_source_router
+
+
+class FakeDatabase:
+    """只提供表清单的数据库策略"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def get_context(self):
+        return {"tables": {name: {"name": name} for name in self.tables}}
+
+
+PRIORITY = {"sqlserver": 1, "postgresql": 2, "excel": 3}
+
+
+def _router(**kwargs):
+    return DataSourceRouter(
+        priority=PRIORITY,
+        table_aliases={"cost_database": "SSME_FI_InsightBot_CostDataBase"},
+        **kwargs,
+    )
+
+
+def _candidates():
+    return {
+        "sqlserver": FakeDatabase(["SSME_FI_InsightBot_CostDataBase", "SSME_FI_InsightBot_Rate"]),
+        "postgresql": FakeDatabase(["cost_database"]),
+    }
+
+
+class TestRouting:
+    """测试路由决策"""
+
+    def test_cold_start_follows_priority(self):
+        decision = _router().route(["cost_database"], _candidates())
+        assert decision.source == "sqlserver"
+        assert "priority" in decision.reason
+
+    def test_fastest_observed_source_wins(self):
+        router = _router()
+        for _ in range(5):
+            router.record("sqlserver", 900.0)
+            router.record("postgresql", 40.0)
+        decision = router.route(["cost_database"], _candidates())
+        assert decision.source == "postgresql"
+        assert {c["source"]: c["latency_ms"] for c in decision.candidates}["postgresql"] == 40.0
+
+    def test_source_missing_tables_is_excluded(self):
+        router = _router()
+        router.record("postgresql", 1.0)
+        router.record("sqlserver", 500.0)
+        decision = router.route(["cost_database", "SSME_FI_InsightBot_Rate"], _candidates())
+        assert decision.source == "sqlserver"
+        excluded = {c["source"]: c for c in decision.candidates}["postgresql"]
+        assert excluded["missing_tables"] == ["SSME_FI_InsightBot_Rate"]
+
+    def test_error_rate_penalizes_fast_but_failing_source(self):
+        router = _router()
+        router.record("postgresql", 50.0)
+        router.record("sqlserver", 120.0)
+        for _ in range(5):
+            router.record("postgresql", 0.0, ok=False, error="connection reset")
+        assert router.route(["cost_database"], _candidates()).source == "sqlserver"
+
+    def test_stale_snapshot_skipped_when_fresher_source_exists(self, monkeypatch):
+        stale = time.time() - 10 * 86400
+        monkeypatch.setattr(
+            DataSourceRouter,
+            "_excel_inventory",
+            staticmethod(lambda: ({"cost_database"}, {"cost_database": stale})),
+        )
+        router = _router(max_staleness_seconds=86400)
+        router.record("excel", 5.0)
+        router.record("postgresql", 80.0)
+        candidates = {"excel": None, "postgresql": FakeDatabase(["cost_database"])}
+        decision = router.route(["cost_database"], candidates)
+        assert decision.source == "postgresql"
+        assert {c["source"]: c["excluded"] for c in decision.candidates}["excel"] == "stale snapshot"
+
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_cost_data.xlsx"
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+def test_run_query_records_latency_and_errors():
+    router = get_data_source_router()
+    before = router.get_stats().get("excel", {"samples": 0, "errors": 0})
+    source = ExcelDataSource(str(FIXTURE))
+    # 唯一的字面量避免命中结果缓存
+    run_query(source, f"SELECT COUNT(*) FROM Sheet1 WHERE Amount <> {time.time_ns()}")
+    with pytest.raises(Exception):
+        run_query(source, "SELECT missing_column FROM Sheet1")
+    after = router.get_stats()["excel"]
+    assert after["samples"] == before["samples"] + 2
+    assert after["errors"] == before["errors"] + 1
+    assert after["latency_ms"] is not None
@@ -0,0 +1,108 @@
+"""
+请求级数据源会话 单元测试
+验证并发请求互不干扰、schema 快照复用，以及执行器单例不再被逐请求修改。
+"""
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.executor import get_executor
+from src.core.data_sources.session import (
+    DataSourceSession,
+    get_session,
+    open_session,
+    release_session,
+    resolve_strategy,
+    session_for,
+)
+
+FIXTURES = Path(__file__).parent.parent / "fixtures"
+COST = FIXTURES / "nl_cost_data.xlsx"
+RATE = FIXTURES / "nl_rate_data.xlsx"
+
+pytestmark = pytest.mark.skipif(
+    not (COST.exists() and RATE.exists()), reason="fixture workbooks missing"
+)
+
+
+class TestSessionRegistry:
+    """测试会话注册表"""
+
+    def test_open_get_release(self):
+        session = open_session("req-1", "excel")
+        assert get_session("req-1") is session
+        assert session_for("req-1") is session
+        release_session("req-1")
+        assert get_session("req-1") is None
+        assert session_for("req-1", "excel") is not session
+
+    def test_shared_strategy_built_once(self):
+        first = resolve_strategy("excel", file_path=str(COST), sheet_name="Sheet1")
+        second = resolve_strategy("excel", file_path=str(COST), sheet_name="Sheet1")
+        assert first is second
+
+
+class TestConcurrentSessions:
+    """测试并发请求使用不同数据源"""
+
+    def test_parallel_requests_do_not_race(self):
+        executor = get_executor()
+        before = executor._strategy
+        sessions = {
+            "req-cost": (ExcelDataSource(str(COST)), "Amount"),
+            "req-rate": (ExcelDataSource(str(RATE)), "RateNo"),
+        }
+        for trace_id, (strategy, _) in sessions.items():
+            open_session(trace_id, "excel").bind_strategy(strategy)
+
+        errors = []
+
+        def worker(trace_id, expected_column):
+            for _ in range(20):
+                df = executor.execute_from_state(
+                    {
+                        "sql_query": "SELECT * FROM Sheet1 LIMIT 1",
+                        "data_source_type": "excel",
+                        "trace_id": trace_id,
+                    }
+                )
+                if expected_column not in df.columns:
+                    errors.append((trace_id, list(df.columns)))
+
+        try:
+            threads = [
+                threading.Thread(target=worker, args=(trace_id, column))
+                for trace_id, (_, column) in sessions.items()
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for trace_id in sessions:
+                release_session(trace_id)
+
+        assert errors == []
+        assert executor._strategy is before
+
+
+class TestSchemaSnapshot:
+    """测试请求内 schema 快照"""
+
+    def test_schema_read_once_per_request(self):
+        calls = []
+
+        class CountingSource(ExcelDataSource):
+            def get_schema_info(self, table_names):
+                calls.append(tuple(table_names))
+                return super().get_schema_info(table_names)
+
+        session = DataSourceSession("req-schema", "excel")
+        session.bind_strategy(CountingSource(str(COST)))
+        first = session.get_schema_info(["Sheet1"])
+        second = session.get_schema_info(["Sheet1"])
+        assert first == second
+        assert calls == [("Sheet1",)]
@@ -0,0 +1,133 @@
+"""
+联邦查询 单元测试
+验证 CTE/过滤下推规划、行数上限，以及与单库执行结果一致（远程端用内存 SQLite 代替 PostgreSQL）。
+"""
+
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.core.data_sources.base import DataSourceStrategy
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.federated import (
+    FederatedDataSource,
+    FederatedQueryError,
+    plan_federated_query,
+)
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_rate_data.xlsx"
+
+REMOTE = {"cost_facts": {"id": "integer", "cc": "character varying", "period": "integer", "amount": "numeric"}}
+LOCAL = {"Sheet1": {"BL", "CC", "Year", "Scenario", "Period", "Key", "RateNo"}}
+
+
+class SQLiteRemote(DataSourceStrategy):
+    """用内存 SQLite 模拟远程数据库，记录收到的下推查询"""
+
+    def __init__(self, rows: int):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        pd.DataFrame(
+            {
+                "id": range(rows),
+                "cc": [f"CT-00{i % 3 + 1}" for i in range(rows)],
+                "period": [i % 12 + 1 for i in range(rows)],
+                "amount": [float(i) for i in range(rows)],
+            }
+        ).to_sql("cost_facts", self.conn, index=False)
+        self.queries = []
+
+    def execute_query(self, query, timeout=None, cancel_token=None):
+        self.queries.append(query)
+        return pd.read_sql_query(query, self.conn)
+
+    def load_data(self):
+        return pd.DataFrame()
+
+    def get_metadata(self):
+        return {"source_type": "postgresql"}
+
+    def get_context(self):
+        return {}
+
+    def get_schema_info(self, table_names):
+        return ", ".join(table_names)
+
+    def is_available(self):
+        return True
+
+
+class TestPlanner:
+    """测试下推规划"""
+
+    def test_remote_only_cte_is_pushed_whole(self):
+        plan = plan_federated_query(
+            "WITH c AS (SELECT cc, SUM(amount) AS total FROM cost_facts WHERE period = 1 GROUP BY cc) "
+            "SELECT s.BL, c.total FROM c JOIN Sheet1 s ON s.CC = c.cc",
+            REMOTE, LOCAL, max_rows=100,
+        )
+        assert [(f.kind, f.name) for f in plan.fetches] == [("cte", "c")]
+        assert "GROUP BY cc" in plan.fetches[0].sql
+        assert plan.fetches[0].sql.endswith("LIMIT 101")
+        assert not plan.local_query.lstrip().upper().startswith("WITH")
+
+    def test_single_table_filters_and_columns_pushed(self):
+        plan = plan_federated_query(
+            "SELECT f.cc, SUM(f.amount) FROM cost_facts f JOIN Sheet1 s ON s.CC = f.cc "
+            "WHERE f.period BETWEEN 1 AND 3 AND s.BL = 'CT' AND f.cc <> 'x' GROUP BY f.cc",
+            REMOTE, LOCAL, max_rows=100,
+        )
+        (fetch,) = plan.fetches
+        assert fetch.kind == "table"
+        assert '"id"' not in fetch.sql
+        assert 'f."period" BETWEEN 1 AND 3' in fetch.sql
+        assert "f.\"cc\" <> 'x'" in fetch.sql
+        assert "BL" not in fetch.sql
+
+    def test_unsafe_predicates_stay_local(self):
+        text_vs_number = plan_federated_query(
+            "SELECT * FROM cost_facts f JOIN Sheet1 s ON s.CC = f.cc WHERE f.cc = 1",
+            REMOTE, LOCAL, max_rows=100,
+        )
+        disjunction = plan_federated_query(
+            "SELECT f.cc FROM cost_facts f JOIN Sheet1 s ON s.CC = f.cc WHERE f.period = 1 OR s.BL = 'CT'",
+            REMOTE, LOCAL, max_rows=100,
+        )
+        outer = plan_federated_query(
+            "SELECT s.CC, f.amount FROM Sheet1 s LEFT JOIN cost_facts f ON s.CC = f.cc WHERE f.period = 1",
+            REMOTE, LOCAL, max_rows=100,
+        )
+        for plan in (text_vs_number, disjunction, outer):
+            assert "WHERE" not in plan.fetches[0].sql
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+class TestFederatedExecution:
+    """测试联邦执行"""
+
+    def _source(self, rows: int, max_rows: int = 100):
+        remote = SQLiteRemote(rows)
+        source = FederatedDataSource(remote, ExcelDataSource(str(FIXTURE)), max_rows=max_rows)
+        source._remote_catalog = REMOTE
+        return source, remote
+
+    def test_matches_single_database_result(self):
+        source, remote = self._source(rows=600)
+        query = (
+            "WITH c AS (SELECT cc, period, SUM(amount) AS total FROM cost_facts GROUP BY cc, period) "
+            "SELECT s.CC, s.Period, c.total * s.RateNo AS allocated "
+            "FROM c JOIN Sheet1 s ON s.CC = c.cc AND s.Period = c.period ORDER BY 1, 2"
+        )
+        result = source.execute_query(query)
+
+        # 把 Excel 工作表复制到“远程”库中，在单库上执行同一查询作为基准
+        pd.read_excel(FIXTURE).to_sql("Sheet1", remote.conn, index=False)
+        expected = pd.read_sql_query(query, remote.conn)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_row_cap_rejects_unfiltered_remote_table(self):
+        source, remote = self._source(rows=600)
+        with pytest.raises(FederatedQueryError):
+            source.execute_query("SELECT * FROM cost_facts f JOIN Sheet1 s ON s.CC = f.cc")
+        assert remote.queries[-1].endswith("LIMIT 101")
@@ -0,0 +1,181 @@
+"""
+并行预处理 单元测试
+验证字段取值索引的匹配与缓存、请求会话拼接预取的表结构快照，以及 fan-out 图并行执行各分支并在 load_context 汇合。
+"""
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.core.data_sources.base import DataSourceStrategy
+from src.core.data_sources.session import DataSourceSession
+from src.core.value_index import ValueIndex, get_value_index, reset_value_indexes
+
+
+@pytest.fixture
+def index():
+    index = ValueIndex(max_distinct=5)
+    index.add_frame("costs", pd.DataFrame({
+        "Function": ["IT", "HR", "IT", "Finance"],
+        "Cost text": ["IT Original", "HR Original", "IT Original", "Opex"],
+        "Year": [2024, 2024, 2025, 2025],
+        "Code": ["2024", "A1", "A2", "A3"],
+    }))
+    index.add_frame("rates", pd.DataFrame({"Region": ["华东区", "华北区"], "Id": list(range(2))}))
+    return index
+
+
+def test_lookup_prefers_longer_values_and_word_boundaries(index):
+    hints = [hint.to_dict() for hint in index.lookup("2024年华东区 IT Original 的成本")]
+    assert hints == [
+        {"value": "华东区", "table": "rates", "column": "Region"},
+        {"value": "IT Original", "table": "costs", "column": "Cost text"},
+    ]
+    assert [h.value for h in index.lookup("it部门和hr")] == ["IT", "HR"]
+    assert index.lookup("ITEM 与 HRM 2024") == []
+    assert len(index.lookup("IT HR Finance Opex", max_hints=2)) == 2
+
+
+def test_high_cardinality_columns_are_skipped():
+    index = ValueIndex(max_distinct=3)
+    assert index.add_frame("t", pd.DataFrame({"name": ["aa", "bb", "cc", "dd"], "dept": ["IT", "HR", "IT", "HR"]})) == 1
+    assert index.lookup("aa 与 IT")[0].value == "IT" and len(index.lookup("aa")) == 0
+
+
+class _Strategy(DataSourceStrategy):
+    schema_info_scope = "table"
+
+    def __init__(self, version="v1"):
+        self.version = version
+        self.schema_calls = []
+        self.samples = 0
+
+    def load_data(self):
+        return pd.DataFrame()
+
+    def get_metadata(self):
+        return {}
+
+    def get_context(self):
+        return {"tables": {"costs": {}, "rates": {}}}
+
+    def execute_query(self, query, timeout=None, cancel_token=None):
+        return pd.DataFrame()
+
+    def get_schema_info(self, table_names):
+        self.schema_calls.append(list(table_names))
+        return "\n".join(f"\n=== Table: {name} ===\n" for name in table_names)
+
+    def is_available(self):
+        return True
+
+    def sample_tables(self, limit, max_tables):
+        self.samples += 1
+        return {"costs": pd.DataFrame({"Function": ["IT", "HR"]})}
+
+    def data_version(self):
+        return self.version
+
+
+def test_session_composes_prefetched_schema():
+    strategy = _Strategy()
+    session = DataSourceSession("t1", "postgresql")
+    session.bind_strategy(strategy)
+
+    assert session.prefetch_schema(["costs", "rates"]) == ["costs", "rates"]
+    composed = session.get_schema_info(["rates", "costs"])
+    assert composed == strategy.get_schema_info(["rates", "costs"])
+    assert strategy.schema_calls[:2] == [["costs"], ["rates"]] and len(strategy.schema_calls) == 3
+
+    session.get_schema_info(["costs", "missing"])
+    assert strategy.schema_calls[-1] == ["costs", "missing"]
+
+
+def test_value_index_cache_rebuilds_on_new_version():
+    reset_value_indexes()
+    strategy = _Strategy()
+    assert get_value_index("test", strategy, wait=True).lookup("IT")[0].column == "Function"
+    assert get_value_index("test", strategy) is not None and strategy.samples == 1
+
+    strategy.version = "v2"
+    stale = get_value_index("test", strategy)  # 后台重建期间返回旧索引
+    assert stale is not None
+    for _ in range(100):
+        if strategy.samples == 2:
+            break
+        time.sleep(0.01)
+    assert strategy.samples == 2
+    reset_value_indexes()
+
+
+# ==================== fan-out 图 ====================
+
+graph_module = pytest.importorskip("src.graph.graph", reason="workflow graph not importable", exc_type=ImportError)
+
+DELAY = 0.2
+
+
+@pytest.fixture
+def stub_nodes(monkeypatch):
+    """各预处理节点替换为固定耗时的桩，记录同时运行的节点数"""
+    running = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def timed(update, full_state=True):
+        def node(state):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(DELAY)
+            with lock:
+                running["now"] -= 1
+            return {**state, **update} if full_state else dict(update)
+        return node
+
+    monkeypatch.setattr(graph_module, "select_skill_node", lambda state: {**state, "skill_context": {"tables": ["costs"]}})
+    monkeypatch.setattr(graph_module, "analyze_intent_node", timed({"intent_analysis": {"is_data_query": True}}))
+    monkeypatch.setattr(graph_module, "select_tables_node", timed(
+        {"selected_tables": [{"table_name": "costs", "fields": []}]}, full_state=False,
+    ))
+    monkeypatch.setattr(graph_module, "prefetch_schema_node", timed({"prefetched_tables": ["costs"]}, full_state=False))
+    monkeypatch.setattr(graph_module, "lookup_values_node", lambda state: {
+        "value_hints": [{"value": "IT", "table": "costs", "column": "Function"}],
+    })
+
+    def load_context(state):
+        assert state["intent_analysis"] == {"is_data_query": True}
+        return {**state, "table_names": [t["table_name"] for t in state["selected_tables"]]}
+
+    monkeypatch.setattr(graph_module, "load_context_node", load_context)
+    return running
+
+
+def test_fan_out_runs_branches_concurrently_and_joins(stub_nodes):
+    graph = graph_module.GraphWorkflow(preprocess="chain", fan_out=True).build_preprocess_graph()
+    started = time.perf_counter()
+    state = graph.invoke({"trace_id": "t1", "user_query": "IT 成本"})
+    elapsed = time.perf_counter() - started
+
+    assert state["table_names"] == ["costs"] and state["prefetched_tables"] == ["costs"]
+    assert state["value_hints"][0]["column"] == "Function"
+    assert stub_nodes["max"] == 3 and elapsed < 2 * DELAY
+
+
+def test_sequential_mode_keeps_chain(stub_nodes, monkeypatch):
+    monkeypatch.setattr(graph_module, "load_context_node", lambda state: {**state, "table_names": ["costs"]})
+    graph = graph_module.GraphWorkflow(preprocess="chain", fan_out=False).build_preprocess_graph()
+    state = graph.invoke({"trace_id": "t1", "user_query": "IT 成本"})
+    assert state["table_names"] == ["costs"] and stub_nodes["max"] == 1
+    assert "prefetch_schema" not in graph.builder.nodes
+
+
+def test_fused_fan_out_forks_from_prepare(stub_nodes, monkeypatch):
+    monkeypatch.setattr(graph_module, "understand_node", lambda state: {
+        **state, "intent_analysis": {"is_data_query": True}, "selected_tables": [{"table_name": "costs"}],
+    })
+    graph = graph_module.GraphWorkflow(preprocess="fused", fan_out=True).build_preprocess_graph()
+    state = graph.invoke({"user_query": "IT 成本"})
+    assert state["trace_id"] and state["table_names"] == ["costs"]
+    assert ("prepare", "understand") in graph.builder.edges
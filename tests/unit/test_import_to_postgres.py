@@ -0,0 +1,152 @@
+"""
+Excel 导入脚本 单元测试
+验证工作表流式分块读取、数据清洗、COPY CSV 编码（NULL 与空字符串区分）增量导入的分区哈希比较，
+以及分区列为 NULL 的行在两种模式下一致保留、全量导入整表替换分区哈希。
+"""
+
+import csv
+import io
+import sys
+from pathlib import Path
+
+from openpyxl import Workbook
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "scripts"))
+from import_to_postgres import (  # noqa: E402
+    NULL_KEY,
+    SHEET_SPECS,
+    _row_digest,
+    _rows_to_csv,
+    changed_partitions,
+    iter_sheet_chunks,
+    partition_filter,
+    partition_key,
+    save_partition_hashes,
+    swap_partitions,
+)
+
+SPECS = {spec.table: spec for spec in SHEET_SPECS}
+
+
+def _workbook(tmp_path, sheet, rows):
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = sheet
+    for row in rows:
+        worksheet.append(row)
+    path = tmp_path / "data.xlsx"
+    workbook.save(path)
+    return str(path)
+
+
+class TestIterSheetChunks:
+    """测试工作表流式读取"""
+
+    def test_chunks_and_numeric_coercion(self, tmp_path):
+        header = ("BL", "CC", "Year", "Scenario", "Month", "Key", "RateNo")
+        rows = [("CT", f"C{i}", "FY25", "Actual", "Oct", "K1", 0.1) for i in range(5)]
+        rows.append(("CT", "C9", "FY25", "Actual", "Oct", "K1", "n/a"))
+        path = _workbook(tmp_path, "SSME_FI_InsightBot_Rate", [header] + rows)
+
+        chunks = list(iter_sheet_chunks(path, SPECS["rate_table"], chunk_size=4))
+        assert [len(c) for c in chunks] == [4, 2]
+        assert chunks[0][0] == ("CT", "C0", "FY25", "Actual", "Oct", "K1", 0.1)
+        assert chunks[1][-1][-1] is None
+
+    def test_required_column_skips_blank_and_repeated_header(self, tmp_path):
+        rows = [
+            ("Cost text", "Function"),
+            ("Cloud", "IT"),
+            (None, "HR"),
+            ("Cost text", "Function"),
+            ("Payroll", "HR"),
+        ]
+        path = _workbook(tmp_path, "Cost text mapping", rows)
+        chunks = list(iter_sheet_chunks(path, SPECS["cost_text_mapping"]))
+        assert chunks == [[("Cloud", "IT"), ("Payroll", "HR")]]
+
+
+class TestRowsToCsv:
+    """测试 COPY CSV 编码"""
+
+    def test_none_is_unquoted_empty_field(self):
+        payload = _rows_to_csv([("a,b", None, 1.5), ('say "hi"', "x", None)])
+        assert payload == '"a,b",,1.5\n"say ""hi""",x,\n'
+        assert list(csv.reader(io.StringIO(payload)))[0] == ["a,b", "", "1.5"]
+
+
+class TestPartitionHashes:
+    """测试增量导入的分区哈希比较"""
+
+    def test_row_digest_sum_is_order_independent(self):
+        rows = [("FY25", "Actual", "Oct", -1.0), ("FY25", "Actual", "Oct", -2.0)]
+        forward = sum(_row_digest(r) for r in rows) % (1 << 128)
+        backward = sum(_row_digest(r) for r in reversed(rows)) % (1 << 128)
+        assert forward == backward
+        assert _row_digest(("a", None)) != _row_digest(("a", "None "))
+
+    def test_only_new_or_modified_partitions_reported(self):
+        engine = create_engine("sqlite://")
+        stored = {("FY25", "Actual", "Oct"): (10, "aa"), ("FY25", "Actual", "Nov"): (8, "bb")}
+        with engine.begin() as conn:
+            save_partition_hashes(conn, "cost_database", stored)
+            incoming = {
+                ("FY25", "Actual", "Oct"): (10, "aa"),
+                ("FY25", "Actual", "Nov"): (8, "cc"),
+                ("FY25", "Actual", "Dec"): (5, "dd"),
+            }
+            assert changed_partitions(conn, "cost_database", incoming) == [
+                ("FY25", "Actual", "Dec"),
+                ("FY25", "Actual", "Nov"),
+            ]
+            assert changed_partitions(conn, "rate_table", {("FY25", "Actual", "Oct"): (1, "aa")}) == [
+                ("FY25", "Actual", "Oct")
+            ]
+
+    def test_full_import_replaces_stale_partition_hashes(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            save_partition_hashes(conn, "cost_database", {("FY24", "Actual", "Oct"): (3, "aa")})
+            save_partition_hashes(conn, "rate_table", {("FY24", "Actual", "Oct"): (1, "aa")})
+            save_partition_hashes(
+                conn, "cost_database", {("FY25", "Actual", "Oct"): (2, "bb")}, replace=True
+            )
+            rows = conn.execute(text(
+                "SELECT table_name, year FROM etl_partition_hashes ORDER BY table_name"
+            )).fetchall()
+        assert [tuple(r) for r in rows] == [("cost_database", "FY25"), ("rate_table", "FY24")]
+
+
+class TestNullPartitionKeys:
+    """测试分区列为 NULL 的行：与全量模式一样保留，并作为独立分区比较与替换"""
+
+    def test_partition_key_and_filter(self):
+        idx = [SPECS["cost_database"].columns.index(c) for c in ("year", "scenario", "month")]
+        row = ("FY25", None, "IT", "Cloud", "A", "C", "K", 1.0, "Oct", 1.0)
+        assert partition_key(row, idx) == ("FY25", NULL_KEY, "Oct")
+        where, params = partition_filter(("FY25", NULL_KEY, "Oct"))
+        assert where == "year = :year AND scenario IS NULL AND month = :month"
+        assert params == {"year": "FY25", "month": "Oct"}
+
+    def test_null_partition_hash_roundtrip_and_swap(self):
+        spec = SPECS["rate_table"]
+        columns = ", ".join(spec.columns)
+        engine = create_engine("sqlite://")
+        null_partition = ("FY25", NULL_KEY, "Oct")
+        with engine.begin() as conn:
+            for table in ("rate_table", "rate_table_staging"):
+                conn.execute(text(f"CREATE TABLE {table} ({columns})"))
+            insert = f"INSERT INTO {{}} ({columns}) VALUES ('CT', :cc, 'FY25', :scenario, 'Oct', 'K1', 0.1)"
+            for cc, scenario in (("old", None), ("keep", "Actual")):
+                conn.execute(text(insert.format("rate_table")), {"cc": cc, "scenario": scenario})
+            for cc in ("new1", "new2"):
+                conn.execute(text(insert.format("rate_table_staging")), {"cc": cc, "scenario": None})
+
+            save_partition_hashes(conn, "rate_table", {null_partition: (1, "aa")})
+            assert changed_partitions(conn, "rate_table", {null_partition: (1, "aa")}) == []
+            assert changed_partitions(conn, "rate_table", {null_partition: (2, "bb")}) == [null_partition]
+
+            swap_partitions(conn, spec, [null_partition])
+            rows = conn.execute(text("SELECT cc, scenario FROM rate_table ORDER BY cc")).fetchall()
+        assert [tuple(r) for r in rows] == [("keep", "Actual"), ("new1", None), ("new2", None)]
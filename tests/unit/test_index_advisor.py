@@ -0,0 +1,141 @@
+"""
+索引顾问 单元测试
+验证谓词列解析、候选索引生成（含已有索引过滤）、SQLite 基准收益估算以及 Excel 目录索引配置。
+"""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src.core.data_sources import excel_source
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.index_advisor import (
+    estimate_sqlite_benefit,
+    parse_query_columns,
+    propose_indexes,
+    sqlite_catalog,
+    sqlite_existing_indexes,
+)
+from src.core.data_sources.query_log import normalize_sql
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_cost_data.xlsx"
+
+CATALOG = {
+    "cost_database": {"year", "scenario", "function", "key", "month", "amount"},
+    "rate_table": {"bl", "cc", "year", "scenario", "month", "key", "rate_no"},
+}
+
+
+def _entry(sql, latency_ms=100.0):
+    return {"event": "slow_query", "sql": normalize_sql(sql), "sample": sql, "latency_ms": latency_ms}
+
+
+class TestParseQueryColumns:
+    """测试谓词列解析"""
+
+    def test_filters_and_joins_with_aliases(self):
+        sql = normalize_sql(
+            'SELECT c.month, SUM(c.amount * r.rate_no) FROM cost_database c '
+            'JOIN rate_table AS r ON c.year = r.year AND c."key" = r."key" '
+            "WHERE c.year = '2024' AND r.bl = 'CT' AND c.month >= 3 GROUP BY c.month"
+        )
+        columns = parse_query_columns(sql, CATALOG)
+        assert columns["cost_database"] == {"eq": ["year"], "range": ["month"], "join": ["year", "key"]}
+        assert columns["rate_table"]["eq"] == ["bl"]
+        assert columns["rate_table"]["join"] == ["year", "key"]
+
+    def test_unqualified_columns_resolved_through_catalog(self):
+        sql = normalize_sql(
+            "SELECT SUM(amount) FROM cost_database WHERE function IN ('IT', 'HR') AND scenario = 'Actual'"
+        )
+        columns = parse_query_columns(sql, CATALOG)
+        assert columns == {"cost_database": {"eq": ["function", "scenario"], "range": [], "join": []}}
+
+    def test_cte_names_ignored(self):
+        sql = normalize_sql(
+            "WITH m AS (SELECT * FROM cost_database WHERE year = '2024') SELECT * FROM m WHERE month = 'Jan'"
+        )
+        assert set(parse_query_columns(sql, CATALOG)) == {"cost_database"}
+
+
+class TestProposeIndexes:
+    """测试候选索引生成"""
+
+    def test_frequent_column_set_weighted_by_latency(self):
+        workload = [
+            _entry(f"SELECT * FROM cost_database WHERE year = '{y}' AND function = 'IT'", 500)
+            for y in (2022, 2023, 2024)
+        ] + [_entry("SELECT * FROM rate_table WHERE bl = 'CT'", 10)] * 2
+        candidates = propose_indexes(workload, CATALOG)
+        assert [(c.table, c.columns) for c in candidates] == [
+            ("cost_database", ("year", "function")),
+            ("rate_table", ("bl",)),
+        ]
+        assert candidates[0].queries == 3
+        assert len(candidates[0].samples) == 3
+
+    def test_existing_prefix_index_skips_candidate(self):
+        workload = [_entry("SELECT * FROM rate_table WHERE bl = 'CT'")] * 2
+        existing = {"rate_table": [("bl", "cc")]}
+        assert propose_indexes(workload, CATALOG, existing=existing) == []
+
+    def test_min_queries(self):
+        workload = [_entry("SELECT * FROM rate_table WHERE bl = 'CT'")]
+        assert propose_indexes(workload, CATALOG, min_queries=2) == []
+
+
+class TestSqliteBenefit:
+    """测试 SQLite 基准收益估算"""
+
+    def test_benchmark_reports_benefit_and_cleans_up(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE cost_database (year TEXT, function TEXT, amount REAL)")
+        conn.executemany(
+            "INSERT INTO cost_database VALUES (?, ?, ?)",
+            [(str(2000 + i % 25), f"F{i % 200}", float(i)) for i in range(60000)],
+        )
+        workload = [
+            _entry("SELECT SUM(amount) FROM cost_database WHERE year = '2010' AND function = 'F10'")
+        ] * 2
+        candidates = propose_indexes(workload, sqlite_catalog(conn))
+        estimate_sqlite_benefit(conn, candidates)
+
+        assert candidates[0].method == "sqlite-benchmark"
+        assert candidates[0].benefit > 0.5
+        assert sqlite_existing_indexes(conn) == {}
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+class TestExcelCatalogIndexes:
+    """测试 Excel 内存目录按配置建立索引并复用快照"""
+
+    def test_configured_index_present_in_cached_catalog(self, monkeypatch):
+        monkeypatch.setattr(
+            ExcelDataSource, "_configured_indexes", staticmethod(lambda: {"Sheet1": [["Year"]]})
+        )
+        query = "SELECT name FROM sqlite_master WHERE type = 'index'"
+        first = ExcelDataSource(str(FIXTURE)).execute_query(query)
+        second = ExcelDataSource(str(FIXTURE)).execute_query(query)
+        assert first["name"].tolist() == second["name"].tolist() == ["idx_Sheet1_Year"]
+
+    def test_snapshot_cached_under_resolved_sheet(self, monkeypatch):
+        builds = []
+        build_catalog = ExcelDataSource.build_catalog
+        monkeypatch.setattr(ExcelDataSource, "build_catalog", lambda self: builds.append(1) or build_catalog(self))
+        monkeypatch.setattr(excel_source, "_catalog_snapshots", {})
+
+        source = ExcelDataSource(str(FIXTURE))  # 工作表由 load_data 确定
+        source.execute_query("SELECT COUNT(*) AS n FROM Sheet1")
+        source.execute_query("SELECT COUNT(*) AS n FROM Sheet1")
+        assert len(builds) == 1
+        assert [key[1] for key in excel_source._catalog_snapshots] == ["Sheet1"]
+
+    def test_backup_snapshot_without_serialize(self, monkeypatch):
+        monkeypatch.setattr(excel_source, "_HAS_SERIALIZE", False)
+        monkeypatch.setattr(excel_source, "_catalog_snapshots", {})
+        query = "SELECT COUNT(*) AS n FROM Sheet1"
+        first = ExcelDataSource(str(FIXTURE)).execute_query(query)
+        assert isinstance(next(iter(excel_source._catalog_snapshots.values())), sqlite3.Connection)
+        second = ExcelDataSource(str(FIXTURE)).execute_query(query)
+        assert first["n"].tolist() == second["n"].tolist() and first["n"].iloc[0] > 0
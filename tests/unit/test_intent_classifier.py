@@ -0,0 +1,129 @@
+"""
+本地意图/选表分类器 单元测试
+验证关键词/字段取值证据的置信度、模糊选表交给 LLM、n-gram 模型训练与样本日志，以及节点跳过 LLM 调用。
+"""
+
+import json
+
+import pytest
+
+from src.config.settings import AppConfig, IntentClassifierConfig, get_config, set_config
+from src.core.intent_classifier import LocalIntentClassifier, ngram_features, reset_local_intent_classifier
+from src.core.metadata import parse_skill_metadata, resolve_table_names
+
+METADATA = {
+    "tables": ["CostDataBase", "Rate"],
+    "default_tables": ["CostDataBase"],
+    "keyword_table_map": {"分摊": ["CostDataBase", "Rate"], "费率": ["Rate"], "预算": ["CostDataBase"]},
+}
+IT_HINT = {"value": "IT", "table": "CostDataBase", "column": "Function"}
+
+
+def test_metadata_accepts_table_list_and_optional_defaults():
+    assert resolve_table_names("费率是多少", skill_metadata=METADATA) == ["Rate"]
+    assert resolve_table_names("你好", skill_metadata=METADATA) == ["CostDataBase"]
+    assert resolve_table_names("你好", skill_metadata=METADATA, use_defaults=False) == []
+
+    context = {"modules": {"metadata": "# 元数据\n```json\n" + json.dumps(METADATA) + "\n```\n"}}
+    assert parse_skill_metadata(context) == METADATA
+    assert parse_skill_metadata({"modules": {"metadata": "```json\n{bad\n```"}}) == {}
+    assert parse_skill_metadata(None) == {}
+
+
+def test_ngram_features_normalise_numbers():
+    features = ngram_features("2024年IT成本")
+    assert "w:0" in features and "w:it" in features and "成本" in features
+
+
+def test_confident_data_query_selects_tables_without_llm():
+    classifier = LocalIntentClassifier(threshold=0.85)
+    decision = classifier.classify("2025年 IT 的预算总额是多少", METADATA, [IT_HINT], ["CostDataBase", "Rate"])
+    assert decision.is_data_query and decision.intent_accepted
+    assert decision.tables == ["CostDataBase"] and decision.tables_accepted
+    assert any("skill keywords" in line for line in decision.trace)
+
+
+def test_small_talk_is_not_a_data_query():
+    decision = LocalIntentClassifier().classify("你好，你是谁", METADATA)
+    assert not decision.is_data_query and decision.intent_accepted and not decision.tables_accepted
+
+
+def test_uncertain_questions_defer_to_llm():
+    classifier = LocalIntentClassifier(threshold=0.85)
+    assert not classifier.classify("帮我看看这个", METADATA).intent_accepted
+
+    # “分摊”同时映射两张表，都只有关键词证据 → 落在模糊区间
+    decision = classifier.classify("IT 的分摊", METADATA, [IT_HINT])
+    assert decision.tables == ["CostDataBase"] and not decision.tables_accepted
+    assert any("ambiguous" in line for line in decision.trace)
+
+    # 阈值调低后关键词证据即可
+    assert LocalIntentClassifier(threshold=0.8).classify("IT 的分摊", METADATA).tables_accepted
+
+
+def test_tables_missing_from_data_source_are_ignored():
+    decision = LocalIntentClassifier().classify("费率统计", METADATA, catalog=["Sheet1"])
+    assert decision.tables == [] and not decision.tables_accepted
+
+
+def test_model_learns_from_logged_samples(tmp_path):
+    log_path = tmp_path / "questions.jsonl"
+    classifier = LocalIntentClassifier(log_path=str(log_path), min_samples=4)
+    assert not classifier.classify("各部门 headcount", {}).intent_accepted
+    for _ in range(3):
+        classifier.record("各部门 headcount 汇总", True, ["HC"], skill="demo")
+        classifier.record("今天天气怎么样", False, ["ignored"])
+
+    reloaded = LocalIntentClassifier(log_path=str(log_path), min_samples=4)
+    assert reloaded.samples == 6
+    assert json.loads(log_path.read_text(encoding="utf-8").splitlines()[1])["tables"] == []
+    decision = reloaded.classify("各部门 headcount", {})
+    assert decision.is_data_query and decision.intent_accepted
+    assert decision.tables == ["HC"] and decision.tables_accepted
+    assert not reloaded.classify("明天天气怎么样", {}).is_data_query
+
+
+# ==================== 节点 ====================
+
+intent_module = pytest.importorskip(
+    "src.agents.intent_analysis_agent", reason="agents not importable", exc_type=ImportError
+)
+from src.agents import load_context_agent  # noqa: E402
+
+SKILL_CONTEXT = {"modules": {"metadata": "```json\n" + json.dumps(METADATA) + "\n```"}}
+
+
+class _FailingLLM:
+    def invoke(self, messages):
+        raise AssertionError("LLM should not be called")
+
+
+@pytest.fixture
+def classifier_config(monkeypatch):
+    original = get_config()
+    set_config(AppConfig(intent_classifier=IntentClassifierConfig(threshold=0.8, log_path="")))
+    reset_local_intent_classifier()
+    monkeypatch.setattr(load_context_agent, "lookup_question_values", lambda *args: [])
+    monkeypatch.setattr(load_context_agent, "session_for", lambda *args: (_ for _ in ()).throw(RuntimeError("no source")))
+    yield
+    reset_local_intent_classifier()
+    set_config(original)
+
+
+def test_nodes_use_confident_local_decision(classifier_config):
+    state = {"user_query": "费率统计是多少", "skill_context": SKILL_CONTEXT, "llm": _FailingLLM()}
+    result = intent_module.analyze_intent_node(dict(state))
+    assert result["intent_analysis"]["is_data_query"] is True
+    assert result["local_decision"]["intent_accepted"]
+
+    update = load_context_agent.select_tables_node(state)
+    assert update["selected_tables"] == [{"table_name": "Rate", "fields": []}]
+    assert update["local_decision"]["tables_accepted"]
+
+
+def test_retry_and_disabled_classifier_use_llm(classifier_config):
+    state = {"user_query": "费率统计是多少", "skill_context": SKILL_CONTEXT, "retry_count": 3}
+    assert load_context_agent.local_decision_for(state) is None
+
+    set_config(AppConfig(intent_classifier=IntentClassifierConfig(enabled=False)))
+    assert load_context_agent.local_decision_for({**state, "retry_count": 0}) is None
@@ -0,0 +1,94 @@
+"""
+LLM 客户端缓存 单元测试
+验证相同配置复用同一实例、回调与事件循环参与缓存键、已关闭循环的实例被清除、共享 HTTP 连接池与 LRU 上限。
+"""
+
+import asyncio
+import gc
+import weakref
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.config.settings import AppConfig, LLMClientConfig, ModelConfig, ProviderConfig, get_config, set_config
+from src.core.llm import get_llm, get_llm_cache_stats, reset_llm_cache
+
+
+def _config(**client):
+    return AppConfig(
+        model=ModelConfig(
+            active="local",
+            providers={
+                "local": ProviderConfig(
+                    provider="openai", model_name="test-model", api_key="sk-test",
+                    base_url="http://127.0.0.1:9/v1",
+                )
+            },
+            client=LLMClientConfig(**client),
+        )
+    )
+
+
+@pytest.fixture
+def llm_config():
+    original = get_config()
+    reset_llm_cache()
+
+    def apply(**client):
+        set_config(_config(**client))
+        reset_llm_cache()
+
+    apply()
+    yield apply
+    set_config(original)
+    reset_llm_cache()
+
+
+def test_same_config_returns_cached_client(llm_config):
+    first, second = get_llm(), get_llm()
+    assert first is second
+    assert get_llm_cache_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    handler = BaseCallbackHandler()
+    with_callback = get_llm(callbacks=[handler])
+    assert with_callback is not first and get_llm(callbacks=[handler]) is with_callback
+    # 所有缓存实例共享同一个 keep-alive 连接池
+    assert with_callback.http_client is first.http_client is not None
+
+
+def test_event_loops_get_their_own_client(llm_config):
+    sync_client = get_llm()
+
+    async def in_loop():
+        return get_llm(), get_llm()
+
+    first_loop = asyncio.run(in_loop())
+    second_loop = asyncio.run(in_loop())
+    assert first_loop[0] is first_loop[1]
+    assert len({id(sync_client), id(first_loop[0]), id(second_loop[0])}) == 3
+
+
+def test_closed_loops_are_purged_and_not_kept_alive(llm_config):
+    get_llm()
+
+    async def in_loop():
+        get_llm()
+        return weakref.ref(asyncio.get_running_loop())
+
+    loops = [asyncio.run(in_loop()) for _ in range(5)]
+    # 已结束循环的模型与连接池在下一次获取时清除，缓存只剩同步实例
+    get_llm()
+    assert get_llm_cache_stats()["size"] == 1
+    gc.collect()
+    assert all(ref() is None for ref in loops)
+
+
+def test_cache_disabled_and_lru_bound(llm_config):
+    llm_config(cache_clients=False)
+    assert get_llm() is not get_llm()
+
+    llm_config(max_cached_clients=2)
+    handlers = [BaseCallbackHandler() for _ in range(3)]
+    for handler in handlers:
+        get_llm(callbacks=[handler])
+    assert get_llm_cache_stats()["size"] == 2
@@ -0,0 +1,122 @@
+"""
+LLM 响应缓存 单元测试
+验证重复提示词命中内存/磁盘层、TTL 与条目上限淘汰，以及 get_llm 按节点挂载缓存。
+"""
+
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.config.settings import (
+    AppConfig,
+    LLMResponseCacheConfig,
+    ModelConfig,
+    ProviderConfig,
+    get_config,
+    set_config,
+)
+from src.core.llm import get_llm, reset_llm_cache
+from src.core.llm_cache import LLMResponseCache, get_llm_response_cache, reset_llm_response_cache
+
+
+def _model(cache, responses=("first", "second", "third")):
+    return FakeListChatModel(responses=list(responses), cache=cache)
+
+
+def test_repeated_prompt_served_from_memory(tmp_path):
+    cache = LLMResponseCache(disk_path=str(tmp_path / "llm.sqlite"), log_every=0)
+    model = _model(cache)
+
+    assert model.invoke("哪个部门成本最高？").content == "first"
+    assert model.invoke("哪个部门成本最高？").content == "first"
+    assert model.invoke("另一个问题").content == "second"
+
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["stores"]) == (1, 2, 2)
+    assert stats["disk_entries"] == 2
+
+    # 模型参数参与缓存键
+    other = FakeListChatModel(responses=["other"], cache=cache, sleep=0.01)
+    assert other.invoke("哪个部门成本最高？").content == "other"
+    cache.close()
+
+
+def test_disk_tier_survives_restart_and_promotes(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    first = LLMResponseCache(disk_path=path, log_every=0)
+    _model(first).invoke("SELECT 校验")
+    first.close()
+
+    second = LLMResponseCache(disk_path=path, log_every=0)
+    model = _model(second)
+    assert model.invoke("SELECT 校验").content == "first"
+    assert model.invoke("SELECT 校验").content == "first"
+    stats = second.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+    second.close()
+
+
+def test_size_and_ttl_eviction(tmp_path):
+    cache = LLMResponseCache(
+        max_memory_entries=1, max_disk_entries=2, disk_path=str(tmp_path / "llm.sqlite"), log_every=0
+    )
+    model = _model(cache, responses=[str(i) for i in range(10)])
+    for question in ("a", "b", "c"):
+        model.invoke(question)
+    stats = cache.get_stats()
+    assert stats["memory_entries"] == 1 and stats["disk_entries"] == 2
+    assert model.invoke("a").content == "3"  # 最早的条目已从两个层级淘汰
+
+    cache.ttl_seconds = cache._disk.ttl_seconds = 0.05
+    time.sleep(0.1)
+    assert model.invoke("c").content == "4"
+    cache.close()
+
+
+@pytest.fixture
+def cache_config(tmp_path):
+    original = get_config()
+
+    def apply(temperature=0.1, **response_cache):
+        response_cache.setdefault("disk_path", str(tmp_path / "llm.sqlite"))
+        set_config(
+            AppConfig(
+                model=ModelConfig(
+                    active="local",
+                    providers={
+                        "local": ProviderConfig(
+                            provider="openai", model_name="test-model", api_key="sk-test",
+                            base_url="http://127.0.0.1:9/v1", temperature=temperature,
+                        )
+                    },
+                    response_cache=LLMResponseCacheConfig(**response_cache),
+                )
+            )
+        )
+        reset_llm_cache()
+        reset_llm_response_cache()
+
+    apply()
+    yield apply
+    set_config(original)
+    reset_llm_cache()
+    reset_llm_response_cache()
+
+
+def test_get_llm_attaches_cache_per_node(cache_config):
+    cached = get_llm(node="intent_analysis")
+    assert cached.cache is get_llm_response_cache()
+    assert get_llm(node="sql_validation") is cached  # 同一配置共享客户端
+    assert get_llm(node="sql_generation").cache is None
+    assert get_llm().cache is None
+
+    cache_config(default=True, nodes={"intent_analysis": False})
+    assert get_llm(node="intent_analysis").cache is None
+    assert get_llm(node="refine_answer").cache is get_llm_response_cache()
+
+    cache_config(temperature=0.7)
+    assert get_llm(node="intent_analysis").cache is None
+
+    cache_config(enabled=False)
+    assert get_llm(node="intent_analysis").cache is None
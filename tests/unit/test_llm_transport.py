@@ -0,0 +1,172 @@
+"""
+LLM 传输层 单元测试
+验证令牌桶预扣等待、请求令牌估算、429/5xx 按 Retry-After 或退避重试、重试计数与工作流 retry_count 分开，以及 get_llm 挂载传输层。
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from src.config.settings import AppConfig, LLMClientConfig, ModelConfig, ProviderConfig, get_config, set_config
+from src.core.llm import get_llm, reset_llm_cache
+from src.core.llm_transport import (
+    AsyncRateLimitedTransport,
+    ProviderRateLimiter,
+    RateLimitedTransport,
+    TokenBucket,
+    count_llm_retries,
+    estimate_request_tokens,
+    get_llm_transport_stats,
+)
+
+RETRY = {"max_retries": 3, "backoff": 0.01, "max_wait": 1.0}
+
+
+def _responses(*statuses, headers=None):
+    """依次返回给定状态码的 MockTransport，记录请求次数"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return httpx.Response(status, headers=headers if status != 200 else None, json={"ok": status == 200})
+
+    return calls, handler
+
+
+def test_token_bucket_reserves_ahead():
+    bucket = TokenBucket(60)  # 每秒 1 个
+    assert bucket.reserve(60, now=bucket.updated) == 0
+    assert bucket.reserve(2, now=bucket.updated) == pytest.approx(2.0)
+    assert bucket.reserve(1, now=bucket.updated + 1) == pytest.approx(2.0)
+    assert bucket.reserve(1000, now=bucket.updated) == pytest.approx(62.0)  # 超过容量按容量计
+
+
+def test_limiter_throttles_requests_per_minute():
+    limiter = ProviderRateLimiter("p", requests_per_minute=600)  # 每 0.1 秒 1 个，初始满桶
+    limiter.requests.tokens = 0
+    waits = [limiter.reserve(1) for _ in range(3)]
+    assert waits[0] == pytest.approx(0.1, abs=0.01) and waits[2] == pytest.approx(0.3, abs=0.01)
+    assert limiter.stats["requests"] == 3
+
+
+def test_estimate_request_tokens_counts_messages_and_max_tokens():
+    body = {"messages": [{"role": "user", "content": "统计成本 total cost"}], "max_tokens": 100}
+    request = httpx.Request("POST", "http://x/v1/chat/completions", content=json.dumps(body).encode())
+    assert 100 < estimate_request_tokens(request) < 130
+    assert estimate_request_tokens(httpx.Request("POST", "http://x", content=b"not json")) == 1
+
+
+def test_retries_429_honoring_retry_after():
+    calls, handler = _responses(429, 429, 200, headers={"Retry-After": "0.05"})
+    limiter = ProviderRateLimiter("p")
+    client = httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handler), limiter, **RETRY))
+
+    started = time.perf_counter()
+    with count_llm_retries() as counter:
+        response = client.post("http://x/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 200 and len(calls) == 3
+    assert time.perf_counter() - started >= 0.1
+    assert counter == {"retries": 2, "rate_limited": 2}
+    assert limiter.stats["retries"] == 2 and limiter.stats["rate_limited"] == 2
+
+
+def test_gives_up_after_max_retries_and_skips_client_errors():
+    calls, handler = _responses(503)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), ProviderRateLimiter("p"), **RETRY)
+    assert httpx.Client(transport=transport).get("http://x").status_code == 503
+    assert len(calls) == 4
+
+    calls, handler = _responses(400)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), ProviderRateLimiter("p"), **RETRY)
+    assert httpx.Client(transport=transport).get("http://x").status_code == 400
+    assert len(calls) == 1
+
+
+def test_async_transport_retries_connection_errors():
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={})
+
+    limiter = ProviderRateLimiter("p")
+
+    async def main():
+        transport = AsyncRateLimitedTransport(httpx.MockTransport(handler), limiter, **RETRY)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.get("http://x")
+
+    with count_llm_retries() as counter:
+        assert asyncio.run(main()).status_code == 200
+    assert counter == {"retries": 1, "rate_limited": 0}
+
+
+# ==================== get_llm ====================
+
+
+class _FlakyProvider(BaseHTTPRequestHandler):
+    """第一次请求返回 429（Retry-After: 0），之后返回补全结果"""
+
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        type(self).requests += 1
+        if type(self).requests == 1:
+            body, status = b'{"error": {"message": "rate limited"}}', 429
+        else:
+            status = 200
+            body = json.dumps({
+                "id": "c", "object": "chat.completion", "created": 0, "model": "m",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_provider():
+    _FlakyProvider.requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original = get_config()
+    set_config(AppConfig(model=ModelConfig(
+        active="flaky",
+        providers={"flaky": ProviderConfig(
+            model_name="m", api_key="sk-test", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+            requests_per_minute=600,
+        )},
+        client=LLMClientConfig(retry_backoff=0.01),
+    )))
+    reset_llm_cache()
+    yield
+    reset_llm_cache()
+    set_config(original)
+    server.shutdown()
+
+
+def test_get_llm_retries_rate_limits_in_transport(flaky_provider):
+    llm = get_llm()
+    assert llm.max_retries == 0  # SDK 自带重试关闭，由传输层重试
+    with count_llm_retries() as counter:
+        assert llm.invoke("hi").content == "ok"
+    assert counter["rate_limited"] == 1 and _FlakyProvider.requests == 2
+    assert get_llm_transport_stats()["flaky"]["requests"] == 2
@@ -0,0 +1,191 @@
+"""
+按节点路由模型 单元测试
+验证节点提供商链（忽略未定义的提供商）、失败提供商冷却后排到链尾、首选提供商不可用、卡住或限流时不重试直接回退，以及按 节点/提供商 记录耗时。
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.config.settings import (
+    AppConfig,
+    LLMClientConfig,
+    ModelConfig,
+    ModelRoutingConfig,
+    ProviderConfig,
+    get_config,
+    set_config,
+)
+from src.core.llm import get_llm, provider_of, reset_llm_cache
+from src.core.model_router import (
+    NodeLatencyStats,
+    get_node_latency_stats,
+    latency_callback,
+    provider_chain,
+)
+
+
+def _provider(base_url="http://127.0.0.1:9/v1"):
+    return ProviderConfig(model_name="m", api_key="sk-test", base_url=base_url)
+
+
+def _model_config(nodes, **providers):
+    return ModelConfig(
+        active="strong",
+        providers=providers or {"strong": _provider(), "fast": _provider()},
+        client=LLMClientConfig(max_retries=0),
+        routing=ModelRoutingConfig(nodes=nodes, cooldown_seconds=30),
+    )
+
+
+@pytest.fixture
+def restore_config():
+    original = get_config()
+    reset_llm_cache()
+    yield
+    reset_llm_cache()
+    set_config(original)
+
+
+def test_provider_chain_uses_routing_and_skips_unknown(restore_config):
+    config = _model_config({"intent_analysis": ["fast", "missing", "strong"], "sql_generation": ["missing"]})
+    assert provider_chain(config, "intent_analysis") == ["fast", "strong"]
+    assert provider_chain(config, "sql_generation") == ["strong"]  # 全部未定义时回到 active
+    assert provider_chain(config, "understand") == ["strong"]
+    assert provider_chain(config, None) == ["strong"]
+
+
+def test_failed_provider_moves_to_end_during_cooldown(restore_config):
+    config = _model_config({"intent_analysis": ["fast", "strong"]})
+    set_config(AppConfig(model=config))
+    latency_callback("intent_analysis", "fast").on_llm_error(RuntimeError("down"), run_id=None)
+    assert provider_chain(config, "intent_analysis") == ["strong", "fast"]
+
+    reset_llm_cache()  # 清空冷却状态
+    assert provider_chain(config, "intent_analysis") == ["fast", "strong"]
+
+
+def test_latency_stats_percentiles_and_cache_hits():
+    stats = NodeLatencyStats(window=100)
+    for ms in range(1, 101):
+        stats.record("intent_analysis", "fast", ms / 1000)
+    stats.record("intent_analysis", "fast", 0, cached=True)
+    stats.record("intent_analysis", "fast", 5.0, error=True)
+    entry = stats.snapshot()["intent_analysis"]["fast"]
+    assert entry["calls"] == 102 and entry["cached"] == 1 and entry["errors"] == 1
+    assert entry["p50_ms"] == 51.0 and entry["p95_ms"] == 96.0 and entry["avg_ms"] == 50.5
+
+
+def test_unrouted_nodes_share_one_client(restore_config):
+    set_config(AppConfig(model=_model_config({"sql_generation": ["strong", "fast"]})))
+    assert get_llm(node="understand") is get_llm(node="load_context")
+    assert provider_of(get_llm(node="understand")) == "strong"
+
+    routed = get_llm(node="sql_generation")
+    assert provider_of(routed) == "strong" and len(routed.fallbacks) == 1
+    assert provider_of(routed.bind_tools([])) == "strong"
+
+
+# ==================== 回退 ====================
+
+
+class _Provider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "id": "c", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StalledProvider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(2)
+        self.send_response(500)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThrottledProvider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(429)
+        self.send_header("Retry-After", "5")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+@pytest.fixture
+def backup_provider(restore_config):
+    server, url = _serve(_Provider)
+    yield url
+    server.shutdown()
+
+
+def test_falls_back_when_primary_unavailable(backup_provider):
+    config = _model_config(
+        {"intent_analysis": ["fast", "strong"]},
+        fast=_provider(),  # 端口 9 拒绝连接
+        strong=_provider(backup_provider),
+    )
+    set_config(AppConfig(model=config))
+    reset_llm_cache()
+
+    assert get_llm(node="intent_analysis").invoke("hi").content == "ok"
+    stats = get_node_latency_stats()["intent_analysis"]
+    assert stats["fast"]["errors"] == 1 and stats["strong"]["calls"] == 1 and "p50_ms" in stats["strong"]
+
+    # 冷却期内直接从备用提供商开始
+    assert provider_of(get_llm(node="intent_analysis")) == "strong"
+
+
+@pytest.mark.parametrize("handler", [_StalledProvider, _ThrottledProvider])
+def test_primary_is_not_retried_before_failover(backup_provider, handler):
+    server, url = _serve(handler)
+    try:
+        config = ModelConfig(
+            active="slow",
+            providers={"slow": _provider(url), "backup": _provider(backup_provider)},
+            client=LLMClientConfig(max_retries=4),
+            routing=ModelRoutingConfig(nodes={"intent_analysis": ["slow", "backup"]}, fallback_timeout=0.3),
+        )
+        set_config(AppConfig(model=config))
+        reset_llm_cache()
+
+        started = time.monotonic()
+        assert get_llm(node="intent_analysis").invoke("hi").content == "ok"
+        assert time.monotonic() - started < 1.5  # 约一个 fallback_timeout，而非多次重试与退避
+    finally:
+        server.shutdown()
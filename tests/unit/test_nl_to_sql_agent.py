@@ -0,0 +1,185 @@
+"""
+NLToSQLAgent 端到端 单元测试
+节点替换为调用假模型的桩，图按原样编译（带检查点），验证 query 与 aquery 完整运行一次工作流，
+以及通过审查的 SQL 写入语义问题缓存后，换一种说法的问题经 query 直接复用。
+"""
+
+import asyncio
+import random
+
+import pandas as pd
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.config.settings import (
+    AppConfig,
+    IntentClassifierConfig,
+    KnowledgeBaseConfig,
+    QuestionCacheConfig,
+    ValueIndexConfig,
+    get_config,
+    set_config,
+)
+from src.core.data_sources import session as session_module
+from src.core.data_sources.base import DataSourceStrategy
+
+graph_module = pytest.importorskip("src.graph.graph", reason="workflow graph not importable", exc_type=ImportError)
+from src.nl_to_sql_agent import NLToSQLAgent  # noqa: E402
+
+SQL = "SELECT SUM(cost) FROM costs"
+
+
+class _StubLLM:
+    """返回固定 SQL 的假模型，记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=SQL)
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=SQL)
+
+
+class _Middleware:
+    def _selection(self):
+        return {"skill": None, "skill_name": "nl-to-sql-agent", "skill_context": None,
+                "skill_selected_by": "stub", "skill_confidence": 1.0}
+
+    def run(self, user_query):
+        return self._selection()
+
+    async def run_async(self, user_query):
+        return self._selection()
+
+
+def _stub_nodes(monkeypatch, llm):
+    """把图中各节点替换为同步/异步桩；SQL 生成调用假模型"""
+    updates = {
+        "select_skill_node": {},
+        "analyze_intent_node": {"intent_analysis": {"is_data_query": True}},
+        "load_context_node": {"table_names": ["costs"]},
+        "sql_validation_node": {"sql_valid": True},
+        "sql_execution_node": {"execution_result": "42"},
+        "review_result_node": {"review_passed": True, "review_message": "IT 成本合计 42"},
+        "refine_answer_node": {},
+    }
+    for name, update in updates.items():
+        monkeypatch.setattr(graph_module, name, lambda state, update=update: {**state, **update})
+
+        async def anode(state, update=update):
+            return {**state, **update}
+
+        monkeypatch.setattr(graph_module, f"{name}_async", anode)
+
+    def generate(state):
+        return {**state, "sql_query": llm.invoke([]).content}
+
+    async def agenerate(state):
+        return {**state, "sql_query": (await llm.ainvoke([])).content}
+
+    monkeypatch.setattr(graph_module, "generate_sql_node", generate)
+    monkeypatch.setattr(graph_module, "generate_sql_node_async", agenerate)
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    original = get_config()
+    set_config(AppConfig(
+        intent_classifier=IntentClassifierConfig(enabled=False),
+        question_cache=QuestionCacheConfig(enabled=False),
+    ))
+    llm = _StubLLM()
+    _stub_nodes(monkeypatch, llm)
+
+    agent = NLToSQLAgent.__new__(NLToSQLAgent)
+    agent.skill_name = "nl-to-sql-agent"
+    agent.skill = None
+    agent.skill_middleware = _Middleware()
+    agent.workflow = graph_module.GraphWorkflow(preprocess="chain", fan_out=False)
+    agent.llm = llm
+    yield agent
+    set_config(original)
+
+
+def test_query_runs_checkpointed_graph(agent):
+    for trace_id in ("t1", "t2"):
+        result = agent.query("2024年IT部门的总成本", trace_id=trace_id)
+        assert result["success"], result.get("error")
+        assert result["sql"] == SQL and result["answer"] == "IT 成本合计 42" and result["trace_id"] == trace_id
+    assert agent.llm.calls == 2
+
+
+def test_aquery_runs_checkpointed_graph(agent):
+    async def main():
+        return await asyncio.gather(
+            agent.aquery("2024年IT部门的总成本", trace_id="a1"),
+            agent.aquery("2025年HR部门的总成本", trace_id="a2"),
+        )
+
+    for result in asyncio.run(main()):
+        assert result["success"], result.get("error")
+        assert result["sql"] == SQL and result["result"] == "42"
+    assert agent.llm.calls == 2
+
+
+# ==================== 语义问题缓存 ====================
+
+
+class _Strategy(DataSourceStrategy):
+    """表结构快照的样本值每次不同（DISTINCT ... LIMIT 3 不保证顺序）"""
+
+    def load_data(self):
+        return pd.DataFrame()
+
+    def get_metadata(self):
+        return {"type": "stub"}
+
+    def get_context(self):
+        return {"tables": {"costs": {}}}
+
+    def execute_query(self, query, timeout=None, cancel_token=None):
+        return pd.DataFrame()
+
+    def get_schema_info(self, table_names):
+        lines = []
+        for name in table_names:
+            samples = ", ".join(f"'{dept}'" for dept in random.sample(["IT", "HR", "Finance", "Legal"], 3))
+            lines.append(f"\n=== Table: {name} ===\n")
+            lines.append(f"{'dept':<30} character varying (max length: 50, nullable: YES, samples: {samples})")
+            lines.append(f"{'cost':<30} numeric (max length: N/A, nullable: YES, samples: 1.5, 2.0, 3.25)")
+        return "\n".join(lines)
+
+    def is_available(self):
+        return True
+
+
+def test_query_stores_reviewed_sql_and_reuses_it_for_paraphrase(agent, monkeypatch, tmp_path):
+    pytest.importorskip("chromadb")
+    from src.core.question_cache import reset_question_cache
+
+    set_config(AppConfig(
+        intent_classifier=IntentClassifierConfig(enabled=False),
+        question_cache=QuestionCacheConfig(enabled=True),
+        value_index=ValueIndexConfig(enabled=False),
+        knowledge_base=KnowledgeBaseConfig(vector_db_path=str(tmp_path / "vector_db")),
+    ))
+    strategy = _Strategy()
+    monkeypatch.setattr(session_module, "resolve_strategy", lambda *args, **kwargs: strategy)
+    reset_question_cache()
+    try:
+        first = agent.query("2024年IT部门的总成本", data_source_type="excel")
+        assert first["success"] and "question_cache" not in first
+
+        again = agent.query("请问IT部门2024年总成本是多少", data_source_type="excel")
+        assert again["success"] and again["sql"] == SQL
+        assert again["question_cache"]["matched_question"] == "2024年IT部门的总成本"
+        assert agent.llm.calls == 1  # 命中后不再生成 SQL
+
+        other = agent.query("2025年IT部门的总成本", data_source_type="excel")
+        assert "question_cache" not in other and agent.llm.calls == 2
+    finally:
+        reset_question_cache()
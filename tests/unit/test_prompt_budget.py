@@ -0,0 +1,129 @@
+"""
+提示词令牌预算 单元测试
+验证令牌估算、未超预算时原样返回、超预算时按相关度先去样本值再省略字段、规则章节按相关度保留、选表提示词不带脚本源码，以及节省令牌统计。
+"""
+
+import json
+
+import pytest
+
+from src.config.settings import AppConfig, PromptBudgetConfig, get_config, set_config
+from src.core.prompt_budget import (
+    PromptAssembler,
+    estimate_tokens,
+    get_prompt_budget_stats,
+    reset_prompt_budget_stats,
+)
+
+
+def _schema(columns):
+    lines = ["## Database Schema", "", "=== Table: costs ===", ""]
+    for name, samples in columns:
+        lines.append(f"{name:<30} character varying (max length: 255, nullable: YES, samples: {samples})")
+    return "\n".join(lines)
+
+
+COLUMNS = [
+    ("year", "'FY24', 'FY25', 'FY23'"),
+    ("function", "'IT Allocation', 'HR Allocation', 'Procurement'"),
+    ("cost_amount", "-1200.5, 300.25, 88.0"),
+] + [(f"unused_attribute_{i}", "'lorem ipsum dolor sit amet', 'consectetur adipiscing'") for i in range(40)]
+
+RULES = """## PostgreSQL SQL 生成规则
+
+### 通用规则
+- 使用与 PostgreSQL 兼容的标准 SQL 语法
+
+### 日期/时间函数
+- 使用 PostgreSQL 标准日期函数 date_trunc、extract 等，财年从 10 月开始
+
+### 分摊成本计算
+- 分摊金额 = ABS(cost_amount) * rate_no，按 function 过滤
+"""
+
+
+@pytest.fixture(autouse=True)
+def budget_stats():
+    reset_prompt_budget_stats()
+    yield
+    reset_prompt_budget_stats()
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("分摊成本") == 4
+
+
+def test_under_budget_returns_parts_unchanged():
+    assembler = PromptAssembler("sql_generation", "cost by function", budget=100000)
+    assembler.add_text("schema", _schema(COLUMNS))
+    assembler.add_text("rules", RULES)
+    parts = assembler.fit("prompt")
+    assert parts == {"schema": _schema(COLUMNS), "rules": RULES}
+    assert assembler.report.saved_tokens == 0
+
+
+def test_schema_keeps_relevant_columns_and_drops_the_rest():
+    schema = _schema(COLUMNS)
+    assembler = PromptAssembler("sql_generation", "FY25 IT 分摊成本 cost amount by function", budget=250)
+    assembler.add_text("schema", schema)
+    parts = assembler.fit("prompt")
+    text = parts["schema"]
+
+    assert "=== Table: costs ===" in text and "## Database Schema" in text
+    for name in ("year", "function", "cost_amount"):
+        assert f"\n{name}" in text
+    assert "'IT Allocation'" in text  # 相关字段保留样本值
+    assert "个与问题无关的字段" in text
+    report = assembler.report
+    assert report.final_tokens <= 250 < report.original_tokens and report.dropped > 0
+    assert get_prompt_budget_stats()["sql_generation"]["saved_tokens"] == report.saved_tokens
+
+    # 相同输入的裁剪结果相同
+    again = PromptAssembler("sql_generation", "FY25 IT 分摊成本 cost amount by function", budget=250)
+    again.add_text("schema", schema)
+    assert again.fit("prompt") == parts
+
+
+def test_keep_columns_survive_tight_budget():
+    assembler = PromptAssembler("sql_generation", "总额", budget=120, keep_columns=["unused_attribute_7"])
+    assembler.add_text("schema", _schema(COLUMNS))
+    text = assembler.fit("prompt")["schema"]
+    kept = [line for line in text.split("\n") if line.startswith("unused_attribute_7 ")]
+    assert kept and "samples:" in kept[0]  # 指定字段保留完整形式
+    assert "unused_attribute_39" not in text
+
+
+def test_rule_sections_ranked_by_question():
+    assembler = PromptAssembler("sql_generation", "各 function 的分摊成本", budget=60)
+    assembler.add_text("rules", RULES)
+    text = assembler.fit("")["rules"]
+    assert "ABS(cost_amount) * rate_no" in text
+    assert "date_trunc" not in text  # 无关章节缩短为标题与首行或省略
+
+
+def test_select_tables_prompt_omits_script_sources():
+    from src.agents.load_context_agent import _select_tables_prompt
+
+    original = get_config()
+    set_config(AppConfig(prompt_budget=PromptBudgetConfig(nodes={"load_context": 300})))
+    try:
+        skill_context = {
+            "skill": {"name": "cost_allocation"},
+            "skill_doc": "# 技能\n\n## 适用范围\n- 成本分摊\n\n" + "## 附录\n" + "无关说明。\n" * 200,
+            "modules": {"metadata": '# 元数据\n```json\n{"tables": ["cost_db", "rate_table"]}\n```'},
+            "scripts": [{"name": "generate_allocation_sql"}],
+            "script_contents": {"generate_allocation_sql": "import sys\n" * 500},
+            "references": ["metadata"],
+        }
+        prompt = _select_tables_prompt("IT 分摊成本", skill_context)[0].content
+    finally:
+        set_config(original)
+
+    context = json.loads(prompt.split("技能上下文(JSON):\n", 1)[1])
+    assert "script_contents" not in context and context["scripts"] == [{"name": "generate_allocation_sql"}]
+    assert "rate_table" in context["modules"]["metadata"]  # 提到技能表名的章节优先保留
+    assert estimate_tokens(prompt) <= 300
+    stats = get_prompt_budget_stats()["load_context"]
+    assert stats["trimmed"] == 1 and stats["saved_tokens"] > 1000
@@ -0,0 +1,104 @@
+"""
+查询超时与取消 单元测试
+验证取消令牌语义，以及 Excel(SQLite) 策略通过 progress handler 中止长时间运行的语句。
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.core.data_sources.cancellation import (
+    CancellationToken,
+    QueryCancelledError,
+    QueryTimeoutError,
+    cancel_request,
+    get_cancellation_token,
+    open_cancellation_scope,
+    release_cancellation_scope,
+    resolve_timeout,
+)
+from src.core.data_sources.excel_source import ExcelDataSource
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_cost_data.xlsx"
+
+# 无限递归 CTE，不被中止时永远不会返回
+RUNAWAY_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+    "SELECT COUNT(*) FROM c"
+)
+
+
+class TestCancellationToken:
+    """测试 CancellationToken"""
+
+    def test_cancel_runs_registered_callbacks_once(self):
+        token = CancellationToken()
+        calls = []
+        token.register(lambda: calls.append(1))
+        token.cancel()
+        token.cancel()
+        assert calls == [1]
+        assert token.cancelled
+
+    def test_unregistered_callback_not_called(self):
+        token = CancellationToken()
+        calls = []
+        unregister = token.register(lambda: calls.append(1))
+        unregister()
+        token.cancel()
+        assert calls == []
+
+    def test_register_after_cancel_fires_immediately(self):
+        token = CancellationToken()
+        token.cancel()
+        calls = []
+        token.register(lambda: calls.append(1))
+        assert calls == [1]
+
+    def test_resolve_timeout_uses_smaller_of_default_and_deadline(self):
+        token = CancellationToken(timeout=0.5)
+        assert resolve_timeout(30, token) <= 0.5
+        assert resolve_timeout(30, None) == 30
+        assert resolve_timeout(0, None) is None
+
+    def test_resolve_timeout_raises_when_expired(self):
+        token = CancellationToken(timeout=0.01)
+        time.sleep(0.02)
+        with pytest.raises(QueryTimeoutError):
+            resolve_timeout(30, token)
+
+    def test_registry_cancel_request(self):
+        token = open_cancellation_scope("trace-1")
+        assert get_cancellation_token("trace-1") is token
+        assert cancel_request("trace-1")
+        assert token.cancelled
+        release_cancellation_scope("trace-1")
+        assert get_cancellation_token("trace-1") is None
+        assert not cancel_request("trace-1")
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+class TestExcelQueryAbort:
+    """测试 Excel 数据源的语句中止"""
+
+    def test_statement_timeout(self):
+        source = ExcelDataSource(str(FIXTURE), query_timeout=0.5)
+        started = time.monotonic()
+        with pytest.raises(QueryTimeoutError):
+            source.execute_query(RUNAWAY_SQL)
+        assert time.monotonic() - started < 5
+
+    def test_cancel_from_another_thread(self):
+        source = ExcelDataSource(str(FIXTURE), query_timeout=0)
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+        with pytest.raises(QueryCancelledError) as exc_info:
+            source.execute_query(RUNAWAY_SQL, cancel_token=token)
+        assert not isinstance(exc_info.value, QueryTimeoutError)
+
+    def test_normal_query_unaffected(self):
+        source = ExcelDataSource(str(FIXTURE), query_timeout=5)
+        df = source.execute_query("SELECT 1 AS one")
+        assert df["one"].tolist() == [1]
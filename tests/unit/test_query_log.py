@@ -0,0 +1,173 @@
+"""
+慢查询日志 单元测试
+验证 SQL 归一化、阈值过滤、滚动 JSONL 写入、计划采样、超时/失败的执行同样记录以及按查询形状聚合。
+"""
+
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from src.core.data_sources import executor
+from src.core.data_sources.base import DataSourceStrategy
+from src.core.data_sources.cancellation import QueryCancelledError, QueryTimeoutError
+from src.core.data_sources.query_log import (
+    SlowQueryLog,
+    iter_log_files,
+    normalize_sql,
+    sql_fingerprint,
+    summarize_slow_queries,
+)
+
+
+class FakePlanStrategy:
+    """支持 explain_analyze 的假数据源"""
+
+    def explain_analyze(self, query):
+        return [{"Plan": {"Node Type": "Seq Scan", "Actual Total Time": 12.5}}]
+
+
+def _read_entries(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class TestNormalizeSql:
+    """测试 SQL 归一化"""
+
+    def test_literals_replaced(self):
+        sql = "SELECT * FROM cost_database WHERE year = '2024' AND amount > 1.5 -- note"
+        assert normalize_sql(sql) == "SELECT * FROM cost_database WHERE year = ? AND amount > ?"
+
+    def test_in_list_and_whitespace_collapsed(self):
+        sql = "select  *\n from t1 where month in ('Jan', 'Feb', 'Mar');"
+        assert normalize_sql(sql) == "select * from t1 where month in (?...)"
+
+    def test_fingerprint_ignores_literals_and_case(self):
+        a = sql_fingerprint("SELECT SUM(amount) FROM cost_database WHERE year = '2024'")
+        b = sql_fingerprint("select sum(amount) from cost_database where year = '2025'")
+        c = sql_fingerprint("SELECT SUM(amount) FROM rate_table WHERE year = '2024'")
+        assert a == b
+        assert a != c
+
+
+class TestSlowQueryLog:
+    """测试慢查询写入"""
+
+    def test_fast_queries_not_logged(self, tmp_path):
+        log = SlowQueryLog(path=str(tmp_path / "slow.jsonl"), threshold_ms=100)
+        assert not log.record("SELECT 1", "excel", latency_ms=5)
+        assert not (tmp_path / "slow.jsonl").exists()
+
+    def test_slow_query_entry(self, tmp_path):
+        path = tmp_path / "slow.jsonl"
+        log = SlowQueryLog(path=str(path), threshold_ms=100, explain_sample_rate=0)
+        assert log.record(
+            "SELECT * FROM cost_database WHERE year = '2024'",
+            "postgresql",
+            latency_ms=250.04,
+            rows=10,
+            result_bytes=2048,
+            trace_id="trace-1",
+        )
+        [entry] = _read_entries(path)
+        assert entry["sql"] == "SELECT * FROM cost_database WHERE year = ?"
+        assert entry["latency_ms"] == 250.0
+        assert entry["rows"] == 10
+        assert entry["bytes"] == 2048
+        assert entry["trace_id"] == "trace-1"
+
+    def test_plan_captured_when_sampled(self, tmp_path):
+        path = tmp_path / "slow.jsonl"
+        log = SlowQueryLog(path=str(path), threshold_ms=0, explain_sample_rate=1.0)
+        log.record("SELECT 1", "postgresql", latency_ms=1, strategy=FakePlanStrategy())
+        deadline = time.monotonic() + 5
+        while len(_read_entries(path)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        plan_entry = _read_entries(path)[1]
+        assert plan_entry["event"] == "plan"
+        assert plan_entry["plan"][0]["Plan"]["Node Type"] == "Seq Scan"
+
+    def test_failed_execution_entry_without_plan(self, tmp_path):
+        path = tmp_path / "slow.jsonl"
+        log = SlowQueryLog(path=str(path), threshold_ms=100, explain_sample_rate=1.0)
+        assert log.record(
+            "SELECT * FROM rate_table", "postgresql", 3000,
+            strategy=FakePlanStrategy(), error="canceling statement due to statement timeout", timed_out=True,
+        )
+        log.record("SELECT * FROM rate_table", "postgresql", 200)
+        time.sleep(0.05)
+        entries = _read_entries(path)
+        assert [e["event"] for e in entries] == ["slow_query", "slow_query"]  # 失败的执行不重跑 EXPLAIN ANALYZE
+        assert entries[0]["timed_out"] and "statement timeout" in entries[0]["error"]
+        assert entries[1]["error"] is None and not entries[1]["timed_out"]
+
+        [item] = summarize_slow_queries([path])
+        assert (item["count"], item["errors"], item["timeouts"]) == (2, 1, 1)
+
+    def test_rotation_and_summary(self, tmp_path):
+        path = tmp_path / "slow.jsonl"
+        log = SlowQueryLog(
+            path=str(path), threshold_ms=0, max_bytes=400, backup_count=10, explain_sample_rate=0
+        )
+        for year in range(2020, 2026):
+            log.record(f"SELECT * FROM cost_database WHERE year = '{year}'", "postgresql", 100)
+        log.record("SELECT * FROM rate_table", "postgresql", 5000)
+
+        files = iter_log_files(str(path))
+        assert len(files) > 1
+
+        summary = summarize_slow_queries(files)
+        assert [item["count"] for item in summary] == [1, 6]
+        assert summary[0]["sql"] == "SELECT * FROM rate_table"
+        assert summary[1]["total_ms"] == 600
+
+
+class _FailingStrategy(DataSourceStrategy):
+    """耗时后以给定异常失败的数据源"""
+
+    def __init__(self, error):
+        self.error = error
+
+    def load_data(self):
+        return pd.DataFrame()
+
+    def get_metadata(self):
+        return {"source_type": "postgresql"}
+
+    def get_context(self):
+        return {}
+
+    def execute_query(self, query, timeout=None, cancel_token=None):
+        time.sleep(0.02)
+        raise self.error
+
+    def get_schema_info(self, table_names):
+        return ""
+
+    def is_available(self):
+        return True
+
+
+class TestExecutorFailures:
+    """测试执行器在失败路径写入慢查询日志"""
+
+    @pytest.mark.parametrize("error, logged, timed_out", [
+        (QueryTimeoutError("canceling statement due to statement timeout"), True, True),
+        (RuntimeError("division by zero"), True, False),
+        (QueryCancelledError("cancelled by caller"), False, False),
+    ])
+    def test_failure_over_threshold_logged(self, tmp_path, monkeypatch, error, logged, timed_out):
+        path = tmp_path / "slow.jsonl"
+        log = SlowQueryLog(path=str(path), threshold_ms=10, explain_sample_rate=0)
+        monkeypatch.setattr(executor, "get_slow_query_log", lambda: log)
+
+        with pytest.raises(type(error)):
+            executor._execute(_FailingStrategy(error), "SELECT * FROM rate_table", None, None, "trace-1", None)
+
+        if not logged:
+            assert not path.exists()
+            return
+        [entry] = _read_entries(path)
+        assert entry["trace_id"] == "trace-1" and entry["latency_ms"] >= 10
+        assert entry["error"] == str(error) and entry["timed_out"] is timed_out
@@ -0,0 +1,174 @@
+"""
+语义问题缓存 单元测试
+验证实体提取、结构版本不含样本值、相近问题命中、实体/维度取值/包含排除/技能版本/表结构变化时不复用，以及 NLToSQLAgent 的复用与失效流程。
+"""
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from src.core.question_cache import QuestionCache, extract_entities, schema_signature
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QuestionCache(path=str(tmp_path / "vector_db"), max_entries=3)
+
+
+SCOPE = ("nl-to-sql-agent", "1.0.0", "excel-cost")
+
+
+def test_extract_entities():
+    assert extract_entities("2024年3月IT部门成本最高的前五个项目") == (
+        "code:it", "month:3", "number:2024", "order:max", "top:5",
+    )
+    assert extract_entities("2024年三月份it部门的成本") == ("month:3", "number:2024")
+    assert extract_entities("Q1 HR 人工成本") == extract_entities("第一季度HR的人工成本")
+    assert extract_entities("去年各部门平均成本") == ("agg:avg", "year:-1")
+    assert extract_entities("2024年IT成本不包括外包") != extract_entities("2024年IT成本包括外包")
+    assert "cmp:gt" in extract_entities("费用超过100万的部门") and "cmp:le" in extract_entities("费用不超过100万的部门")
+    assert extract_entities("分摊给财务部的费用", ["财务部", "人事部"]) == ("value:财务部",)
+
+
+def test_schema_signature_ignores_sample_values():
+    def schema(samples, cost_type="numeric", column="cost_center_description_long_name"):
+        return "\n".join([
+            "\n=== Table: costs ===\n",
+            f"{'dept':<30} character varying (max length: 50, nullable: YES, samples: {samples})",
+            f"{'cost':<30} {cost_type} (max length: N/A, nullable: YES, samples: 1.5, 2.0)",
+            f"{column:<30} text (max length: N/A, nullable: NO, samples: N/A)",
+        ])
+
+    signature = schema_signature(schema("'IT', 'HR', 'Finance'"))
+    assert signature == [
+        ("costs",),
+        ("costs", "dept", "character varying"),
+        ("costs", "cost", "numeric"),
+        ("costs", "cost_center_description_long_name", "text"),
+    ]
+    assert schema_signature(schema("'Legal', 'IT', 'HR'")) == signature
+    assert schema_signature(schema("'IT'", cost_type="double precision")) != signature
+    assert schema_signature(schema("'IT'", column="cost_center")) != signature
+    assert schema_signature("表 a.xlsx (Sheet1) 列信息:\n  - dept (object)") == [
+        ("表 a.xlsx (Sheet1) 列信息:",), ("- dept (object)",),
+    ]
+
+
+def test_paraphrase_hits_and_entities_must_match(cache):
+    cache.store("2024年IT部门的总成本是多少？", "SELECT SUM(cost) FROM costs", ["costs"], *SCOPE, "v1")
+
+    hit = cache.lookup("请问IT部门2024年总成本是多少", *SCOPE, lambda tables: "v1")
+    assert hit is not None and hit.sql == "SELECT SUM(cost) FROM costs" and hit.table_names == ["costs"]
+    assert hit.similarity >= cache.similarity_threshold
+
+    assert cache.lookup("2025年IT部门的总成本是多少？", *SCOPE, lambda tables: "v1") is None
+    assert cache.lookup("2024年IT部门的平均成本是多少？", *SCOPE, lambda tables: "v1") is None
+    assert cache.lookup("各部门人数", *SCOPE, lambda tables: "v1") is None
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["rejected_entities"]) == (1, 3, 2)
+
+
+ALLOCATION = "2024年研发中心按人数分摊给财务部的IT服务费用合计"
+ALLOCATION_SQL = (
+    "SELECT SUM(amount * rate) FROM costs JOIN rates USING (cc) "
+    "WHERE year = 'FY24' AND cc = '研发中心' AND bl = '财务部' AND key = 'headcount'"
+)
+
+
+def test_department_swap_is_not_reused(cache):
+    cache.store(ALLOCATION, ALLOCATION_SQL, ["costs", "rates"], *SCOPE, "v1")
+    swapped = ALLOCATION.replace("财务部", "人事部")
+
+    # 无维度取值时由缓存 SQL 中的取值拦截
+    assert cache.lookup(swapped, *SCOPE, lambda t: "v1") is None
+    assert cache.lookup("研发中心2024年按人数分摊给财务部的IT服务费用合计", *SCOPE, lambda t: "v1") is not None
+
+    # 字段取值索引命中的部门作为实体
+    terms = ["研发中心", "财务部", "人事部"]
+    cache.store(ALLOCATION, "SELECT 1", ["costs"], *SCOPE, "v1", terms)
+    assert cache.lookup(swapped, *SCOPE, lambda t: "v1", terms) is None
+    assert cache.lookup(ALLOCATION, *SCOPE, lambda t: "v1", terms) is not None
+    assert cache.get_stats()["rejected_entities"] == 2
+
+
+def test_negation_is_not_reused(cache):
+    cache.store("2024年IT成本不包括外包", "SELECT SUM(cost) FROM costs WHERE NOT outsourced", ["costs"], *SCOPE, "v1")
+    assert cache.lookup("2024年IT成本包括外包", *SCOPE, lambda t: "v1") is None
+    assert cache.lookup("2024年IT成本，不包括外包", *SCOPE, lambda t: "v1") is not None
+    assert cache.get_stats()["rejected_entities"] == 1
+
+
+def test_skill_and_schema_version_invalidate(cache):
+    cache.store("各部门的总成本", "SELECT dept, SUM(cost) FROM costs GROUP BY dept", ["costs"], *SCOPE, "v1")
+
+    assert cache.lookup("各部门总成本", "nl-to-sql-agent", "1.1.0", SCOPE[2], lambda t: "v1") is None
+    assert cache.lookup("各部门总成本", *SCOPE, lambda t: "v2") is None
+    assert cache.get_stats()["rejected_schema"] == 1 and cache.get_stats()["entries"] == 0
+
+
+def test_eviction_keeps_recently_used(cache):
+    for i, question in enumerate(["各部门的总成本", "各项目的总成本", "各地区的总成本", "各月份的总成本"]):
+        cache.store(question, f"SELECT {i}", ["costs"], *SCOPE, "v1")
+    assert cache.get_stats()["entries"] == 3
+    assert cache.lookup("各部门的总成本", *SCOPE, lambda t: "v1") is None
+
+
+class _Graph:
+    def __init__(self, passed):
+        self.passed, self.states = passed, []
+
+    def invoke(self, state, config=None):
+        self.states.append(state)
+        return {**state, "review_passed": self.passed, "execution_result": "42", "review_message": "42"}
+
+
+class _Workflow:
+    def __init__(self, full, cached):
+        self.full, self.cached = full, cached
+
+    def get_graph(self):
+        return self.full
+
+    def get_cached_sql_graph(self):
+        return self.cached
+
+
+class _Session:
+    def get_schema_info(self, table_names, data_source_type=None):
+        return f"schema of {table_names}"
+
+
+def _agent(cached_passes):
+    module = pytest.importorskip("src.nl_to_sql_agent", reason="workflow graph not importable", exc_type=ImportError)
+    NLToSQLAgent = module.NLToSQLAgent
+
+    agent = NLToSQLAgent.__new__(NLToSQLAgent)
+    agent.skill_name = "nl-to-sql-agent"
+    agent.workflow = _Workflow(_Graph(True), _Graph(cached_passes))
+    return agent
+
+
+def test_agent_reuses_sql_and_drops_rejected_entries(cache):
+    agent = _agent(cached_passes=True)
+    scope = {"cache": cache, "skill_name": SCOPE[0], "skill_version": SCOPE[1], "source": SCOPE[2],
+             "data_source_type": "excel"}
+    state = {"trace_id": "t1", "user_query": "2024年IT部门的总成本", "data_source_type": "excel"}
+
+    assert agent._run_cached_sql(state["user_query"], state, scope, _Session(), {}) is None
+    agent._remember_sql(
+        state["user_query"],
+        {"review_passed": True, "sql_query": "SELECT SUM(cost) FROM costs", "table_names": ["costs"]},
+        scope,
+        _Session(),
+    )
+
+    result = agent._run_cached_sql("请问IT部门2024年总成本是多少", state, scope, _Session(), {})
+    assert result["success"] and result["sql"] == "SELECT SUM(cost) FROM costs"
+    assert result["question_cache"]["matched_question"] == "2024年IT部门的总成本"
+    replayed = agent.workflow.cached.states[0]
+    assert replayed["sql_valid"] and replayed["table_names"] == ["costs"]
+
+    agent.workflow.cached.passed = False
+    assert agent._run_cached_sql("IT部门2024年的总成本", state, scope, _Session(), {}) is None
+    assert cache.get_stats()["entries"] == 0
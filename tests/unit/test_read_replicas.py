@@ -0,0 +1,126 @@
+"""
+只读副本路由 单元测试
+用 SQLite 文件库模拟主库与副本，验证加权/最低耗时选择、延迟排除与故障转移；
+设置 NL2SQL_TEST_PG_PRIMARY 与 NL2SQL_TEST_PG_REPLICA（SQLAlchemy URL）时对两个 PostgreSQL 实例做联调。
+"""
+
+import os
+import sqlite3
+from collections import Counter
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.core.data_sources.replicas import Replica, ReplicaPool, is_read_only
+
+
+def _database(path, label):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (served_by TEXT)")
+        conn.execute("INSERT INTO t VALUES (?)", (label,))
+    return f"sqlite:///{path}"
+
+
+def _run(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT served_by FROM t")).scalar()
+
+
+@pytest.fixture
+def dsns(tmp_path):
+    return {name: _database(tmp_path / f"{name}.db", name) for name in ("primary", "r1", "r2")}
+
+
+def _pool(dsns, weights=None, lag=None, **kwargs):
+    weights = weights or {"r1": 1.0, "r2": 1.0}
+    replicas = [Replica(name=name, dsn=dsns.get(name, name), weight=w) for name, w in weights.items()]
+    lag_probe = None
+    if lag is not None:
+        by_url = {dsns.get(name, name): seconds for name, seconds in lag.items()}
+        lag_probe = lambda engine: by_url[str(engine.url)]
+    return ReplicaPool(replicas, engine_factory=create_engine, lag_probe=lag_probe, **kwargs)
+
+
+def test_read_only_detection():
+    assert is_read_only("  WITH x AS (SELECT 1) SELECT * FROM x")
+    assert is_read_only("(SELECT 1) UNION (SELECT 2)")
+    assert not is_read_only("SELECT * INTO backup FROM t")
+    assert not is_read_only("DELETE FROM t")
+
+
+def test_weighted_selection_follows_weights(dsns):
+    pool = _pool(dsns, weights={"r1": 3.0, "r2": 1.0})
+    primary = create_engine(dsns["primary"])
+    served = Counter(pool.execute(_run, primary=lambda: primary) for _ in range(400))
+    assert served["primary"] == 0
+    assert 2.0 < served["r1"] / served["r2"] < 4.5
+
+
+def test_least_latency_prefers_fastest_replica(dsns):
+    pool = _pool(dsns, strategy="least_latency")
+    pool.replicas[0].latency_ms, pool.replicas[1].latency_ms = 50.0, 5.0
+    assert [r.name for r in pool.candidates()] == ["r2", "r1"]
+
+
+def test_lagging_replica_excluded_and_primary_used_when_all_lag(dsns):
+    primary = create_engine(dsns["primary"])
+    pool = _pool(dsns, lag={"r1": 120.0, "r2": 1.0}, max_lag_seconds=30)
+    assert {pool.execute(_run, primary=lambda: primary) for _ in range(20)} == {"r2"}
+
+    pool = _pool(dsns, lag={"r1": 120.0, "r2": 90.0}, max_lag_seconds=30)
+    assert pool.execute(_run, primary=lambda: primary) == "primary"
+    assert pool.get_stats()["primary"] == 1
+
+
+def test_connection_failure_fails_over_and_cools_down(dsns, tmp_path):
+    dsns["dead"] = f"sqlite:///{tmp_path / 'missing' / 'dead.db'}"
+    primary = create_engine(dsns["primary"])
+    pool = _pool(dsns, weights={"dead": 1.0, "r1": 0.0}, failure_cooldown_seconds=60)
+
+    assert pool.execute(_run, primary=lambda: primary) == "r1"
+    stats = pool.get_stats()
+    assert stats["failovers"] == 1 and not stats["replicas"]["dead"]["healthy"]
+    assert [r.name for r in pool.candidates()] == ["r1"]
+
+
+def test_query_errors_do_not_fail_over(dsns):
+    pool = _pool(dsns)
+
+    def broken(engine):
+        raise ValueError("syntax error")
+
+    with pytest.raises(ValueError):
+        pool.execute(broken, primary=lambda: pytest.fail("must not fall back"))
+    assert pool.get_stats()["failovers"] == 0
+
+
+def test_no_fallback_to_primary(dsns, tmp_path):
+    pool = _pool(
+        {"dead": f"sqlite:///{tmp_path / 'missing' / 'dead.db'}"},
+        weights={"dead": 1.0},
+        fallback_to_primary=False,
+    )
+    with pytest.raises(Exception):
+        pool.execute(_run, primary=lambda: pytest.fail("must not fall back"))
+
+
+PG_PRIMARY = os.environ.get("NL2SQL_TEST_PG_PRIMARY")
+PG_REPLICA = os.environ.get("NL2SQL_TEST_PG_REPLICA")
+
+
+@pytest.mark.skipif(not (PG_PRIMARY and PG_REPLICA), reason="two PostgreSQL instances not configured")
+def test_postgres_reads_served_by_replica():
+    from src.config.settings import ReplicaEndpointConfig, ReplicaSetConfig
+    from src.core.data_sources.postgres_source import PostgreSQLDataSource
+
+    source = PostgreSQLDataSource()
+    source._engine = create_engine(PG_PRIMARY)
+    source.replica_config = ReplicaSetConfig(endpoints=[ReplicaEndpointConfig(dsn=PG_REPLICA)])
+    try:
+        df = source.execute_query("SELECT inet_server_port() AS port, pg_is_in_recovery() AS standby")
+        stats = source.get_replica_stats()
+        assert isinstance(df, pd.DataFrame) and stats["replica"] == 1 and stats["primary"] == 0
+        assert stats["replicas"]["replica1"]["lag_seconds"] is not None
+    finally:
+        source.close()
@@ -0,0 +1,124 @@
+"""
+查询结果缓存 单元测试
+验证 SQL 规范化、数据版本失效、无数据版本的数据源默认不缓存、字节上限/TTL，以及磁盘 Parquet 层。
+"""
+
+import importlib.util
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.result_cache import ResultCache, canonicalize_sql
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_cost_data.xlsx"
+
+
+class CountingSource(ExcelDataSource):
+    """记录实际执行次数，数据版本可手动修改"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.executions = 0
+        self.version = "v1"
+
+    def execute_query(self, query, timeout=None, cancel_token=None):
+        self.executions += 1
+        return super().execute_query(query, timeout=timeout, cancel_token=cancel_token)
+
+    def data_version(self):
+        return self.version
+
+
+class TestCanonicalize:
+    """测试 SQL 规范化"""
+
+    def test_whitespace_case_and_comments_ignored(self):
+        a = "SELECT  Function, SUM(Amount)\nFROM Sheet1 -- totals\nWHERE Year = 2025 GROUP BY Function;"
+        b = "select function , sum( amount ) from sheet1 where year=2025 group by function"
+        assert canonicalize_sql(a) == canonicalize_sql(b)
+
+    def test_literals_and_quoted_identifiers_preserved(self):
+        assert canonicalize_sql("SELECT 'IT' FROM t") != canonicalize_sql("SELECT 'it' FROM t")
+        assert '"Cost text"' in canonicalize_sql('SELECT "Cost text" FROM t')
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+class TestResultCache:
+    """测试缓存命中与失效"""
+
+    def test_repeat_query_served_from_memory_until_version_changes(self):
+        cache = ResultCache()
+        source = CountingSource(str(FIXTURE))
+        query = "SELECT Function, SUM(Amount) AS total FROM Sheet1 GROUP BY Function"
+
+        key = cache.make_key(source, query)
+        cache.put(key, source.execute_query(query))
+        hit = cache.get(cache.make_key(source, query.lower().replace(" ", "  ")))
+        assert hit is not None and source.executions == 1
+
+        source.version = "v2"
+        cache.data_version_ttl_seconds = 0
+        assert cache.get(cache.make_key(source, query)) is None
+        stats = cache.get_stats()
+        assert stats["memory_hits"] == 1 and stats["misses"] == 1
+
+    def test_unversioned_source_not_cached_by_default(self):
+        source = CountingSource(str(FIXTURE))
+        source.version = None
+        query = "SELECT COUNT(*) AS n FROM Sheet1"
+
+        cache = ResultCache()
+        key = cache.make_key(source, query)
+        assert key is not None  # single-flight 仍可使用
+        cache.put(key, source.execute_query(query))
+        assert cache.get(key) is None and cache.get_stats()["unversioned"] == 1
+
+        cache = ResultCache(unversioned_ttl_seconds=0.05)
+        key = cache.make_key(source, query)
+        cache.put(key, source.execute_query(query))
+        assert cache.get(key) is not None
+        time.sleep(0.1)
+        assert cache.get(key) is None
+
+    def test_non_select_statements_not_cached(self):
+        cache = ResultCache()
+        assert cache.make_key(CountingSource(str(FIXTURE)), "DELETE FROM Sheet1") is None
+
+
+class TestBounds:
+    """测试字节上限与 TTL"""
+
+    def _frame(self, rows):
+        return pd.DataFrame({"x": range(rows)})
+
+    def test_lru_evicts_to_byte_bound(self):
+        frame = self._frame(1000)
+        size = int(frame.memory_usage(deep=True, index=True).sum())
+        cache = ResultCache(max_memory_bytes=size * 2, max_entry_bytes=size * 2)
+        for key in ("a", "b", "c"):
+            cache.put(key, frame)
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+        assert cache.get_stats()["memory_bytes"] <= size * 2
+
+    def test_oversized_entry_skipped_and_ttl_expires(self):
+        cache = ResultCache(max_entry_bytes=100, ttl_seconds=0.05)
+        cache.put("big", self._frame(1000))
+        assert cache.get_stats()["skipped"] == 1
+        cache.put("small", self._frame(1))
+        time.sleep(0.1)
+        assert cache.get("small") is None
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="pyarrow not installed")
+def test_disk_tier_survives_memory_reset(tmp_path):
+    frame = pd.DataFrame({"Function": ["IT", "HR"], "total": [1.5, 2.5]})
+    ResultCache(disk_enabled=True, disk_path=str(tmp_path)).put("k", frame)
+
+    fresh = ResultCache(disk_enabled=True, disk_path=str(tmp_path))
+    pd.testing.assert_frame_equal(fresh.get("k"), frame)
+    assert fresh.get_stats()["disk_hits"] == 1
+    assert fresh.get("k") is not None and fresh.get_stats()["memory_hits"] == 1
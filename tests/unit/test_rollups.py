@@ -0,0 +1,127 @@
+"""
+分摊预聚合表 单元测试
+使用 SQLite 引擎验证预聚合结果与原始 monthly_alloc 口径一致、按分区增量刷新，以及 SQL 规则引导。
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.config.settings import get_config
+from src.core.data_sources.rollups import AllocationRollup
+from src.core.metadata import get_sql_generation_rules
+
+sys.path.insert(
+    0, str(Path(__file__).parent.parent.parent / "skills" / "cost_allocation" / "scripts")
+)
+from generate_allocation_sql import generate_alloc_sql  # noqa: E402
+
+COST_ROWS = [
+    # year, scenario, function, key, month, amount
+    ("FY24", "Actual", "IT Allocation", "K1", "Oct", -100.0),
+    ("FY24", "Actual", "IT Allocation", "K1", "Nov", -200.0),
+    ("FY25", "Actual", "IT Allocation", "K1", "Oct", -150.0),
+    ("FY25", "Actual", "IT Allocation", "K2", "Oct", -50.0),
+    ("FY25", "Actual", "HR Allocation", "K1", "Oct", -80.0),
+]
+RATE_ROWS = [
+    # bl, cc, year, scenario, month, key, rate_no
+    ("CT", "C1", "FY24", "Actual", "Oct", "K1", 0.4),
+    ("DI", "C2", "FY24", "Actual", "Oct", "K1", 0.6),
+    ("CT", "C1", "FY24", "Actual", "Nov", "K1", 0.5),
+    ("CT", "C1", "FY25", "Actual", "Oct", "K1", 0.3),
+    ("CT", "C3", "FY25", "Actual", "Oct", "K2", 1.0),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE cost_database (year TEXT, scenario TEXT, function TEXT, "
+                "key TEXT, month TEXT, amount REAL)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE TABLE rate_table (bl TEXT, cc TEXT, year TEXT, scenario TEXT, "
+                "month TEXT, key TEXT, rate_no REAL)"
+            )
+        )
+        conn.execute(
+            text("INSERT INTO cost_database VALUES (:y, :s, :f, :k, :m, :a)"),
+            [dict(zip("ysfkma", row)) for row in COST_ROWS],
+        )
+        conn.execute(
+            text("INSERT INTO rate_table VALUES (:b, :c, :y, :s, :m, :k, :r)"),
+            [dict(zip("bcysmkr", row)) for row in RATE_ROWS],
+        )
+    return engine
+
+
+def _run_alloc(engine, use_rollup):
+    sql = generate_alloc_sql(
+        ["FY24", "FY25"], ["Actual"], "IT Allocation", "t7.bl", "'CT'", use_rollup=use_rollup
+    )
+    sql = sql.replace("SSME_FI_InsightBot_CostDataBase", "cost_database").replace(
+        "SSME_FI_InsightBot_Rate", "rate_table"
+    )
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(sql))]
+
+
+class TestAllocationRollup:
+    """测试预聚合表刷新"""
+
+    def test_rollup_matches_raw_allocation_sql(self, engine):
+        AllocationRollup(engine).refresh()
+        raw = _run_alloc(engine, use_rollup=False)
+        rolled = _run_alloc(engine, use_rollup=True)
+        assert [row[:2] for row in rolled] == [row[:2] for row in raw]
+        assert [row[2] for row in rolled] == pytest.approx([row[2] for row in raw])
+        assert [row[2] for row in rolled] == pytest.approx([-95.0, -140.0])
+
+    def test_missing_partitions_refreshed_incrementally(self, engine):
+        rollup = AllocationRollup(engine)
+        rollup.refresh([("FY24", "Actual", "Oct")])
+        assert sorted(rollup.missing_partitions()) == [
+            ("FY24", "Actual", "Nov"),
+            ("FY25", "Actual", "Oct"),
+        ]
+
+        rollup.refresh_missing()
+        assert rollup.missing_partitions() == []
+
+    def test_partition_refresh_replaces_rows(self, engine):
+        rollup = AllocationRollup(engine)
+        rollup.refresh()
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE rate_table SET rate_no = 1.0 WHERE month = 'Nov'"))
+        rollup.refresh([("FY24", "Actual", "Nov")])
+
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT allocated_amount FROM alloc_cost_rollup "
+                    "WHERE year = 'FY24' AND month = 'Nov'"
+                )
+            ).fetchall()
+        assert rows == [(-200.0,)]
+
+
+class TestRollupRules:
+    """测试 SQL 生成规则引导"""
+
+    def test_rules_mention_rollup_only_when_enabled(self, monkeypatch):
+        rollups = get_config().data_source.rollups
+        monkeypatch.setattr(rollups, "enabled", False)
+        assert "alloc_cost_rollup" not in get_sql_generation_rules("postgresql")
+
+        monkeypatch.setattr(rollups, "enabled", True)
+        assert "alloc_cost_rollup" in get_sql_generation_rules("postgresql")
+        assert "[function]" in get_sql_generation_rules("sqlserver")
+        assert "alloc_cost_rollup" not in get_sql_generation_rules("excel")
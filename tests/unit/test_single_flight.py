@@ -0,0 +1,152 @@
+"""
+Single-flight 合并 单元测试
+验证并发相同执行只运行一次、异常传播、leader 取消或超时后 follower 重新执行，以及执行器层的合并。
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.core.data_sources.cancellation import CancellationToken, QueryCancelledError, QueryTimeoutError
+from src.core.data_sources.excel_source import ExcelDataSource
+from src.core.data_sources.executor import run_query
+from src.core.data_sources.single_flight import SingleFlight
+
+FIXTURE = Path(__file__).parent.parent / "fixtures" / "nl_cost_data.xlsx"
+
+
+def _run_concurrently(flight, key, fn, callers=5):
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(flight.do, key, fn) for _ in range(callers)]
+        return [f.result() for f in futures]
+
+
+class TestSingleFlight:
+    """测试合并语义"""
+
+    def test_concurrent_calls_execute_once(self):
+        flight = SingleFlight()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.2)
+            return "rows"
+
+        results = _run_concurrently(flight, "k", fn)
+        assert len(calls) == 1
+        assert [r for r, _ in results] == ["rows"] * 5
+        assert sum(shared for _, shared in results) == 4
+        assert flight.get_stats() == {"executions": 1, "shared": 4, "in_flight": 0}
+
+    def test_leader_error_propagates_to_followers(self):
+        flight = SingleFlight()
+
+        def fn():
+            time.sleep(0.2)
+            raise ValueError("boom")
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(flight.do, "k", fn) for _ in range(3)]
+            for future in futures:
+                with pytest.raises(ValueError):
+                    future.result()
+        assert flight.get_stats()["executions"] == 1
+
+    def test_followers_retry_after_leader_cancelled(self):
+        flight = SingleFlight()
+        calls = []
+        leader_started = threading.Event()
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                leader_started.set()
+                time.sleep(0.2)
+                raise QueryCancelledError("cancelled by caller")
+            return "rows"
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", fn)
+            leader_started.wait()
+            follower = pool.submit(flight.do, "k", fn)
+            with pytest.raises(QueryCancelledError):
+                leader.result()
+            assert follower.result() == ("rows", False)
+        assert len(calls) == 2
+
+    def test_follower_reruns_after_leader_timeout(self):
+        flight = SingleFlight()
+        calls = []
+        leader_started = threading.Event()
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                leader_started.set()
+                time.sleep(0.2)
+                raise QueryTimeoutError("leader deadline exceeded")
+            return "rows"
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", fn)
+            leader_started.wait()
+            follower = pool.submit(flight.do, "k", fn)
+            with pytest.raises(QueryTimeoutError):
+                leader.result()
+            assert follower.result() == ("rows", False)
+        assert len(calls) == 2
+
+    def test_follower_honours_own_cancel_token(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        token = CancellationToken()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", lambda: release.wait(5) and "rows")
+            time.sleep(0.05)
+            follower = pool.submit(flight.do, "k", lambda: "other", token)
+            time.sleep(0.05)
+            token.cancel()
+            with pytest.raises(QueryCancelledError):
+                follower.result(timeout=1)
+            release.set()
+            assert leader.result() == ("rows", False)
+
+
+class SlowSource(ExcelDataSource):
+    """执行变慢并计数；数据版本唯一，避免命中其他测试写入的结果缓存"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.executions = 0
+        self.version = uuid.uuid4().hex
+
+    def execute_query(self, query, timeout=None, cancel_token=None):
+        self.executions += 1
+        time.sleep(0.2)
+        return super().execute_query(query, timeout=timeout, cancel_token=cancel_token)
+
+    def data_version(self):
+        return self.version
+
+
+@pytest.mark.skipif(not FIXTURE.exists(), reason="fixture workbook missing")
+def test_run_query_coalesces_identical_statements():
+    source = SlowSource(str(FIXTURE))
+    queries = [
+        "SELECT Function, SUM(Amount) AS total FROM Sheet1 GROUP BY Function",
+        "select function, sum(amount) as total from sheet1 group by function",
+    ] * 3
+
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        frames = list(pool.map(lambda q: run_query(source, q), queries))
+
+    assert source.executions == 1
+    assert all(frame.equals(frames[0]) for frame in frames)
+    frames[1].iloc[0, 1] = -1
+    assert not frames[0].equals(frames[1])
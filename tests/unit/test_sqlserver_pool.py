@@ -0,0 +1,150 @@
+"""
+SQL Server 连接池与分批读取 单元测试
+用模拟的 pyodbc 驱动（无需 SQL Server 实例）验证共享 engine、连接池/登录超时设置与按列类型构建结果。
+"""
+
+import datetime
+import sys
+import types
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from src.core.data_sources.engines import dispose_shared_engines
+
+ROWS = [
+    (1, 1.5, "IT", datetime.datetime(2025, 1, 31), Decimal("10.25"), None, True),
+    (2, None, "HR", datetime.datetime(2025, 2, 28), Decimal("3.50"), 7, False),
+    (3, 2.0, None, None, None, None, True),
+]
+DESCRIPTION = [
+    (name, type_code, None, None, None, None, True)
+    for name, type_code in [
+        ("id", int), ("amount", float), ("func", str), ("period", datetime.datetime),
+        ("cost", Decimal), ("maybe", int), ("flag", bool),
+    ]
+]
+
+
+def _mock_pyodbc(log):
+    """最小的 pyodbc 替身：满足 SQLAlchemy mssql+pyodbc 方言初始化，业务查询返回 ROWS"""
+    module = types.ModuleType("pyodbc")
+    module.version, module.paramstyle, module.apilevel, module.threadsafety = "5.1.0", "qmark", "2.0", 1
+    module.SQL_DBMS_VER, module.SQL_DRIVER_NAME = 18, 6
+    module.Error = type("Error", (Exception,), {})
+    for name in ("Warning", "InterfaceError", "DatabaseError", "DataError", "OperationalError",
+                 "IntegrityError", "InternalError", "ProgrammingError", "NotSupportedError"):
+        setattr(module, name, type(name, (module.Error,), {}))
+
+    class Cursor:
+        arraysize = 1
+
+        def __init__(self):
+            self.description, self._rows = None, []
+
+        def execute(self, sql, *params):
+            if "FROM costs" in sql:
+                self.description, self._rows = DESCRIPTION, list(ROWS)
+            else:
+                self.description, self._rows = [("v", str, None, None, None, None, True)], [("16.0.1000.6",)]
+            return self
+
+        def fetchmany(self, size=None):
+            log.append(("fetchmany", size, self.arraysize))
+            batch, self._rows = self._rows[:size], self._rows[size:]
+            return batch
+
+        def fetchone(self):
+            return self._rows.pop(0) if self._rows else None
+
+        def fetchall(self):
+            batch, self._rows = self._rows, []
+            return batch
+
+        def nextset(self):
+            return False
+
+        def setinputsizes(self, *args):
+            pass
+
+        def cancel(self):
+            pass
+
+        def close(self):
+            pass
+
+    class Connection:
+        timeout = 0
+
+        def cursor(self):
+            return Cursor()
+
+        def getinfo(self, key):
+            return "16.00.1000"
+
+        def add_output_converter(self, *args):
+            pass
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    def connect(*args, **kwargs):
+        log.append(("connect", kwargs))
+        return Connection()
+
+    module.Cursor, module.Connection, module.connect = Cursor, Connection, connect
+    return module
+
+
+@pytest.fixture
+def driver_log(monkeypatch):
+    log = []
+    monkeypatch.setitem(sys.modules, "pyodbc", _mock_pyodbc(log))
+    dispose_shared_engines()
+    yield log
+    dispose_shared_engines()
+
+
+def _source(**overrides):
+    from src.core.data_sources.sqlserver_source import SQLServerDataSource
+
+    source = SQLServerDataSource(host="mock-host", password="pw")
+    for key, value in overrides.items():
+        setattr(source, key, value)
+    return source
+
+
+def test_sources_share_one_pooled_engine(driver_log):
+    first, second = _source(pool_size=3, pool_recycle=600, login_timeout=7), _source(
+        pool_size=3, pool_recycle=600, login_timeout=7
+    )
+    engine = first._get_engine()
+    assert second._get_engine() is engine
+    assert engine.pool.size() == 3 and engine.pool._recycle == 600 and engine.pool._pre_ping
+
+    first.execute_query("SELECT * FROM costs")
+    second.execute_query("SELECT * FROM costs")
+    connects = [entry for entry in driver_log if entry[0] == "connect"]
+    assert connects == [("connect", {"timeout": 7})]
+
+
+def test_batched_fetch_builds_typed_columns(driver_log):
+    df = _source(arraysize=2).execute_query("SELECT * FROM costs")
+
+    assert [e for e in driver_log if e[0] == "fetchmany"] == [("fetchmany", 2, 2)] * 3
+    assert str(df["id"].dtype) == "int64"
+    assert str(df["amount"].dtype) == "float64" and pd.isna(df["amount"][1])
+    assert str(df["maybe"].dtype) == "float64"
+    assert str(df["flag"].dtype) == "bool"
+    assert df["period"].dtype.kind == "M" and pd.isna(df["period"][2])
+    assert df["cost"][0] == Decimal("10.25") and pd.isna(df["func"][2])
+
+    expected = pd.DataFrame(ROWS, columns=[d[0] for d in DESCRIPTION])
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
@@ -0,0 +1,175 @@
+"""
+融合理解节点 单元测试
+验证一次结构化调用写入技能/意图/选表、load_context 复用选表、调用失败时退回原链路，以及两种预处理模式的图结构。
+"""
+
+import pytest
+
+understand_agent = pytest.importorskip(
+    "src.agents.understand_agent", reason="workflow agents not importable", exc_type=ImportError
+)
+
+from src.agents import load_context_agent
+from src.core.schemas import TableSelection, UnderstandingResult
+from src.graph.graph import GraphWorkflow
+
+
+class _Context:
+    def __init__(self, name):
+        self.name = name
+
+
+class _ContextLoader:
+    def load(self, skill_name):
+        return _Context(skill_name)
+
+
+class _Catalog:
+    def load_skill_summaries(self):
+        return []
+
+
+class _Selector:
+    catalog = _Catalog()
+
+
+class _Middleware:
+    default_skill = "nl-to-sql-agent"
+    context_loader = _ContextLoader()
+    selector = _Selector()
+
+    def resolve(self, skill_name, confidence, selected_by):
+        if confidence < 0.4:
+            skill_name, selected_by = self.default_skill, "fallback"
+        return {
+            "skill": None,
+            "skill_name": skill_name,
+            "skill_context": {"name": skill_name},
+            "skill_selected_by": selected_by,
+            "skill_confidence": confidence,
+        }
+
+
+class _StructuredLLM:
+    def __init__(self, result):
+        self.result, self.calls = result, 0
+
+    def with_structured_output(self, schema):
+        assert schema is UnderstandingResult
+        return self
+
+    def invoke(self, messages):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def _result(skill_name="nl-to-sql-agent", confidence=0.9):
+    return UnderstandingResult(
+        skill_name=skill_name,
+        skill_confidence=confidence,
+        is_data_query=True,
+        reason="成本统计",
+        tables=[TableSelection(table_name="costs", fields=["dept", "cost"])],
+    )
+
+
+@pytest.fixture(autouse=True)
+def middleware(monkeypatch):
+    middleware = _Middleware()
+    monkeypatch.setattr(understand_agent, "get_skill_middleware_singleton", lambda **kwargs: middleware)
+    return middleware
+
+
+def test_single_call_fills_skill_intent_and_tables():
+    llm = _StructuredLLM(_result())
+    state = understand_agent.understand_node({"user_query": "各部门总成本", "llm": llm})
+
+    assert llm.calls == 1
+    assert state["skill_name"] == "nl-to-sql-agent" and state["skill_selected_by"] == "understand"
+    assert state["skill_context"] == {"name": "nl-to-sql-agent"}
+    assert state["intent_analysis"] == {"is_data_query": True, "reason": "成本统计"}
+    assert state["selected_tables"] == [{"table_name": "costs", "fields": ["dept", "cost"]}]
+
+
+def test_switched_skill_leaves_table_selection_to_load_context():
+    state = understand_agent.understand_node({
+        "user_query": "各部门总成本",
+        "llm": _StructuredLLM(_result(skill_name="hr-report")),
+        "skill_name": "nl-to-sql-agent",
+        "skill_context": {"name": "nl-to-sql-agent"},
+    })
+    assert state["skill_name"] == "hr-report" and state["skill_context"] == {"name": "hr-report"}
+    assert state["selected_tables"] is None
+
+
+def test_forced_skill_and_low_confidence():
+    forced = understand_agent.understand_node({
+        "user_query": "q",
+        "llm": _StructuredLLM(_result(skill_name="hr-report")),
+        "skill_name": "nl-to-sql-agent",
+        "skill_context": {"name": "nl-to-sql-agent"},
+        "skill_selected_by": "forced",
+    })
+    assert forced["skill_name"] == "nl-to-sql-agent" and forced["skill_selected_by"] == "forced"
+    assert forced["selected_tables"] == [{"table_name": "costs", "fields": ["dept", "cost"]}]
+
+    fallback = understand_agent.understand_node({
+        "user_query": "q", "llm": _StructuredLLM(_result(skill_name="hr-report", confidence=0.1)),
+    })
+    assert fallback["skill_name"] == "nl-to-sql-agent" and fallback["skill_selected_by"] == "fallback"
+    assert fallback["selected_tables"] is not None
+
+
+def test_failed_structured_call_falls_back_to_chain(monkeypatch):
+    calls = []
+    monkeypatch.setattr(understand_agent, "select_skill_node", lambda state: calls.append("skill") or state)
+    monkeypatch.setattr(understand_agent, "analyze_intent_node", lambda state: calls.append("intent") or state)
+
+    state = understand_agent.understand_node({"user_query": "q", "llm": _StructuredLLM(ValueError("unsupported"))})
+    assert calls == ["skill", "intent"] and state["selected_tables"] is None
+
+
+def test_load_context_reuses_selected_tables(monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("load_context should not call the LLM")
+
+    monkeypatch.setattr(load_context_agent, "get_llm", unexpected)
+    monkeypatch.setattr(load_context_agent, "select_tables", unexpected)
+    monkeypatch.setattr(load_context_agent, "_is_auto_routing", lambda: False)
+
+    class _Provider:
+        def detect_sources(self, table_names):
+            self.detected = table_names
+
+        def get_data_source_context(self, table_names, **kwargs):
+            return f"schema of {table_names}"
+
+        def is_sql_server_mode(self):
+            return False
+
+        def is_excel_mode(self):
+            return True
+
+    monkeypatch.setattr(load_context_agent, "get_data_source_context_provider", _Provider)
+    state = load_context_agent.load_context_node({
+        "user_query": "q", "selected_tables": [{"table_name": "costs", "fields": ["cost"]}],
+    })
+    assert state["table_names"] == ["costs"] and state["data_source_schema"] == "schema of ['costs']"
+
+
+@pytest.mark.parametrize(
+    "mode, entry, absent",
+    [("chain", "select_skill", "understand"), ("fused", "understand", "select_skill")],
+)
+def test_graph_preprocess_modes(mode, entry, absent):
+    graph = GraphWorkflow(preprocess=mode, fan_out=False).build_graph()
+    assert entry in graph.nodes and absent not in graph.nodes
+    assert ("__start__", entry) in graph.builder.edges
+    assert GraphWorkflow(preprocess=mode).preprocess == mode
+
+
+def test_graph_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        GraphWorkflow(preprocess="parallel")